@@ -119,7 +119,7 @@ def get_secret(name):
 
 def fetch_graph_emails(access_token, rcb_email, max_pages=20):
     """Fetch ALL messages from inbox + sentItems (paginated)."""
-    import requests
+    from lib.graph_client import graph_request
 
     all_messages = []
     seen_ids = set()
@@ -133,7 +133,7 @@ def fetch_graph_emails(access_token, rcb_email, max_pages=20):
         }
 
         for page in range(max_pages):
-            resp = requests.get(url, headers={"Authorization": f"Bearer {access_token}"}, params=params)
+            resp = graph_request("GET", url, access_token, params=params)
             if resp.status_code != 200:
                 print(f"    Graph API error ({folder} p{page}): {resp.status_code}")
                 break
@@ -0,0 +1,129 @@
+"""
+Chapter detection benchmark.
+
+Compares the single-pass detector used by decide_chapter()
+(_chapter_decision_trees._detect_chapter: one Aho-Corasick scan for the
+candidate chapters, then only their detectors in priority order) with the
+linear walk over _CHAPTER_DETECT_ORDER it replaced, on every product and
+detector text in tests/test_chapter_decision_trees.py.
+
+Reports texts/sec for both, the speedup, the average number of detectors
+run per text, and any text where the two pick a different chapter (there
+should be none — the benchmark exits 1 if so).
+
+Usage:
+  python benchmarks/chapter_detect_bench.py [--repeat 20] [--json out.json]
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+
+from lib import _chapter_decision_trees as trees  # noqa: E402
+
+FIXTURES = os.path.join(FUNCTIONS_DIR, "tests", "test_chapter_decision_trees.py")
+_PRODUCT_FIELDS = ("name", "essence", "physical", "function",
+                   "transformation_stage", "processing_state", "dominant_material_pct")
+
+
+def load_fixture_texts(path=FIXTURES):
+    """Product texts from the literal _make_product(...) / _is_chapter_NN_candidate("...") calls."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    texts = []
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Call) or not isinstance(node.func, ast.Name):
+            continue
+        try:
+            args = [ast.literal_eval(a) for a in node.args]
+            kwargs = {k.arg: ast.literal_eval(k.value) for k in node.keywords}
+        except (ValueError, TypeError, SyntaxError):
+            continue  # built from variables
+        if node.func.id == "_make_product":
+            product = {"function": "human consumption"}
+            product.update(zip(_PRODUCT_FIELDS, args))
+            product.update(kwargs)
+            texts.append(trees._product_text(product))
+        elif node.func.id.startswith("_is_chapter_") and args and isinstance(args[0], str):
+            texts.append(args[0])
+    return texts
+
+
+def linear_detect(text):
+    """The previous dispatcher: every detector in order until one fires."""
+    for ch_num, detect_fn, tree_fn in trees._CHAPTER_DETECT_ORDER:
+        if detect_fn(text):
+            return ch_num, tree_fn
+    return None
+
+
+def _chapter(detected):
+    return detected[0] if detected else None
+
+
+def _time_per_text(fn, texts, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - t0) / (repeat * len(texts))
+
+
+def run_benchmark(texts, repeat=20):
+    t0 = time.perf_counter()
+    trees._get_detect_matcher()
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    mismatches = [
+        {"text": text[:120], "linear": _chapter(linear_detect(text)),
+         "single_pass": _chapter(trees._detect_chapter(text))}
+        for text in texts
+        if _chapter(linear_detect(text)) != _chapter(trees._detect_chapter(text))
+    ]
+    linear = _time_per_text(linear_detect, texts, repeat)
+    single = _time_per_text(trees._detect_chapter, texts, repeat)
+    return {
+        "texts": len(texts),
+        "matched": sum(1 for text in texts if trees._detect_chapter(text)),
+        "matcher_build_ms": round(build_ms, 1),
+        "linear_texts_per_sec": round(1 / linear) if linear else 0,
+        "single_pass_texts_per_sec": round(1 / single) if single else 0,
+        "speedup": round(linear / single, 1) if single else 0,
+        "avg_candidate_chapters": round(
+            sum(len(trees._candidate_chapters(text)) for text in texts) / max(len(texts), 1), 2),
+        "detectors": len(trees._CHAPTER_DETECT_ORDER),
+        "mismatches": mismatches,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--fixtures", default=FIXTURES)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--json", default="", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = run_benchmark(load_fixture_texts(args.fixtures), max(1, args.repeat))
+    print(f"fixture texts:           {report['texts']} ({report['matched']} routed to a chapter)")
+    print(f"matcher build:           {report['matcher_build_ms']} ms (once per process)")
+    print(f"linear walk:             {report['linear_texts_per_sec']:>8} texts/sec")
+    print(f"single pass:             {report['single_pass_texts_per_sec']:>8} texts/sec")
+    print(f"speedup:                 {report['speedup']}x")
+    print(f"candidate chapters/text: {report['avg_candidate_chapters']} of {report['detectors']} detectors")
+    print(f"mismatches:              {len(report['mismatches'])}")
+    for m in report["mismatches"]:
+        print(f"  linear={m['linear']} single_pass={m['single_pass']}  {m['text']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    sys.exit(1 if report["mismatches"] else 0)
+
+
+if __name__ == "__main__":
+    main()
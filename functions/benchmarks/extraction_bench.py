@@ -0,0 +1,212 @@
+"""
+Extraction backend benchmark.
+
+Runs every registered extraction_engine backend over the checked-in corpus
+(benchmarks/corpus/, see extraction_corpus.py) and reports, per document
+class and backend:
+
+    chars/sec   raw extracted characters per second of wall time
+    peak MB     tracemalloc peak of the Python heap during one document,
+                and the peak RSS of the worker process (--isolate)
+    quality     share of expected facts (expected.json) found in the text
+    errors      documents the backend raised on
+
+and a suggested backend order per class: backends meeting --min-quality,
+fastest first. Apply it with RCB_EXTRACTION_BACKENDS or
+extraction_engine.set_backend_order().
+
+With --isolate each (class, backend) pair runs in a fresh process so the
+RSS column reflects that backend alone (imports included). OCR backends
+need Vision credentials; without them they show up as errors / quality 0.
+
+Usage:
+  python benchmarks/extraction_bench.py [--backends rcb,smart] [--classes pdf,excel]
+                                        [--repeat 3] [--min-quality 0.9]
+                                        [--isolate] [--json out.json]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+import tracemalloc
+
+FUNCTIONS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, FUNCTIONS_DIR)
+
+from lib import extraction_engine  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+DEFAULT_BACKENDS = ("rcb", "smart", "reliable", "pipeline")
+DEFAULT_MIN_QUALITY = 0.9
+
+
+def _normalize(text):
+    return re.sub(r"\s+", " ", (text or "")).strip().lower()
+
+
+def quality_score(text, facts):
+    """Share of expected facts present in text (case / whitespace insensitive)."""
+    if not facts:
+        return 1.0
+    haystack = _normalize(text)
+    return sum(1 for fact in facts if _normalize(fact) in haystack) / len(facts)
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """[(filename, bytes, meta)] with meta["doc_class"] filled in."""
+    with open(os.path.join(corpus_dir, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    docs = []
+    for filename in sorted(expected):
+        with open(os.path.join(corpus_dir, filename), "rb") as f:
+            data = f.read()
+        meta = dict(expected[filename])
+        meta["doc_class"] = extraction_engine.detect_doc_class(filename)
+        docs.append((filename, data, meta))
+    return docs
+
+
+def _rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    except Exception:
+        return None
+
+
+def bench_document(backend, filename, data, meta, repeat=1):
+    """Run one backend on one document. Returns a row dict."""
+    row = {"file": filename, "doc_class": meta["doc_class"], "backend": backend,
+           "chars": 0, "seconds": 0.0, "peak_mb": 0.0, "quality": 0.0, "error": None}
+    text = ""
+    try:
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            text, _tables = extraction_engine.run_backend(backend, data, filename, doc_class=meta["doc_class"])
+        row["seconds"] = (time.perf_counter() - t0) / repeat
+        row["peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+    except Exception as e:
+        row["error"] = f"{e.__class__.__name__}: {e}"[:200]
+    finally:
+        tracemalloc.stop()
+    row["chars"] = len(text)
+    row["quality"] = quality_score(text, meta.get("facts", []))
+    return row
+
+
+def bench_group(backend, docs, repeat=1):
+    """Bench one backend over docs (one class). Returns (rows, process peak RSS MB)."""
+    rows = [bench_document(backend, filename, data, meta, repeat) for filename, data, meta in docs]
+    return rows, _rss_mb()
+
+
+def _isolated_group(args):
+    backend, docs, repeat = args
+    return bench_group(backend, docs, repeat)
+
+
+def run_benchmark(backends=DEFAULT_BACKENDS, classes=None, corpus_dir=CORPUS_DIR, repeat=1, isolate=False):
+    """Rows for every (document, backend) pair the backend supports, plus a summary."""
+    docs = load_corpus(corpus_dir)
+    by_class = {}
+    for doc in docs:
+        if classes and doc[2]["doc_class"] not in classes:
+            continue
+        by_class.setdefault(doc[2]["doc_class"], []).append(doc)
+
+    jobs = [(backend, class_docs, repeat)
+            for doc_class, class_docs in sorted(by_class.items())
+            for backend in backends
+            if backend in extraction_engine.available_backends(doc_class)]
+
+    rows, rss = [], {}
+    if isolate:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(processes=1, maxtasksperchild=1) as pool:
+            results = pool.map(_isolated_group, jobs, chunksize=1)
+    else:
+        results = [bench_group(*job) for job in jobs]
+    for (backend, class_docs, _), (group_rows, group_rss) in zip(jobs, results):
+        rows.extend(group_rows)
+        rss[(class_docs[0][2]["doc_class"], backend)] = group_rss
+    return rows, summarize(rows, rss if isolate else {})
+
+
+def summarize(rows, rss=None):
+    """Per (class, backend): docs, errors, chars/sec, peak MB, mean quality."""
+    groups = {}
+    for row in rows:
+        groups.setdefault((row["doc_class"], row["backend"]), []).append(row)
+    summary = []
+    for (doc_class, backend), group in sorted(groups.items()):
+        seconds = sum(r["seconds"] for r in group)
+        chars = sum(r["chars"] for r in group)
+        summary.append({
+            "doc_class": doc_class,
+            "backend": backend,
+            "docs": len(group),
+            "errors": sum(1 for r in group if r["error"]),
+            "chars_per_sec": round(chars / seconds) if seconds else 0,
+            "peak_mb": round(max(r["peak_mb"] for r in group), 2),
+            "rss_mb": round((rss or {}).get((doc_class, backend)) or 0, 1) or None,
+            "quality": round(sum(r["quality"] for r in group) / len(group), 3),
+        })
+    return summary
+
+
+def recommend_order(summary, min_quality=DEFAULT_MIN_QUALITY):
+    """doc_class -> backends with quality >= min_quality, fastest first."""
+    order = {}
+    for entry in summary:
+        if entry["quality"] >= min_quality:
+            order.setdefault(entry["doc_class"], []).append(entry)
+    return {doc_class: [e["backend"] for e in sorted(entries, key=lambda e: -e["chars_per_sec"])]
+            for doc_class, entries in sorted(order.items())}
+
+
+def _print_report(rows, summary, order):
+    print(f"{'file':<26} {'backend':<9} {'chars':>7} {'ms':>9} {'peak MB':>8} {'quality':>8}  error")
+    for r in rows:
+        print(f"{r['file']:<26} {r['backend']:<9} {r['chars']:>7} {r['seconds'] * 1000:>9.1f} "
+              f"{r['peak_mb']:>8.2f} {r['quality']:>8.2f}  {r['error'] or ''}")
+    print()
+    print(f"{'class':<7} {'backend':<9} {'docs':>4} {'err':>4} {'chars/sec':>11} {'peak MB':>8} "
+          f"{'RSS MB':>7} {'quality':>8}")
+    for s in summary:
+        rss = f"{s['rss_mb']:.1f}" if s["rss_mb"] else "-"
+        print(f"{s['doc_class']:<7} {s['backend']:<9} {s['docs']:>4} {s['errors']:>4} "
+              f"{s['chars_per_sec']:>11} {s['peak_mb']:>8.2f} {rss:>7} {s['quality']:>8.2f}")
+    print()
+    spec = ";".join(f"{c}={','.join(b)}" for c, b in order.items())
+    print(f"Suggested RCB_EXTRACTION_BACKENDS=\"{spec}\"")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--backends", default=",".join(DEFAULT_BACKENDS))
+    parser.add_argument("--classes", default="")
+    parser.add_argument("--corpus", default=CORPUS_DIR)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--min-quality", type=float, default=DEFAULT_MIN_QUALITY)
+    parser.add_argument("--isolate", action="store_true", help="one process per class/backend (true RSS)")
+    parser.add_argument("--json", default="", help="also write rows + summary to this file")
+    args = parser.parse_args()
+
+    backends = [b for b in args.backends.split(",") if b]
+    classes = {c for c in args.classes.split(",") if c} or None
+    rows, summary = run_benchmark(backends, classes, args.corpus, max(1, args.repeat), args.isolate)
+    order = recommend_order(summary, args.min_quality)
+    _print_report(rows, summary, order)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"rows": rows, "summary": summary, "recommended_order": order}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,624 @@
+"""
+Synthetic extraction benchmark corpus.
+
+Writes invoices, bills of lading and packing lists (Hebrew and English) in
+every attachment format the extraction engine handles, plus expected.json
+listing the facts a good extraction must contain (invoice / B/L numbers,
+HS codes, amounts, ports, Hebrew terms). Everything is built with the
+standard library only — handcrafted PDF, PNG, XLSX and DOCX containers and
+a 5x7 bitmap font for the scanned (image-only) documents — so the corpus
+is byte-for-byte reproducible and checked in under benchmarks/corpus/.
+
+Hebrew PDFs embed the same bitmap font (Latin capitals, digits and Hebrew
+letters) as a Type3 font with a ToUnicode map, so the text layer is real
+Unicode. Lines are laid out right-to-left: glyphs are written in logical
+order but positioned in visual order, as word processors do — extractors
+that sort by x coordinate return reversed Hebrew, which the facts catch.
+
+Usage:
+  python benchmarks/extraction_corpus.py [out_dir]
+"""
+
+import io
+import json
+import os
+import struct
+import sys
+import zipfile
+import zlib
+from email.message import EmailMessage
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+_ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+
+# ═══════════════════════════════════════════
+#  DOCUMENT CONTENT
+# ═══════════════════════════════════════════
+
+INVOICE_EN = [
+    "COMMERCIAL INVOICE",
+    "Invoice No: INV-2024-0117   Date: 14/03/2024",
+    "Seller: Ningbo Hydraulics Co., Ltd, Ningbo, China",
+    "Buyer: R.P.A. PORT LTD, Haifa, Israel",
+    "Terms: FOB Ningbo",
+    "Item  Description                  HS Code     Qty   Unit USD   Total USD",
+    "1     Hydraulic cylinder HC-80     8412.21     40    185.00     7,400.00",
+    "2     Excavator bucket teeth       8431.49     120   42.00      5,040.00",
+    "Country of origin: China",
+    "Total: USD 12,440.00",
+]
+INVOICE_EN_FACTS = ["INV-2024-0117", "14/03/2024", "Ningbo Hydraulics", "8412.21", "8431.49",
+                    "12,440.00", "FOB", "China"]
+
+BL_EN = [
+    "BILL OF LADING",
+    "B/L No: MEDU4829173",
+    "Shipper: Ningbo Hydraulics Co., Ltd",
+    "Consignee: R.P.A. PORT LTD, Haifa",
+    "Vessel: MSC ARIANE   Voyage: FA412W",
+    "Port of loading: Ningbo   Port of discharge: Haifa",
+    "Container: MSCU7712345   Seal: CN448812",
+    "2 x 40HC   160 packages   Gross weight 18,240 KG",
+    "Freight prepaid   Date of issue: 20/03/2024",
+]
+BL_EN_FACTS = ["MEDU4829173", "MSC ARIANE", "Haifa", "MSCU7712345", "18,240", "20/03/2024"]
+
+# Scanned documents use the bitmap font: upper case, digits and . , : / - # $ only
+SCAN_INVOICE_EN = [
+    "COMMERCIAL INVOICE",
+    "INVOICE NO: INV-2024-0231",
+    "DATE: 02/04/2024",
+    "SELLER: ANKARA STEEL WORKS",
+    "ORIGIN: TURKEY",
+    "HS CODE 7308.90  QTY 24",
+    "TOTAL: USD 8,760.00",
+]
+SCAN_INVOICE_EN_FACTS = ["INV-2024-0231", "02/04/2024", "ANKARA STEEL", "7308.90", "8,760.00"]
+
+SCAN_BL_EN = [
+    "BILL OF LADING",
+    "B/L NO: ZIMU3318820",
+    "VESSEL: ZIM MOUNT BLANC",
+    "POL: MERSIN  POD: ASHDOD",
+    "CONTAINER: ZCSU5501234",
+    "GROSS WEIGHT 9,120 KG",
+]
+SCAN_BL_EN_FACTS = ["ZIMU3318820", "ZIM MOUNT BLANC", "ASHDOD", "ZCSU5501234", "9,120"]
+
+# Hebrew PDFs use the bitmap font too: Hebrew letters, upper case, digits, . , : / - " $
+INVOICE_HE_PDF = [
+    "חשבונית מס 2024/781",
+    "תאריך: 05/05/2024",
+    "ספק: BELLA CASA, מילאנו",
+    "תנאי מסירה: CIF HAIFA",
+    "מכונת קפה ביתית, פרט מכס 8516.71",
+    'סה"כ לתשלום: EUR 9,450.00',
+]
+INVOICE_HE_PDF_FACTS = ["חשבונית מס", "2024/781", "05/05/2024", "BELLA CASA", "8516.71",
+                        "9,450.00", "מכונת קפה"]
+
+SCAN_BL_HE = [
+    "שטר מטען",
+    "מספר: ZIMU4410772",
+    "אניה: ZIM SHANGHAI",
+    "נמל פריקה: אשדוד",
+    "מכולה: ZCSU6602345",
+    "משקל ברוטו 7,480 KG",
+]
+SCAN_BL_HE_FACTS = ["שטר מטען", "ZIMU4410772", "ZIM SHANGHAI", "אשדוד", "ZCSU6602345", "7,480"]
+
+PACKING_EN = [
+    ["Packing List PL-0117", "", "", "", ""],
+    ["Carton", "Description", "Qty", "Net KG", "Gross KG"],
+    ["1-40", "Hydraulic cylinder HC-80", "40", "6,800", "7,120"],
+    ["41-160", "Excavator bucket teeth", "120", "10,560", "11,120"],
+    ["Total", "", "160", "17,360", "18,240"],
+]
+PACKING_EN_FACTS = ["PL-0117", "Hydraulic cylinder", "17,360", "18,240", "Carton"]
+
+PACKING_HE = [
+    ["רשימת אריזה 2024/553", "", "", ""],
+    ["קרטון", "תיאור", "כמות", "משקל ברוטו"],
+    ["1-12", "מכונת קפה ביתית", "48", "312"],
+    ["13-20", "מטחנת קפה חשמלית", "32", "198"],
+    ['סה"כ', "", "80", "510"],
+]
+PACKING_HE_FACTS = ["רשימת אריזה", "מכונת קפה", "מטחנת קפה", "510", "2024/553"]
+
+INVOICE_HE = [
+    "חשבונית מס 2024/553",
+    "תאריך: 11/02/2024",
+    "ספק: Bella Casa S.r.l, מילאנו, איטליה",
+    "לקוח: ר.פ.א. פורט בע\"מ, חיפה",
+    "עמיל מכס: ר.פ.א. פורט",
+    "תנאי מסירה: CIF Haifa",
+    "מכונת קפה ביתית, פרט מכס 8516.71, כמות 48",
+    "מטחנת קפה חשמלית, פרט מכס 8509.40, כמות 32",
+    'סה"כ לתשלום: EUR 14,880.00',
+]
+INVOICE_HE_FACTS = ["2024/553", "11/02/2024", "Bella Casa", "8516.71", "8509.40", "14,880.00",
+                    "עמיל מכס", "CIF"]
+
+BL_HE_HTML = """<!DOCTYPE html>
+<html dir="rtl" lang="he"><head><meta charset="utf-8"><title>הודעת הגעה</title>
+<style>td { padding: 4px; }</style><script>var tracking = "ignore me";</script></head>
+<body>
+<h1>הודעת הגעת מטען</h1>
+<p>שטר מטען: ZIMU2210554</p>
+<p>אונייה: ZIM SAMMY OFER, הפלגה 24E</p>
+<table>
+<tr><td>נמל טעינה</td><td>Shanghai</td></tr>
+<tr><td>נמל פריקה</td><td>Haifa</td></tr>
+<tr><td>מכולה</td><td>ZCSU8812345</td></tr>
+<tr><td>משקל ברוטו</td><td>11,480 KG</td></tr>
+<tr><td>תאריך הגעה משוער</td><td>28/04/2024</td></tr>
+</table>
+</body></html>
+"""
+BL_HE_HTML_FACTS = ["שטר מטען", "ZIMU2210554", "ZIM SAMMY OFER", "Shanghai", "ZCSU8812345", "11,480",
+                    "28/04/2024"]
+
+INVOICE_EN_HTML = """<html><head><title>Proforma</title></head><body>
+<h2>PROFORMA INVOICE PI-88213</h2>
+<p>Date: 05/05/2024 &mdash; Seller: Saigon Furniture JSC, Vietnam</p>
+<table border="1">
+<tr><th>Description</th><th>HS</th><th>Qty</th><th>Amount</th></tr>
+<tr><td>Teak dining table</td><td>9403.60</td><td>30</td><td>USD 9,300.00</td></tr>
+<tr><td>Teak chair</td><td>9401.69</td><td>120</td><td>USD 8,640.00</td></tr>
+</table>
+<p>Terms: CFR Ashdod. Total USD 17,940.00</p>
+</body></html>
+"""
+INVOICE_EN_HTML_FACTS = ["PI-88213", "05/05/2024", "Saigon Furniture", "9403.60", "9401.69", "17,940.00",
+                         "CFR"]
+
+ARRIVAL_EML_HE = """שלום רב,
+
+מצורפת הודעת הגעה עבור שטר מטען MEDU4829173.
+האונייה MSC ARIANE צפויה להגיע לנמל חיפה בתאריך 02/04/2024.
+נא להעביר לעמיל המכס את החשבונית INV-2024-0117 ואת רשימת האריזה.
+
+מעקב משלוח: https://www.msc.com/track-a-shipment?agencyPath=isr&trackingNumber=MEDU4829173
+
+בברכה,
+מחלקת יבוא
+"""
+ARRIVAL_EML_HE_FACTS = ["MEDU4829173", "MSC ARIANE", "02/04/2024", "INV-2024-0117", "עמיל המכס",
+                        "https://www.msc.com/track-a-shipment"]
+
+
+# ═══════════════════════════════════════════
+#  5x7 BITMAP FONT (scanned documents)
+# ═══════════════════════════════════════════
+
+_GLYPHS = {
+    "A": ".###.|#...#|#...#|#####|#...#|#...#|#...#",
+    "B": "####.|#...#|#...#|####.|#...#|#...#|####.",
+    "C": ".###.|#...#|#....|#....|#....|#...#|.###.",
+    "D": "####.|#...#|#...#|#...#|#...#|#...#|####.",
+    "E": "#####|#....|#....|####.|#....|#....|#####",
+    "F": "#####|#....|#....|####.|#....|#....|#....",
+    "G": ".###.|#...#|#....|#.###|#...#|#...#|.###.",
+    "H": "#...#|#...#|#...#|#####|#...#|#...#|#...#",
+    "I": ".###.|..#..|..#..|..#..|..#..|..#..|.###.",
+    "J": "..###|...#.|...#.|...#.|...#.|#..#.|.##..",
+    "K": "#...#|#..#.|#.#..|##...|#.#..|#..#.|#...#",
+    "L": "#....|#....|#....|#....|#....|#....|#####",
+    "M": "#...#|##.##|#.#.#|#.#.#|#...#|#...#|#...#",
+    "N": "#...#|##..#|#.#.#|#..##|#...#|#...#|#...#",
+    "O": ".###.|#...#|#...#|#...#|#...#|#...#|.###.",
+    "P": "####.|#...#|#...#|####.|#....|#....|#....",
+    "Q": ".###.|#...#|#...#|#...#|#.#.#|#..#.|.##.#",
+    "R": "####.|#...#|#...#|####.|#.#..|#..#.|#...#",
+    "S": ".####|#....|#....|.###.|....#|....#|####.",
+    "T": "#####|..#..|..#..|..#..|..#..|..#..|..#..",
+    "U": "#...#|#...#|#...#|#...#|#...#|#...#|.###.",
+    "V": "#...#|#...#|#...#|#...#|#...#|.#.#.|..#..",
+    "W": "#...#|#...#|#...#|#.#.#|#.#.#|##.##|#...#",
+    "X": "#...#|#...#|.#.#.|..#..|.#.#.|#...#|#...#",
+    "Y": "#...#|#...#|.#.#.|..#..|..#..|..#..|..#..",
+    "Z": "#####|....#|...#.|..#..|.#...|#....|#####",
+    "0": ".###.|#...#|#..##|#.#.#|##..#|#...#|.###.",
+    "1": "..#..|.##..|..#..|..#..|..#..|..#..|.###.",
+    "2": ".###.|#...#|....#|...#.|..#..|.#...|#####",
+    "3": "####.|....#|....#|.###.|....#|....#|####.",
+    "4": "...#.|..##.|.#.#.|#..#.|#####|...#.|...#.",
+    "5": "#####|#....|####.|....#|....#|#...#|.###.",
+    "6": ".###.|#....|#....|####.|#...#|#...#|.###.",
+    "7": "#####|....#|...#.|..#..|.#...|.#...|.#...",
+    "8": ".###.|#...#|#...#|.###.|#...#|#...#|.###.",
+    "9": ".###.|#...#|#...#|.####|....#|....#|.###.",
+    ".": ".....|.....|.....|.....|.....|.##..|.##..",
+    ",": ".....|.....|.....|.....|.##..|..#..|.#...",
+    ":": ".....|.##..|.##..|.....|.##..|.##..|.....",
+    "/": "....#|...#.|...#.|..#..|.#...|.#...|#....",
+    "-": ".....|.....|.....|#####|.....|.....|.....",
+    "#": ".#.#.|.#.#.|#####|.#.#.|#####|.#.#.|.#.#.",
+    "$": "..#..|.####|#.#..|.###.|..#.#|####.|..#..",
+    " ": ".....|.....|.....|.....|.....|.....|.....",
+    '"': ".#.#.|.#.#.|.....|.....|.....|.....|.....",
+    "א": "#...#|.#..#|..#.#|.#.#.|#.#..|#..#.|#...#",
+    "ב": "####.|....#|....#|....#|....#|....#|#####",
+    "ג": ".##..|...#.|...#.|...#.|..##.|.#.#.|#..#.",
+    "ד": "#####|...#.|...#.|...#.|...#.|...#.|...#.",
+    "ה": "#####|....#|....#|#...#|#...#|#...#|#...#",
+    "ו": ".##..|..#..|..#..|..#..|..#..|..#..|..#..",
+    "ז": "#####|..#..|..#..|..#..|..#..|..#..|..#..",
+    "ח": "#####|#...#|#...#|#...#|#...#|#...#|#...#",
+    "ט": "#..##|#.#.#|#...#|#...#|#...#|#...#|#####",
+    "י": ".##..|..#..|..#..|.....|.....|.....|.....",
+    "כ": "####.|....#|....#|....#|....#|....#|####.",
+    "ך": "#####|....#|....#|....#|....#|....#|....#",
+    "ל": "#....|#####|....#|....#|...#.|..#..|..#..",
+    "מ": "#.##.|.#..#|#...#|#...#|#...#|#...#|#.###",
+    "ם": "#####|#...#|#...#|#...#|#...#|#...#|#####",
+    "נ": "..##.|...#.|...#.|...#.|...#.|...#.|.###.",
+    "ן": "..##.|...#.|...#.|...#.|...#.|...#.|...#.",
+    "ס": "#####|#...#|#...#|#...#|#...#|#...#|.###.",
+    "ע": "#...#|#...#|.#..#|..#.#|...##|...#.|####.",
+    "פ": "####.|#...#|##..#|....#|....#|....#|#####",
+    "ף": "####.|#...#|##..#|....#|....#|....#|....#",
+    "צ": "#...#|.#..#|..#.#|...#.|..#..|.#...|#####",
+    "ץ": "#...#|#..#.|#.#..|##...|#....|#....|#....",
+    "ק": "#####|....#|#...#|#..#.|#....|#....|#....",
+    "ר": "####.|....#|....#|....#|....#|....#|....#",
+    "ש": "#.#.#|#.#.#|#.#.#|#.#.#|#.#.#|#..##|####.",
+    "ת": "####.|.#..#|.#..#|.#..#|.#..#|.#..#|##..#",
+}
+
+
+def _is_hebrew(ch):
+    return "\u0590" <= ch <= "\u05ff"
+
+
+def visual_order(line):
+    """Logical indices of an RTL line in left-to-right display order.
+
+    Minimal bidi for a right-to-left paragraph: runs of Latin letters / digits
+    (with the punctuation and spaces between them) keep their order, every
+    other character is mirrored around the line.
+    """
+    segments = []           # [indices] — LTR runs whole, everything else one char each
+    i = 0
+    while i < len(line):
+        if line[i].isascii() and line[i].isalnum():
+            j = i
+            while j + 1 < len(line) and not _is_hebrew(line[j + 1]):
+                j += 1
+            while not (line[j].isascii() and line[j].isalnum()):
+                j -= 1
+            segments.append(list(range(i, j + 1)))
+            i = j + 1
+        else:
+            segments.append([i])
+            i += 1
+    return [idx for seg in reversed(segments) for idx in seg]
+
+
+def render_text_image(lines, scale=5, margin=40, rtl=False):
+    """Render lines with the bitmap font. Returns (width, height, 8-bit gray rows).
+
+    rtl: lay lines out right-to-left (visual_order), right-aligned.
+    """
+    cell_w, cell_h = 6 * scale, 10 * scale
+    columns = max(len(line) for line in lines)
+    width = margin * 2 + cell_w * columns
+    height = margin * 2 + cell_h * len(lines)
+    pixels = [bytearray(b"\xff" * width) for _ in range(height)]
+    for row_no, line in enumerate(lines):
+        indent = 0
+        if rtl:
+            line = "".join(line[i] for i in visual_order(line))
+            indent = columns - len(line)
+        for col_no, ch in enumerate(line.upper(), start=indent):
+            glyph = _GLYPHS.get(ch, _GLYPHS[" "]).split("|")
+            x0 = margin + col_no * cell_w
+            y0 = margin + row_no * cell_h
+            for gy, bits in enumerate(glyph):
+                for gx, bit in enumerate(bits):
+                    if bit != "#":
+                        continue
+                    for dy in range(scale):
+                        row = pixels[y0 + gy * scale + dy]
+                        start = x0 + gx * scale
+                        row[start:start + scale] = b"\x00" * scale
+    return width, height, [bytes(r) for r in pixels]
+
+
+def make_png(width, height, rows):
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+    raw = b"".join(b"\x00" + r for r in rows)
+    return (b"\x89PNG\r\n\x1a\n"
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(raw, 9))
+            + chunk(b"IEND", b""))
+
+
+# ═══════════════════════════════════════════
+#  CONTAINERS
+# ═══════════════════════════════════════════
+
+def _pdf(objects):
+    """Assemble a PDF from object bodies (object 1 must be the catalog)."""
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def _stream(data, extra=b""):
+    return b"<< /Length " + str(len(data)).encode() + extra + b" >>\nstream\n" + data + b"\nendstream"
+
+
+def make_text_pdf(lines):
+    """Single-page Helvetica text PDF (Latin-1 text only)."""
+    def esc(s):
+        return s.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    ops = ["BT", "/F1 10 Tf", "14 TL", "40 800 Td"]
+    for line in lines:
+        ops.append(f"({esc(line)}) Tj T*")
+    ops.append("ET")
+    content = "\n".join(ops).encode("latin-1")
+    return _pdf([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+        b"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>",
+        _stream(content),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ])
+
+
+def make_scanned_pdf(lines, rtl=False):
+    """Single-page image-only PDF (no text layer), like a scanner produces."""
+    width, height, rows = render_text_image(lines, rtl=rtl)
+    image = zlib.compress(b"".join(rows), 9)
+    page_w, page_h = 595, int(595 * height / width)
+    content = f"q {page_w} 0 0 {page_h} 0 0 cm /Im1 Do Q".encode()
+    return _pdf([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+        f"/Resources << /XObject << /Im1 5 0 R >> >> /Contents 4 0 R >>".encode(),
+        _stream(content),
+        _stream(image, f" /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                       f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode".encode()),
+    ])
+
+
+def _to_unicode_cmap(codes):
+    """ToUnicode CMap for single-byte codes: {code: char}."""
+    entries = "\n".join(f"<{code:02X}> <{ord(ch):04X}>" for code, ch in sorted(codes.items()))
+    return (
+        "/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n"
+        "/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def\n"
+        "/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n"
+        "1 begincodespacerange\n<00> <FF>\nendcodespacerange\n"
+        f"{len(codes)} beginbfchar\n{entries}\nendbfchar\n"
+        "endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend"
+    ).encode("ascii")
+
+
+def make_rtl_text_pdf(lines, size=12):
+    """Single-page text PDF with the bitmap font embedded as a Type3 font.
+
+    Every character gets a one-byte code, a glyph procedure and a ToUnicode
+    entry. Lines are right-aligned; glyphs are written in logical order at
+    their visual (right-to-left) positions.
+    """
+    chars = sorted({ch for line in lines for ch in line.upper()})
+    codes = {ch: n for n, ch in enumerate(chars, start=1)}
+    advance = size * 0.6        # 6 font units of 0.1 em per cell
+    page_w, page_h, margin = 595, 842, 40
+
+    ops = ["BT", f"/F1 {size} Tf"]
+    for row_no, line in enumerate(lines):
+        text = line.upper()
+        y = page_h - margin - (row_no + 1) * size * 1.4
+        x0 = page_w - margin - len(text) * advance
+        column = {idx: col for col, idx in enumerate(visual_order(text))}
+        for idx, ch in enumerate(text):
+            ops.append(f"1 0 0 1 {x0 + column[idx] * advance:.1f} {y:.1f} Tm <{codes[ch]:02X}> Tj")
+    ops.append("ET")
+
+    # Objects 1-5: catalog, pages, page, content, font; then ToUnicode and one per glyph
+    glyph_objects = []
+    for ch in chars:
+        rects = []
+        for gy, bits in enumerate(_GLYPHS.get(ch, _GLYPHS[" "]).split("|")):
+            for gx, bit in enumerate(bits):
+                if bit == "#":
+                    rects.append(f"{gx} {6 - gy} 1 1 re")
+        glyph_objects.append(_stream(("6 0 0 0 5 7 d1\n" + " ".join(rects) + (" f" if rects else "")).encode()))
+    first_glyph = 7
+    char_procs = " ".join(f"/g{n} {first_glyph + n - 1} 0 R" for n in codes.values())
+    differences = " ".join(f"/g{n}" for n in codes.values())
+    font = (f"<< /Type /Font /Subtype /Type3 /FontBBox [0 0 5 7] "
+            f"/FontMatrix [0.1 0 0 0.1 0 0] /CharProcs << {char_procs} >> "
+            f"/Encoding << /Type /Encoding /Differences [1 {differences}] >> "
+            f"/FirstChar 1 /LastChar {len(chars)} /Widths [{' '.join(['6'] * len(chars))}] "
+            f"/Resources << >> /ToUnicode 6 0 R >>").encode()
+    return _pdf([
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_w} {page_h}] "
+        f"/Resources << /Font << /F1 5 0 R >> >> /Contents 4 0 R >>".encode(),
+        _stream("\n".join(ops).encode("ascii")),
+        font,
+        _stream(_to_unicode_cmap({n: ch for ch, n in codes.items()})),
+        *glyph_objects,
+    ])
+
+
+def _zip(parts):
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in parts:
+            zf.writestr(zipfile.ZipInfo(name, date_time=_ZIP_DATE), data)
+    return out.getvalue()
+
+
+def _xml_escape(s):
+    return s.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace('"', "&quot;")
+
+
+_RELS_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+_DOC_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+
+def make_xlsx(rows, sheet_name="Sheet1"):
+    """Minimal XLSX with inline strings and numeric cells."""
+    def col(i):
+        return chr(ord("A") + i)
+
+    sheet_rows = []
+    for r, row in enumerate(rows, start=1):
+        cells = []
+        for c, value in enumerate(row):
+            ref = f"{col(c)}{r}"
+            if value == "":
+                continue
+            if value.isdigit():
+                cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+            else:
+                cells.append(f'<c r="{ref}" t="inlineStr"><is><t>{_xml_escape(value)}</t></is></c>')
+        sheet_rows.append(f'<row r="{r}">{"".join(cells)}</row>')
+    main_ns = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+    return _zip([
+        ("[Content_Types].xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+         '<Default Extension="xml" ContentType="application/xml"/>'
+         '<Override PartName="/xl/workbook.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+         '<Override PartName="/xl/worksheets/sheet1.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+         '</Types>'),
+        ("_rels/.rels",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_RELS_NS}">'
+         f'<Relationship Id="rId1" Type="{_DOC_REL}/officeDocument" Target="xl/workbook.xml"/>'
+         '</Relationships>'),
+        ("xl/workbook.xml",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         f'<workbook xmlns="{main_ns}" xmlns:r="{_DOC_REL}"><sheets>'
+         f'<sheet name="{_xml_escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+        ("xl/_rels/workbook.xml.rels",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_RELS_NS}">'
+         f'<Relationship Id="rId1" Type="{_DOC_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+         '</Relationships>'),
+        ("xl/worksheets/sheet1.xml",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         f'<worksheet xmlns="{main_ns}"><sheetData>{"".join(sheet_rows)}</sheetData></worksheet>'),
+    ])
+
+
+def make_docx(paragraphs, table=None, rtl=False):
+    """Minimal DOCX: paragraphs, then an optional table."""
+    w = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+    bidi = "<w:pPr><w:bidi/></w:pPr>" if rtl else ""
+
+    def para(text):
+        return f"<w:p>{bidi}<w:r><w:t xml:space=\"preserve\">{_xml_escape(text)}</w:t></w:r></w:p>"
+
+    body = "".join(para(p) for p in paragraphs)
+    if table:
+        rows = "".join("<w:tr>" + "".join(f"<w:tc>{para(c)}</w:tc>" for c in row) + "</w:tr>"
+                       for row in table)
+        body += f"<w:tbl>{rows}</w:tbl>"
+    return _zip([
+        ("[Content_Types].xml",
+         '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+         '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+         '<Default Extension="xml" ContentType="application/xml"/>'
+         '<Override PartName="/word/document.xml" '
+         'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+         '</Types>'),
+        ("_rels/.rels",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><Relationships xmlns="{_RELS_NS}">'
+         f'<Relationship Id="rId1" Type="{_DOC_REL}/officeDocument" Target="word/document.xml"/>'
+         '</Relationships>'),
+        ("word/document.xml",
+         f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+         f'<w:document xmlns:w="{w}"><w:body>{body}</w:body></w:document>'),
+    ])
+
+
+def make_csv(rows, sep=","):
+    return ("\n".join(sep.join(f'"{c}"' if sep in c else c for c in row) for row in rows) + "\n").encode("utf-8")
+
+
+def make_eml(subject, body, sender="imports@rpa-port.co.il", to="rcb@rpa-port.co.il"):
+    msg = EmailMessage()
+    msg["From"] = sender
+    msg["To"] = to
+    msg["Subject"] = subject
+    msg["Date"] = "Mon, 25 Mar 2024 09:30:00 +0200"
+    msg["Message-ID"] = "<bench-arrival-0001@rpa-port.co.il>"
+    msg.set_content(body)
+    return msg.as_bytes()
+
+
+# ═══════════════════════════════════════════
+#  CORPUS
+# ═══════════════════════════════════════════
+
+def build_corpus():
+    """[(filename, bytes, meta)] — meta: kind, lang, scanned, facts."""
+    def meta(kind, lang, facts, scanned=False):
+        return {"kind": kind, "lang": lang, "scanned": scanned, "facts": facts}
+
+    return [
+        ("invoice_en.pdf", make_text_pdf(INVOICE_EN), meta("invoice", "en", INVOICE_EN_FACTS)),
+        ("bl_en.pdf", make_text_pdf(BL_EN), meta("bl", "en", BL_EN_FACTS)),
+        ("invoice_scan_en.pdf", make_scanned_pdf(SCAN_INVOICE_EN),
+         meta("invoice", "en", SCAN_INVOICE_EN_FACTS, scanned=True)),
+        ("bl_scan_en.pdf", make_scanned_pdf(SCAN_BL_EN), meta("bl", "en", SCAN_BL_EN_FACTS, scanned=True)),
+        ("bl_scan_en.png", make_png(*render_text_image(SCAN_BL_EN)),
+         meta("bl", "en", SCAN_BL_EN_FACTS, scanned=True)),
+        ("invoice_he.pdf", make_rtl_text_pdf(INVOICE_HE_PDF), meta("invoice", "he", INVOICE_HE_PDF_FACTS)),
+        ("bl_scan_he.pdf", make_scanned_pdf(SCAN_BL_HE, rtl=True),
+         meta("bl", "he", SCAN_BL_HE_FACTS, scanned=True)),
+        ("packing_list_en.xlsx", make_xlsx(PACKING_EN, "Packing List"), meta("packing_list", "en", PACKING_EN_FACTS)),
+        ("packing_list_he.xlsx", make_xlsx(PACKING_HE, "אריזה"), meta("packing_list", "he", PACKING_HE_FACTS)),
+        ("invoice_he.docx", make_docx(INVOICE_HE, table=PACKING_HE[1:], rtl=True),
+         meta("invoice", "he", INVOICE_HE_FACTS)),
+        ("invoice_en.docx", make_docx(INVOICE_EN), meta("invoice", "en", INVOICE_EN_FACTS)),
+        ("arrival_notice_he.html", BL_HE_HTML.encode("utf-8"), meta("bl", "he", BL_HE_HTML_FACTS)),
+        ("proforma_en.html", INVOICE_EN_HTML.encode("utf-8"), meta("invoice", "en", INVOICE_EN_HTML_FACTS)),
+        ("packing_list_en.csv", make_csv(PACKING_EN), meta("packing_list", "en", PACKING_EN_FACTS)),
+        ("packing_list_he.tsv", make_csv(PACKING_HE, sep="\t"), meta("packing_list", "he", PACKING_HE_FACTS)),
+        ("arrival_notice_he.eml", make_eml("הודעת הגעה MEDU4829173", ARRIVAL_EML_HE),
+         meta("bl", "he", ARRIVAL_EML_HE_FACTS)),
+    ]
+
+
+def write_corpus(out_dir=CORPUS_DIR):
+    os.makedirs(out_dir, exist_ok=True)
+    expected = {}
+    for filename, data, info in build_corpus():
+        with open(os.path.join(out_dir, filename), "wb") as f:
+            f.write(data)
+        expected[filename] = info
+    with open(os.path.join(out_dir, "expected.json"), "w", encoding="utf-8") as f:
+        json.dump(expected, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+    return expected
+
+
+if __name__ == "__main__":
+    out = sys.argv[1] if len(sys.argv) > 1 else CORPUS_DIR
+    docs = write_corpus(out)
+    print(f"Wrote {len(docs)} documents + expected.json to {out}")
@@ -0,0 +1,36 @@
+"""
+Build binary snapshots of the generated data modules.
+
+Marshals each large table (_customs_vocabulary, _tariff_supplements,
+_fta_all_countries, _unified_index) into functions/lib/data_snapshots/ so
+cold starts load only the tables a request touches instead of importing the
+multi-MB .py literals. Runs as the functions predeploy step (firebase.json);
+re-run after regenerating any of the source modules.
+
+Snapshots are tied to the Python minor version that wrote them — if the
+deploy machine's Python differs from the runtime's, lib/_data_snapshot.py
+simply falls back to importing the modules.
+
+Usage:
+  python build_data_snapshots.py [out_dir]
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lib._data_snapshot import build_snapshots
+
+
+def main():
+    out_dir = sys.argv[1] if len(sys.argv) > 1 else None
+    written = build_snapshots(out_dir)
+    total = sum(written.values())
+    for key, size in sorted(written.items()):
+        print(f"  {key:<45} {size / 1024:>9.1f} KB")
+    print(f"Wrote {len(written)} tables, {total / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
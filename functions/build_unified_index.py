@@ -24,7 +24,6 @@ Usage:
 """
 
 import os
-import re
 import sys
 import json
 import time
@@ -43,8 +42,10 @@ if _script_dir not in sys.path:
 # ---------------------------------------------------------------------------
 #  Hebrew text processing
 # ---------------------------------------------------------------------------
-_HE_PREFIXES = ("ו", "ה", "ב", "ל", "כ", "מ", "ש")
-_HE_COMPOUND_PREFIXES = ("וה", "של", "מה", "לה", "בה", "כש", "שב", "שה", "שמ", "של")
+# Tokenization rules are shared with lib/_unified_search.py via lib/lexicon.py;
+# only the (larger) index-time stop list is local.
+from lib.lexicon import index_tokens
+
 _STOP_WORDS_HE = frozenset({
     "את", "של", "על", "עם", "או", "גם", "כי", "אם", "לא", "יש", "זה",
     "אל", "הם", "הוא", "היא", "בין", "כל", "מן", "אשר", "עד", "רק",
@@ -150,26 +151,7 @@ _HE_EN_SYNONYMS = {
 
 def _tokenize(text: str) -> List[str]:
     """Split text into searchable tokens. Strips Hebrew prefixes."""
-    if not text:
-        return []
-    words = re.split(r'[^\w\u0590-\u05FF]+', text.lower())
-    tokens = []
-    for w in words:
-        if len(w) < 2 or w in _STOP_WORDS:
-            continue
-        tokens.append(w)
-        # Also add prefix-stripped version for Hebrew
-        if len(w) > 3:
-            for pfx in _HE_COMPOUND_PREFIXES:
-                if w.startswith(pfx) and len(w) - len(pfx) >= 2:
-                    tokens.append(w[len(pfx):])
-                    break
-            else:
-                for pfx in _HE_PREFIXES:
-                    if w.startswith(pfx) and len(w) - len(pfx) >= 2:
-                        tokens.append(w[len(pfx):])
-                        break
-    return tokens
+    return index_tokens(text, _STOP_WORDS)
 
 
 def _dedup_tokens(tokens: List[str]) -> List[str]:
@@ -12,6 +12,13 @@ Product dict expected keys (from Layer 0 / _identify_items_with_ai):
 """
 
 import re
+import threading
+from collections import deque
+
+try:
+    from re import _parser as _sre_parse    # Python 3.11+
+except ImportError:
+    import sre_parse as _sre_parse
 
 # ============================================================================
 # CHAPTER 03: Fish, crustaceans, molluscs, other aquatic invertebrates
@@ -12832,20 +12839,21 @@ def decide_chapter(product):
     """
     text = _product_text(product)
 
-    # Check each chapter's candidate detection in order
-    for ch_num, detect_fn, tree_fn in _CHAPTER_DETECT_ORDER:
-        if detect_fn(text):
-            result = tree_fn(product)
-            # Follow redirects: if tree says "go to chapter X", run that tree
-            if result and result.get("redirect") and not result.get("candidates"):
-                target_ch = result["redirect"].get("chapter")
-                if target_ch and target_ch in _CHAPTER_TREES:
-                    redirected = _CHAPTER_TREES[target_ch](product)
-                    if redirected and redirected.get("candidates"):
-                        return redirected
-            return result
-
-    return None
+    # First chapter (in _CHAPTER_DETECT_ORDER priority) whose detection fires
+    detected = _detect_chapter(text)
+    if detected is None:
+        return None
+
+    ch_num, tree_fn = detected
+    result = tree_fn(product)
+    # Follow redirects: if tree says "go to chapter X", run that tree
+    if result and result.get("redirect") and not result.get("candidates"):
+        target_ch = result["redirect"].get("chapter")
+        if target_ch and target_ch in _CHAPTER_TREES:
+            redirected = _CHAPTER_TREES[target_ch](product)
+            if redirected and redirected.get("candidates"):
+                return redirected
+    return result
 
 
 def _is_chapter_03_candidate(text):
@@ -12981,6 +12989,158 @@ _CHAPTER_DETECT_ORDER = [
 ]
 
 
+# ============================================================================
+# SINGLE-PASS CHAPTER DETECTION
+# ============================================================================
+# Walking _CHAPTER_DETECT_ORDER runs each detector's regexes in turn — up to
+# ~600 searches for a product no tree matches. Every detector needs at least
+# one of its regexes to match, and every match of a regex contains one of its
+# "required literals" (derived from the parsed pattern below). So one
+# Aho-Corasick scan over the lowercased text for all required literals gives
+# the set of chapters whose detector CAN fire; only those detectors run, in
+# priority order. Results are identical to the linear walk (the detectors
+# still decide); benchmarks/chapter_detect_bench.py compares the two.
+
+# Literal chars used for required literals: ASCII and Hebrew. Other chars
+# (case-folding corner cases) just end a literal run.
+_HEBREW_RANGE = (0x0590, 0x05FF)
+# Non-ASCII chars that re.IGNORECASE matches against ASCII letters
+_CASE_FOLD = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+_ZERO_WIDTH_OPS = (_sre_parse.AT, _sre_parse.ASSERT, _sre_parse.ASSERT_NOT)
+_REPEAT_OPS = tuple(getattr(_sre_parse, op) for op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+                    if hasattr(_sre_parse, op))
+
+_DETECT_LOCK = threading.Lock()
+_DETECT_MATCHER = {}    # built on first use: goto, fail, out, always
+
+
+def _literal_char(code):
+    return code < 128 or _HEBREW_RANGE[0] <= code <= _HEBREW_RANGE[1]
+
+
+def _required_literals(items):
+    """Lowercase strings, one of which occurs in every match of a parsed
+    (sub)pattern; None if no such set can be derived."""
+    options, run = [], []
+    for op, av in items:
+        if op is _sre_parse.LITERAL and _literal_char(av):
+            run.append(chr(av).lower())
+            continue
+        if op in _ZERO_WIDTH_OPS:
+            continue  # consumes nothing — the literal run stays contiguous
+        if run:
+            options.append({"".join(run)})
+            run = []
+        required = None
+        if op is _sre_parse.SUBPATTERN:
+            required = _required_literals(av[-1])
+        elif op is _sre_parse.BRANCH:
+            alternatives = [_required_literals(alt) for alt in av[1]]
+            if all(alternatives):
+                required = set().union(*alternatives)
+        elif op in _REPEAT_OPS and av[0] >= 1:
+            required = _required_literals(av[2])
+        if required:
+            options.append(required)
+    if run:
+        options.append({"".join(run)})
+    if not options:
+        return None
+    # Most selective option: longest shortest-literal, then fewest literals
+    return max(options, key=lambda lits: (min(len(lit) for lit in lits), -len(lits)))
+
+
+def _detector_literals(detect_fn):
+    """Required literals of every regex a detector uses, or None if the
+    detector does anything else (helper calls, unparseable patterns) and
+    must always run."""
+    code = detect_fn.__code__
+    if any(hasattr(const, "co_code") for const in code.co_consts):
+        return None
+    literals = set()
+    for name in code.co_names:
+        value = detect_fn.__globals__.get(name)
+        if isinstance(value, re.Pattern):
+            try:
+                required = _required_literals(_sre_parse.parse(value.pattern, value.flags))
+            except Exception:
+                return None
+            if not required:
+                return None
+            literals |= required
+        elif callable(value):
+            return None
+    return literals or None
+
+
+def _build_detect_matcher():
+    """Aho-Corasick automaton: required literal -> chapters whose detector uses it."""
+    goto, out, always = [{}], [set()], set()
+    for ch_num, detect_fn, _tree_fn in _CHAPTER_DETECT_ORDER:
+        literals = _detector_literals(detect_fn)
+        if literals is None:
+            always.add(ch_num)
+            continue
+        for literal in literals:
+            state = 0
+            for char in literal:
+                nxt = goto[state].get(char)
+                if nxt is None:
+                    goto.append({})
+                    out.append(set())
+                    nxt = goto[state][char] = len(goto) - 1
+                state = nxt
+            out[state].add(ch_num)
+
+    fail = [0] * len(goto)
+    queue = deque(goto[0].values())
+    while queue:
+        state = queue.popleft()
+        for char, nxt in goto[state].items():
+            queue.append(nxt)
+            f = fail[state]
+            while f and char not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(char, 0) if state else 0
+            out[nxt] |= out[fail[nxt]]
+    return {"goto": goto, "fail": fail, "out": [frozenset(o) for o in out], "always": frozenset(always)}
+
+
+def _get_detect_matcher():
+    if not _DETECT_MATCHER:
+        with _DETECT_LOCK:
+            if not _DETECT_MATCHER:
+                _DETECT_MATCHER.update(_build_detect_matcher())
+    return _DETECT_MATCHER
+
+
+def _candidate_chapters(text):
+    """Chapters whose detector can fire on text — one scan over the text."""
+    matcher = _get_detect_matcher()
+    goto, fail, out = matcher["goto"], matcher["fail"], matcher["out"]
+    hits = set(matcher["always"])
+    state = 0
+    for char in text.translate(_CASE_FOLD).lower():
+        while state and char not in goto[state]:
+            state = fail[state]
+        state = goto[state].get(char, 0)
+        if out[state]:
+            hits |= out[state]
+    return hits
+
+
+def _detect_chapter(text):
+    """(chapter, tree_fn) of the first _CHAPTER_DETECT_ORDER entry whose
+    detector fires on text, or None."""
+    candidates = _candidate_chapters(text)
+    if not candidates:
+        return None
+    for ch_num, detect_fn, tree_fn in _CHAPTER_DETECT_ORDER:
+        if ch_num in candidates and detect_fn(text):
+            return ch_num, tree_fn
+    return None
+
+
 def available_chapters():
     """Return list of chapter numbers that have decision trees."""
     return sorted(_CHAPTER_TREES.keys())
@@ -0,0 +1,280 @@
+"""Binary snapshots of the large generated data modules.
+
+_customs_vocabulary.py, _tariff_supplements.py, _fta_all_countries.py and
+_unified_index.py are multi-MB dict literals. Importing them compiles/executes
+the whole literal on every cold start, even when a request only needs one
+table. build_snapshots() (run by build_data_snapshots.py at deploy time)
+marshals each table into its own file; load_table() reads only the table that
+is actually touched, and falls back to importing the source module when no
+valid snapshot exists.
+
+Provides:
+  load_table(module, table)       -> dict (cached per process)
+  LazyTable(module, table)        -> read-only mapping, loads on first access
+  get_supplement_rate(hs_code)    -> same contract as _tariff_supplements
+  get_general_customs(hs_code)
+  get_purchase_tax(hs_code)
+  get_statistical_unit(mu_id)
+  get_unit_for_hs(hs_code)
+  CUSTOMS_VOCABULARY              -> LazyTable over _customs_vocabulary
+  FTA_COUNTRIES                   -> LazyTable over _fta_all_countries
+  build_snapshots(out_dir=None)   -> {table_key: bytes_written}
+"""
+
+import hashlib
+import importlib
+import json
+import marshal
+import os
+import sys
+import threading
+from collections.abc import Mapping
+
+_LIB_DIR = os.path.dirname(os.path.abspath(__file__))
+_SNAPSHOT_DIR = os.path.join(_LIB_DIR, "data_snapshots")
+_MANIFEST = "manifest.json"
+_FORMAT_VERSION = 2
+
+# module -> tables to snapshot
+SNAPSHOT_TABLES = {
+    "_tariff_supplements": ("STATISTICAL_UNITS", "SUPPLEMENT_RATES",
+                            "GENERAL_CUSTOMS", "PURCHASE_TAX"),
+    "_customs_vocabulary": ("CUSTOMS_VOCABULARY",),
+    "_fta_all_countries": ("FTA_COUNTRIES",),
+    "_unified_index": ("WORD_INDEX", "HEADING_MAP", "HS_META"),
+}
+
+_TABLES = {}            # "module.TABLE" -> dict
+_MANIFEST_CACHE = None
+_SOURCE_HASHES = {}     # module -> sha256 of its .py source
+_LOCK = threading.Lock()
+
+
+# ---------------------------------------------------------------------------
+#  Loading
+# ---------------------------------------------------------------------------
+
+def _source_path(module):
+    return os.path.join(_LIB_DIR, module + ".py")
+
+
+def _source_hash(module):
+    """sha256 of the module's source, computed once per process."""
+    digest = _SOURCE_HASHES.get(module)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(_source_path(module), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        digest = _SOURCE_HASHES[module] = h.hexdigest()
+    return digest
+
+
+def _read_manifest(snapshot_dir):
+    global _MANIFEST_CACHE
+    if _MANIFEST_CACHE is not None and _MANIFEST_CACHE[0] == snapshot_dir:
+        return _MANIFEST_CACHE[1]
+    manifest = {}
+    try:
+        with open(os.path.join(snapshot_dir, _MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        pass
+    _MANIFEST_CACHE = (snapshot_dir, manifest)
+    return manifest
+
+
+def _snapshot_valid(manifest, module, key):
+    """Snapshot is usable if it was written by this Python from byte-identical source."""
+    if manifest.get("format") != _FORMAT_VERSION:
+        return False
+    if manifest.get("python") != list(sys.version_info[:2]):
+        return False
+    entry = manifest.get("tables", {}).get(key)
+    if not entry:
+        return False
+    try:
+        # Size is a cheap reject; the hash catches same-size edits (e.g. a changed rate)
+        if os.path.getsize(_source_path(module)) != entry.get("source_size"):
+            return False
+        return _source_hash(module) == entry.get("source_sha256")
+    except OSError:
+        # Source not shipped — snapshot is the only copy
+        return True
+
+
+def _import_table(module, table):
+    try:
+        mod = importlib.import_module("lib." + module)
+    except ImportError:
+        mod = importlib.import_module(module)
+    return getattr(mod, table)
+
+
+def load_table(module, table, snapshot_dir=None, cache=True):
+    """Return one table, from its snapshot if valid, else by importing the module.
+
+    cache=False hands the table to a caller that converts it (e.g. into a
+    lexicon) without keeping a second copy here.
+    Raises ImportError/AttributeError if neither is available.
+    """
+    key = f"{module}.{table}"
+    data = _TABLES.get(key)
+    if data is not None:
+        return data
+    snapshot_dir = snapshot_dir or _SNAPSHOT_DIR
+    with _LOCK:
+        data = _TABLES.get(key)
+        if data is not None:
+            return data
+        manifest = _read_manifest(snapshot_dir)
+        if _snapshot_valid(manifest, module, key):
+            try:
+                with open(os.path.join(snapshot_dir, key + ".marshal"), "rb") as f:
+                    data = marshal.load(f)
+            except (OSError, EOFError, ValueError, TypeError) as e:
+                print(f"[data_snapshot] {key} snapshot unreadable ({e}) — importing module")
+                data = None
+        if data is None:
+            data = _import_table(module, table)
+        if cache:
+            _TABLES[key] = data
+        return data
+
+
+def reset_tables():
+    """Drop loaded tables. Useful for testing."""
+    global _MANIFEST_CACHE
+    with _LOCK:
+        _TABLES.clear()
+        _SOURCE_HASHES.clear()
+        _MANIFEST_CACHE = None
+
+
+class LazyTable(Mapping):
+    """Read-only mapping view that loads its table on first access.
+
+    Behaves as an empty mapping when neither snapshot nor module is available,
+    matching the callers' old `except ImportError: X = {}` fallbacks.
+    """
+
+    def __init__(self, module, table):
+        self._module = module
+        self._table = table
+        self._missing = False
+
+    def _data(self):
+        if self._missing:
+            return {}
+        try:
+            return load_table(self._module, self._table)
+        except (ImportError, AttributeError) as e:
+            print(f"[data_snapshot] {self._module}.{self._table} unavailable: {e}")
+            self._missing = True
+            return {}
+
+    def __getitem__(self, key):
+        return self._data()[key]
+
+    def __contains__(self, key):
+        return key in self._data()
+
+    def __iter__(self):
+        return iter(self._data())
+
+    def __len__(self):
+        return len(self._data())
+
+    def get(self, key, default=None):
+        return self._data().get(key, default)
+
+    def __repr__(self):
+        loaded = f"{self._module}.{self._table}" in _TABLES
+        return f"<LazyTable {self._module}.{self._table} loaded={loaded}>"
+
+
+CUSTOMS_VOCABULARY = LazyTable("_customs_vocabulary", "CUSTOMS_VOCABULARY")
+FTA_COUNTRIES = LazyTable("_fta_all_countries", "FTA_COUNTRIES")
+
+
+# ---------------------------------------------------------------------------
+#  _tariff_supplements API (same signatures, lazy tables)
+# ---------------------------------------------------------------------------
+
+def _lookup_hs(table, hs_code):
+    """Exact 10-digit match, then parent codes (strip trailing digits)."""
+    data = load_table("_tariff_supplements", table)
+    code = (hs_code or '').replace('.', '').replace('/', '').replace(' ', '').strip()
+    if len(code) < 10:
+        code = code.ljust(10, '0')
+    if code in data:
+        return data[code]
+    for trim in (8, 6, 4):
+        parent = code[:trim].ljust(10, '0')
+        if parent in data:
+            return data[parent]
+    return None
+
+
+def get_supplement_rate(hs_code: str) -> dict | None:
+    """Combined customs duty + purchase tax for a 10-digit HS code (or None)."""
+    return _lookup_hs("SUPPLEMENT_RATES", hs_code)
+
+
+def get_general_customs(hs_code: str) -> dict | None:
+    """General customs duty rate for a 10-digit HS code (or None)."""
+    return _lookup_hs("GENERAL_CUSTOMS", hs_code)
+
+
+def get_purchase_tax(hs_code: str) -> dict | None:
+    """Purchase tax rate for a 10-digit HS code (or None)."""
+    return _lookup_hs("PURCHASE_TAX", hs_code)
+
+
+def get_statistical_unit(mu_id: int) -> dict | None:
+    """Statistical unit {en, he} for a MeasurementUnitID (or None)."""
+    return load_table("_tariff_supplements", "STATISTICAL_UNITS").get(mu_id)
+
+
+def get_unit_for_hs(hs_code: str) -> dict | None:
+    """Statistical unit for an HS code, or None if percentage-based/not found."""
+    data = get_supplement_rate(hs_code)
+    if data and data.get('mu_id'):
+        return get_statistical_unit(data['mu_id'])
+    return None
+
+
+# ---------------------------------------------------------------------------
+#  Build
+# ---------------------------------------------------------------------------
+
+def build_snapshots(out_dir=None):
+    """Marshal every table in SNAPSHOT_TABLES into out_dir. Skips missing modules."""
+    out_dir = out_dir or _SNAPSHOT_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"format": _FORMAT_VERSION, "python": list(sys.version_info[:2]), "tables": {}}
+    written = {}
+    for module, tables in SNAPSHOT_TABLES.items():
+        try:
+            source_size = os.path.getsize(_source_path(module))
+            source_sha256 = _source_hash(module)
+        except OSError:
+            print(f"[data_snapshot] {module}.py not found — skipped")
+            continue
+        for table in tables:
+            key = f"{module}.{table}"
+            try:
+                data = _import_table(module, table)
+            except (ImportError, AttributeError) as e:
+                print(f"[data_snapshot] {key} not available ({e}) — skipped")
+                continue
+            blob = marshal.dumps(dict(data))
+            with open(os.path.join(out_dir, key + ".marshal"), "wb") as f:
+                f.write(blob)
+            manifest["tables"][key] = {"source_size": source_size,
+                                       "source_sha256": source_sha256,
+                                       "entries": len(data), "bytes": len(blob)}
+            written[key] = len(blob)
+    with open(os.path.join(out_dir, _MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return written
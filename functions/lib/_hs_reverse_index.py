@@ -369,7 +369,7 @@ def _build_fta_index() -> Dict[str, Dict[str, Any]]:
     Returns per-country metadata. For actual preferential rates per heading,
     use search_fta_full_text() from _fta_all_countries.py.
     """
-    from lib._fta_all_countries import FTA_COUNTRIES
+    from lib._data_snapshot import FTA_COUNTRIES
 
     fta_info: Dict[str, Dict[str, Any]] = {}
     for code, data in FTA_COUNTRIES.items():
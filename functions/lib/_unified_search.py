@@ -49,51 +49,17 @@ def format_hs(hs_code):
     return str(hs_code)
 
 # ---------------------------------------------------------------------------
-#  Hebrew text processing (must match builder's _tokenize exactly)
+#  Hebrew text processing (shared with the builder via lexicon.py)
 # ---------------------------------------------------------------------------
-_HE_PREFIXES = ("\u05d5", "\u05d4", "\u05d1", "\u05dc", "\u05db", "\u05de", "\u05e9")
-_HE_COMPOUND = (
-    "\u05d5\u05d4", "\u05e9\u05dc", "\u05de\u05d4", "\u05dc\u05d4",
-    "\u05d1\u05d4", "\u05db\u05e9", "\u05e9\u05d1", "\u05e9\u05d4",
-    "\u05e9\u05de", "\u05e9\u05dc",
-)
-_STOP = frozenset({
-    "\u05d0\u05ea", "\u05e9\u05dc", "\u05e2\u05dc", "\u05e2\u05dd",
-    "\u05d0\u05d5", "\u05d2\u05dd", "\u05db\u05d9", "\u05d0\u05dd",
-    "\u05dc\u05d0", "\u05d9\u05e9", "\u05d6\u05d4", "\u05d0\u05dc",
-    "\u05d4\u05dd", "\u05d4\u05d5\u05d0", "\u05d4\u05d9\u05d0",
-    "\u05d1\u05d9\u05df", "\u05db\u05dc", "\u05de\u05df",
-    "\u05d0\u05e9\u05e8", "\u05e2\u05d3", "\u05e8\u05e7",
-    "the", "a", "an", "of", "for", "and", "or", "with",
-    "to", "from", "in", "on", "by", "is", "are", "was", "were",
-    "be", "been", "new", "used", "set", "pcs", "piece", "pieces",
-    "item", "items", "type", "other", "others", "not",
-})
-
-_WORD_SPLIT_RE = re.compile(r'[^\w\u0590-\u05FF]+')
+try:
+    from lib.lexicon import STOP_WORDS as _STOP, Lexicon, get_lexicon, index_tokens, strip_prefixes
+except ImportError:
+    from lexicon import STOP_WORDS as _STOP, Lexicon, get_lexicon, index_tokens, strip_prefixes
 
 
 def _tok(text):
     """Tokenize for search — same logic as builder."""
-    if not text:
-        return []
-    words = _WORD_SPLIT_RE.split(text.lower())
-    tokens = []
-    for w in words:
-        if len(w) < 2 or w in _STOP:
-            continue
-        tokens.append(w)
-        if len(w) > 3:
-            for pfx in _HE_COMPOUND:
-                if w.startswith(pfx) and len(w) - len(pfx) >= 2:
-                    tokens.append(w[len(pfx):])
-                    break
-            else:
-                for pfx in _HE_PREFIXES:
-                    if w.startswith(pfx) and len(w) - len(pfx) >= 2:
-                        tokens.append(w[len(pfx):])
-                        break
-    return list(dict.fromkeys(tokens))
+    return list(dict.fromkeys(index_tokens(text, _STOP)))
 
 
 # ---------------------------------------------------------------------------
@@ -109,16 +75,20 @@ def _ensure_index():
         return _INDEX
 
     try:
-        from lib._unified_index import WORD_INDEX, HEADING_MAP, HS_META
+        from lib._data_snapshot import load_table
     except ImportError:
-        try:
-            from _unified_index import WORD_INDEX, HEADING_MAP, HS_META
-        except ImportError:
-            # Index not built yet — return empty
-            _INDEX = {"words": {}, "headings": {}, "meta": {}}
-            return _INDEX
-
-    _INDEX = {"words": WORD_INDEX, "headings": HEADING_MAP, "meta": HS_META}
+        from _data_snapshot import load_table
+    try:
+        _INDEX = {
+            # WORD_INDEX is compacted into the shared lexicon; the raw dict is not kept
+            "words": get_lexicon("unified_index", lambda: Lexicon.build(
+                load_table("_unified_index", "WORD_INDEX", cache=False), labels=True)),
+            "headings": load_table("_unified_index", "HEADING_MAP"),
+            "meta": load_table("_unified_index", "HS_META"),
+        }
+    except (ImportError, AttributeError):
+        # Index not built yet — return empty
+        _INDEX = {"words": Lexicon(), "headings": {}, "meta": {}}
     return _INDEX
 
 
@@ -289,17 +259,14 @@ def search_word(word):
     wi = idx["words"]
 
     w = word.lower().strip()
-    results = wi.get(w, [])
+    results = wi.postings(w)
 
     # Also try prefix-stripped
-    if not results and len(w) > 3:
-        for pfx in _HE_COMPOUND + _HE_PREFIXES:
-            if w.startswith(pfx):
-                stripped = w[len(pfx):]
-                if stripped and len(stripped) >= 2:
-                    results = wi.get(stripped, [])
-                    if results:
-                        break
+    if not results:
+        for stripped in strip_prefixes(w)[1:]:
+            results = wi.postings(stripped)
+            if results:
+                break
     return results
 
 
@@ -429,4 +396,4 @@ def get_heading_subcodes(heading_4digit, leaves_only=True):
 def index_loaded():
     """Check if the unified index is available and has data."""
     idx = _ensure_index()
-    return bool(idx["words"])
+    return len(idx["words"]) > 0
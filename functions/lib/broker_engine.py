@@ -65,6 +65,16 @@ try:
 except ImportError:
     from librarian import get_israeli_hs_format
 
+try:
+    from lib._data_snapshot import load_table
+except ImportError:
+    from _data_snapshot import load_table
+
+try:
+    from lib.lexicon import strip_prefixes
+except ImportError:
+    from lexicon import strip_prefixes
+
 
 def _enforce_hs_format(raw_code):
     """Always returns XX.XX.XXXXXX/X — enforced at output boundary.
@@ -91,21 +101,13 @@ def _ensure_vocabulary():
     if _CUSTOMS_VOCABULARY is not None:
         return
     try:
-        from lib._customs_vocabulary import CUSTOMS_VOCABULARY
-        _CUSTOMS_VOCABULARY = CUSTOMS_VOCABULARY
-    except ImportError:
-        try:
-            from _customs_vocabulary import CUSTOMS_VOCABULARY
-            _CUSTOMS_VOCABULARY = CUSTOMS_VOCABULARY
-        except ImportError:
-            _CUSTOMS_VOCABULARY = False  # mark as unavailable
+        _CUSTOMS_VOCABULARY = load_table("_customs_vocabulary", "CUSTOMS_VOCABULARY")
+    except (ImportError, AttributeError):
+        _CUSTOMS_VOCABULARY = False  # mark as unavailable
     if _CUSTOMS_VOCABULARY and _CUSTOMS_VOCABULARY is not False:
         _CUSTOMS_VOCABULARY.update(_VOCAB_PATCHES)
 
 
-# Hebrew prefixes to strip when matching vocabulary
-_HE_PREFIXES = ("וה", "של", "מה", "לה", "בה", "כש", "מ", "ב", "ל", "ה", "ו", "כ", "ש")
-
 # Stop words to skip during vocabulary extraction — common Hebrew verbs,
 # adjectives, pronouns, and adverbs that are NOT product nouns
 _VOCAB_STOP = frozenset({
@@ -305,14 +307,7 @@ def _extract_products_from_vocab(text):
 
     # Also check individual words with Hebrew prefix stripping
     for word in words:
-        variants = [word]
-        if len(word) > 3:
-            for pfx in _HE_PREFIXES:
-                if word.startswith(pfx) and len(word) - len(pfx) >= 2:
-                    stripped = word[len(pfx):]
-                    if stripped not in variants:
-                        variants.append(stripped)
-        for variant in variants:
+        for variant in strip_prefixes(word):
             if variant in _CUSTOMS_VOCABULARY:
                 entry = _CUSTOMS_VOCABULARY[variant]
                 chapters = tuple(sorted(entry.get("chapters", [])))
@@ -1711,10 +1706,10 @@ def _enrich_subcodes_with_supplements(sub_codes):
     Data comes from _tariff_supplements.py (parsed from XML tariff archives).
     """
     try:
-        from lib._tariff_supplements import get_supplement_rate, get_unit_for_hs
+        from lib._data_snapshot import get_supplement_rate, get_unit_for_hs
     except ImportError:
         try:
-            from _tariff_supplements import get_supplement_rate, get_unit_for_hs
+            from _data_snapshot import get_supplement_rate, get_unit_for_hs
         except ImportError:
             return  # Data file not available — columns stay "—"
 
@@ -3009,9 +3004,9 @@ def process_case(email_text, attachments_text, db, get_secret_func,
         if not result.get("duty_rate"):
             try:
                 try:
-                    from lib._tariff_supplements import get_supplement_rate
+                    from lib._data_snapshot import get_supplement_rate
                 except ImportError:
-                    from _tariff_supplements import get_supplement_rate
+                    from _data_snapshot import get_supplement_rate
                 _hs_clean = str(result.get("hs_code", "")).replace(".", "").replace("/", "")
                 _supp = get_supplement_rate(_hs_clean)
                 if _supp:
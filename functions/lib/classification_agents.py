@@ -12,14 +12,19 @@ UPDATED: Session 15 - Multi-model optimization:
   - Agent 6 (synthesis): Gemini 2.5 Pro (good Hebrew, lower cost)
   - Agents 1,3,4,5: Gemini 2.5 Flash (simple tasks, ~95% cheaper)
 """
+import contextvars
+import copy
+import functools
 import json
 import re
+import threading
 import time
 import requests
 import base64
 import io
 import random
 import string
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime
 from lib.librarian import (
     search_all_knowledge, 
@@ -29,6 +34,7 @@ from lib.librarian import (
     get_israeli_hs_format,
     validate_and_correct_classifications,  # Session 11: HS validation
 )
+from lib.llm_cache import IncompleteResponse, cached_llm_call, has_json_object
 
 # Session 10: Import new modules
 try:
@@ -70,7 +76,7 @@ except ImportError as e:
 
 # Intelligence module: system's own brain (Firestore-only, no AI)
 try:
-    from lib.intelligence import pre_classify, lookup_regulatory, lookup_fta, validate_documents, query_free_import_order, route_to_ministries
+    from lib.intelligence import pre_classify, lookup_regulatory, lookup_fta, validate_documents, query_free_import_order, route_to_ministries, prefetch_index_docs
     INTELLIGENCE_AVAILABLE = True
 except ImportError as e:
     print(f"Intelligence module not available: {e}")
@@ -174,6 +180,10 @@ VERIFICATION_ENGINE_ENABLED = True    # Session 34 Block E: Phase 4+5+Flagging
 COMPLIANCE_AUDITOR_ENABLED = True     # Session 82: Official document citations in emails
 USE_TARIFF_TREE = True                # Session 95: Tariff tree module active
 USE_SMART_CLASSIFY = True             # Session 97: Smart classify as first attempt in consultation handler
+PRE_CLASSIFY_MAX_WORKERS = 6          # Concurrent per-item pre_classify in run_full_classification (1 = serial)
+PRE_CLASSIFY_ITEM_TIMEOUT_SEC = 45    # Per-item pre_classify deadline; late items are dropped, not waited on
+AGENT_GRAPH_MAX_WORKERS = 5           # Agents 3-5 + quality gate + synthesis run as a graph (1 = serial)
+SPECIALIST_AGENT_TIMEOUT_SEC = 60     # Per-agent deadline for Agents 3-5; a late agent contributes its empty default
 
 # Session 48: Gemini quota fast-fail — skip all Gemini calls after first 429
 # CRIT-2 fix: timestamp instead of bare boolean — auto-resets after 60s
@@ -202,29 +212,64 @@ except ImportError:
 class _CostTracker:
     """Accumulates AI costs per classification run. Thread-safe reset per call."""
     def __init__(self):
+        self._lock = threading.Lock()  # Agents 3-5 record costs concurrently
         self.reset()
 
     def reset(self):
         self._costs = {}  # model_name -> total_cost
         self._calls = {}  # model_name -> call_count
+        self._cache_hits = {}    # model id -> responses served from llm_cache
+        self._cache_misses = {}  # model id -> cache lookups that went to the API
 
     def add(self, model, cost):
-        self._costs[model] = self._costs.get(model, 0) + cost
-        self._calls[model] = self._calls.get(model, 0) + 1
+        with self._lock:
+            self._costs[model] = self._costs.get(model, 0) + cost
+            self._calls[model] = self._calls.get(model, 0) + 1
+
+    def record_llm_cache(self, model, hit):
+        with self._lock:
+            counts = self._cache_hits if hit else self._cache_misses
+            counts[model] = counts.get(model, 0) + 1
+
+    def cache_counts(self):
+        return sum(self._cache_hits.values()), sum(self._cache_misses.values())
 
     def total(self):
         return sum(self._costs.values())
 
     def summary(self):
-        if not self._costs:
+        hits, misses = self.cache_counts()
+        if not self._costs and not hits:
             return ""
         lines = ["💰 Cost Summary:"]
         for model in sorted(self._costs.keys()):
             lines.append(f"    {model}: {self._calls[model]} calls = ${self._costs[model]:.4f}")
         lines.append(f"    TOTAL: ${self.total():.4f}")
+        if hits or misses:
+            lines.append(f"    LLM cache: {hits} hits / {misses} misses")
         return "\n".join(lines)
 
-_cost_tracker = _CostTracker()
+# Each classification run gets its own _CostTracker through a contextvar, so
+# direct-lane workers classifying concurrently never reset or mix each
+# other's costs. _cost_tracker always resolves to the current run's tracker.
+_run_cost_tracker = contextvars.ContextVar("rcb_run_cost_tracker", default=None)
+_default_cost_tracker = _CostTracker()
+
+
+class _CurrentCostTracker:
+    """The running classification's _CostTracker (module default outside a run)."""
+    def __getattr__(self, name):
+        return getattr(_run_cost_tracker.get() or _default_cost_tracker, name)
+
+_cost_tracker = _CurrentCostTracker()
+
+
+def _in_own_context(fn):
+    """Run fn in a copy of the caller's context — per-run contextvars stay private to the call."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        return contextvars.copy_context().run(fn, *args, **kwargs)
+    return wrapper
 
 # =============================================================================
 # HS CODE VALIDATION HELPERS
@@ -421,13 +466,25 @@ def clean_firestore_data(data):
     return data
 
 
-def call_claude(api_key, system_prompt, user_prompt, max_tokens=2000):
+CLAUDE_MODEL = "claude-sonnet-4-20250514"
+
+
+def call_claude(api_key, system_prompt, user_prompt, max_tokens=2000, cache=True, cache_if=None):
     """Call Claude API - Sonnet 4.5 (Session 15: upgraded from Sonnet 4)
     Session 26: Added cost tracking
-    Session 48: Added None/empty key guard"""
+    Session 48: Added None/empty key guard
+    Identical requests are served from llm_cache; cache=False forces a fresh call,
+    cache_if(response) limits what is stored (see llm_cache)."""
     if not api_key:
         print("    ❌ call_claude: api_key is None/empty — cannot call Claude API")
         return None
+    return cached_llm_call(
+        CLAUDE_MODEL, system_prompt, user_prompt, max_tokens, None,
+        lambda: _post_claude(api_key, system_prompt, user_prompt, max_tokens),
+        cache=cache, tracker=_cost_tracker, cache_if=cache_if)
+
+
+def _post_claude(api_key, system_prompt, user_prompt, max_tokens):
     try:
         response = requests.post(
             "https://api.anthropic.com/v1/messages",
@@ -437,7 +494,7 @@ def call_claude(api_key, system_prompt, user_prompt, max_tokens=2000):
                 "anthropic-version": "2023-06-01"
             },
             json={
-                "model": "claude-sonnet-4-20250514",
+                "model": CLAUDE_MODEL,
                 "max_tokens": max_tokens,
                 "system": system_prompt,
                 "messages": [{"role": "user", "content": user_prompt}]
@@ -454,7 +511,11 @@ def call_claude(api_key, system_prompt, user_prompt, max_tokens=2000):
                 cost = (inp_tok * 3.0 + out_tok * 15.0) / 1_000_000
                 print(f"    💰 Claude: {inp_tok}+{out_tok} tokens = ${cost:.4f}")
                 _cost_tracker.add("Claude Sonnet", cost)
-            return data['content'][0]['text']
+            text = data['content'][0]['text']
+            if data.get("stop_reason") == "max_tokens":
+                print(f"    ⚠️ Claude stop_reason: max_tokens ({max_tokens})")
+                return IncompleteResponse(text)
+            return text
         else:
             print(f"Claude API error: {response.status_code} - {response.text[:200]}")
             return None
@@ -471,16 +532,27 @@ def call_claude(api_key, system_prompt, user_prompt, max_tokens=2000):
 # SESSION 27: ChatGPT / OpenAI Integration (cross-check)
 # =============================================================================
 
-def call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model="gpt-4o-mini"):
+def call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model="gpt-4o-mini", cache=True,
+                 cache_if=None):
     """Call OpenAI ChatGPT API.
 
     Session 27: Added for three-way cross-check.
     Models:
       - gpt-4o-mini: Fast, cheap (~$0.15/$0.60 per MTok)
       - gpt-4o: Higher quality (~$2.50/$10 per MTok)
+
+    Identical requests are served from llm_cache; cache=False forces a fresh call,
+    cache_if(response) limits what is stored (see llm_cache).
     """
     if not openai_key:
         return None
+    return cached_llm_call(
+        model, system_prompt, user_prompt, max_tokens, 0.3,
+        lambda: _post_chatgpt(openai_key, system_prompt, user_prompt, max_tokens, model),
+        cache=cache, tracker=_cost_tracker, cache_if=cache_if)
+
+
+def _post_chatgpt(openai_key, system_prompt, user_prompt, max_tokens, model):
     try:
         import openai
         client = openai.OpenAI(api_key=openai_key)
@@ -505,6 +577,10 @@ def call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model=
                 cost = (inp_tok * 2.50 + out_tok * 10.0) / 1_000_000
             print(f"    💰 ChatGPT ({model}): {inp_tok}+{out_tok} tokens = ${cost:.4f}")
             _cost_tracker.add(f"ChatGPT {model}", cost)
+        finish_reason = response.choices[0].finish_reason
+        if result and finish_reason not in (None, "stop"):
+            print(f"    ⚠️ ChatGPT finish_reason: {finish_reason} (model={model})")
+            return IncompleteResponse(result)
         return result
     except ImportError:
         print("    ⚠️ openai package not installed, ChatGPT unavailable")
@@ -514,7 +590,8 @@ def call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model=
         return None
 
 
-def call_gemini(gemini_key, system_prompt, user_prompt, max_tokens=2000, model="gemini-2.5-flash"):
+def call_gemini(gemini_key, system_prompt, user_prompt, max_tokens=2000, model="gemini-2.5-flash", cache=True,
+                cache_if=None):
     """Call Google Gemini API
 
     Session 15: Added for cost optimization.
@@ -524,10 +601,20 @@ def call_gemini(gemini_key, system_prompt, user_prompt, max_tokens=2000, model="
       - gemini-2.5-pro: Medium tasks (synthesis) ~$1.25/$10 per MTok
 
     Falls back to Claude if Gemini fails or key is missing.
+    Identical requests are served from llm_cache (even while the 429 fast-fail
+    is active); cache=False forces a fresh call, cache_if(response) limits
+    what is stored (see llm_cache).
     """
-    global _gemini_quota_exhausted_at
     if not gemini_key:
         return None
+    return cached_llm_call(
+        model, system_prompt, user_prompt, max_tokens, 0.3,
+        lambda: _post_gemini(gemini_key, system_prompt, user_prompt, max_tokens, model),
+        cache=cache, tracker=_cost_tracker, cache_if=cache_if)
+
+
+def _post_gemini(gemini_key, system_prompt, user_prompt, max_tokens, model):
+    global _gemini_quota_exhausted_at
     # Session 48+CRIT-2: Skip Gemini if 429 within last 60s
     if _gemini_quota_exhausted_at and (time.time() - _gemini_quota_exhausted_at < 60):
         return None
@@ -571,6 +658,8 @@ def call_gemini(gemini_key, system_prompt, user_prompt, max_tokens=2000, model="
                         text = text.split("\n", 1)[1] if "\n" in text else text[3:]
                     if text.endswith("```"):
                         text = text[:-3]
+                    if finish_reason not in ("STOP", "UNKNOWN"):
+                        return IncompleteResponse(text.strip())
                     return text.strip()
         else:
             # Session 48: Detect 429 quota exhaustion — fast-fail for rest of run
@@ -585,17 +674,20 @@ def call_gemini(gemini_key, system_prompt, user_prompt, max_tokens=2000, model="
         return None
 
 
-def call_gemini_fast(gemini_key, system_prompt, user_prompt, max_tokens=2000):
+def call_gemini_fast(gemini_key, system_prompt, user_prompt, max_tokens=2000, cache=True, cache_if=None):
     """Gemini 2.5 Flash - for simple structured tasks (Agents 1,3,4,5)"""
-    return call_gemini(gemini_key, system_prompt, user_prompt, max_tokens, "gemini-2.5-flash")
+    return call_gemini(gemini_key, system_prompt, user_prompt, max_tokens, "gemini-2.5-flash",
+                       cache=cache, cache_if=cache_if)
 
 
-def call_gemini_pro(gemini_key, system_prompt, user_prompt, max_tokens=2000):
+def call_gemini_pro(gemini_key, system_prompt, user_prompt, max_tokens=2000, cache=True, cache_if=None):
     """Gemini 2.5 Pro - for medium complexity tasks (Agent 6 synthesis)"""
-    return call_gemini(gemini_key, system_prompt, user_prompt, max_tokens, "gemini-2.5-pro")
+    return call_gemini(gemini_key, system_prompt, user_prompt, max_tokens, "gemini-2.5-pro",
+                       cache=cache, cache_if=cache_if)
 
 
-def call_ai(api_key, gemini_key, system_prompt, user_prompt, max_tokens=2000, tier="fast"):
+def call_ai(api_key, gemini_key, system_prompt, user_prompt, max_tokens=2000, tier="fast", cache=True,
+            cache_if=None):
     """Smart router: picks the right model based on task tier.
     
     Session 15: Central routing function with automatic fallback.
@@ -609,19 +701,19 @@ def call_ai(api_key, gemini_key, system_prompt, user_prompt, max_tokens=2000, ti
     
     if tier == "smart":
         # Always use Claude for the hard classification task
-        result = call_claude(api_key, system_prompt, user_prompt, max_tokens)
+        result = call_claude(api_key, system_prompt, user_prompt, max_tokens, cache=cache, cache_if=cache_if)
     elif tier == "pro":
         # Try Gemini Pro first, fallback to Claude
-        result = call_gemini_pro(gemini_key, system_prompt, user_prompt, max_tokens)
+        result = call_gemini_pro(gemini_key, system_prompt, user_prompt, max_tokens, cache=cache, cache_if=cache_if)
         if not result:
             print("    ↩️ Gemini Pro fallback → Claude")
-            result = call_claude(api_key, system_prompt, user_prompt, max_tokens)
+            result = call_claude(api_key, system_prompt, user_prompt, max_tokens, cache=cache, cache_if=cache_if)
     else:  # "fast"
         # Try Gemini Flash first, fallback to Claude
-        result = call_gemini_fast(gemini_key, system_prompt, user_prompt, max_tokens)
+        result = call_gemini_fast(gemini_key, system_prompt, user_prompt, max_tokens, cache=cache, cache_if=cache_if)
         if not result:
             print("    ↩️ Gemini Flash fallback → Claude")
-            result = call_claude(api_key, system_prompt, user_prompt, max_tokens)
+            result = call_claude(api_key, system_prompt, user_prompt, max_tokens, cache=cache, cache_if=cache_if)
     
     return result
 
@@ -750,14 +842,15 @@ def run_document_agent(api_key, doc_text, gemini_key=None, openai_key=None):
 
 JSON בלבד."""
     # Fallback 1: Gemini Flash (cheapest) — via call_ai which auto-falls back to Claude
-    result = call_ai(api_key, gemini_key, system, doc_text[:6000], max_tokens=4096, tier="fast")
+    result = call_ai(api_key, gemini_key, system, doc_text[:6000], max_tokens=4096, tier="fast",
+                     cache_if=has_json_object)
     parsed = _try_parse_agent1(result, "call_ai(Gemini→Claude)")
     if parsed:
         return parsed
 
     # Fallback 2: Claude direct (in case call_ai's fallback also failed)
     print("    🔄 Agent 1: call_ai failed, retrying Claude directly...")
-    result = call_claude(api_key, system, doc_text[:6000], max_tokens=4096)
+    result = call_claude(api_key, system, doc_text[:6000], max_tokens=4096, cache_if=has_json_object)
     parsed = _try_parse_agent1(result, "Claude-direct")
     if parsed:
         return parsed
@@ -765,7 +858,8 @@ JSON בלבד."""
     # Fallback 3: ChatGPT (Session 48 — third fallback, never leave pipeline with 0 models)
     if openai_key:
         print("    🔄 Agent 1: Claude failed, trying ChatGPT (gpt-4o-mini)...")
-        result = call_chatgpt(openai_key, system, doc_text[:6000], max_tokens=4096, model="gpt-4o-mini")
+        result = call_chatgpt(openai_key, system, doc_text[:6000], max_tokens=4096, model="gpt-4o-mini",
+                              cache_if=has_json_object)
         parsed = _try_parse_agent1(result, "ChatGPT")
         if parsed:
             return parsed
@@ -800,7 +894,8 @@ def run_classification_agent(api_key, items, tariff_data, rules, knowledge_conte
 פלט JSON:
 {{"classifications":[{{"item":"","hs_code":"","duty_rate":"","confidence":"גבוהה/בינונית/נמוכה","reasoning":""}}]}}"""
     
-    result = call_ai(api_key, gemini_key, system, f"פריטים לסיווג:\n{json.dumps(items, ensure_ascii=False)}", 3000, tier="smart")
+    result = call_ai(api_key, gemini_key, system, f"פריטים לסיווג:\n{json.dumps(items, ensure_ascii=False)}", 3000, tier="smart",
+                     cache_if=has_json_object)
     try:
         if result:
             start, end = result.find('{'), result.rfind('}') + 1
@@ -821,7 +916,8 @@ def run_regulatory_agent(api_key, classifications, ministry_data, gemini_key=Non
 פלט JSON:
 {{"regulatory":[{{"hs_code":"","ministries":[{{"name":"","required":true/false,"regulation":""}}]}}]}}"""
     
-    result = call_ai(api_key, gemini_key, system, f"סיווגים:\n{json.dumps(classifications, ensure_ascii=False)}", tier="fast")
+    result = call_ai(api_key, gemini_key, system, f"סיווגים:\n{json.dumps(classifications, ensure_ascii=False)}", tier="fast",
+                     cache_if=has_json_object)
     try:
         if result:
             start, end = result.find('{'), result.rfind('}') + 1
@@ -841,7 +937,8 @@ def run_fta_agent(api_key, classifications, origin_country, gemini_key=None):
 פלט JSON:
 {"fta":[{"hs_code":"","country":"","agreement":"","eligible":true/false,"preferential":"","documents_needed":""}]}"""
     
-    result = call_ai(api_key, gemini_key, system, f"סיווגים: {json.dumps(classifications, ensure_ascii=False)}\nארץ מקור: {origin_country}", tier="fast")
+    result = call_ai(api_key, gemini_key, system, f"סיווגים: {json.dumps(classifications, ensure_ascii=False)}\nארץ מקור: {origin_country}", tier="fast",
+                     cache_if=has_json_object)
     try:
         if result:
             start, end = result.find('{'), result.rfind('}') + 1
@@ -863,7 +960,8 @@ def run_risk_agent(api_key, invoice_data, classifications, gemini_key=None):
 פלט JSON:
 {"risk":{"level":"נמוך/בינוני/גבוה","items":[{"item":"","issue":"","recommendation":""}]}}"""
     
-    result = call_ai(api_key, gemini_key, system, f"חשבונית: {json.dumps(invoice_data, ensure_ascii=False)}\nסיווגים: {json.dumps(classifications, ensure_ascii=False)}", tier="fast")
+    result = call_ai(api_key, gemini_key, system, f"חשבונית: {json.dumps(invoice_data, ensure_ascii=False)}\nסיווגים: {json.dumps(classifications, ensure_ascii=False)}", tier="fast",
+                     cache_if=has_json_object)
     try:
         if result:
             start, end = result.find('{'), result.rfind('}') + 1
@@ -957,6 +1055,136 @@ def _link_invoice_to_classifications(items, classifications):
     return classifications
 
 
+def _pre_classify_items(db, work, seller_name="", max_workers=None, item_timeout=None):
+    """Run pre_classify for [(description, origin), ...] on a bounded thread pool.
+
+    Returns a list aligned with `work` (deterministic invoice order). An item
+    that raises or runs past its deadline yields None — other items are not
+    affected. max_workers=1 runs serially on the calling thread.
+    """
+    max_workers = PRE_CLASSIFY_MAX_WORKERS if max_workers is None else max_workers
+    item_timeout = PRE_CLASSIFY_ITEM_TIMEOUT_SEC if item_timeout is None else item_timeout
+    results = [None] * len(work)
+    started = {}  # idx -> monotonic start time (set by the worker)
+
+    def _one(idx, desc, item_origin):
+        started[idx] = time.monotonic()
+        try:
+            return pre_classify(db, desc, item_origin, seller_name=seller_name)
+        except Exception as e:
+            print(f"    ⚠️ pre_classify error for '{desc[:40]}': {e}")
+            return None
+
+    if max_workers <= 1 or len(work) <= 1:
+        for idx, (desc, item_origin) in enumerate(work):
+            results[idx] = _one(idx, desc, item_origin)
+        return results
+
+    workers = min(max_workers, len(work))
+    # Hard cap for the whole batch: every "wave" of workers gets one item_timeout
+    batch_deadline = time.monotonic() + item_timeout * (-(-len(work) // workers))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = {pool.submit(contextvars.copy_context().run, _one, idx, desc, item_origin): idx
+                   for idx, (desc, item_origin) in enumerate(work)}
+        while pending:
+            done, _ = wait(list(pending), timeout=0.25, return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[pending.pop(fut)] = fut.result()
+            now = time.monotonic()
+            for fut, idx in list(pending.items()):
+                late = idx in started and now - started[idx] > item_timeout
+                if late or now > batch_deadline:
+                    fut.cancel()
+                    pending.pop(fut)
+                    print(f"    ⚠️ pre_classify timeout for '{work[idx][0][:40]}' — skipped")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def _run_agent_graph(nodes, max_workers=None, timeout=None):
+    """Run a dependency graph of agents on a bounded thread pool.
+
+    nodes: {name: {"fn": callable, "deps": (names...), "default": value,
+                   "deadline": seconds}}
+    fn is called with one keyword argument per dep (that dep's result) and is
+    submitted as soon as all of its deps have results. "deadline" defaults to
+    `timeout`; None means no deadline. A node with a "default" that raises
+    or runs past its deadline yields the default, so its dependents still run
+    on partial inputs (the late thread is abandoned, not waited on). A node
+    without a "default" is required: its error is re-raised.
+
+    Returns {name: result}. max_workers=1 runs every node in dependency order
+    on the calling thread, without deadlines.
+    """
+    max_workers = AGENT_GRAPH_MAX_WORKERS if max_workers is None else max_workers
+    timeout = SPECIALIST_AGENT_TIMEOUT_SEC if timeout is None else timeout
+    for name, node in nodes.items():
+        missing = [d for d in node.get("deps", ()) if d not in nodes]
+        if missing:
+            raise ValueError(f"agent graph: {name} depends on unknown {missing}")
+
+    results = {}
+    waiting = dict(nodes)
+
+    def _ready():
+        ready = [name for name, node in waiting.items()
+                 if all(d in results for d in node.get("deps", ()))]
+        if waiting and not ready and not pending:
+            raise ValueError(f"agent graph: dependency cycle in {sorted(waiting)}")
+        return [(name, waiting.pop(name)) for name in ready]
+
+    def _fallback(name, node, reason):
+        if "default" not in node:
+            raise reason
+        print(f"    ⚠️ Agent graph: {name} {reason} — continuing without it")
+        results[name] = node["default"]
+
+    def _kwargs(node):
+        return {d: results[d] for d in node.get("deps", ())}
+
+    pending = {}
+    if max_workers <= 1:
+        while waiting:
+            for name, node in _ready():
+                try:
+                    results[name] = node["fn"](**_kwargs(node))
+                except Exception as e:
+                    _fallback(name, node, e)
+        return results
+
+    started = {}  # name -> monotonic start time (set by the worker)
+
+    def _one(name, fn, kwargs):
+        started[name] = time.monotonic()
+        return fn(**kwargs)
+
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(nodes)) or 1)
+    try:
+        while waiting or pending:
+            for name, node in _ready():
+                pending[pool.submit(contextvars.copy_context().run, _one, name, node["fn"],
+                                    _kwargs(node))] = name
+            done, _ = wait(list(pending), timeout=0.25, return_when=FIRST_COMPLETED)
+            for fut in done:
+                name = pending.pop(fut)
+                try:
+                    results[name] = fut.result()
+                except Exception as e:
+                    _fallback(name, nodes[name], e)
+            now = time.monotonic()
+            for fut, name in list(pending.items()):
+                deadline = nodes[name].get("deadline", timeout)
+                if deadline is not None and name in started and now - started[name] > deadline:
+                    fut.cancel()
+                    pending.pop(fut)
+                    _fallback(name, nodes[name], TimeoutError(f"timed out after {deadline}s"))
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
 def run_full_classification(api_key, doc_text, db, gemini_key=None, openai_key=None):
     """Run complete multi-agent classification
     Session 15: Now accepts gemini_key for cost-optimized multi-model routing
@@ -1041,6 +1269,13 @@ def run_full_classification(api_key, doc_text, db, gemini_key=None, openai_key=N
         seller_name = invoice.get("seller", "")
         if INTELLIGENCE_AVAILABLE:
             print("    🧠 Intelligence: Pre-classifying from own knowledge...")
+            # One batched get_all for every item's keyword/product/supplier index docs
+            prefetch_index_docs(db, [
+                i.get("description", "") for i in items
+                if isinstance(i, dict) and i.get("description", "")
+                and not i["description"].startswith("=== ") and "&nbsp;" not in i["description"]
+            ], seller_name=seller_name)
+            pc_work = []
             for item in items:
                 if not isinstance(item, dict):
                     continue
@@ -1048,8 +1283,10 @@ def run_full_classification(api_key, doc_text, db, gemini_key=None, openai_key=N
                 desc = item.get("description", "")
                 if not desc or desc.startswith("=== ") or "&nbsp;" in desc:
                     continue  # Skip raw email/HTML text — not a real product description
-                item_origin = item.get("origin_country", origin)
-                pc_result = pre_classify(db, desc, item_origin, seller_name=seller_name)
+                pc_work.append((desc, item.get("origin_country", origin)))
+            # Fan out per item (bounded pool), fan back in invoice order
+            pc_results = _pre_classify_items(db, pc_work, seller_name=seller_name)
+            for (desc, _), pc_result in zip(pc_work, pc_results):
                 if not isinstance(pc_result, dict):
                     continue
                 intelligence_results[desc[:50]] = pc_result
@@ -1284,27 +1521,12 @@ def run_full_classification(api_key, doc_text, db, gemini_key=None, openai_key=N
             except Exception as e:
                 print(f"    ⚠️ Smart questions error: {e}")
 
-        # Agent 3: Regulatory (Gemini Flash)
-        print("    ⚖️ Agent 3: Regulatory... [Gemini Flash]")
-        regulatory = run_regulatory_agent(api_key, classification.get("classifications", []), ministry, gemini_key=gemini_key)
-        if not isinstance(regulatory, dict):
-            regulatory = {"regulatory": []}
-
-        # Agent 4: FTA (Gemini Flash)
-        print("    🌍 Agent 4: FTA... [Gemini Flash]")
-        fta = run_fta_agent(api_key, classification.get("classifications", []), origin, gemini_key=gemini_key)
-        if not isinstance(fta, dict):
-            fta = {"fta": []}
-
-        # Agent 5: Risk (Gemini Flash)
-        print("    🚨 Agent 5: Risk... [Gemini Flash]")
-        risk = run_risk_agent(api_key, invoice, classification.get("classifications", []), gemini_key=gemini_key)
-        if not isinstance(risk, dict):
-            risk = {"risk": {"level": "נמוך", "items": []}}
-
-        # Agent 6: Synthesis (Gemini Pro)
-        print("    📝 Agent 6: Synthesis... [Gemini Pro]")
-        all_results = {"invoice": invoice, "classification": classification, "regulatory": regulatory, "fta": fta, "risk": risk}
+        # Agents 3-5 are independent of each other and of the quality gate.
+        # They read a snapshot of the pre-audit classifications, so the gate
+        # can fix the originals in place while they run.
+        specialist_classifications = copy.deepcopy(classification.get("classifications", []))
+        # Slots keep the synthesis prompt's key order; filled once Agents 3-5 finish
+        all_results = {"invoice": invoice, "classification": classification, "regulatory": None, "fta": None, "risk": None}
 
         # Include intelligence results for synthesis context
         if intelligence_results:
@@ -1390,14 +1612,42 @@ def run_full_classification(api_key, doc_text, db, gemini_key=None, openai_key=N
 
         # ── QUALITY GATE: Audit + retry before synthesis ──
         pre_send = {"agents": all_results, "invoice_data": invoice}
-        audit = audit_before_send(
-            pre_send, api_key=api_key, items=items,
-            tariff=tariff, rules=rules, context=combined_context,
-            gemini_key=gemini_key, db=db, openai_key=openai_key,
-        )
-        all_results["classification"]["classifications"] = audit["classifications"]
 
-        synthesis = run_synthesis_agent(api_key, all_results, gemini_key=gemini_key)
+        def _audit():
+            return audit_before_send(
+                pre_send, api_key=api_key, items=items,
+                tariff=tariff, rules=rules, context=combined_context,
+                gemini_key=gemini_key, db=db, openai_key=openai_key,
+            )
+
+        def _synthesis(regulatory, fta, risk, audit):
+            # Agent 6: Synthesis (Gemini Pro) — starts as soon as Agents 3-5 and the gate are done
+            print("    📝 Agent 6: Synthesis... [Gemini Pro]")
+            all_results["regulatory"] = regulatory if isinstance(regulatory, dict) else {"regulatory": []}
+            all_results["fta"] = fta if isinstance(fta, dict) else {"fta": []}
+            all_results["risk"] = risk if isinstance(risk, dict) else {"risk": {"level": "נמוך", "items": []}}
+            all_results["classification"]["classifications"] = audit["classifications"]
+            return run_synthesis_agent(api_key, all_results, gemini_key=gemini_key)
+
+        print("    ⚖️🌍🚨 Agents 3-5: Regulatory / FTA / Risk... [Gemini Flash, concurrent]")
+        graph = _run_agent_graph({
+            "regulatory": {
+                "fn": lambda: run_regulatory_agent(api_key, specialist_classifications, ministry, gemini_key=gemini_key),
+                "default": {"regulatory": []},
+            },
+            "fta": {
+                "fn": lambda: run_fta_agent(api_key, specialist_classifications, origin, gemini_key=gemini_key),
+                "default": {"fta": []},
+            },
+            "risk": {
+                "fn": lambda: run_risk_agent(api_key, invoice, specialist_classifications, gemini_key=gemini_key),
+                "default": {"risk": {"level": "נמוך", "items": []}},
+            },
+            "audit": {"fn": _audit, "deadline": None},
+            "synthesis": {"fn": _synthesis, "deps": ("regulatory", "fta", "risk", "audit"), "deadline": None},
+        })
+        audit = graph["audit"]
+        synthesis = graph["synthesis"]
 
         # Session 14: Clean synthesis text (fix typos, VAT rate, RTL spacing)
         if LANGUAGE_TOOLS_AVAILABLE:
@@ -1645,7 +1895,8 @@ Return JSON:
 }}"""
 
     try:
-        raw = call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model="gpt-4o")
+        raw = call_chatgpt(openai_key, system_prompt, user_prompt, max_tokens=2000, model="gpt-4o",
+                           cache_if=has_json_object)
         if not raw:
             return None
 
@@ -3080,6 +3331,7 @@ def _link_classification_to_tracker(db, classification_doc_id, invoice_data, res
           f"({len(hs_codes)} HS codes)")
 
 
+@_in_own_context
 def process_and_send_report(access_token, rcb_email, to_email, subject, sender_name, raw_attachments, msg_id, get_secret_func, db, firestore, helper_graph_send, extract_text_func, email_body=None, internet_message_id=None):
     """Main: Extract, classify, validate, send ONE consolidated email.
 
@@ -3139,10 +3391,15 @@ def process_and_send_report(access_token, rcb_email, to_email, subject, sender_n
         print("  📬 No reply target (external sender, no team address) — will classify but NOT send email")
     try:
         print(f"  🤖 Starting: {subject[:50]}")
-        _cost_tracker.reset()  # Session 27: Reset per-run cost accumulator
+        _run_cost_tracker.set(_CostTracker())  # Session 27: per-run cost accumulator (this run's context only)
         try:
             from lib.librarian import clear_search_cache
-            clear_search_cache()  # Session 27: Clear search cache between runs
+            clear_search_cache(collections=False)  # Session 27: Clear search cache between runs (keep warm collection snapshots)
+        except ImportError:
+            pass
+        try:
+            from lib.intelligence import begin_index_cache_run
+            begin_index_cache_run()  # Re-read index docs cached before this run (without clearing other runs' entries)
         except ImportError:
             pass
 
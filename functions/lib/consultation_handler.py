@@ -871,7 +871,7 @@ def _render_broker_result_html(broker_result):
             # Safety: enrich duty_rate from supplements if missing
             if sub_codes:
                 try:
-                    from lib._tariff_supplements import get_supplement_rate, get_unit_for_hs
+                    from lib._data_snapshot import get_supplement_rate, get_unit_for_hs
                     for _sc in sub_codes:
                         _sc_hs = str(_sc.get("hs_code", "")).replace(".", "").replace("/", "")
                         _sc_supp = get_supplement_rate(_sc_hs)
@@ -923,7 +923,7 @@ def _render_broker_result_html(broker_result):
                 _sr = ""
                 _su = ""
                 try:
-                    from lib._tariff_supplements import get_supplement_rate, get_unit_for_hs
+                    from lib._data_snapshot import get_supplement_rate, get_unit_for_hs
                     _hs_raw = str(hs_code).replace(".", "").replace("/", "")
                     _supp = get_supplement_rate(_hs_raw)
                     if _supp:
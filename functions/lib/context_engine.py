@@ -20,6 +20,7 @@ import re
 import hashlib
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from dataclasses import dataclass, field
 from typing import Optional
 
@@ -418,6 +419,12 @@ TOOL_ROUTING_MAP = {
     },
 }
 
+# Tool plan execution. Planned tools run concurrently; a tool may declare
+# "depends_on": [tool, ...] and "timeout_sec" in TOOL_ROUTING_MAP.
+TOOL_PLAN_MAX_WORKERS = 8
+TOOL_DEFAULT_TIMEOUT_SEC = 15     # per tool, from the moment it starts
+TOOL_PLAN_BUDGET_SEC = 30         # whole plan including fallbacks
+
 
 # ═══════════════════════════════════════════
 #  INTERNAL HELPERS
@@ -1395,67 +1402,172 @@ def _store_tool_result(tool_name, result, pkg):
         pkg.other_tool_results.append({"tool": tool_name, "result": result})
 
 
-def _execute_tool_plan(plan, pkg, db, get_secret_func):
-    """Execute planned tool calls and store results in pkg."""
-    if not plan:
+def _run_tool(tool_name, params, executor, db, get_secret_func):
+    """Run one tool with its own search log (safe to call from a worker thread).
+
+    Returns (result, log_entries).
+    """
+    log = []
+    if tool_name == "calculate_route_eta":
+        result = _execute_route_eta(
+            params.get("origin", ""),
+            params.get("port_code", "ILASD"),
+            db, get_secret_func, log
+        )
+    elif tool_name == "check_shipment_status":
+        result = _execute_shipment_lookup(params, db, log)
+    elif tool_name == "get_port_schedule":
+        result = _execute_port_schedule(params, db, log)
+    elif executor and tool_name in TOOL_ROUTING_MAP:
+        result = _execute_tool_via_executor(executor, tool_name, params, log)
+    else:
+        log.append({"search": f"tool:{tool_name}", "status": "no_executor"})
+        result = None
+    return result, log
+
+
+def _order_plan(plan):
+    """Stable topological order: a tool comes after the planned tools it depends on.
+
+    Returns (ordered, unmet, deps) — unmet tools are part of a dependency
+    cycle; deps maps each tool to its planned dependencies.
+    """
+    planned = set(plan)
+    deps = {t: [d for d in TOOL_ROUTING_MAP.get(t, {}).get("depends_on", ())
+                if d in planned and d != t] for t in plan}
+    ordered, placed = [], set()
+    remaining = list(plan)
+    while remaining:
+        ready = [t for t in remaining if all(d in placed for d in deps[t])]
+        if not ready:
+            break
+        for t in ready:
+            ordered.append(t)
+            placed.add(t)
+        remaining = [t for t in remaining if t not in placed]
+    return ordered, remaining, deps
+
+
+def _run_tools(tools, pkg, executor, db, get_secret_func, deadline,
+               max_workers=None, default_timeout=None):
+    """
+    Run tools concurrently and merge their results into pkg.
+
+    A tool is submitted once the planned tools it depends on have been merged
+    (its params are built from pkg at that point). Results and log entries are
+    merged strictly in dependency/plan order, so the package is the same no
+    matter which tool finishes first. Each tool gets its own deadline from
+    when it starts; anything still running at `deadline` (time.monotonic())
+    is abandoned. Every tool's log entries carry its wall time in elapsed_ms.
+    """
+    max_workers = max_workers or TOOL_PLAN_MAX_WORKERS
+    default_timeout = default_timeout or TOOL_DEFAULT_TIMEOUT_SEC
+    order, unmet, deps = _order_plan(tools)
+    for tool_name in unmet:
+        pkg.search_log.append({"search": f"tool:{tool_name}", "status": "dependency_cycle"})
+    if not order:
         return
 
-    executor = _get_executor(db)
+    finished = {}    # tool -> (result, log, elapsed_ms)
+    merged = set()
+    pending = list(order)
+    running = {}     # future -> (tool, started, tool_deadline)
+    next_merge = 0
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(order)))
 
-    # Separate tools by execution method
-    executor_tools = set(TOOL_ROUTING_MAP.keys()) - {
-        "calculate_route_eta", "check_shipment_status", "get_port_schedule"
-    }
+    def _finish(tool_name, result, log, started, status=None):
+        elapsed = int((time.monotonic() - started) * 1000) if started else 0
+        if status:
+            log = log + [{"search": f"tool:{tool_name}", "status": status}]
+        finished[tool_name] = (result, log, elapsed)
 
-    for tool_name in plan:
-        params = _build_tool_params(tool_name, pkg)
-        if params is None:
-            pkg.search_log.append({"search": f"tool:{tool_name}", "status": "no_params"})
-            continue
+    try:
+        while True:
+            # Merge the finished prefix, then submit whatever became ready
+            while next_merge < len(order) and order[next_merge] in finished:
+                tool_name = order[next_merge]
+                result, log, elapsed = finished[tool_name]
+                for entry in log:
+                    entry.setdefault("elapsed_ms", elapsed)
+                pkg.search_log.extend(log)
+                try:
+                    _store_tool_result(tool_name, result, pkg)
+                except Exception as e:
+                    pkg.search_log.append({"search": f"tool:{tool_name}", "status": f"crash:{e}"})
+                merged.add(tool_name)
+                next_merge += 1
+
+            for tool_name in list(pending):
+                if not all(d in merged for d in deps[tool_name]):
+                    continue
+                pending.remove(tool_name)
+                params = _build_tool_params(tool_name, pkg)
+                if params is None:
+                    _finish(tool_name, None, [], None, status="no_params")
+                    continue
+                started = time.monotonic()
+                timeout = TOOL_ROUTING_MAP.get(tool_name, {}).get("timeout_sec", default_timeout)
+                fut = pool.submit(_run_tool, tool_name, params, executor, db, get_secret_func)
+                running[fut] = (tool_name, started, started + timeout)
+
+            if next_merge < len(order) and order[next_merge] in finished:
+                continue  # no-params tools just finished — merge them
+            if not running:
+                break
 
-        try:
-            if tool_name == "calculate_route_eta":
-                result = _execute_route_eta(
-                    params.get("origin", ""),
-                    params.get("port_code", "ILASD"),
-                    db, get_secret_func, pkg.search_log
-                )
-            elif tool_name == "check_shipment_status":
-                result = _execute_shipment_lookup(params, db, pkg.search_log)
-            elif tool_name == "get_port_schedule":
-                result = _execute_port_schedule(params, db, pkg.search_log)
-            elif executor and tool_name in executor_tools:
-                result = _execute_tool_via_executor(executor, tool_name, params, pkg.search_log)
-            else:
-                pkg.search_log.append({"search": f"tool:{tool_name}", "status": "no_executor"})
+            now = time.monotonic()
+            if now >= deadline:
+                for fut, (tool_name, started, _) in running.items():
+                    fut.cancel()
+                    _finish(tool_name, None, [], started, status="budget_exceeded")
+                for tool_name in pending:
+                    _finish(tool_name, None, [], None, status="budget_exceeded")
+                running.clear()
+                pending.clear()
                 continue
 
-            _store_tool_result(tool_name, result, pkg)
+            next_deadline = min([deadline] + [d for _, _, d in running.values()])
+            done, _ = wait(list(running), timeout=max(0.0, next_deadline - now),
+                           return_when=FIRST_COMPLETED)
+            for fut in done:
+                tool_name, started, _ = running.pop(fut)
+                try:
+                    result, log = fut.result()
+                    _finish(tool_name, result, log, started)
+                except Exception as e:
+                    _finish(tool_name, None, [], started, status=f"crash:{e}")
+
+            now = time.monotonic()
+            for fut, (tool_name, started, tool_deadline) in list(running.items()):
+                if now >= tool_deadline:
+                    fut.cancel()
+                    running.pop(fut)
+                    _finish(tool_name, None, [], started, status="timeout")
+    finally:
+        # Abandon stragglers — their results are discarded
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _execute_tool_plan(plan, pkg, db, get_secret_func, budget_sec=None):
+    """Execute planned tool calls concurrently and store results in pkg."""
+    if not plan:
+        return
 
-        except Exception as e:
-            pkg.search_log.append({
-                "search": f"tool:{tool_name}",
-                "status": f"crash:{e}",
-            })
+    deadline = time.monotonic() + (budget_sec or TOOL_PLAN_BUDGET_SEC)
+    executor = _get_executor(db)
+
+    _run_tools(plan, pkg, executor, db, get_secret_func, deadline)
 
     # After all planned tools, check if we need fallbacks
     customs_data_count = (len(pkg.tariff_results) + len(pkg.ordinance_articles) +
                           len(pkg.regulatory_results) + len(pkg.framework_articles))
 
-    if customs_data_count < 2 and executor:
+    if customs_data_count < 2 and executor and time.monotonic() < deadline:
         # Run fallback tools (wikipedia)
-        for tool_name, config in TOOL_ROUTING_MAP.items():
-            if not config.get("fallback"):
-                continue
-            if tool_name in plan:
-                continue  # already ran
-            try:
-                params = _build_tool_params(tool_name, pkg)
-                if params:
-                    result = _execute_tool_via_executor(executor, tool_name, params, pkg.search_log)
-                    _store_tool_result(tool_name, result, pkg)
-            except Exception:
-                pass
+        fallbacks = [tool_name for tool_name, config in TOOL_ROUTING_MAP.items()
+                     if config.get("fallback") and tool_name not in plan]
+        fallbacks = [t for t in fallbacks if _build_tool_params(t, pkg)]
+        _run_tools(fallbacks, pkg, executor, db, get_secret_func, deadline)
 
 
 # ═══════════════════════════════════════════
@@ -14,6 +14,11 @@ import logging
 import requests
 from datetime import datetime, timezone
 
+try:
+    from lib.llm_cache import IncompleteResponse, cached_llm_call
+except ImportError:
+    from llm_cache import IncompleteResponse, cached_llm_call
+
 logger = logging.getLogger("rcb.cost_tracker")
 
 
@@ -51,6 +56,8 @@ class CostTracker:
             "image_cache_hits": 0,
             "image_cache_misses": 0,
             "image_cost": 0.0,
+            "llm_cache_hits": 0,
+            "llm_cache_misses": 0,
         }
         self._stopped = False
 
@@ -108,6 +115,10 @@ class CostTracker:
                 logger.warning(f"BUDGET EXHAUSTED after image analysis: ${self.total_spent:.4f} / ${self.BUDGET_LIMIT}")
         return not self.is_over_budget
 
+    def record_llm_cache(self, model, hit):
+        """Record an llm_cache lookup. Hits are free — no cost added."""
+        self.breakdown["llm_cache_hits" if hit else "llm_cache_misses"] += 1
+
     def can_afford(self, estimated_input_tokens, estimated_output_tokens):
         """Check if we can afford an estimated AI call."""
         estimated_cost = (estimated_input_tokens / 1_000_000 * self.GEMINI_FLASH_INPUT) + \
@@ -125,17 +136,39 @@ class CostTracker:
         }
 
 
+GEMINI_FLASH_MODEL = "gemini-2.5-flash"
+
+
 def call_gemini_tracked(gemini_key, prompt, tracker, system_prompt=None,
-                        max_tokens=2000):
+                        max_tokens=2000, cache=True):
     """
     Budget-aware Gemini Flash wrapper.
     Returns parsed JSON dict, raw string, or None if over budget / call failed.
 
     Uses the same Gemini REST API as classification_agents.call_gemini().
+    Identical requests are served from llm_cache without touching the budget;
+    cache=False forces a fresh call.
     """
     if not gemini_key:
         return None
 
+    sys_prompt = system_prompt or "You are an expert Israeli customs classification AI assistant for RCB."
+    text = cached_llm_call(
+        GEMINI_FLASH_MODEL, sys_prompt, prompt, max_tokens, 0.3,
+        lambda: _post_gemini_tracked(gemini_key, prompt, tracker, sys_prompt, max_tokens),
+        cache=cache, tracker=tracker)
+    if not text:
+        return None
+
+    # Try to parse as JSON
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        return text
+
+
+def _post_gemini_tracked(gemini_key, prompt, tracker, sys_prompt, max_tokens):
+    """One budget-checked Gemini Flash call. Returns the fence-stripped text or None."""
     # Pre-check budget
     estimated_input = len(prompt) // 3
     estimated_output = estimated_input // 2
@@ -146,11 +179,9 @@ def call_gemini_tracked(gemini_key, prompt, tracker, system_prompt=None,
     if tracker.is_over_budget:
         return None
 
-    sys_prompt = system_prompt or "You are an expert Israeli customs classification AI assistant for RCB."
-
     try:
         response = requests.post(
-            f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={gemini_key}",
+            f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_FLASH_MODEL}:generateContent?key={gemini_key}",
             headers={"content-type": "application/json"},
             json={
                 "systemInstruction": {"parts": [{"text": sys_prompt}]},
@@ -191,13 +222,10 @@ def call_gemini_tracked(gemini_key, prompt, tracker, system_prompt=None,
             text = text.split("\n", 1)[1] if "\n" in text else text[3:]
         if text.endswith("```"):
             text = text[:-3]
-        text = text.strip()
-
-        # Try to parse as JSON
-        try:
-            return json.loads(text)
-        except (json.JSONDecodeError, ValueError):
-            return text
+        # Cut off by maxOutputTokens / safety: usable now, never cached
+        if candidates[0].get("finishReason", "STOP") not in ("STOP", "UNKNOWN"):
+            return IncompleteResponse(text.strip())
+        return text.strip()
 
     except requests.Timeout:
         logger.warning("Gemini call timed out")
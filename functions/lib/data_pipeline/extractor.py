@@ -11,14 +11,28 @@ Supported formats:
 - Images (Cloud Vision OCR)
 - Plain text (direct)
 
+Extraction goes through extraction_engine as the "pipeline" caller: the
+default backend for every route is this module's own extractor, and the
+order can be changed per class (e.g. to try rcb_helpers first).
+
 Session 27 — Assignment 14C
 """
 
 import logging
 import re
 
+try:
+    from lib.extraction_cache import cached_extraction
+    from lib.extraction_engine import backends_for, extract_document
+except ImportError:
+    from extraction_cache import cached_extraction
+    from extraction_engine import backends_for, extract_document
+
 logger = logging.getLogger("rcb.pipeline.extractor")
 
+# Bump when any extractor's output changes (invalidates extraction_cache entries)
+EXTRACTOR_VERSION = 1
+
 
 def extract_text(file_bytes, content_type, filename=""):
     """
@@ -44,22 +58,41 @@ def extract_text(file_bytes, content_type, filename=""):
     ct = (content_type or "").lower()
     fn = (filename or "").lower()
 
-    # Route to appropriate extractor
+    # Route to the engine's document class
     if "pdf" in ct or fn.endswith(".pdf"):
-        return _extract_pdf(file_bytes)
+        route = "pdf"
     elif "html" in ct or fn.endswith((".html", ".htm")):
-        return _extract_html(file_bytes)
+        route = "html"
     elif "wordprocessingml" in ct or "msword" in ct or fn.endswith((".docx", ".doc")):
-        return _extract_docx(file_bytes)
+        route = "docx"
     elif "spreadsheetml" in ct or "excel" in ct or fn.endswith((".xlsx", ".xls")):
-        return _extract_excel(file_bytes)
+        route = "excel"
     elif ct.startswith("image/") or fn.endswith((".png", ".jpg", ".jpeg", ".tiff")):
-        return _extract_image_ocr(file_bytes)
-    elif "text" in ct or "json" in ct or fn.endswith((".txt", ".csv", ".json")):
-        return _extract_plain_text(file_bytes)
+        route = "image"
     else:
-        # Try as plain text
-        return _extract_plain_text(file_bytes)
+        # Text / JSON, or unknown — try as plain text
+        route = "text"
+    backends = backends_for(route, caller="pipeline")
+
+    def _extract():
+        extracted = extract_document(file_bytes, filename, content_type, backends=backends,
+                                     postprocess=False, caller="pipeline", doc_class=route)
+        if "full_text" in extracted["meta"]:
+            return extracted["meta"]   # this module's own result dict
+        if not extracted["text"]:
+            return _empty_result("all_failed")
+        text = extracted["text"]
+        return {
+            "full_text": text,
+            "tables": extracted["tables"],
+            "language": _detect_language(text),
+            "extraction_method": extracted["backend"],
+            "char_count": len(text),
+        }
+
+    # Same bytes re-ingested (directive re-downloads, reprocessing) reuse the first extraction
+    return cached_extraction(file_bytes, f"pipeline_{route}_{'+'.join(backends)}", EXTRACTOR_VERSION,
+                             _extract, filename=filename)
 
 
 # ═══════════════════════════════════════════
@@ -109,6 +109,8 @@ Public API
 ----------
     eliminate(db, product_info, candidates, api_key=None, gemini_key=None)
         -> EliminationResult dict
+    eliminate_batch(db, [(product_info, candidates), ...], api_key=None, gemini_key=None)
+        -> list[EliminationResult dict] (same traces, chapter rules parsed once)
     candidates_from_pre_classify(pre_classify_result)
         -> list[HSCandidate dict]
     make_product_info(item_dict)
@@ -118,7 +120,8 @@ Reused patterns (not reinvented):
     _CHAPTER_REF_RE — from justification_engine.py:522
     _STOP_WORDS     — from intelligence.py:1371-1378
     _WORD_SPLIT_RE  — from intelligence.py
-    Chapter/section Firestore reads — same fields as tool_executors.py
+    Chapter/section Firestore reads — same fields as tool_executors.py,
+                      served from the process-wide tariff_cache
 """
 
 import json
@@ -126,6 +129,11 @@ import logging
 import re
 from datetime import datetime, timezone
 
+try:
+    from lib.tariff_cache import get_chapter_notes_doc, get_heading_tariff_docs, get_tariff_structure_doc
+except ImportError:
+    from tariff_cache import get_chapter_notes_doc, get_heading_tariff_docs, get_tariff_structure_doc
+
 logger = logging.getLogger(__name__)
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -235,14 +243,13 @@ def _extract_keywords(text, limit=15):
     return result[:limit]
 
 
-def _keyword_overlap(text_a, text_b):
-    """Calculate keyword overlap score between two texts.
+def _keyword_set(text, limit=15):
+    """_extract_keywords() as a frozenset (what the overlap checks compare)."""
+    return frozenset(_extract_keywords(text, limit))
 
-    Returns (overlap_count, overlap_ratio) where ratio is relative to the
-    shorter keyword list. Conservative: 0 overlap if either text is empty.
-    """
-    kw_a = set(_extract_keywords(text_a))
-    kw_b = set(_extract_keywords(text_b))
+
+def _keyword_set_overlap(kw_a, kw_b):
+    """_keyword_overlap() on keyword sets that were already extracted."""
     if not kw_a or not kw_b:
         return 0, 0.0
     overlap = kw_a & kw_b
@@ -250,6 +257,26 @@ def _keyword_overlap(text_a, text_b):
     return len(overlap), ratio
 
 
+def _keyword_overlap(text_a, text_b):
+    """Calculate keyword overlap score between two texts.
+
+    Returns (overlap_count, overlap_ratio) where ratio is relative to the
+    shorter keyword list. Conservative: 0 overlap if either text is empty.
+    """
+    return _keyword_set_overlap(_keyword_set(text_a), _keyword_set(text_b))
+
+
+def _product_text(product_info, fields):
+    """Join product_info fields into the text matched against rule texts."""
+    return " ".join([product_info.get(f, "") for f in fields])
+
+
+# Product fields each level matches on
+_MATCH_FIELDS = ("description", "description_he", "material", "use")
+_DEFINITION_FIELDS = ("description", "description_he", "material")
+_GIR_3A_FIELDS = ("description", "description_he", "material", "form", "use")
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # HS CODE UTILITIES (reuses justification_engine.py:42-44 pattern)
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -284,11 +311,14 @@ def _subheading_from_hs(hs_code):
 # ═══════════════════════════════════════════════════════════════════════════════
 
 class TariffCache:
-    """In-memory cache for tariff data used during a single elimination run.
-
-    One instance per eliminate() call. Not shared across requests.
-    Caches chapter_notes, tariff_structure, and heading data to avoid
-    repeated Firestore reads.
+    """Per-run view of tariff reference data for one elimination run.
+
+    The documents themselves come from the process-wide tariff_cache
+    (bulk-preloaded, versioned, shared across requests), so warm instances
+    eliminate without Firestore reads. This class only memoizes the
+    per-run projections below and turns read errors into "not found".
+    eliminate_batch() shares one instance across all items of a batch, so
+    chapter rules are parsed and rule-side keywords extracted once.
     """
 
     def __init__(self, db):
@@ -297,6 +327,65 @@ class TariffCache:
         self._section_data = {}        # section "XVI" -> dict
         self._chapter_to_section = {}  # chapter "84" -> "XVI"
         self._headings = {}            # heading "8471" -> dict
+        self._chapter_rules = {}       # chapter "84" -> parsed rules dict
+        self._keyword_sets = {}        # (text, limit) -> frozenset
+
+    def keyword_set(self, text, limit=15):
+        """Memoized _keyword_set() for rule-side texts (notes, headings, sections)."""
+        key = (text, limit)
+        kw = self._keyword_sets.get(key)
+        if kw is None:
+            kw = self._keyword_sets[key] = _keyword_set(text, limit)
+        return kw
+
+    def get_chapter_rules(self, chapter):
+        """Chapter notes parsed for the Level 2-3b rules.
+
+        preamble:         "preamble preamble_en"
+        exclusions:       [{text, conditional, main, exception, other_chapters}]
+        inclusions:       [text]
+        definitions:      [text]  (_extract_definitions of notes + preamble)
+        subheading_rules: [{text, heading_refs}]
+
+        Keyword sets are extracted on use via keyword_set() (rules after the
+        first match are never compared).
+        """
+        chapter = str(chapter).zfill(2)
+        if chapter in self._chapter_rules:
+            return self._chapter_rules[chapter]
+
+        notes = self.get_chapter_notes(chapter)
+        rules = {"found": bool(notes.get("found")), "preamble": "",
+                 "exclusions": [], "inclusions": [], "definitions": [], "subheading_rules": []}
+        if rules["found"]:
+            preamble = notes.get("preamble", "")
+            rules["preamble"] = f"{preamble} {notes.get('preamble_en', '')}".strip()
+
+            for excl in notes.get("exclusions", []):
+                text = _rule_text(excl)
+                if not text:
+                    continue
+                main, exception = _split_at_exception(text)
+                rules["exclusions"].append({
+                    "text": text,
+                    "conditional": _has_exception_clause(text),
+                    "main": main,
+                    "exception": exception,
+                    "other_chapters": _exclusion_points_elsewhere(text, chapter),
+                })
+            rules["inclusions"] = [t for t in (_rule_text(i) for i in notes.get("inclusions", [])) if t]
+
+            rules["definitions"] = _extract_definitions(notes.get("notes", []))
+            if preamble:
+                rules["definitions"].extend(_extract_definitions(preamble))
+
+            rules["subheading_rules"] = [
+                {"text": str(rule), "heading_refs": _extract_heading_refs(str(rule))}
+                for rule in notes.get("subheading_rules", [])
+            ]
+
+        self._chapter_rules[chapter] = rules
+        return rules
 
     def get_chapter_notes(self, chapter):
         """Fetch chapter notes from chapter_notes collection.
@@ -305,11 +394,9 @@ class TariffCache:
         if chapter in self._chapter_notes:
             return self._chapter_notes[chapter]
 
-        doc_id = f"chapter_{chapter}"
         try:
-            doc = self._db.collection("chapter_notes").document(doc_id).get()
-            if doc.exists:
-                data = doc.to_dict()
+            data = get_chapter_notes_doc(self._db, chapter)
+            if data is not None:
                 result = {
                     "found": True,
                     "chapter": chapter,
@@ -339,11 +426,9 @@ class TariffCache:
         if section in self._section_data:
             return self._section_data[section]
 
-        doc_id = f"section_{section}"
         try:
-            doc = self._db.collection("tariff_structure").document(doc_id).get()
-            if doc.exists:
-                data = doc.to_dict()
+            data = get_tariff_structure_doc(self._db, f"section_{section}")
+            if data is not None:
                 result = {
                     "found": True,
                     "section": section,
@@ -368,12 +453,11 @@ class TariffCache:
         if chapter in self._chapter_to_section:
             return self._chapter_to_section[chapter]
 
-        doc_id = f"chapter_{chapter}"
         section = ""
         try:
-            doc = self._db.collection("tariff_structure").document(doc_id).get()
-            if doc.exists:
-                section = doc.to_dict().get("section", "")
+            data = get_tariff_structure_doc(self._db, f"chapter_{chapter}")
+            if data is not None:
+                section = data.get("section", "")
         except Exception as e:
             logger.warning(f"TariffCache: chapter->section lookup failed for {chapter}: {e}")
 
@@ -389,20 +473,7 @@ class TariffCache:
 
         results = []
         try:
-            docs = list(
-                self._db.collection("tariff")
-                .where("heading", "==", heading)
-                .limit(10)
-                .stream()
-            )
-            for doc in docs:
-                data = doc.to_dict()
-                results.append({
-                    "hs_code": data.get("hs_code", ""),
-                    "description_he": data.get("description_he", ""),
-                    "description_en": data.get("description_en", ""),
-                    "duty_rate": data.get("duty_rate", ""),
-                })
+            results = get_heading_tariff_docs(self._db, heading)
         except Exception as e:
             logger.warning(f"TariffCache: heading lookup failed for {heading}: {e}")
 
@@ -562,7 +633,7 @@ def _apply_section_scope(cache, product_info, candidates, steps):
 
         # Need enough section text to make a meaningful comparison
         # Use higher limit (100) for section text — sections span many chapters
-        sec_keywords = set(_extract_keywords(sec_text, limit=100))
+        sec_keywords = cache.keyword_set(sec_text, limit=100)
         if len(sec_keywords) < 5:
             continue  # Not enough signal to eliminate at section level
 
@@ -604,20 +675,16 @@ def _apply_section_scope(cache, product_info, candidates, steps):
 # LEVEL 2: CHAPTER EXCLUSIONS / INCLUSIONS — most impactful level
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def _check_exclusion_match(product_info, exclusion_text):
-    """Check if a chapter exclusion applies to this product.
+def _rule_text(rule):
+    """Text of an exclusion/inclusion entry (plain string or {text|description})."""
+    if not isinstance(rule, dict):
+        return str(rule)
+    return rule.get("text", "") or rule.get("description", "") or str(rule)
 
-    Uses keyword overlap between product description and exclusion text.
-    Conservative: requires meaningful overlap (>=2 keywords or high ratio).
-    Returns (matches, score) tuple.
-    """
-    combined = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-        product_info.get("use", ""),
-    ])
-    overlap_count, overlap_ratio = _keyword_overlap(combined, exclusion_text)
+
+def _match_keyword_sets(product_kw, rule_kw):
+    """Exclusion/inclusion threshold on pre-extracted keyword sets -> (matches, score)."""
+    overlap_count, overlap_ratio = _keyword_set_overlap(product_kw, rule_kw)
 
     # Conservative threshold: need at least 2 overlapping keywords
     # OR high ratio (>0.5) with at least 1 keyword
@@ -626,23 +693,25 @@ def _check_exclusion_match(product_info, exclusion_text):
     return False, 0
 
 
+def _check_exclusion_match(product_info, exclusion_text):
+    """Check if a chapter exclusion applies to this product.
+
+    Uses keyword overlap between product description and exclusion text.
+    Conservative: requires meaningful overlap (>=2 keywords or high ratio).
+    Returns (matches, score) tuple.
+    """
+    combined = _product_text(product_info, _MATCH_FIELDS)
+    return _match_keyword_sets(_keyword_set(combined), _keyword_set(exclusion_text))
+
+
 def _check_inclusion_match(product_info, inclusion_text):
     """Check if a chapter inclusion applies to this product.
 
     Same logic as exclusion matching but used for boosting confidence.
     Returns (matches, score) tuple.
     """
-    combined = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-        product_info.get("use", ""),
-    ])
-    overlap_count, overlap_ratio = _keyword_overlap(combined, inclusion_text)
-
-    if overlap_count >= 2 or (overlap_count >= 1 and overlap_ratio > 0.5):
-        return True, overlap_count
-    return False, 0
+    combined = _product_text(product_info, _MATCH_FIELDS)
+    return _match_keyword_sets(_keyword_set(combined), _keyword_set(inclusion_text))
 
 
 def _exclusion_points_elsewhere(exclusion_text, current_chapter):
@@ -720,12 +789,7 @@ def _apply_preamble_scope(cache, product_info, candidates, steps):
     if len(alive) <= 1:
         return candidates
 
-    product_text = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-        product_info.get("use", ""),
-    ])
+    product_kw = _keyword_set(_product_text(product_info, _MATCH_FIELDS))
 
     chapters_seen = set()
     chapter_preamble_scores = {}  # chapter -> (overlap_count, overlap_ratio)
@@ -736,17 +800,15 @@ def _apply_preamble_scope(cache, product_info, candidates, steps):
             continue
         chapters_seen.add(chapter)
 
-        notes = cache.get_chapter_notes(chapter)
-        if not notes.get("found"):
+        rules = cache.get_chapter_rules(chapter)
+        if not rules["found"]:
             continue
 
-        preamble = notes.get("preamble", "")
-        preamble_en = notes.get("preamble_en", "")
-        preamble_text = f"{preamble} {preamble_en}".strip()
+        preamble_text = rules["preamble"]
         if not preamble_text or len(preamble_text) < 20:
             continue
 
-        overlap_count, overlap_ratio = _keyword_overlap(product_text, preamble_text)
+        overlap_count, overlap_ratio = _keyword_set_overlap(product_kw, cache.keyword_set(preamble_text))
         chapter_preamble_scores[chapter] = (overlap_count, overlap_ratio)
 
     # If we have scores for multiple chapters, boost the best-matching ones
@@ -849,11 +911,7 @@ def _apply_definition_matching(cache, product_info, candidates, steps):
     if len(alive) <= 1:
         return candidates
 
-    product_text = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-    ])
+    product_kw = _keyword_set(_product_text(product_info, _DEFINITION_FIELDS))
 
     chapters_seen = set()
     for c in alive:
@@ -862,19 +920,13 @@ def _apply_definition_matching(cache, product_info, candidates, steps):
             continue
         chapters_seen.add(chapter)
 
-        notes = cache.get_chapter_notes(chapter)
-        if not notes.get("found"):
+        rules = cache.get_chapter_rules(chapter)
+        if not rules["found"]:
             continue
 
-        # Look for definitions in preamble and notes
-        all_notes = notes.get("notes", [])
-        preamble = notes.get("preamble", "")
-        definitions = _extract_definitions(all_notes)
-        if preamble:
-            definitions.extend(_extract_definitions(preamble))
-
-        for defn_text in definitions:
-            overlap_count, overlap_ratio = _keyword_overlap(product_text, defn_text)
+        # Definitions from notes and preamble (parsed once per chapter)
+        for defn_text in rules["definitions"]:
+            overlap_count, overlap_ratio = _keyword_set_overlap(product_kw, cache.keyword_set(defn_text))
             if overlap_count >= 2:
                 boost = min(8, 3 + overlap_count)
                 for c2 in candidates:
@@ -912,6 +964,8 @@ def _apply_chapter_exclusions_inclusions(cache, product_info, candidates, steps)
       matches exception clause, skip the elimination.
     - Check inclusions: if product matches an inclusion -> BOOST confidence
     """
+    product_kw = _keyword_set(_product_text(product_info, _MATCH_FIELDS))
+
     # Collect unique chapters from alive candidates
     chapters_checked = set()
     for c in candidates:
@@ -922,35 +976,25 @@ def _apply_chapter_exclusions_inclusions(cache, product_info, candidates, steps)
             continue
         chapters_checked.add(chapter)
 
-        notes = cache.get_chapter_notes(chapter)
-        if not notes.get("found"):
+        rules = cache.get_chapter_rules(chapter)
+        if not rules["found"]:
             continue
 
         # ── Check exclusions ──
-        exclusions = notes.get("exclusions", [])
-        for excl in exclusions:
-            excl_text = str(excl) if not isinstance(excl, dict) else (
-                excl.get("text", "") or excl.get("description", "") or str(excl)
-            )
-            if not excl_text:
-                continue
+        for excl in rules["exclusions"]:
+            excl_text = excl["text"]
 
             # D2: Handle conditional exclusions ("except for X")
             # If the exclusion has an exception clause AND the product matches
             # the exception, skip this exclusion (product is in the exception).
-            if _has_exception_clause(excl_text):
-                main_clause, exception_clause = _split_at_exception(excl_text)
+            if excl["conditional"]:
                 # Product must match the main exclusion clause
-                matches_main, score_main = _check_exclusion_match(
-                    product_info, main_clause
-                )
+                matches_main, score_main = _match_keyword_sets(product_kw, cache.keyword_set(excl["main"]))
                 if not matches_main:
                     continue
                 # If product also matches the exception, DON'T eliminate
-                if exception_clause:
-                    matches_exc, _ = _check_exclusion_match(
-                        product_info, exception_clause
-                    )
+                if excl["exception"]:
+                    matches_exc, _ = _match_keyword_sets(product_kw, cache.keyword_set(excl["exception"]))
                     if matches_exc:
                         logger.info(
                             f"Chapter {chapter}: exclusion matches product but "
@@ -959,12 +1003,12 @@ def _apply_chapter_exclusions_inclusions(cache, product_info, candidates, steps)
                         continue
                 matches, score = matches_main, score_main
             else:
-                matches, score = _check_exclusion_match(product_info, excl_text)
+                matches, score = _match_keyword_sets(product_kw, cache.keyword_set(excl_text))
                 if not matches:
                     continue
 
             # Check if the exclusion points to another specific chapter
-            other_chapters = _exclusion_points_elsewhere(excl_text, chapter)
+            other_chapters = excl["other_chapters"]
 
             before_count = sum(1 for x in candidates if x["alive"])
             eliminated = []
@@ -1000,19 +1044,13 @@ def _apply_chapter_exclusions_inclusions(cache, product_info, candidates, steps)
                 break
 
         # ── Check inclusions (only for still-alive candidates in this chapter) ──
-        inclusions = notes.get("inclusions", [])
+        inclusions = rules["inclusions"]
         alive_in_chapter = [c for c in candidates if c["alive"] and c["chapter"] == chapter]
         if not alive_in_chapter or not inclusions:
             continue
 
-        for incl in inclusions:
-            incl_text = str(incl) if not isinstance(incl, dict) else (
-                incl.get("text", "") or incl.get("description", "") or str(incl)
-            )
-            if not incl_text:
-                continue
-
-            matches, score = _check_inclusion_match(product_info, incl_text)
+        for incl_text in inclusions:
+            matches, score = _match_keyword_sets(product_kw, cache.keyword_set(incl_text))
             if not matches:
                 continue
 
@@ -1164,12 +1202,7 @@ def _apply_heading_match(cache, product_info, candidates, steps):
     if len(alive) <= 1:
         return candidates
 
-    product_text = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-        product_info.get("use", ""),
-    ])
+    product_kw = _keyword_set(_product_text(product_info, _MATCH_FIELDS))
 
     # Score each alive candidate with composite scoring
     candidate_scores = {}  # hs_code -> {keyword, specificity, attribute, composite}
@@ -1177,7 +1210,7 @@ def _apply_heading_match(cache, product_info, candidates, steps):
         heading_text = _get_heading_text(cache, c)
 
         # Signal 1: Keyword overlap (D1)
-        kw_count, kw_ratio = _keyword_overlap(product_text, heading_text)
+        kw_count, kw_ratio = _keyword_set_overlap(product_kw, cache.keyword_set(heading_text))
         kw_score = min(1.0, kw_count * 0.2)  # Normalize: 5+ keywords = 1.0
 
         # Signal 2: Heading specificity (D3)
@@ -1285,11 +1318,7 @@ def _apply_subheading_notes(cache, product_info, candidates, steps):
     if len(alive) <= 1:
         return candidates
 
-    product_text = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-    ])
+    product_kw = _keyword_set(_product_text(product_info, _DEFINITION_FIELDS))
 
     chapters_seen = set()
     for c in alive:
@@ -1305,19 +1334,15 @@ def _apply_subheading_notes(cache, product_info, candidates, steps):
         if len(chapter_candidates) <= 1:
             continue
 
-        notes = cache.get_chapter_notes(chapter)
-        if not notes.get("found"):
-            continue
-
-        subheading_rules = notes.get("subheading_rules", [])
-        if not subheading_rules:
+        rules = cache.get_chapter_rules(chapter)
+        if not rules["found"] or not rules["subheading_rules"]:
             continue
 
         # Check if any subheading rule specifically references one of our
         # candidate headings and matches the product
-        for rule_text in subheading_rules:
-            rule_str = str(rule_text)
-            heading_refs = _extract_heading_refs(rule_str)
+        for rule in rules["subheading_rules"]:
+            rule_str = rule["text"]
+            heading_refs = rule["heading_refs"]
 
             # Find which of our candidates are referenced
             referenced = [
@@ -1328,7 +1353,7 @@ def _apply_subheading_notes(cache, product_info, candidates, steps):
                 continue
 
             # Check if the rule text matches our product
-            overlap_count, _ = _keyword_overlap(product_text, rule_str)
+            overlap_count, _ = _keyword_set_overlap(product_kw, cache.keyword_set(rule_str))
             if overlap_count >= 2:
                 # Boost referenced candidates
                 for cc in referenced:
@@ -1417,14 +1442,7 @@ def _gir_3a_most_specific(cache, product_info, candidates):
 
     Returns: list of (candidate, specificity_score) tuples, sorted best-first.
     """
-    product_text = " ".join([
-        product_info.get("description", ""),
-        product_info.get("description_he", ""),
-        product_info.get("material", ""),
-        product_info.get("form", ""),
-        product_info.get("use", ""),
-    ])
-    product_kw = set(_extract_keywords(product_text))
+    product_kw = _keyword_set(_product_text(product_info, _GIR_3A_FIELDS))
 
     scored = []
     for c in candidates:
@@ -1432,7 +1450,7 @@ def _gir_3a_most_specific(cache, product_info, candidates):
             continue
 
         heading_text = _get_heading_text(cache, c)
-        heading_kw = set(_extract_keywords(heading_text))
+        heading_kw = cache.keyword_set(heading_text)
 
         # GIR 3a scoring components:
         # 1. Keyword overlap breadth — how many product keywords are covered
@@ -2287,26 +2305,8 @@ def _build_result(candidates, steps, sections_checked, chapters_checked,
 # MAIN ENTRY POINT
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def eliminate(db, product_info, candidates, api_key=None, gemini_key=None):
-    """Walk the tariff tree and eliminate candidates deterministically.
-
-    Args:
-        db: Firestore client
-        product_info: ProductInfo dict (from make_product_info)
-        candidates: list of HSCandidate dicts (from candidates_from_pre_classify
-                    or manually constructed)
-        api_key: optional Anthropic API key for AI consultation (D6/D7)
-        gemini_key: optional Gemini API key for AI consultation (D6/D7)
-
-    Returns:
-        EliminationResult dict with survivors, eliminated, steps, metadata,
-        and challenges (D7 devil's advocate).
-    """
-    if not candidates:
-        result = _build_result([], [], set(), set(), 0)
-        result["challenges"] = []
-        return result
-
+def _start_run(product_info, candidates):
+    """Normalize candidates (alive flag, chapter/heading/subheading) and open a run."""
     # Ensure all candidates have alive=True and required fields
     for c in candidates:
         c.setdefault("alive", True)
@@ -2321,68 +2321,67 @@ def eliminate(db, product_info, candidates, api_key=None, gemini_key=None):
             c["subheading"] = _subheading_from_hs(c["hs_code"])
         c.setdefault("section", "")
 
-    input_count = len(candidates)
-    steps = []
-    cache = TariffCache(db)
-
     logger.info(
-        f"Elimination engine: starting with {input_count} candidates for "
+        f"Elimination engine: starting with {len(candidates)} candidates for "
         f"product '{product_info.get('description', '')[:80]}'"
     )
+    return {
+        "product_info": product_info,
+        "candidates": candidates,
+        "steps": [],
+        "input_count": len(candidates),
+        "sections_checked": set(),
+        "chapters_checked": set(),
+    }
 
-    # Level 0: ENRICH — resolve sections
-    candidates = _enrich_candidates(cache, candidates)
-
-    # Track which sections/chapters we checked
-    sections_checked = {c.get("section") for c in candidates if c.get("section")}
-    chapters_checked = {c.get("chapter") for c in candidates if c.get("chapter")}
 
-    # Level 1: SECTION SCOPE
-    candidates = _apply_section_scope(cache, product_info, candidates, steps)
-    alive_count = sum(1 for c in candidates if c["alive"])
-    logger.info(f"After section scope: {alive_count}/{input_count} alive")
+def _cross_chapter_level(cache, product_info, candidates, steps):
+    return _apply_cross_chapter_boost(candidates, steps)
 
-    # Level 2a: D2 — PREAMBLE SCOPE (chapter preamble relevance)
-    candidates = _apply_preamble_scope(cache, product_info, candidates, steps)
 
-    # Level 2b: CHAPTER EXCLUSIONS/INCLUSIONS (with D2 conditional handling)
-    candidates = _apply_chapter_exclusions_inclusions(
-        cache, product_info, candidates, steps
-    )
-    alive_count = sum(1 for c in candidates if c["alive"])
-    logger.info(f"After chapter exclusions/inclusions: {alive_count}/{input_count} alive")
+# Levels 1-4b in execution order: (name logged after the level or None, fn)
+_DETERMINISTIC_LEVELS = (
+    ("section scope", _apply_section_scope),                               # 1
+    (None, _apply_preamble_scope),                                         # 2a
+    ("chapter exclusions/inclusions", _apply_chapter_exclusions_inclusions),  # 2b
+    (None, _cross_chapter_level),                                          # 2c
+    (None, _apply_definition_matching),                                    # 2d
+    ("heading match", _apply_heading_match),                               # 3
+    (None, _apply_subheading_notes),                                       # 3b
+    ("GIR 3 tiebreak", _apply_rule_3),                                     # 4a
+    ("others gate + principally", _check_others_gate),                     # 4b
+)
 
-    # Level 2c: D2 — CROSS-CHAPTER REDIRECT BOOST
-    candidates = _apply_cross_chapter_boost(candidates, steps)
 
-    # Level 2d: D2 — DEFINITION MATCHING
-    candidates = _apply_definition_matching(
-        cache, product_info, candidates, steps
-    )
+def _run_deterministic_levels(cache, runs):
+    """Levels 0-4b, one level at a time across all runs.
 
-    # Level 3: HEADING MATCH — GIR 1 full semantics (D3)
-    candidates = _apply_heading_match(cache, product_info, candidates, steps)
-    alive_count = sum(1 for c in candidates if c["alive"])
-    logger.info(f"After heading match: {alive_count}/{input_count} alive")
+    Runs only share the TariffCache (documents, parsed chapter rules,
+    keyword sets); candidates and steps are per run, so each run's trace
+    is the same as eliminating it on its own.
+    """
+    # Level 0: ENRICH — resolve sections
+    for run in runs:
+        run["candidates"] = _enrich_candidates(cache, run["candidates"])
+        # Track which sections/chapters we checked
+        run["sections_checked"] = {c.get("section") for c in run["candidates"] if c.get("section")}
+        run["chapters_checked"] = {c.get("chapter") for c in run["candidates"] if c.get("chapter")}
 
-    # Level 3b: D3 — SUBHEADING NOTES
-    candidates = _apply_subheading_notes(
-        cache, product_info, candidates, steps
-    )
+    for name, level_fn in _DETERMINISTIC_LEVELS:
+        for run in runs:
+            run["candidates"] = level_fn(cache, run["product_info"], run["candidates"], run["steps"])
+            if name:
+                alive_count = sum(1 for c in run["candidates"] if c["alive"])
+                logger.info(f"After {name}: {alive_count}/{run['input_count']} alive")
 
-    # Level 4a: D4 — GIR RULE 3 TIEBREAK (3א/3ב/3ג)
-    candidates = _apply_rule_3(cache, product_info, candidates, steps)
-    alive_count = sum(1 for c in candidates if c["alive"])
-    logger.info(f"After GIR 3 tiebreak: {alive_count}/{input_count} alive")
 
-    # Level 4b: D5 — OTHERS GATE + PRINCIPALLY TEST
-    candidates = _check_others_gate(cache, product_info, candidates, steps)
-    alive_count = sum(1 for c in candidates if c["alive"])
-    logger.info(f"After others gate + principally: {alive_count}/{input_count} alive")
+def _finish_run(db, run, api_key=None, gemini_key=None):
+    """Levels 4c-7 for one run: AI consultation, result, devil's advocate, log."""
+    product_info, steps, input_count = run["product_info"], run["steps"], run["input_count"]
 
     # Level 4c: D6 — AI CONSULTATION (when >1 survivor and keys available)
     candidates = _ai_consultation_hook(
-        db, product_info, candidates, steps,
+        db, product_info, run["candidates"], steps,
         api_key=api_key, gemini_key=gemini_key
     )
     alive_count = sum(1 for c in candidates if c["alive"])
@@ -2390,7 +2389,7 @@ def eliminate(db, product_info, candidates, api_key=None, gemini_key=None):
 
     # Level 5: BUILD RESULT
     result = _build_result(
-        candidates, steps, sections_checked, chapters_checked, input_count
+        candidates, steps, run["sections_checked"], run["chapters_checked"], input_count
     )
 
     # Level 6: D7 — DEVIL'S ADVOCATE
@@ -2411,3 +2410,67 @@ def eliminate(db, product_info, candidates, api_key=None, gemini_key=None):
     )
 
     return result
+
+
+def _empty_result():
+    result = _build_result([], [], set(), set(), 0)
+    result["challenges"] = []
+    return result
+
+
+def eliminate(db, product_info, candidates, api_key=None, gemini_key=None):
+    """Walk the tariff tree and eliminate candidates deterministically.
+
+    Args:
+        db: Firestore client
+        product_info: ProductInfo dict (from make_product_info)
+        candidates: list of HSCandidate dicts (from candidates_from_pre_classify
+                    or manually constructed)
+        api_key: optional Anthropic API key for AI consultation (D6/D7)
+        gemini_key: optional Gemini API key for AI consultation (D6/D7)
+
+    Returns:
+        EliminationResult dict with survivors, eliminated, steps, metadata,
+        and challenges (D7 devil's advocate).
+    """
+    if not candidates:
+        return _empty_result()
+
+    run = _start_run(product_info, candidates)
+    _run_deterministic_levels(TariffCache(db), [run])
+    return _finish_run(db, run, api_key=api_key, gemini_key=gemini_key)
+
+
+def eliminate_batch(db, items, api_key=None, gemini_key=None):
+    """Eliminate candidates for several products at once (e.g. a whole invoice).
+
+    Levels 0-4b run level by level across all items with one shared
+    TariffCache, so each chapter's notes are parsed (exclusions, exception
+    clauses, definitions, heading refs) and their keywords extracted once
+    per batch instead of once per item. Levels 4c-7 (AI, log) run per item.
+
+    Args:
+        db: Firestore client
+        items: list of (product_info, candidates) pairs. Candidate dicts are
+               updated in place, as in eliminate(), so items must not share them.
+        api_key: optional Anthropic API key for AI consultation (D6/D7)
+        gemini_key: optional Gemini API key for AI consultation (D6/D7)
+
+    Returns:
+        list of EliminationResult dicts in item order, each with the same
+        survivors, eliminated and steps as eliminate() on that item alone.
+    """
+    seen = set()
+    for _, candidates in items:
+        for c in candidates or []:
+            if id(c) in seen:
+                raise ValueError(f"eliminate_batch: candidate {c.get('hs_code', '')} is shared between items")
+            seen.add(id(c))
+
+    runs = [_start_run(product_info, candidates) if candidates else None
+            for product_info, candidates in items]
+    active = [run for run in runs if run is not None]
+    if active:
+        _run_deterministic_levels(TariffCache(db), active)
+    return [_finish_run(db, run, api_key=api_key, gemini_key=gemini_key) if run else _empty_result()
+            for run in runs]
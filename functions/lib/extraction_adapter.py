@@ -10,19 +10,61 @@ When Sessions A/B are ready to switch, the change is ONE LINE in each caller:
 
 All old callers keep working unchanged. Internally the new engine runs,
 multi-method extraction + validation + quality logging happen automatically.
+Documents go through extraction_engine as the "adapter" caller, whose
+default backend is read_document_reliable ("reliable"); the order can be
+changed per class like any other caller.
 
 Session 28C — Assignment 20.
 NEW FILE — does not modify any existing code.
 """
 
-import base64
 import io
 import json
 import re
 import logging
 
+from .extraction_cache import cached_extraction
+from .extraction_engine import backends_for, detect_doc_class, extract_document
+from .text_postprocess import (
+    cleanup_hebrew_text as _cleanup_hebrew_text,
+    tag_document_structure as _tag_document_structure,
+    extract_urls_from_text as _extract_urls_from_text,
+)
+
 logger = logging.getLogger("rcb.extraction_adapter")
 
+# Bump when read_document_reliable output changes (invalidates extraction_cache)
+SMART_EXTRACTOR_VERSION = 1
+
+
+def _read_document_cached(file_bytes, filename, content_type):
+    """Extract through the engine's "adapter" backends, reusing the result for bytes seen before.
+
+    Returns the read_document_reliable dict shape (text, tables, confidence,
+    method_used, valid, warnings, ...) whichever backend produced the text.
+    """
+    # Unknown types were always handed to the reader; let it try them as text
+    doc_class = detect_doc_class(filename, content_type) or "text"
+    backends = backends_for(doc_class, caller="adapter")
+
+    def _extract():
+        extracted = extract_document(file_bytes, filename, content_type, backends=backends,
+                                     postprocess=False, caller="adapter", doc_class=doc_class)
+        return {
+            "methods_tried": extracted["tried"],
+            "method_used": extracted["backend"] or "none",
+            **extracted["meta"],
+            "text": extracted["text"],
+            "tables": extracted["tables"],
+            "backend": extracted["backend"],
+            "degraded": extracted["degraded"],
+        }
+
+    return cached_extraction(
+        file_bytes, f"smart_{content_type}_{doc_class}_{'+'.join(backends)}",
+        SMART_EXTRACTOR_VERSION, _extract, filename=filename,
+    )
+
 
 # ═══════════════════════════════════════════════════════════
 #  Drop-in replacement for rcb_helpers.extract_text_from_pdf_bytes
@@ -35,13 +77,7 @@ def extract_text_from_pdf_bytes(pdf_bytes):
     Old signature:  extract_text_from_pdf_bytes(pdf_bytes) -> str
     New behaviour:  multi-method extraction + validation under the hood.
     """
-    from .read_document import read_document_reliable
-
-    result = read_document_reliable(
-        file_bytes=pdf_bytes,
-        filename="document.pdf",
-        content_type="application/pdf",
-    )
+    result = _read_document_cached(pdf_bytes, "document.pdf", "application/pdf")
 
     text = result.get("text", "")
 
@@ -67,7 +103,7 @@ def extract_text_from_attachments(attachments_data, email_body=None,
     The return value is the same concatenated string the old code produced,
     so all downstream code keeps working.
     """
-    from .read_document import read_document_reliable
+    from .rcb_helpers import attachment_bytes
 
     all_text = []
 
@@ -78,25 +114,20 @@ def extract_text_from_attachments(attachments_data, email_body=None,
 
     for att in attachments_data:
         name = att.get("name", "file")
-        content_bytes = att.get("contentBytes", "")
-
-        if not content_bytes:
-            continue
 
+        # Inline base64 contentBytes, or a streamed "content" file object
         try:
-            file_bytes = base64.b64decode(content_bytes)
+            file_bytes = attachment_bytes(att)
         except Exception:
             continue
+        if not file_bytes:
+            continue
 
         content_type = _guess_content_type(name)
 
         logger.info(f"Extracting: {name} ({content_type})")
 
-        result = read_document_reliable(
-            file_bytes=file_bytes,
-            filename=name,
-            content_type=content_type,
-        )
+        result = _read_document_cached(file_bytes, name, content_type)
 
         text = result.get("text", "")
 
@@ -171,13 +202,7 @@ def extract_text(file_bytes, content_type, filename=""):
     Old returns: dict with full_text, tables, language, extraction_method, char_count
     New behaviour: same dict shape, powered by the smart extractor.
     """
-    from .read_document import read_document_reliable
-
-    result = read_document_reliable(
-        file_bytes=file_bytes,
-        filename=filename or "file",
-        content_type=content_type,
-    )
+    result = _read_document_cached(file_bytes, filename or "file", content_type)
 
     # Map to the old dict format expected by callers
     text = result.get("text", "")
@@ -197,89 +222,9 @@ def extract_text(file_bytes, content_type, filename=""):
 
 
 # ═══════════════════════════════════════════════════════════
-#  Post-processing helpers (copied from rcb_helpers.py patterns
-#  to avoid importing the old module — keeps the adapter self-contained)
+#  Helpers (post-processing lives in text_postprocess.py)
 # ═══════════════════════════════════════════════════════════
 
-def _cleanup_hebrew_text(text):
-    """Fix common Hebrew/RTL extraction issues."""
-    if not text:
-        return text
-    text = re.sub(r" {3,}", "  ", text)
-    text = re.sub(r"\n{4,}", "\n\n\n", text)
-    replacements = {
-        "חשבוו": "חשבון",
-        'מע"ט': 'מע"מ',
-        "עמיל מכם": "עמיל מכס",
-        "מתווך מכס": "עמיל מכס",
-        "מתווכי מכס": "עמילי מכס",
-    }
-    for wrong, right in replacements.items():
-        text = text.replace(wrong, right)
-    return text
-
-
-def _tag_document_structure(text):
-    """Tag document sections to help AI classification agent."""
-    if not text:
-        return text
-
-    tags = []
-
-    inv_match = re.search(
-        r"(?:invoice|inv|חשבונית|חשבון)[\s#:]*(\S+)", text, re.IGNORECASE
-    )
-    if inv_match:
-        tags.append(f"[INVOICE_NUMBER: {inv_match.group(1)}]")
-
-    dates = re.findall(r"\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}", text)
-    if dates:
-        tags.append(f"[DATES_FOUND: {', '.join(dates[:5])}]")
-
-    amounts = re.findall(
-        r"(?:USD|EUR|ILS|NIS|\$|€|₪)\s*[\d,.]+", text, re.IGNORECASE
-    )
-    if not amounts:
-        amounts = re.findall(
-            r"[\d,.]+\s*(?:USD|EUR|ILS|NIS|\$|€|₪)", text, re.IGNORECASE
-        )
-    if amounts:
-        tags.append(f"[AMOUNTS: {', '.join(amounts[:10])}]")
-
-    hs_codes = re.findall(r"\b\d{4}[.\s]\d{2}(?:[.\s]\d{2,6})?\b", text)
-    if hs_codes:
-        tags.append(f"[HS_CODE_CANDIDATES: {', '.join(set(hs_codes[:10]))}]")
-
-    bl_match = re.search(
-        r"(?:B/?L|bill\s*of\s*lading|שטר\s*מטען)[\s#:]*(\S+)",
-        text, re.IGNORECASE,
-    )
-    if bl_match:
-        tags.append(f"[BL_NUMBER: {bl_match.group(1)}]")
-
-    awb_match = re.search(
-        r"(?:AWB|air\s*waybill)[\s#:]*(\S+)", text, re.IGNORECASE
-    )
-    if awb_match:
-        tags.append(f"[AWB_NUMBER: {awb_match.group(1)}]")
-
-    if tags:
-        return "\n".join(tags) + "\n\n" + text
-    return text
-
-
-def _extract_urls_from_text(text):
-    """Detect URLs in text and append them as tagged section."""
-    if not text:
-        return text
-    urls = re.findall(r"https?://[^\s<>\"')\]]+", text)
-    if urls:
-        unique_urls = list(dict.fromkeys(urls))[:20]
-        url_section = "\n[URLS_FOUND]\n" + "\n".join(unique_urls) + "\n[/URLS_FOUND]"
-        return text + url_section
-    return text
-
-
 def _detect_language(text):
     """Simple language detection for the pipeline result dict."""
     if not text:
@@ -0,0 +1,219 @@
+"""
+Content-addressed extraction cache.
+
+The same attachment (invoice PDF, BL, packing list) is extracted again in
+every reply-all of a thread, by batch reprocessing, by the inbox relearner
+and by Gap-2 deal aggregation. Results are keyed by
+
+    sha256(decoded bytes) + extractor name + extractor version
+
+so any caller that sees the same bytes reuses the first extraction instead of
+running pdfplumber / OCR again. Bump the caller's version constant whenever
+its output changes; old entries are then simply never read.
+
+Storage (storage_manager rule — Firestore for metadata, GCS for bulk):
+    in-process LRU          -> repeats within one run (reply-all threads)
+    extraction_cache/<key>  -> small pointer doc (sha256, extractor, sizes)
+    rcb-docs/texts/extraction_cache/<key>.txt  -> result JSON when > 10 KB
+
+Empty, invalid (valid=False / needs_review=True) and degraded results (a PDF
+page kept its fallback text because Vision OCR failed) are never cached —
+OCR / backend outages must be retried. Entries expire after
+RCB_EXTRACTION_CACHE_TTL_SEC (default 30 days). Set RCB_EXTRACTION_CACHE=0
+to disable.
+
+Public API:
+    cached_extraction(file_bytes, extractor, version, extract_fn, filename="")
+    get_cached_extraction(file_bytes, extractor, version)
+    put_cached_extraction(file_bytes, extractor, version, result, filename="")
+    get_extraction_cache_stats() / clear_extraction_cache()
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    from lib.storage_manager import store_text_smart, retrieve_full_text
+except ImportError:
+    from storage_manager import store_text_smart, retrieve_full_text
+
+CACHE_COLLECTION = "extraction_cache"
+_MEMORY_MAX_ENTRIES = 64
+_DEFAULT_TTL_SEC = 30 * 24 * 3600
+
+_MEMORY = OrderedDict()   # key -> (result dict, expires_at)
+_LOCK = threading.Lock()
+_STATS = {"memory_hits": 0, "firestore_hits": 0, "misses": 0, "expired": 0,
+          "stores": 0, "skipped": 0, "errors": 0}
+_DB = None
+
+
+def _enabled():
+    return os.environ.get("RCB_EXTRACTION_CACHE", "1") != "0"
+
+
+def _ttl_sec():
+    try:
+        return float(os.environ.get("RCB_EXTRACTION_CACHE_TTL_SEC", _DEFAULT_TTL_SEC))
+    except ValueError:
+        return _DEFAULT_TTL_SEC
+
+
+def _get_db():
+    """Firestore client of the initialized Firebase app, or None (memory tier only)."""
+    global _DB
+    if _DB is None:
+        try:
+            import firebase_admin
+            from firebase_admin import firestore
+            if firebase_admin._apps:
+                _DB = firestore.client()
+        except Exception:
+            return None
+    return _DB
+
+
+def set_extraction_cache_db(db):
+    """Use this Firestore client for the persistent tier (None = auto-detect)."""
+    global _DB
+    _DB = db
+
+
+def cache_key(file_bytes, extractor, version):
+    """Doc id for (bytes, extractor, version) — safe for Firestore and GCS paths."""
+    digest = hashlib.sha256(file_bytes).hexdigest()
+    safe_extractor = "".join(c if c.isalnum() or c in "-_" else "_" for c in extractor)
+    return f"{safe_extractor}-v{version}-{digest}"
+
+
+def _remember(key, result, expires_at):
+    with _LOCK:
+        _MEMORY[key] = (result, expires_at)
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > _MEMORY_MAX_ENTRIES:
+            _MEMORY.popitem(last=False)
+
+
+def _result_text(result):
+    if not isinstance(result, dict):
+        return ""
+    return result.get("text") or result.get("full_text") or ""
+
+
+def _cacheable(result):
+    """False for results a retry could improve: failed validation or OCR fallback."""
+    return (result.get("valid") is not False
+            and not result.get("needs_review")
+            and not result.get("degraded"))
+
+
+def _stat(name):
+    with _LOCK:
+        _STATS[name] += 1
+
+
+def get_cached_extraction(file_bytes, extractor, version):
+    """Cached result dict for these bytes, or None."""
+    if not file_bytes or not _enabled():
+        return None
+    key = cache_key(file_bytes, extractor, version)
+    now = time.time()
+    with _LOCK:
+        entry = _MEMORY.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                _MEMORY.move_to_end(key)
+                _STATS["memory_hits"] += 1
+                return dict(entry[0])
+            del _MEMORY[key]
+
+    db = _get_db()
+    if db is not None:
+        try:
+            doc = db.collection(CACHE_COLLECTION).document(key).get()
+            if doc.exists:
+                data = doc.to_dict()
+                expires_at = data.get("expires_at", 0)
+                if expires_at > now:
+                    result = json.loads(retrieve_full_text(data))
+                    _remember(key, result, expires_at)
+                    _stat("firestore_hits")
+                    return dict(result)
+                _stat("expired")
+        except Exception as e:
+            _stat("errors")
+            print(f"    ⚠️ Extraction cache read error ({key[:40]}): {e}")
+    _stat("misses")
+    return None
+
+
+def put_cached_extraction(file_bytes, extractor, version, result, filename=""):
+    """Store a result dict with non-empty "text" / "full_text". Returns True if stored."""
+    text = _result_text(result)
+    if not file_bytes or not _enabled() or not text.strip():
+        return False
+    if not _cacheable(result):
+        _stat("skipped")
+        return False
+    ttl = _ttl_sec()
+    if ttl <= 0:
+        return False
+    expires_at = time.time() + ttl
+    key = cache_key(file_bytes, extractor, version)
+    _remember(key, result, expires_at)
+
+    db = _get_db()
+    if db is None:
+        return True
+    try:
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        doc = store_text_smart(payload, CACHE_COLLECTION, key)
+        doc.update({
+            "sha256": key.rsplit("-", 1)[-1],
+            "extractor": extractor,
+            "version": version,
+            "filename": filename[:200],
+            "size_bytes": len(file_bytes),
+            "char_count": len(text),
+            "expires_at": expires_at,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        db.collection(CACHE_COLLECTION).document(key).set(doc)
+        _stat("stores")
+        return True
+    except Exception as e:
+        _stat("errors")
+        print(f"    ⚠️ Extraction cache write error ({key[:40]}): {e}")
+        return False
+
+
+def cached_extraction(file_bytes, extractor, version, extract_fn, filename=""):
+    """Return the cached result for these bytes, or run extract_fn() and cache it."""
+    result = get_cached_extraction(file_bytes, extractor, version)
+    if result is not None:
+        return result
+    result = extract_fn()
+    put_cached_extraction(file_bytes, extractor, version, result, filename)
+    return result
+
+
+def get_extraction_cache_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["memory_entries"] = len(_MEMORY)
+    return stats
+
+
+def clear_extraction_cache():
+    """Drop the in-process tier and reset stats. Useful for testing."""
+    global _DB
+    with _LOCK:
+        _MEMORY.clear()
+        for k in _STATS:
+            _STATS[k] = 0
+    _DB = None
@@ -0,0 +1,332 @@
+"""
+Attachment extraction engine
+============================
+One entry point for turning attachment bytes into text, with the actual
+work done by pluggable backends registered per document class:
+
+    "rcb"       rcb_helpers extractors (pdfplumber/pypdf + streamed Vision OCR,
+                openpyxl, python-docx, eml/msg parsing, regex HTML, CSV tables)
+    "smart"     smart_extractor.SmartExtractor — every method, best result
+    "reliable"  read_document.read_document_reliable — smart + validation + AI retry
+    "pipeline"  data_pipeline.extractor — pdfplumber -> PyMuPDF -> OCR
+
+extract_document() detects the class (pdf, excel, docx, image, tiff, csv,
+html, eml, msg, text), tries that class's backends in order until one
+returns text, and applies the shared post-processor (text_postprocess).
+The default order keeps the rcb_helpers behaviour; benchmarks/
+extraction_bench.py measures chars/sec, peak memory and quality per
+backend and class so the order can be changed per class with evidence:
+
+    set_backend_order("pdf", ["pipeline", "rcb"])
+    RCB_EXTRACTION_BACKENDS="pdf=pipeline,rcb;image=smart"   (env override)
+
+Each entry point is a "caller" with its own order, so all of them go
+through the engine without changing what they extract by default:
+
+    "attachments"  rcb_helpers.extract_text_from_attachments (default order above)
+    "adapter"      extraction_adapter (email pipeline) — ["reliable"]
+    "pipeline"     data_pipeline.extractor.extract_text — ["pipeline"]
+
+    set_backend_order("pdf", ["rcb"], caller="pipeline")
+    RCB_EXTRACTION_BACKENDS_PIPELINE="pdf=rcb,pipeline"
+
+Backends are callables fn(file_bytes, filename, content_type, doc_class)
+returning (text, tables) or (text, tables, meta); they may raise — the
+engine logs and moves on. meta {"degraded": True} marks text a retry could
+improve (e.g. a PDF page whose OCR failed), so callers don't cache it; the
+last backend's meta is returned as result["meta"] (confidence, warnings ...).
+
+Usage:
+    result = extract_document(file_bytes, "invoice.pdf")
+    result["text"], result["backend"], result["doc_class"]
+"""
+
+import os
+import threading
+
+try:
+    from lib.text_postprocess import cleanup_hebrew_text, tag_document_structure, extract_urls_from_text
+except ImportError:
+    from text_postprocess import cleanup_hebrew_text, tag_document_structure, extract_urls_from_text
+
+DOC_CLASSES = ("pdf", "excel", "docx", "image", "tiff", "csv", "html", "eml", "msg", "text")
+
+_EXTENSION_CLASSES = {
+    "pdf": "pdf",
+    "xlsx": "excel", "xls": "excel",
+    "docx": "docx",
+    "jpg": "image", "jpeg": "image", "png": "image", "gif": "image", "bmp": "image",
+    "tiff": "tiff", "tif": "tiff",
+    "csv": "csv", "tsv": "csv",
+    "html": "html", "htm": "html",
+    "eml": "eml",
+    "msg": "msg",
+    "txt": "text", "json": "text", "xml": "text",
+}
+
+# (content-type fragment, class) — checked in order when the extension is unknown
+_CONTENT_TYPE_CLASSES = (
+    ("pdf", "pdf"),
+    ("spreadsheetml", "excel"), ("excel", "excel"),
+    ("wordprocessingml", "docx"),
+    ("image/tif", "tiff"), ("image/", "image"),
+    ("text/csv", "csv"), ("tab-separated", "csv"),
+    ("html", "html"),
+    ("message/rfc822", "eml"),
+    ("ms-outlook", "msg"),
+    ("text/plain", "text"), ("json", "text"),
+)
+
+# Classes whose text is an email: URLs matter more than invoice / BL tags
+_EMAIL_CLASSES = ("eml", "msg")
+
+# Current production behaviour (rcb_helpers only). "text" is not extracted
+# from attachments by default; enable it with set_backend_order / the env var.
+DEFAULT_BACKEND_ORDER = {
+    "pdf": ["rcb"],
+    "excel": ["rcb"],
+    "docx": ["rcb"],
+    "image": ["rcb"],
+    "tiff": ["rcb"],
+    "csv": ["rcb"],
+    "html": ["rcb"],
+    "eml": ["rcb"],
+    "msg": ["rcb"],
+    "text": [],
+}
+
+# Other callers keep their historical backend for every class it handles
+CALLERS = ("attachments", "adapter", "pipeline")
+_CALLER_DEFAULT_BACKEND = {"adapter": "reliable", "pipeline": "pipeline"}
+
+_BACKENDS = {}          # name -> {doc_class: fn}
+_ORDER = {}             # (caller, doc_class) -> [backend names] (overrides the defaults)
+_LOCK = threading.Lock()
+_STATS = {}             # "class/backend" -> {"calls", "hits", "errors", "chars"}
+
+
+def detect_doc_class(filename, content_type=""):
+    """Document class for a filename / MIME type, or None if not extractable."""
+    name = (filename or "").lower()
+    ext = name.rsplit(".", 1)[-1] if "." in name else ""
+    if ext in _EXTENSION_CLASSES:
+        return _EXTENSION_CLASSES[ext]
+    ct = (content_type or "").lower()
+    if ct:
+        for fragment, doc_class in _CONTENT_TYPE_CLASSES:
+            if fragment in ct:
+                return doc_class
+    return None
+
+
+def register_backend(name, doc_classes, fn):
+    """Register fn(file_bytes, filename, content_type, doc_class) -> (text, tables)."""
+    with _LOCK:
+        handlers = _BACKENDS.setdefault(name, {})
+        for doc_class in doc_classes:
+            handlers[doc_class] = fn
+
+
+def available_backends(doc_class):
+    """Names of all backends registered for a class (in registration order)."""
+    with _LOCK:
+        return [name for name, handlers in _BACKENDS.items() if doc_class in handlers]
+
+
+def set_backend_order(doc_class, names, caller="attachments"):
+    """Use these backends, in this order, for doc_class (None restores the default)."""
+    with _LOCK:
+        if names is None:
+            _ORDER.pop((caller, doc_class), None)
+        else:
+            _ORDER[(caller, doc_class)] = list(names)
+
+
+def _env_order(caller):
+    """Parse RCB_EXTRACTION_BACKENDS[_<CALLER>]="pdf=rcb,smart;image=smart"."""
+    var = "RCB_EXTRACTION_BACKENDS" if caller == "attachments" else f"RCB_EXTRACTION_BACKENDS_{caller.upper()}"
+    order = {}
+    for part in os.environ.get(var, "").split(";"):
+        if "=" not in part:
+            continue
+        doc_class, names = part.split("=", 1)
+        order[doc_class.strip()] = [n.strip() for n in names.split(",") if n.strip()]
+    return order
+
+
+def backends_for(doc_class, caller="attachments"):
+    """Backend names tried for doc_class: env override > set_backend_order > default."""
+    env = _env_order(caller)
+    if doc_class in env:
+        return env[doc_class]
+    with _LOCK:
+        if (caller, doc_class) in _ORDER:
+            return list(_ORDER[(caller, doc_class)])
+    if caller == "attachments":
+        return list(DEFAULT_BACKEND_ORDER.get(doc_class, []))
+    name = _CALLER_DEFAULT_BACKEND[caller]
+    return [name] if name in available_backends(doc_class) else []
+
+
+def postprocess_text(text, doc_class):
+    """Shared cleanup: Hebrew fixes, then URL section for emails or structure tags otherwise."""
+    if not text:
+        return text
+    text = cleanup_hebrew_text(text)
+    if doc_class in _EMAIL_CLASSES:
+        return extract_urls_from_text(text)
+    return tag_document_structure(text)
+
+
+def _stat(key, field, n=1):
+    with _LOCK:
+        entry = _STATS.setdefault(key, {"calls": 0, "hits": 0, "errors": 0, "chars": 0})
+        entry[field] += n
+
+
+def _call_backend(name, file_bytes, filename, content_type, doc_class):
+    with _LOCK:
+        fn = _BACKENDS.get(name, {}).get(doc_class)
+    if fn is None:
+        raise KeyError(f"no '{name}' extraction backend for {doc_class}")
+    out = fn(file_bytes, filename, content_type, doc_class)
+    meta = out[2] if len(out) > 2 else {}
+    return out[0] or "", out[1] or [], meta or {}
+
+
+def run_backend(name, file_bytes, filename="", content_type="", doc_class=None):
+    """Raw (text, tables) from one backend, without post-processing. Raises on backend errors."""
+    doc_class = doc_class or detect_doc_class(filename, content_type)
+    text, tables, _ = _call_backend(name, file_bytes, filename, content_type, doc_class)
+    return text, tables
+
+
+def extract_document(file_bytes, filename="", content_type="", backends=None, postprocess=True,
+                     caller="attachments", doc_class=None):
+    """Extract one document with the first backend (in order) that returns text.
+
+    Returns {"text", "tables", "doc_class", "backend", "tried", "degraded", "meta"};
+    text is "" (backend None) when the class is unknown or every backend came
+    up empty. doc_class overrides detection (callers with their own routing).
+    """
+    doc_class = doc_class or detect_doc_class(filename, content_type)
+    result = {"text": "", "tables": [], "doc_class": doc_class, "backend": None, "tried": [],
+              "degraded": False, "meta": {}}
+    if not file_bytes or doc_class is None:
+        return result
+
+    for name in (backends if backends is not None else backends_for(doc_class, caller)):
+        key = f"{doc_class}/{name}"
+        result["tried"].append(name)
+        _stat(key, "calls")
+        try:
+            text, tables, meta = _call_backend(name, file_bytes, filename, content_type, doc_class)
+        except Exception as e:
+            _stat(key, "errors")
+            print(f"    ⚠️ {name} extractor failed on {filename or doc_class}: {e}")
+            continue
+        result["meta"] = meta
+        if text and text.strip():
+            _stat(key, "hits")
+            _stat(key, "chars", len(text))
+            result.update(text=postprocess_text(text, doc_class) if postprocess else text,
+                          tables=tables, backend=name, degraded=bool(meta.get("degraded")))
+            return result
+    return result
+
+
+def get_extraction_engine_stats():
+    """Per "class/backend" counters: calls, hits, errors, chars."""
+    with _LOCK:
+        return {k: dict(v) for k, v in _STATS.items()}
+
+
+def reset_extraction_engine():
+    """Drop order overrides and stats (registered backends stay). Useful for testing."""
+    with _LOCK:
+        _ORDER.clear()
+        _STATS.clear()
+
+
+# ═══════════════════════════════════════════
+#  DEFAULT BACKENDS (lazy imports — the stacks pull in pdfplumber, Vision, ...)
+# ═══════════════════════════════════════════
+
+# doc_class -> rcb_helpers function name (looked up at call time so it can be patched)
+_RCB_FUNCTIONS = {
+    "pdf": "extract_text_from_pdf_bytes",
+    "excel": "_extract_from_excel",
+    "docx": "_extract_from_docx",
+    "image": "_extract_from_image",
+    "tiff": "_extract_from_tiff",
+    "html": "_extract_from_html",
+    "eml": "_extract_from_eml",
+    "msg": "_extract_from_msg",
+}
+
+
+def _rcb_backend(file_bytes, filename, content_type, doc_class):
+    try:
+        from lib import rcb_helpers
+    except ImportError:
+        import rcb_helpers
+    if doc_class == "csv":
+        sep = '\t' if (filename or "").lower().endswith('.tsv') or "tab-separated" in (content_type or "") else ','
+        return rcb_helpers._extract_from_csv(file_bytes, sep), []
+    if doc_class == "pdf":
+        details = {}
+        text = rcb_helpers.extract_text_from_pdf_bytes(file_bytes, details)
+        return text, [], {"degraded": details.get("degraded", False)}
+    return getattr(rcb_helpers, _RCB_FUNCTIONS[doc_class])(file_bytes), []
+
+
+def _reliable_backend(file_bytes, filename, content_type, doc_class):
+    try:
+        from lib.read_document import read_document_reliable
+    except ImportError:
+        from read_document import read_document_reliable
+    result = read_document_reliable(file_bytes=file_bytes, filename=filename or f"document.{doc_class}",
+                                    content_type=content_type)
+    return result.get("text", ""), result.get("tables", []), result
+
+
+def _smart_backend(file_bytes, filename, content_type, doc_class):
+    try:
+        from lib.smart_extractor import SmartExtractor
+    except ImportError:
+        from smart_extractor import SmartExtractor
+    result = SmartExtractor().extract(file_bytes, filename or f"document.{doc_class}", content_type)
+    return result.text, result.tables
+
+
+# doc_class -> data_pipeline.extractor function name
+_PIPELINE_FUNCTIONS = {
+    "pdf": "_extract_pdf",
+    "excel": "_extract_excel",
+    "docx": "_extract_docx",
+    "image": "_extract_image_ocr",
+    "tiff": "_extract_image_ocr",
+    "html": "_extract_html",
+    "csv": "_extract_plain_text",
+    "text": "_extract_plain_text",
+}
+
+
+def _pipeline_backend(file_bytes, filename, content_type, doc_class):
+    try:
+        from lib.data_pipeline import extractor
+    except ImportError:
+        from data_pipeline import extractor
+    result = getattr(extractor, _PIPELINE_FUNCTIONS[doc_class])(file_bytes)
+    return result.get("full_text", ""), result.get("tables", []), result
+
+
+def _register_default_backends():
+    register_backend("rcb", list(_RCB_FUNCTIONS) + ["csv"], _rcb_backend)
+    register_backend("smart", ["pdf", "excel", "docx", "image", "tiff", "csv", "html", "text"],
+                     _smart_backend)
+    register_backend("reliable", list(DOC_CLASSES), _reliable_backend)
+    register_backend("pipeline", list(_PIPELINE_FUNCTIONS), _pipeline_backend)
+
+
+_register_default_backends()
@@ -43,13 +43,14 @@ def _get_gemini_key():
         return None
 
 
-def _call_gemini(prompt, max_tokens=2000):
+def _call_gemini(prompt, max_tokens=2000, cache=True):
     """
     Simple Gemini call used by pupil.py, tracker.py, brain_commander.py.
 
     Args:
         prompt: Single string prompt (agents build the full prompt themselves)
         max_tokens: Max response tokens (default 2000)
+        cache: False to bypass the llm_cache for this call
 
     Returns:
         str: Gemini response text, or None on failure
@@ -63,5 +64,5 @@ def _call_gemini(prompt, max_tokens=2000):
     # Split into a minimal system instruction + the prompt as user content.
     system_prompt = "You are an expert AI assistant for RCB, an Israeli customs brokerage system."
 
-    result = call_gemini(key, system_prompt, prompt, max_tokens=max_tokens)
+    result = call_gemini(key, system_prompt, prompt, max_tokens=max_tokens, cache=cache)
     return result
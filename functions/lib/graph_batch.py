@@ -0,0 +1,226 @@
+"""
+Microsoft Graph JSON $batch
+===========================
+One rcb_check_email tick used to spend one HTTPS round-trip per message on
+mark-read and another on the attachment list. GraphBatchSession coalesces
+them into POST /$batch requests of up to 20 sub-requests:
+
+- mark-read PATCHes are queued and flushed in batches at the end of the run
+- attachment metadata lists (ATTACHMENT_META_SELECT, no contentBytes) are
+  fetched for a planned set of messages, 20 per batch, the first time any
+  of them is asked for; the responses are demultiplexed by sub-request id
+  and kept for the run, so every lane of a message reads the same list.
+  Bodies are never batched: 20 messages of inline contentBytes can run to
+  hundreds of MB in one response, so they are downloaded per message by
+  the lane that processes it
+
+While a session is active, rcb_helpers.helper_graph_mark_read and
+helper_graph_attachment_list route through it transparently, and
+helper_graph_attachments skips its download for messages whose batched
+list is empty; when no session is active, or a sub-request failed, they
+fall back to a single call.
+Sends are not batched: each one must pass the quality gate and report its
+own 202 synchronously, and attachment payloads quickly exceed batch limits.
+
+Usage:
+    batch = GraphBatchSession(access_token, mailbox)
+    activate_graph_batch(batch)
+    batch.plan_attachments(msg_ids_with_attachments)
+    ... helper_graph_mark_read / helper_graph_attachments as usual ...
+    deactivate_graph_batch()
+    batch.flush_mark_read()
+"""
+
+import threading
+
+try:
+    from lib.graph_client import GRAPH_BASE, MAX_RETRY_AFTER_SEC, graph_request
+    from lib import graph_client
+except ImportError:
+    from graph_client import GRAPH_BASE, MAX_RETRY_AFTER_SEC, graph_request
+    import graph_client
+
+MAX_BATCH = 20           # Graph hard limit of sub-requests per $batch
+ATTACHMENT_META_SELECT = "id,name,contentType,size,isInline"
+_THROTTLE_ROUNDS = 2     # extra rounds for sub-requests answered 429/503
+
+
+def _relative(url):
+    """Sub-request URLs are relative to the version root ("/users/...")."""
+    return url[len(GRAPH_BASE):] if url.startswith(GRAPH_BASE) else url
+
+
+def graph_batch(access_token, subrequests, max_rounds=_THROTTLE_ROUNDS):
+    """Send sub-requests through POST /$batch, MAX_BATCH at a time.
+
+    subrequests: [{"method", "url", "body"?}] (url absolute or "/users/...").
+    Returns a list aligned with subrequests of {"status", "body", "headers"}.
+    Throttled sub-requests are retried after their Retry-After; a failed
+    batch call marks its sub-requests with the batch status (0 on exception).
+    """
+    results = [None] * len(subrequests)
+    todo = list(range(len(subrequests)))
+    for round_no in range(max_rounds + 1):
+        throttled = []
+        wait_sec = 0.0
+        for start in range(0, len(todo), MAX_BATCH):
+            chunk = todo[start:start + MAX_BATCH]
+            payload = {"requests": []}
+            for i in chunk:
+                sub = subrequests[i]
+                item = {"id": str(i), "method": sub["method"].upper(), "url": _relative(sub["url"])}
+                if sub.get("body") is not None:
+                    item["body"] = sub["body"]
+                    item["headers"] = {"Content-Type": "application/json"}
+                payload["requests"].append(item)
+            try:
+                response = graph_request("POST", "/$batch", access_token, json=payload)
+                if response.status_code != 200:
+                    for i in chunk:
+                        results[i] = {"status": response.status_code, "body": {}, "headers": {}}
+                    continue
+                answers = response.json().get("responses", [])
+            except Exception as e:
+                print(f"  ⚠️ Graph $batch error: {e}")
+                for i in chunk:
+                    results[i] = {"status": 0, "body": {}, "headers": {}}
+                continue
+            for answer in answers:
+                try:
+                    i = int(answer.get("id"))
+                except (TypeError, ValueError):
+                    continue
+                status = answer.get("status", 0)
+                headers = answer.get("headers") or {}
+                results[i] = {"status": status, "body": answer.get("body") or {}, "headers": headers}
+                if status in (429, 503):
+                    throttled.append(i)
+                    try:
+                        wait_sec = max(wait_sec, float(headers.get("Retry-After", 1)))
+                    except (TypeError, ValueError):
+                        wait_sec = max(wait_sec, 1.0)
+        if not throttled or round_no == max_rounds:
+            break
+        graph_client._sleep(min(wait_sec, MAX_RETRY_AFTER_SEC))
+        todo = throttled
+    return [r or {"status": 0, "body": {}, "headers": {}} for r in results]
+
+
+class GraphBatchSession:
+    """Per-run coalescing of mark-read and attachment calls for one mailbox."""
+
+    def __init__(self, access_token, user_email):
+        self.access_token = access_token
+        self.user_email = user_email
+        self._lock = threading.Lock()
+        self._mark_read = []          # msg ids, in queue order
+        self._closed = False
+        self._chunk_of = {}           # msg id -> chunk index
+        self._chunks = []             # [(lock, msg ids still to fetch)]
+        self._fetched = {}            # msg id -> attachment metadata list
+        self._stats = {"mark_read_queued": 0, "mark_read_ok": 0, "attachments_batched": 0,
+                       "attachments_served": 0, "batch_calls": 0}
+
+    def matches(self, access_token, user_email):
+        return access_token == self.access_token and (user_email or "").lower() == self.user_email.lower()
+
+    # ── mark-read ──
+
+    def queue_mark_read(self, msg_id):
+        """Queue a mark-read for flush_mark_read(). False once flushed (caller sends it)."""
+        with self._lock:
+            if self._closed:
+                return False
+            if msg_id not in self._mark_read:
+                self._mark_read.append(msg_id)
+                self._stats["mark_read_queued"] += 1
+        return True
+
+    def flush_mark_read(self):
+        """PATCH isRead on every queued message via $batch. Returns the number marked."""
+        with self._lock:
+            self._closed = True
+            msg_ids, self._mark_read = self._mark_read, []
+        if not msg_ids:
+            return 0
+        subrequests = [{"method": "PATCH", "url": f"/users/{self.user_email}/messages/{m}",
+                        "body": {"isRead": True}} for m in msg_ids]
+        results = graph_batch(self.access_token, subrequests)
+        ok = sum(1 for r in results if 200 <= r["status"] < 300)
+        with self._lock:
+            self._stats["mark_read_ok"] += ok
+            self._stats["batch_calls"] += -(-len(msg_ids) // MAX_BATCH)
+        if ok < len(msg_ids):
+            print(f"  ⚠️ Graph batch mark-read: {len(msg_ids) - ok}/{len(msg_ids)} failed")
+        return ok
+
+    # ── attachments ──
+
+    def plan_attachments(self, msg_ids):
+        """Register messages whose attachment metadata will be fetched MAX_BATCH at a time."""
+        with self._lock:
+            pending = [m for m in dict.fromkeys(msg_ids) if m and m not in self._chunk_of]
+            for start in range(0, len(pending), MAX_BATCH):
+                ids = pending[start:start + MAX_BATCH]
+                for m in ids:
+                    self._chunk_of[m] = len(self._chunks)
+                self._chunks.append((threading.Lock(), ids))
+
+    def attachments(self, msg_id):
+        """Attachment metadata for a planned message, or None (not planned / sub-request failed)."""
+        with self._lock:
+            chunk_no = self._chunk_of.get(msg_id)
+        if chunk_no is None:
+            return None
+        chunk_lock, ids = self._chunks[chunk_no]
+        with chunk_lock:
+            if ids:
+                self._fetch_chunk(ids)
+                ids.clear()
+        with self._lock:
+            result = self._fetched.get(msg_id)
+            if result is not None:
+                self._stats["attachments_served"] += 1
+        return [dict(a) for a in result] if result is not None else None
+
+    def _fetch_chunk(self, ids):
+        subrequests = [{"method": "GET",
+                        "url": f"/users/{self.user_email}/messages/{m}/attachments"
+                               f"?$select={ATTACHMENT_META_SELECT}"}
+                       for m in ids]
+        results = graph_batch(self.access_token, subrequests)
+        with self._lock:
+            self._stats["batch_calls"] += 1
+            for m, r in zip(ids, results):
+                if r["status"] == 200:
+                    self._fetched[m] = r["body"].get("value", [])
+                    self._stats["attachments_batched"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+_active = None
+_active_lock = threading.Lock()
+
+
+def activate_graph_batch(batch):
+    """Route rcb_helpers mark-read / attachment calls for batch's mailbox through it."""
+    global _active
+    with _active_lock:
+        _active = batch
+
+
+def deactivate_graph_batch():
+    global _active
+    with _active_lock:
+        _active = None
+
+
+def active_graph_batch(access_token, user_email):
+    """The active session if it belongs to this token + mailbox, else None."""
+    batch = _active
+    if batch is not None and batch.matches(access_token, user_email):
+        return batch
+    return None
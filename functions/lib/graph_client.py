@@ -0,0 +1,276 @@
+"""
+Microsoft Graph HTTP client
+===========================
+Every Graph call (rcb_helpers, inbox_relearner, overnight_audit,
+batch_reprocess) goes through graph_request() instead of bare
+requests.get/post/patch:
+
+- one pooled keep-alive requests.Session per process (TLS handshakes to
+  graph.microsoft.com are reused across calls and warm invocations)
+- default (connect, read) timeouts on every call
+- 429 / 503 / 504 honour Retry-After (capped) with exponential backoff for
+  idempotent methods. POST (sendMail, reply, $batch) is retried only on 429,
+  or 503 with Retry-After — throttles Graph rejected before doing any work.
+  A 504 or a connection error may arrive after the message was accepted, so
+  those are returned / raised instead of risking a second send
+- client-credentials tokens cached until shortly before expires_in; a 401
+  with a cached token invalidates it and retries once with a fresh one
+- request metrics: count, latency, throttles, retries, errors
+
+Usage:
+    token = get_graph_token(tenant_id, client_id, client_secret)
+    resp = graph_request("GET", f"/users/{mailbox}/messages", token, params={...})
+    print(get_graph_stats())
+"""
+
+import hashlib
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+GRAPH_BASE = "https://graph.microsoft.com/v1.0"
+LOGIN_BASE = "https://login.microsoftonline.com"
+GRAPH_SCOPE = "https://graph.microsoft.com/.default"
+
+DEFAULT_TIMEOUT = (5, 60)        # (connect, read) seconds
+TOKEN_TIMEOUT = (5, 15)
+MAX_RETRIES = 3
+RETRY_STATUSES = frozenset({429, 503, 504})
+MAX_RETRY_AFTER_SEC = 30         # never sleep longer than this on one Retry-After
+BACKOFF_BASE_SEC = 1.0
+TOKEN_REFRESH_MARGIN_SEC = 300   # refresh tokens 5 minutes before they expire
+_POOL_MAXSIZE = 16               # >= lane workers + OCR/attachment fan-out
+_IDEMPOTENT = frozenset({"GET", "HEAD", "PUT", "DELETE", "PATCH", "OPTIONS"})
+
+_session = None
+_session_lock = threading.Lock()
+_tokens = {}                     # (tenant, client_id, secret hash) -> (token, expires_at)
+_token_creds = {}                # token -> (tenant, client_id, secret), to refetch after a 401
+_TOKEN_CREDS_MAX = 64
+_tokens_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "requests": 0, "errors": 0, "throttled": 0, "retries": 0,
+    "latency_ms_total": 0, "latency_ms_max": 0,
+    "token_fetches": 0, "token_cache_hits": 0, "token_refreshes": 0,
+}
+_sleep = time.sleep              # patched in tests
+
+
+def get_session():
+    """Process-wide pooled keep-alive session for Graph and login calls."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+
+def _stat(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def _record_latency(ms):
+    with _stats_lock:
+        _stats["latency_ms_total"] += ms
+        _stats["latency_ms_max"] = max(_stats["latency_ms_max"], ms)
+
+
+def _retry_delay(response, attempt):
+    """Seconds to wait before the next attempt: Retry-After if given, else backoff."""
+    retry_after = None
+    if response is not None:
+        try:
+            retry_after = float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError, AttributeError):
+            retry_after = None
+    if retry_after is None:
+        retry_after = BACKOFF_BASE_SEC * (2 ** attempt) + random.uniform(0, BACKOFF_BASE_SEC)
+    return max(0.0, min(retry_after, MAX_RETRY_AFTER_SEC))
+
+
+def _retryable(method, response):
+    """Whether a RETRY_STATUSES response may be retried for this method."""
+    if method in _IDEMPOTENT:
+        return True
+    status = response.status_code
+    return status == 429 or (status == 503 and response.headers.get("Retry-After") is not None)
+
+
+def _refreshed_token(stale_token):
+    """A fresh token for the credentials that issued stale_token, or None if unknown."""
+    with _tokens_lock:
+        creds = _token_creds.get(stale_token)
+        if creds is None:
+            return None
+        cached = _tokens.get(_token_key(*creds))
+    if cached and cached[0] != stale_token and cached[1] > time.time():
+        return cached[0]    # another caller already refreshed it
+    invalidate_graph_token(*creds)
+    _stat("token_refreshes")
+    token = get_graph_token(*creds, force_refresh=True)
+    return token if token and token != stale_token else None
+
+
+def graph_request(method, url, access_token=None, params=None, json=None, data=None,
+                  headers=None, timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES, stream=False):
+    """Send one Graph request with retries. Returns the final requests.Response.
+
+    url may be absolute (nextLink / deltaLink) or a path relative to
+    GRAPH_BASE. Connection errors are raised after the last retry, so
+    callers keep their own try/except fallbacks. With stream=True the body
+    is not read; the caller must consume or close() the response.
+
+    A 401 with a token from get_graph_token() refetches the token and
+    retries once; callers holding the old token are refreshed the same way.
+    """
+    method = method.upper()
+    if not url.startswith("http"):
+        url = GRAPH_BASE + url
+    req_headers = dict(headers or {})
+    if access_token:
+        req_headers["Authorization"] = f"Bearer {access_token}"
+    if json is not None:
+        req_headers.setdefault("Content-Type", "application/json")
+
+    session = get_session()
+    attempt = 0
+    token_refreshed = False
+    while True:
+        _stat("requests")
+        t0 = time.time()
+        try:
+            response = session.request(method, url, params=params, json=json, data=data,
+                                       headers=req_headers, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _record_latency(int((time.time() - t0) * 1000))
+            if method not in _IDEMPOTENT or attempt >= max_retries:
+                _stat("errors")
+                raise
+            delay = _retry_delay(None, attempt)
+            print(f"  ⚠️ Graph {method} connection error ({e.__class__.__name__}), retry in {delay:.1f}s")
+        else:
+            _record_latency(int((time.time() - t0) * 1000))
+            status = response.status_code
+            if status == 401 and access_token and not token_refreshed:
+                token_refreshed = True
+                fresh = _refreshed_token(access_token)
+                if fresh:
+                    if stream:
+                        response.close()
+                    print(f"  🔑 Graph {method} HTTP 401, retrying with a refreshed token")
+                    access_token = fresh
+                    req_headers["Authorization"] = f"Bearer {fresh}"
+                    continue
+            if status not in RETRY_STATUSES:
+                if status >= 400:
+                    _stat("errors")
+                return response
+            if status == 429:
+                _stat("throttled")
+            if attempt >= max_retries or not _retryable(method, response):
+                _stat("errors")
+                return response
+            delay = _retry_delay(response, attempt)
+            if stream:
+                response.close()
+            print(f"  ⚠️ Graph {method} HTTP {status}, retry in {delay:.1f}s")
+        _stat("retries")
+        attempt += 1
+        _sleep(delay)
+
+
+def graph_get(url, access_token, params=None, **kwargs):
+    return graph_request("GET", url, access_token, params=params, **kwargs)
+
+
+def graph_post(url, access_token, json=None, **kwargs):
+    return graph_request("POST", url, access_token, json=json, **kwargs)
+
+
+def graph_patch(url, access_token, json=None, **kwargs):
+    return graph_request("PATCH", url, access_token, json=json, **kwargs)
+
+
+def _token_key(tenant_id, client_id, client_secret):
+    return (tenant_id, client_id, hashlib.sha256((client_secret or "").encode()).hexdigest()[:16])
+
+
+def get_graph_token(tenant_id, client_id, client_secret, force_refresh=False):
+    """Client-credentials token, cached until TOKEN_REFRESH_MARGIN_SEC before expiry.
+
+    Returns the token, or None if login fails (the failure is not cached).
+    """
+    key = _token_key(tenant_id, client_id, client_secret)
+    now = time.time()
+    if not force_refresh:
+        with _tokens_lock:
+            cached = _tokens.get(key)
+        if cached and cached[1] > now:
+            _stat("token_cache_hits")
+            return cached[0]
+
+    _stat("token_fetches")
+    response = graph_request(
+        "POST", f"{LOGIN_BASE}/{tenant_id}/oauth2/v2.0/token",
+        data={
+            'client_id': client_id,
+            'client_secret': client_secret,
+            'scope': GRAPH_SCOPE,
+            'grant_type': 'client_credentials',
+        },
+        timeout=TOKEN_TIMEOUT,
+    )
+    if response.status_code != 200:
+        print(f"  ⚠️ Graph token error: HTTP {response.status_code}")
+        return None
+    body = response.json()
+    token = body.get('access_token')
+    if token:
+        try:
+            expires_in = int(body.get('expires_in') or 3599)
+        except (TypeError, ValueError):
+            expires_in = 3599
+        with _tokens_lock:
+            _tokens[key] = (token, now + max(0, expires_in - TOKEN_REFRESH_MARGIN_SEC))
+            _token_creds[token] = (tenant_id, client_id, client_secret)
+            while len(_token_creds) > _TOKEN_CREDS_MAX:
+                _token_creds.pop(next(iter(_token_creds)))
+    return token
+
+
+def invalidate_graph_token(tenant_id, client_id, client_secret):
+    """Drop a cached token (e.g. after Graph answered 401 with it)."""
+    with _tokens_lock:
+        _tokens.pop(_token_key(tenant_id, client_id, client_secret), None)
+
+
+def get_graph_stats():
+    """Request metrics since process start (or the last reset)."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["latency_ms_avg"] = (stats["latency_ms_total"] // stats["requests"]) if stats["requests"] else 0
+    return stats
+
+
+def reset_graph_client():
+    """Close the session, drop cached tokens and zero the metrics. Useful for testing."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+    with _tokens_lock:
+        _tokens.clear()
+        _token_creds.clear()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
@@ -15,7 +15,10 @@ import traceback
 from datetime import datetime, timezone
 from html import unescape
 
-import requests
+try:
+    from lib.graph_client import graph_request, get_graph_token
+except ImportError:
+    from graph_client import graph_request, get_graph_token
 
 # ═══════════════════════════════════════════════════════════
 #  TIER 1 PROTECTION — NEVER WRITE TO THESE COLLECTIONS
@@ -155,19 +158,10 @@ def _get_graph_token_and_email(get_secret_func):
         if not all([tenant, client_id, client_secret, rcb_email]):
             print("[RELEARN] Missing Graph API secrets")
             return None, None
-        resp = requests.post(
-            f"https://login.microsoftonline.com/{tenant.strip()}/oauth2/v2.0/token",
-            data={
-                'client_id': client_id.strip(),
-                'client_secret': client_secret.strip(),
-                'scope': 'https://graph.microsoft.com/.default',
-                'grant_type': 'client_credentials',
-            },
-            timeout=15,
-        )
-        if resp.status_code == 200:
-            return resp.json().get('access_token'), rcb_email.strip()
-        print(f"[RELEARN] Token error: {resp.status_code} {resp.text[:200]}")
+        token = get_graph_token(tenant.strip(), client_id.strip(), client_secret.strip())
+        if token:
+            return token, rcb_email.strip()
+        print("[RELEARN] Token error")
         return None, None
     except Exception as e:
         print(f"[RELEARN] Token exception: {e}")
@@ -185,7 +179,7 @@ def _fetch_messages(access_token, mailbox, skip=0, top=50):
                    'receivedDateTime,bodyPreview,body,hasAttachments,conversationId',
     }
     try:
-        resp = requests.get(url, headers={'Authorization': f'Bearer {access_token}'}, params=params, timeout=30)
+        resp = graph_request('GET', url, access_token, params=params)
         if resp.status_code == 200:
             data = resp.json()
             return data.get('value', []), data.get('@odata.nextLink')
@@ -11,8 +11,12 @@ Functions:
 4. validate_documents() — what doc types are present vs missing
 """
 
+import contextvars
 import re
+import threading
+import time
 import requests
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 
@@ -31,7 +35,7 @@ def pre_classify(db, item_description, origin_country="", seller_name=""):
       3. supplier_index (supplier-based HS hints)
       4. classification_knowledge (past classifications, corrections)
       5. classification_rules (keyword patterns)
-      6. tariff / tariff_chapters (HS description matching — slow, only if needed)
+      6. tariff / tariff_chapters (in-memory inverted index, only if needed)
       - regulatory_requirements (by HS chapter)
       - fta_agreements (by origin country)
 
@@ -168,7 +172,7 @@ def pre_classify(db, item_description, origin_country="", seller_name=""):
                 "notes": r.get("notes", ""),
             })
 
-    # ── Step 6: tariff scan (SLOW FALLBACK — skip if keyword_index had results) ──
+    # ── Step 6: tariff index (FALLBACK — skip if keyword_index had results) ──
     if not ki_results:
         tariff_results = _search_tariff(db, keywords)
         for r in tariff_results:
@@ -184,7 +188,7 @@ def pre_classify(db, item_description, origin_country="", seller_name=""):
                     "reasoning": f"Tariff description match (score {r['score']})",
                 })
     else:
-        print(f"  🧠 INTELLIGENCE: Skipping slow tariff scan (keyword_index had results)")
+        print(f"  🧠 INTELLIGENCE: Skipping tariff index search (keyword_index had results)")
 
     # Sort by confidence descending
     candidates.sort(key=lambda c: c["confidence"], reverse=True)
@@ -1596,6 +1600,167 @@ def _search_corrections(db, item_description, desc_lower):
     return results
 
 
+# ── Batched index-doc lookups (keyword_index / product_index / supplier_index) ──
+# Short-lived LRU keyed by (collection, safe_id) -> (expires_at, data, cached_at).
+# None data = doc known to be missing. Entries expire after _INDEX_DOC_TTL_SEC
+# so callers that never clear the cache (broker_engine, tool_executors, the
+# main.py pre-check) don't serve stale docs or misses on a warm instance.
+# A classification run calls begin_index_cache_run(): in its context, entries
+# cached before the run started are misses, while concurrent runs keep theirs.
+_INDEX_DOC_CACHE = OrderedDict()
+_INDEX_DOC_CACHE_DB = None          # db client the cache was filled from
+_INDEX_DOC_CACHE_MAX = 5000
+_INDEX_DOC_TTL_SEC = 300            # about one classification run
+_INDEX_DOC_LOCK = threading.RLock()  # pre_classify may run per-item in a thread pool
+_INDEX_RUN_STARTED = contextvars.ContextVar("rcb_index_run_started", default=0.0)
+_GET_ALL_CHUNK = 300
+_SUPPLIER_SUFFIXES = [" ltd", " ltd.", " inc", " inc.", " co.", " corp", " corp.",
+                      " gmbh", " s.a.", " s.r.l.", " bv", " b.v.", " llc",
+                      " בע\"מ", " בע״מ"]
+
+
+def _safe_id(text):
+    """Normalize text to an index doc ID (same logic as the indexer)."""
+    safe_id = re.sub(r'[^\w\u0590-\u05FF]', '_', text)
+    return re.sub(r'_+', '_', safe_id).strip('_')[:200]
+
+
+def _keyword_doc_ids(keywords):
+    ids = []
+    for kw in keywords[:12]:
+        safe_id = _safe_id(kw.lower())
+        if safe_id:
+            ids.append(safe_id)
+    return ids
+
+
+def _product_doc_ids(desc_lower):
+    """[exact_id] or [exact_id, prefix_id] for product_index."""
+    if not desc_lower or len(desc_lower) < 5:
+        return []
+    normalized = re.sub(r'[^\w\u0590-\u05FF\s]', ' ', desc_lower)
+    normalized = re.sub(r'\s+', ' ', normalized).strip()[:200]
+    if not normalized:
+        return []
+    ids = [_safe_id(normalized)]
+    if len(normalized) > 60:
+        prefix_id = _safe_id(normalized[:60].strip())
+        if prefix_id != ids[0]:
+            ids.append(prefix_id)
+    return ids
+
+
+def _supplier_doc_id(seller_name):
+    if not seller_name:
+        return ""
+    name = seller_name.lower().strip()
+    for suffix in _SUPPLIER_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[:-len(suffix)].strip()
+    name = re.sub(r'[^\w\u0590-\u05FF\s]', ' ', name)
+    name = re.sub(r'\s+', ' ', name).strip()
+    return _safe_id(name) if name else ""
+
+
+def _cache_index_doc(key, data):
+    with _INDEX_DOC_LOCK:
+        now = time.monotonic()
+        _INDEX_DOC_CACHE[key] = (now + _INDEX_DOC_TTL_SEC, data, now)
+        _INDEX_DOC_CACHE.move_to_end(key)
+        while len(_INDEX_DOC_CACHE) > _INDEX_DOC_CACHE_MAX:
+            _INDEX_DOC_CACHE.popitem(last=False)
+
+
+def _fetch_index_docs(db, wanted):
+    """
+    Fetch index docs for [(collection, safe_id), ...] → {(collection, safe_id): data|None}.
+    Cache misses are read in ONE db.get_all() round-trip (chunked); falls back
+    to per-document get() if get_all is unavailable.
+    """
+    global _INDEX_DOC_CACHE_DB
+    found = {}
+    missing = []
+    now = time.monotonic()
+    run_started = _INDEX_RUN_STARTED.get()
+    with _INDEX_DOC_LOCK:
+        if _INDEX_DOC_CACHE_DB is not db:
+            _INDEX_DOC_CACHE.clear()
+            _INDEX_DOC_CACHE_DB = db
+        for key in wanted:
+            if key in found:
+                continue
+            entry = _INDEX_DOC_CACHE.get(key)
+            if entry is not None and entry[0] > now and entry[2] >= run_started:
+                _INDEX_DOC_CACHE.move_to_end(key)
+                found[key] = entry[1]
+            elif key not in missing:
+                missing.append(key)
+    if not missing:
+        return found
+
+    try:
+        for i in range(0, len(missing), _GET_ALL_CHUNK):
+            chunk = missing[i:i + _GET_ALL_CHUNK]
+            refs = [db.collection(c).document(doc_id) for c, doc_id in chunk]
+            for snap in db.get_all(refs):
+                key = (snap.reference.parent.id, snap.id)
+                data = snap.to_dict() if snap.exists else None
+                _cache_index_doc(key, data)
+                found[key] = data
+    except Exception as e:
+        print(f"    ⚠️ index get_all error (falling back to get): {e}")
+
+    # Anything get_all did not return — one get() per doc
+    for key in missing:
+        if key in found:
+            continue
+        doc = db.collection(key[0]).document(key[1]).get()
+        data = doc.to_dict() if doc.exists else None
+        _cache_index_doc(key, data)
+        found[key] = data
+    return found
+
+
+def prefetch_index_docs(db, descriptions, seller_name=""):
+    """
+    Fetch keyword/product/supplier index docs for ALL invoice items in one
+    batched get_all, so the per-item pre_classify lookups hit the cache.
+    Returns the number of docs requested.
+    """
+    wanted = []
+    for desc in descriptions:
+        if not desc:
+            continue
+        wanted.extend(("keyword_index", d) for d in _keyword_doc_ids(_extract_keywords(desc)))
+        wanted.extend(("product_index", d) for d in _product_doc_ids(desc.lower()))
+    supplier_id = _supplier_doc_id(seller_name)
+    if supplier_id:
+        wanted.append(("supplier_index", supplier_id))
+    if not wanted:
+        return 0
+    try:
+        _fetch_index_docs(db, wanted)
+        print(f"  🧠 INTELLIGENCE: prefetched {len(set(wanted))} index docs for "
+              f"{len(descriptions)} items")
+    except Exception as e:
+        print(f"    ⚠️ index prefetch error: {e}")
+    return len(set(wanted))
+
+
+def begin_index_cache_run():
+    """Start a run in the current context: index docs cached before now are re-read.
+
+    Unlike clear_index_cache() it leaves the entries of concurrent runs alone.
+    """
+    _INDEX_RUN_STARTED.set(time.monotonic())
+
+
+def clear_index_cache():
+    """Clear the index-doc cache (entries also expire after _INDEX_DOC_TTL_SEC)."""
+    with _INDEX_DOC_LOCK:
+        _INDEX_DOC_CACHE.clear()
+
+
 def _search_keyword_index(db, keywords):
     """
     Fast lookup via pre-built keyword_index collection.
@@ -1609,17 +1774,13 @@ def _search_keyword_index(db, keywords):
     aggregated = {}
 
     try:
-        for kw in keywords[:12]:
-            safe_id = re.sub(r'[^\w\u0590-\u05FF]', '_', kw.lower())
-            safe_id = re.sub(r'_+', '_', safe_id).strip('_')[:200]
-            if not safe_id:
-                continue
-
-            doc = db.collection("keyword_index").document(safe_id).get()
-            if not doc.exists:
+        keys = [("keyword_index", d) for d in _keyword_doc_ids(keywords)]
+        docs = _fetch_index_docs(db, keys)
+        for key in keys:
+            data = docs.get(key)
+            if not data:
                 continue
 
-            data = doc.to_dict()
             for entry in data.get("codes", [])[:20]:
                 hs = entry.get("hs_code", "")
                 if not hs:
@@ -1668,19 +1829,14 @@ def _search_product_index(db, desc_lower):
     results = []
 
     try:
-        # Normalize to match how indexer stores it
-        normalized = re.sub(r'[^\w\u0590-\u05FF\s]', ' ', desc_lower)
-        normalized = re.sub(r'\s+', ' ', normalized).strip()[:200]
-        if not normalized:
+        ids = _product_doc_ids(desc_lower)
+        if not ids:
             return []
-
-        safe_id = re.sub(r'[^\w\u0590-\u05FF]', '_', normalized)
-        safe_id = re.sub(r'_+', '_', safe_id).strip('_')[:200]
+        docs = _fetch_index_docs(db, [("product_index", d) for d in ids])
 
         # Try exact match
-        doc = db.collection("product_index").document(safe_id).get()
-        if doc.exists:
-            data = doc.to_dict()
+        data = docs.get(("product_index", ids[0]))
+        if data:
             results.append({
                 "hs_code": data.get("hs_code", ""),
                 "confidence": data.get("confidence", 75),
@@ -1690,23 +1846,18 @@ def _search_product_index(db, desc_lower):
             })
 
         # Also try shorter prefix (first 60 chars) for partial matches
-        if len(normalized) > 60:
-            prefix = normalized[:60].strip()
-            prefix_id = re.sub(r'[^\w\u0590-\u05FF]', '_', prefix)
-            prefix_id = re.sub(r'_+', '_', prefix_id).strip('_')[:200]
-            if prefix_id != safe_id:
-                doc2 = db.collection("product_index").document(prefix_id).get()
-                if doc2.exists:
-                    data2 = doc2.to_dict()
-                    hs = data2.get("hs_code", "")
-                    if not any(r["hs_code"] == hs for r in results):
-                        results.append({
-                            "hs_code": hs,
-                            "confidence": max(50, data2.get("confidence", 75) - 10),
-                            "usage_count": data2.get("usage_count", 0),
-                            "description": data2.get("description", ""),
-                            "is_correction": data2.get("is_correction", False),
-                        })
+        if len(ids) > 1:
+            data2 = docs.get(("product_index", ids[1]))
+            if data2:
+                hs = data2.get("hs_code", "")
+                if not any(r["hs_code"] == hs for r in results):
+                    results.append({
+                        "hs_code": hs,
+                        "confidence": max(50, data2.get("confidence", 75) - 10),
+                        "usage_count": data2.get("usage_count", 0),
+                        "description": data2.get("description", ""),
+                        "is_correction": data2.get("is_correction", False),
+                    })
     except Exception as e:
         print(f"    ⚠️ product_index search error: {e}")
 
@@ -1725,23 +1876,13 @@ def _search_supplier_index(db, seller_name):
 
     try:
         # Normalize supplier name (same logic as indexer)
-        name = seller_name.lower().strip()
-        for suffix in [" ltd", " ltd.", " inc", " inc.", " co.", " corp", " corp.",
-                       " gmbh", " s.a.", " s.r.l.", " bv", " b.v.", " llc",
-                       " בע\"מ", " בע״מ"]:
-            if name.endswith(suffix):
-                name = name[:-len(suffix)].strip()
-        name = re.sub(r'[^\w\u0590-\u05FF\s]', ' ', name)
-        name = re.sub(r'\s+', ' ', name).strip()
-        if not name:
+        safe_id = _supplier_doc_id(seller_name)
+        if not safe_id:
             return []
 
-        safe_id = re.sub(r'[^\w\u0590-\u05FF]', '_', name)
-        safe_id = re.sub(r'_+', '_', safe_id).strip('_')[:200]
-
-        doc = db.collection("supplier_index").document(safe_id).get()
-        if doc.exists:
-            data = doc.to_dict()
+        key = ("supplier_index", safe_id)
+        data = _fetch_index_docs(db, [key]).get(key)
+        if data:
             for entry in data.get("codes", [])[:5]:
                 hs = entry.get("hs_code", "")
                 count = entry.get("count", 1)
@@ -1761,74 +1902,17 @@ def _search_supplier_index(db, seller_name):
 
 
 def _search_tariff(db, keywords):
-    """Search tariff and tariff_chapters for matching HS descriptions (SLOW FALLBACK)."""
-    results = []
-    keywords_lower = [k.lower() for k in keywords if k]
+    """Search tariff and tariff_chapters for matching HS descriptions.
 
-    # Search tariff_chapters (has richer data)
-    try:
-        docs = db.collection("tariff_chapters").limit(1000).stream()
-        for doc in docs:
-            data = doc.to_dict()
-            search_text = ""
-            for field in ["description_he", "description_en", "title",
-                          "title_he", "title_en"]:
-                val = data.get(field, "")
-                if isinstance(val, str):
-                    search_text += " " + val.lower()
-
-            score = sum(1 for kw in keywords_lower if kw in search_text)
-            if score >= 2:  # Need at least 2 keyword matches for tariff
-                hs = data.get("code", data.get("hs_code", ""))
-                if hs:
-                    results.append({
-                        "hs_code": hs,
-                        "score": min(85, score * 15),
-                        "description_he": data.get("description_he",
-                                                     data.get("title_he", "")),
-                        "description_en": data.get("description_en",
-                                                     data.get("title_en", "")),
-                        "duty_rate": data.get("duty_rate", ""),
-                        "source": "tariff_chapters",
-                    })
-    except Exception as e:
-        print(f"    ⚠️ tariff_chapters search error: {e}")
-
-    # Search tariff collection
+    Uses the process-wide inverted index (lib.tariff_index) — the collections
+    are read once per warm instance instead of streamed for every item.
+    """
     try:
-        docs = db.collection("tariff").stream()
-        for doc in docs:
-            data = doc.to_dict()
-            search_text = ""
-            for field in ["description_he", "description_en", "hs_code"]:
-                val = data.get(field, "")
-                if isinstance(val, str):
-                    search_text += " " + val.lower()
-
-            score = sum(1 for kw in keywords_lower if kw in search_text)
-            if score >= 2:
-                hs = data.get("hs_code", "")
-                if hs and not data.get("corrupt_code"):
-                    # Don't duplicate
-                    already = any(r["hs_code"] == hs for r in results)
-                    if not already:
-                        desc_he = data.get("description_he", "")
-                        # Penalize entries with empty/short descriptions (low quality)
-                        adj_score = min(80, score * 15)
-                        if not desc_he or len(desc_he.strip()) < 5:
-                            adj_score = max(10, adj_score - 15)
-                        results.append({
-                            "hs_code": hs,
-                            "score": adj_score,
-                            "description_he": desc_he,
-                            "duty_rate": data.get("duty_rate", ""),
-                            "source": "tariff",
-                        })
+        from lib.tariff_index import search_tariff_index
+        return search_tariff_index(db, [k.lower() for k in keywords if k])
     except Exception as e:
-        print(f"    ⚠️ tariff search error: {e}")
-
-    results.sort(key=lambda r: r["score"], reverse=True)
-    return results[:10]
+        print(f"    ⚠️ tariff index search error: {e}")
+        return []
 
 
 def _lookup_regulatory_by_chapter(db, chapter):
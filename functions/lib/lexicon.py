@@ -0,0 +1,244 @@
+"""
+Lexicon — shared tokenizer and compact word→code postings.
+============================================================
+One canonical Hebrew/English tokenizer and prefix-stripping rule set, plus an
+immutable, array-backed term→postings structure that modules share instead of
+each holding its own dict-of-lists vocabulary.
+
+    tariff_tree      -> "tariff_tree" lexicon (node ids, he/en field bits);
+                        smart_classify queries the same instance
+    _unified_search  -> "unified_index" lexicon compacted from WORD_INDEX
+    broker_engine    -> canonical prefix stripping for CUSTOMS_VOCABULARY
+    tariff_index     -> tokenizer + prefix stripping for the BM25 index
+
+Terms and doc keys are interned; postings live in flat `array` columns
+(doc id, tag, weight) addressed by per-term offsets.
+
+Public API:
+    tokenize(text, stop=STOP_WORDS)   -> words (lowercase, len >= 2, no stop words)
+    index_tokens(text, stop=...)      -> words + first prefix-stripped variant
+    strip_prefixes(word, min_len=4)   -> word + all prefix-stripped variants
+    Lexicon.build(postings)           -> Lexicon
+    get_lexicon(name, builder)        -> shared Lexicon (built lazily, once)
+    reset_lexicons(name=None)         -> drop shared lexicons (tests)
+"""
+
+import bisect
+import re
+import sys
+import threading
+from array import array
+
+# ---------------------------------------------------------------------------
+# Canonical tokenization
+# ---------------------------------------------------------------------------
+
+# Compound prefixes first so "וה" wins over "ו"; order within each group is
+# the order the unified index builder has always used.
+HE_PREFIXES = (
+    "וה", "של", "מה", "לה",
+    "בה", "כש", "שב", "שה", "שמ",
+    "ו", "ה", "ב", "ל", "כ", "מ", "ש",
+)
+
+WORD_SPLIT_RE = re.compile(r'[^\w\u0590-\u05FF]+')
+
+STOP_WORDS = frozenset({
+    "את", "של", "על", "עם",
+    "או", "גם", "כי", "אם",
+    "לא", "יש", "זה", "אל",
+    "הם", "הוא", "היא",
+    "בין", "כל", "מן",
+    "אשר", "עד", "רק",
+    "the", "a", "an", "of", "for", "and", "or", "with",
+    "to", "from", "in", "on", "by", "is", "are", "was", "were",
+    "be", "been", "new", "used", "set", "pcs", "piece", "pieces",
+    "item", "items", "type", "other", "others", "not",
+})
+
+_MIN_STRIP_LEN = 4      # by default only words longer than 3 chars lose a prefix
+_MIN_STEM_LEN = 2       # and the remainder must keep 2+ chars
+
+
+def strip_prefixes(word, min_len=_MIN_STRIP_LEN):
+    """Return the word plus every variant with one Hebrew prefix stripped.
+
+    Words shorter than min_len are returned as-is. Description indexes pass
+    min_len=0 so 3-letter words keep their 2-letter stem ("מבד" -> "בד").
+    """
+    variants = [word]
+    if len(word) >= min_len:
+        for pfx in HE_PREFIXES:
+            if word.startswith(pfx) and len(word) - len(pfx) >= _MIN_STEM_LEN:
+                stripped = word[len(pfx):]
+                if stripped not in variants:
+                    variants.append(stripped)
+    return variants
+
+
+def tokenize(text, stop=STOP_WORDS):
+    """Lowercase, split on non-word chars, drop short tokens and stop words."""
+    if not text:
+        return []
+    return [w for w in WORD_SPLIT_RE.split(text.lower()) if len(w) >= 2 and w not in stop]
+
+
+def index_tokens(text, stop=STOP_WORDS):
+    """Tokens plus the first (longest-prefix) stripped variant of each word."""
+    tokens = []
+    for w in tokenize(text, stop):
+        tokens.append(w)
+        variants = strip_prefixes(w)
+        if len(variants) > 1:
+            tokens.append(variants[1])
+    return tokens
+
+
+# ---------------------------------------------------------------------------
+# Lexicon
+# ---------------------------------------------------------------------------
+
+class Lexicon:
+    """
+    Immutable term -> [(doc, tag, weight)] map.
+
+    Postings are stored column-wise in arrays; `tag` is either a small int
+    (bit flags, OR-ed per term into `term_tags`) or, when built with
+    labels=True, an index into `labels` decoded back to the original string.
+    """
+
+    __slots__ = ("_term_ids", "vocab", "_offsets", "_docs", "_tags", "_weights",
+                 "_term_tags", "doc_keys", "labels")
+
+    def __init__(self):
+        self._term_ids = {}
+        self.vocab = []                 # sorted terms, for prefix expansion
+        self._offsets = array("I", [0])
+        self._docs = array("I")
+        self._tags = array("H")
+        self._weights = array("i")
+        self._term_tags = array("H")
+        self.doc_keys = []
+        self.labels = None
+
+    @classmethod
+    def build(cls, postings, labels=False):
+        """Build from {term: iterable of (doc, tag, weight)}."""
+        lex = cls()
+        doc_ids = {}
+        label_ids = {}
+        if labels:
+            lex.labels = []
+        for term in sorted(postings):
+            mask = 0
+            for doc, tag, weight in postings[term]:
+                did = doc_ids.get(doc)
+                if did is None:
+                    did = len(lex.doc_keys)
+                    doc_ids[doc] = did
+                    lex.doc_keys.append(sys.intern(doc) if isinstance(doc, str) else doc)
+                if labels:
+                    tid = label_ids.get(tag)
+                    if tid is None:
+                        tid = len(lex.labels)
+                        label_ids[tag] = tid
+                        lex.labels.append(tag)
+                    tag = tid
+                lex._docs.append(did)
+                lex._tags.append(tag)
+                lex._weights.append(int(weight))
+                mask |= tag
+            term = sys.intern(term)
+            lex._term_ids[term] = len(lex.vocab)
+            lex.vocab.append(term)
+            lex._offsets.append(len(lex._docs))
+            lex._term_tags.append(0 if labels else mask)
+        return lex
+
+    def __contains__(self, term):
+        return term in self._term_ids
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def has(self, term, tag_mask):
+        """True if the term has any posting with a tag bit in tag_mask."""
+        tid = self._term_ids.get(term)
+        return tid is not None and bool(self._term_tags[tid] & tag_mask)
+
+    def postings(self, term):
+        """[(doc_key, tag, weight)] for a term; [] if absent."""
+        tid = self._term_ids.get(term)
+        if tid is None:
+            return []
+        start, end = self._offsets[tid], self._offsets[tid + 1]
+        keys, labels = self.doc_keys, self.labels
+        docs, tags, weights = self._docs, self._tags, self._weights
+        if labels is not None:
+            return [(keys[docs[i]], labels[tags[i]], weights[i]) for i in range(start, end)]
+        return [(keys[docs[i]], tags[i], weights[i]) for i in range(start, end)]
+
+    def docs(self, term):
+        """Doc keys for a term, in posting order."""
+        tid = self._term_ids.get(term)
+        if tid is None:
+            return []
+        keys, docs = self.doc_keys, self._docs
+        return [keys[docs[i]] for i in range(self._offsets[tid], self._offsets[tid + 1])]
+
+    def expand(self, prefix, min_len=3, limit=60):
+        """Terms starting with prefix (exact match included), via the sorted vocab."""
+        if len(prefix) < min_len:
+            return [prefix] if prefix in self._term_ids else []
+        out = []
+        pos = bisect.bisect_left(self.vocab, prefix)
+        while pos < len(self.vocab) and len(out) < limit:
+            term = self.vocab[pos]
+            if not term.startswith(prefix):
+                break
+            out.append(term)
+            pos += 1
+        return out
+
+    def stats(self):
+        """Sizes for logging/debugging."""
+        return {
+            "terms": len(self.vocab),
+            "docs": len(self.doc_keys),
+            "postings": len(self._docs),
+            "array_bytes": sum(a.itemsize * len(a) for a in (
+                self._offsets, self._docs, self._tags, self._weights, self._term_tags)),
+        }
+
+
+# ---------------------------------------------------------------------------
+# Shared registry
+# ---------------------------------------------------------------------------
+
+_LEXICONS = {}
+_LOCK = threading.Lock()
+
+
+def get_lexicon(name, builder):
+    """Return the shared lexicon `name`, calling builder() once to create it."""
+    lex = _LEXICONS.get(name)
+    if lex is not None:
+        return lex
+    with _LOCK:
+        lex = _LEXICONS.get(name)
+        if lex is None:
+            lex = builder()
+            _LEXICONS[name] = lex
+            s = lex.stats()
+            print(f"[lexicon] {name}: {s['terms']} terms, {s['postings']} postings, "
+                  f"{s['array_bytes'] // 1024} KB arrays")
+    return lex
+
+
+def reset_lexicons(name=None):
+    """Drop one shared lexicon, or all of them. Useful for testing."""
+    with _LOCK:
+        if name is None:
+            _LEXICONS.clear()
+        else:
+            _LEXICONS.pop(name, None)
@@ -9,7 +9,10 @@ The Librarian is the CENTRAL BRAIN of the RCB system:
 """
 
 import re
+import sys
+import threading
 import time
+from collections import OrderedDict
 from datetime import datetime, timezone
 
 # ═══════════════════════════════════════════
@@ -33,9 +36,139 @@ def _cache_set(key, value):
     _SEARCH_CACHE[key] = (time.time(), value)
 
 
-def clear_search_cache():
-    """Clear the entire search cache (call between classification runs)."""
+def clear_search_cache(collections=True):
+    """Clear the keyword result cache (call between classification runs).
+
+    collections=False keeps the warm collection snapshots — they have their
+    own TTL + updated_at change detection and are shared across runs.
+    """
     _SEARCH_CACHE.clear()
+    if collections:
+        clear_collection_cache()
+
+
+# ═══════════════════════════════════════════
+#  COLLECTION SNAPSHOT CACHE (warm instance)
+# ═══════════════════════════════════════════
+# Each searched collection is streamed ONCE, with lowercased text and word
+# sets precomputed per field. Keyword searches then score in memory.
+
+_COLLECTION_CACHE = OrderedDict()           # collection_name -> snapshot dict (LRU order)
+_COLLECTION_LOCK = threading.Lock()         # guards _COLLECTION_CACHE/_COLLECTION_STATS; no I/O under it
+_COLLECTION_TTL_SEC = 1800                  # full reload after 30 minutes
+_COLLECTION_CHECK_SEC = 120                 # updated_at change probe interval
+_COLLECTION_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_COLLECTION_DOC_LIMIT = 500
+_COLLECTION_STATS = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+_WORD_RE = re.compile(r'\w+')
+
+
+def clear_collection_cache():
+    """Drop all collection snapshots."""
+    with _COLLECTION_LOCK:
+        _COLLECTION_CACHE.clear()
+
+
+def get_collection_cache_stats():
+    """Hit/miss counters plus current size of the collection snapshot cache."""
+    with _COLLECTION_LOCK:
+        return {
+            **_COLLECTION_STATS,
+            "collections": len(_COLLECTION_CACHE),
+            "bytes": sum(s["bytes"] for s in _COLLECTION_CACHE.values()),
+        }
+
+
+def _latest_updated_at(db, collection_name):
+    """Newest updated_at in the collection (one-doc probe), or None."""
+    try:
+        docs = (db.collection(collection_name)
+                .order_by("updated_at", direction="DESCENDING")
+                .limit(1).stream())
+        for doc in docs:
+            return (doc.to_dict() or {}).get("updated_at")
+    except Exception:
+        pass
+    return None
+
+
+def _load_collection_snapshot(db, collection_name):
+    """Stream up to _COLLECTION_DOC_LIMIT docs and precompute per-field search text."""
+    entries = []
+    size = 0
+    newest = None
+    for doc in db.collection(collection_name).limit(_COLLECTION_DOC_LIMIT).stream():
+        data = doc.to_dict() or {}
+        texts = {}
+        words = {}
+        for field, val in data.items():
+            if isinstance(val, str) and val:
+                low = val.lower()
+                texts[field] = low
+                words[field] = frozenset(_WORD_RE.findall(low))
+                size += sys.getsizeof(low) * 2
+        updated = data.get("updated_at")
+        if updated is not None:
+            try:
+                if newest is None or updated > newest:
+                    newest = updated
+            except TypeError:
+                pass
+        entries.append((doc.id, data, texts, words))
+        size += 200
+    now = time.time()
+    return {
+        "entries": entries,
+        "loaded_at": now,
+        "checked_at": now,
+        "updated_at": newest,
+        "bytes": size,
+    }
+
+
+def _evict_collections():
+    """LRU-evict whole collections until the cache fits under the memory ceiling.
+    Caller holds _COLLECTION_LOCK."""
+    total = sum(s["bytes"] for s in _COLLECTION_CACHE.values())
+    while total > _COLLECTION_CACHE_MAX_BYTES and len(_COLLECTION_CACHE) > 1:
+        _, evicted = _COLLECTION_CACHE.popitem(last=False)
+        total -= evicted["bytes"]
+        _COLLECTION_STATS["evictions"] += 1
+
+
+def _get_collection_snapshot(db, collection_name):
+    """Return a warm snapshot for the collection, loading/reloading as needed."""
+    now = time.time()
+    with _COLLECTION_LOCK:
+        snap = _COLLECTION_CACHE.get(collection_name)
+        probe = False
+        if snap is not None:
+            stale = (now - snap["loaded_at"]) >= _COLLECTION_TTL_SEC
+            probe = not stale and (now - snap["checked_at"]) >= _COLLECTION_CHECK_SEC
+            if probe:
+                snap["checked_at"] = now    # one thread probes; the rest serve the snapshot
+    if probe:
+        latest = _latest_updated_at(db, collection_name)
+        try:
+            stale = latest is not None and (snap["updated_at"] is None
+                                            or latest > snap["updated_at"])
+        except TypeError:
+            stale = False
+    with _COLLECTION_LOCK:
+        if snap is not None:
+            if not stale:
+                _COLLECTION_STATS["hits"] += 1
+                if collection_name in _COLLECTION_CACHE:
+                    _COLLECTION_CACHE.move_to_end(collection_name)
+                return snap
+            _COLLECTION_STATS["reloads"] += 1
+        _COLLECTION_STATS["misses"] += 1
+    snap = _load_collection_snapshot(db, collection_name)
+    with _COLLECTION_LOCK:
+        _COLLECTION_CACHE[collection_name] = snap
+        _COLLECTION_CACHE.move_to_end(collection_name)
+        _evict_collections()
+    return snap
 
 
 # ═══════════════════════════════════════════
@@ -55,7 +188,11 @@ def extract_search_keywords(item_description):
 
 
 def search_collection_smart(db, collection_name, keywords, text_fields, max_results=50):
-    """Smart search a single collection (with cache + word-boundary matching)."""
+    """Smart search a single collection (with cache + word-boundary matching).
+
+    Documents come from the warm collection snapshot, so repeated searches
+    with different keywords do not re-read Firestore.
+    """
     keywords_lower = sorted(set(k.lower() for k in keywords if k))
     cache_key = f"{collection_name}|{'|'.join(keywords_lower)}|{'|'.join(text_fields)}"
     cached = _cache_get(cache_key)
@@ -64,30 +201,37 @@ def search_collection_smart(db, collection_name, keywords, text_fields, max_resu
 
     results = []
 
-    try:
-        docs = db.collection(collection_name).limit(500).stream()
-        for doc in docs:
-            data = doc.to_dict()
+    # Word-boundary match for Latin, substring for Hebrew. A plain \w+ keyword
+    # is on a word boundary exactly when it is one of the field's words.
+    hebrew_kws = [kw for kw in keywords_lower if any("\u0590" <= c <= "\u05FF" for c in kw)]
+    word_kws = [kw for kw in keywords_lower
+                if kw not in hebrew_kws and _WORD_RE.fullmatch(kw)]
+    regex_kws = [re.compile(r'\b' + re.escape(kw) + r'\b') for kw in keywords_lower
+                 if kw not in hebrew_kws and not _WORD_RE.fullmatch(kw)]
 
-            search_text = ""
-            for field in text_fields:
-                val = data.get(field, "")
-                if isinstance(val, str):
-                    search_text += " " + val.lower()
+    try:
+        snap = _get_collection_snapshot(db, collection_name)
+        for doc_id, data, texts, words in snap["entries"]:
+            field_texts = [texts[f] for f in text_fields if f in texts]
+            if not field_texts:
+                continue
 
             score = 0
-            for kw in keywords_lower:
-                # Word-boundary match for Latin, substring for Hebrew
-                if any("\u0590" <= c <= "\u05FF" for c in kw):
+            for kw in word_kws:
+                if any(kw in words[f] for f in text_fields if f in words):
+                    score += 1
+            if hebrew_kws or regex_kws:
+                search_text = " " + " ".join(field_texts)
+                for kw in hebrew_kws:
                     if kw in search_text:
                         score += 1
-                else:
-                    if re.search(r'\b' + re.escape(kw) + r'\b', search_text):
+                for pattern in regex_kws:
+                    if pattern.search(search_text):
                         score += 1
 
             if score > 0:
                 results.append({
-                    "doc_id": doc.id,
+                    "doc_id": doc_id,
                     "score": score,
                     "data": data
                 })
@@ -0,0 +1,242 @@
+"""
+Content-addressed LLM response cache.
+
+Reprocessing an email (batch_reprocess.py, rcb_retry_failed, the
+reprocessing audit) sends byte-identical prompts to Claude / Gemini /
+ChatGPT again and pays full latency and cost for them. Responses are keyed by
+
+    sha256(model, system prompt, user prompt, max_tokens, temperature)
+
+so any caller that sends the same request within the TTL gets the first
+response back without an API call. Changing any prompt byte, the model or
+the generation settings is a different key.
+
+Storage (storage_manager rule — Firestore for metadata, GCS for bulk):
+    in-process LRU              -> repeats within one run / warm instance
+    llm_response_cache/<key>    -> response doc with expires_at
+    rcb-docs/texts/llm_response_cache/<key>.txt  -> response text when > 10 KB
+
+Empty / failed responses are never cached, nor are responses the model did
+not finish (call_fn returns them wrapped in IncompleteResponse — token limit,
+safety stop). Callers that need a structured answer pass cache_if (e.g.
+has_json_object) so only answers that parse are stored. Entries expire after
+RCB_LLM_CACHE_TTL_SEC (default 7 days). Set RCB_LLM_CACHE=0 to disable,
+or pass cache=False to call_claude / call_gemini / call_chatgpt to bypass
+it for one call.
+
+Public API:
+    cached_llm_call(model, system_prompt, user_prompt, max_tokens, temperature,
+                    call_fn, cache=True, tracker=None, cache_if=None)
+    IncompleteResponse(text)          -> str marked "do not cache"
+    has_json_object(response)         -> True if a {...} span parses as JSON
+    llm_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+    get_cached_response(key) / put_cached_response(key, response, model="")
+    get_llm_cache_stats() / clear_llm_cache()
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    from lib.storage_manager import store_text_smart, retrieve_full_text
+except ImportError:
+    from storage_manager import store_text_smart, retrieve_full_text
+
+CACHE_COLLECTION = "llm_response_cache"
+_MEMORY_MAX_ENTRIES = 256
+_DEFAULT_TTL_SEC = 7 * 24 * 3600
+
+_MEMORY = OrderedDict()   # key -> (response, expires_at)
+_LOCK = threading.Lock()
+_STATS = {"memory_hits": 0, "firestore_hits": 0, "misses": 0, "expired": 0,
+          "stores": 0, "skipped": 0, "bypassed": 0, "errors": 0}
+_DB = None
+
+
+def _enabled():
+    return os.environ.get("RCB_LLM_CACHE", "1") != "0"
+
+
+def _ttl_sec():
+    try:
+        return float(os.environ.get("RCB_LLM_CACHE_TTL_SEC", _DEFAULT_TTL_SEC))
+    except ValueError:
+        return _DEFAULT_TTL_SEC
+
+
+def _get_db():
+    """Firestore client of the initialized Firebase app, or None (memory tier only)."""
+    global _DB
+    if _DB is None:
+        try:
+            import firebase_admin
+            from firebase_admin import firestore
+            if firebase_admin._apps:
+                _DB = firestore.client()
+        except Exception:
+            return None
+    return _DB
+
+
+class IncompleteResponse(str):
+    """Response text the model did not finish (max tokens, safety stop).
+
+    Behaves as the plain text for the caller but is never cached.
+    """
+
+
+def has_json_object(response):
+    """True if the response holds a parseable {...} object (the agents' JSON contract)."""
+    if not response:
+        return False
+    start, end = response.find("{"), response.rfind("}") + 1
+    if start == -1 or end <= start:
+        return False
+    try:
+        json.loads(response[start:end])
+        return True
+    except ValueError:
+        return False
+
+
+def set_llm_cache_db(db):
+    """Use this Firestore client for the persistent tier (None = auto-detect)."""
+    global _DB
+    _DB = db
+
+
+def llm_cache_key(model, system_prompt, user_prompt, max_tokens, temperature):
+    """Doc id for one request — sha256 of every field that shapes the response."""
+    payload = json.dumps([model, system_prompt or "", user_prompt or "", max_tokens, temperature],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _stat(name):
+    with _LOCK:
+        _STATS[name] += 1
+
+
+def _remember(key, response, expires_at):
+    with _LOCK:
+        _MEMORY[key] = (response, expires_at)
+        _MEMORY.move_to_end(key)
+        while len(_MEMORY) > _MEMORY_MAX_ENTRIES:
+            _MEMORY.popitem(last=False)
+
+
+def get_cached_response(key):
+    """Cached response text for this key, or None (missing, expired or disabled)."""
+    if not _enabled():
+        return None
+    now = time.time()
+    with _LOCK:
+        entry = _MEMORY.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                _MEMORY.move_to_end(key)
+                _STATS["memory_hits"] += 1
+                return entry[0]
+            del _MEMORY[key]
+
+    db = _get_db()
+    if db is not None:
+        try:
+            doc = db.collection(CACHE_COLLECTION).document(key).get()
+            if doc.exists:
+                data = doc.to_dict()
+                expires_at = data.get("expires_at", 0)
+                if expires_at > now:
+                    response = retrieve_full_text(data)
+                    if response:
+                        _remember(key, response, expires_at)
+                        _stat("firestore_hits")
+                        return response
+                else:
+                    _stat("expired")
+        except Exception as e:
+            _stat("errors")
+            print(f"    ⚠️ LLM cache read error ({key[:16]}): {e}")
+    _stat("misses")
+    return None
+
+
+def put_cached_response(key, response, model=""):
+    """Store a non-empty, complete response string. Returns True if stored."""
+    if not _enabled() or not isinstance(response, str) or not response.strip():
+        return False
+    if isinstance(response, IncompleteResponse):
+        _stat("skipped")
+        return False
+    ttl = _ttl_sec()
+    if ttl <= 0:
+        return False
+    expires_at = time.time() + ttl
+    _remember(key, response, expires_at)
+
+    db = _get_db()
+    if db is None:
+        return True
+    try:
+        doc = store_text_smart(str(response), CACHE_COLLECTION, key)
+        doc.update({
+            "model": model,
+            "char_count": len(response),
+            "expires_at": expires_at,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        db.collection(CACHE_COLLECTION).document(key).set(doc)
+        _stat("stores")
+        return True
+    except Exception as e:
+        _stat("errors")
+        print(f"    ⚠️ LLM cache write error ({key[:16]}): {e}")
+        return False
+
+
+def cached_llm_call(model, system_prompt, user_prompt, max_tokens, temperature,
+                    call_fn, cache=True, tracker=None, cache_if=None):
+    """Return the cached response for this request, or run call_fn() and cache it.
+
+    tracker: optional object with record_llm_cache(model, hit) — the
+    classification _CostTracker or the overnight CostTracker.
+    cache_if: optional predicate(response) -> bool; a fresh response is only
+    stored when it returns True (e.g. has_json_object for JSON agents).
+    """
+    if not cache or not _enabled():
+        _stat("bypassed")
+        return call_fn()
+    key = llm_cache_key(model, system_prompt, user_prompt, max_tokens, temperature)
+    response = get_cached_response(key)
+    if tracker is not None:
+        tracker.record_llm_cache(model, hit=response is not None)
+    if response is not None:
+        return response
+    response = call_fn()
+    if cache_if is not None and response and not cache_if(response):
+        _stat("skipped")
+        return response
+    put_cached_response(key, response, model)
+    return response
+
+
+def get_llm_cache_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats["memory_entries"] = len(_MEMORY)
+    return stats
+
+
+def clear_llm_cache():
+    """Drop the in-process tier and reset stats. Useful for testing."""
+    global _DB
+    with _LOCK:
+        _MEMORY.clear()
+        for k in _STATS:
+            _STATS[k] = 0
+    _DB = None
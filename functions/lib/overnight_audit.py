@@ -172,7 +172,7 @@ def _audit_email_reprocessing(db, firestore_module, access_token, rcb_email, get
     Read last 30 days of emails, feed each through Pupil + Tracker in silent mode.
     Does NOT send replies — is_direct=False for tracker, pupil never replies in Phase A.
     """
-    import requests
+    from lib.graph_client import graph_request
 
     stats = {
         "total_emails": 0,
@@ -199,7 +199,7 @@ def _audit_email_reprocessing(db, firestore_module, access_token, rcb_email, get
     }
 
     try:
-        resp = requests.get(url, headers={'Authorization': f'Bearer {access_token}'}, params=params, timeout=30)
+        resp = graph_request('GET', url, access_token, params=params)
         if resp.status_code != 200:
             stats["error"] = f"graph_api_{resp.status_code}"
             return stats
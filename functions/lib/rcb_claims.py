@@ -0,0 +1,369 @@
+"""
+RCB processed-message claims
+============================
+rcb_check_email claims each inbox message by atomically creating
+rcb_processed/<md5(msg_id)>; whoever creates the doc owns the message.
+
+ClaimManager reads every candidate claim doc in one get_all() before the
+message loop, so already-handled messages are skipped in memory and
+.create() is only attempted for ids that did not exist at prefetch time.
+The create stays the source of truth: a concurrent run that claims the
+same id in between is counted as "contended" and skipped.
+
+Leases: every claim carries lease_owner / lease_expires_at / attempts.
+While a run works on its messages a heartbeat thread keeps extending the
+leases; release() marks a message done. If a run dies mid-message (crash,
+540s timeout) its lease expires and a later run takes the message over —
+found either in its own inbox listing (prefetch) or via recover_expired(),
+since a delta sync does not return an unchanged message again. Takeover is
+a compare-and-set on the doc's update_time and gives up after
+MAX_ATTEMPTS. Claim docs without lease fields (older runs) are never
+taken over. As soon as a run's reply is accepted by Graph it writes reply_sent_at on
+the claim (mark_reply_sent); reply_sent() tells a run that takes the
+message over to skip it instead of replying twice.
+
+Retries: rcb_retry_failed cannot just delete a claim doc and wait for the
+inbox listing to return the message — the delta sync never will. It calls
+queue_retry(), which deletes the claim and leaves the msg id in
+rcb_retry_queue; the next run picks it up via take_retries() and
+re-fetches the message by id, like lease recovery. The queue doc stays
+until claim() has run for the id (or ack_retry() drops it), so a failed
+re-fetch is retried by the next run; an id taken MAX_ATTEMPTS times
+without being claimed is dropped.
+
+Usage:
+    claims = ClaimManager(db)
+    claims.prefetch([m["id"] for m in messages])
+    for msg in messages:
+        safe_id = claims.claim(msg["id"], "direct_pending")
+        if not safe_id:
+            continue
+        ...
+        claims.release(safe_id)
+    print(claims.stats())
+"""
+
+import hashlib
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+
+try:
+    from google.api_core.exceptions import AlreadyExists
+    from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+except ImportError:  # Firestore SDK not installed (local tooling)
+    class AlreadyExists(Exception):
+        pass
+    SERVER_TIMESTAMP = None
+
+PROCESSED_COLLECTION = "rcb_processed"
+RETRY_QUEUE_COLLECTION = "rcb_retry_queue"
+_GET_ALL_CHUNK = 300
+
+LEASE_SEC = 180           # claim lease; renewed by the heartbeat while work runs
+HEARTBEAT_SEC = 60
+MAX_ATTEMPTS = 3          # runs allowed per message before it is marked failed
+RECOVER_LIMIT = 20
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _lease_expired(data, now):
+    """True for an active lease whose expiry has passed."""
+    expires = (data or {}).get("lease_expires_at")
+    return (data or {}).get("lease_state") == "active" and expires is not None and expires < now
+
+
+def claim_doc_id(msg_id):
+    """rcb_processed doc id for a Graph message id."""
+    return hashlib.md5(msg_id.encode()).hexdigest()
+
+
+def queue_retry(db, msg_id, collection=PROCESSED_COLLECTION):
+    """Drop msg_id's claim doc and queue the id for the next rcb_check_email run."""
+    doc_id = claim_doc_id(msg_id)
+    db.collection(RETRY_QUEUE_COLLECTION).document(doc_id).set({
+        "msg_id": msg_id,
+        "queued_at": SERVER_TIMESTAMP or _now(),
+    })
+    db.collection(collection).document(doc_id).delete()
+    return doc_id
+
+
+class ClaimManager:
+    """Bulk pre-check + atomic claim of rcb_processed docs for one run."""
+
+    def __init__(self, db, locked_by="rcb_check_email", collection=PROCESSED_COLLECTION,
+                 lease_sec=LEASE_SEC, max_attempts=MAX_ATTEMPTS):
+        self.db = db
+        self.locked_by = locked_by
+        self.collection = collection
+        self.lease_sec = lease_sec
+        self.max_attempts = max_attempts
+        self.owner = f"{locked_by}:{uuid.uuid4().hex[:12]}"
+        self._known = set()        # doc ids that already exist (or that we claimed)
+        self._prefetched = set()   # doc ids covered by prefetch()
+        self._expired = {}         # doc id -> snapshot of an expired lease (takeover candidate)
+        self._active = set()       # doc ids leased by this run, not yet released
+        self._replied = set()      # taken-over doc ids whose reply already went out
+        self._queued = set()       # doc ids handed out by take_retries(), not yet acked
+        self._lock = threading.Lock()
+        self._heartbeat_stop = None
+        self._heartbeat_thread = None
+        self._stats = {"prefetched": 0, "known": 0, "claimed": 0,
+                       "skipped": 0, "contended": 0, "prefetch_errors": 0,
+                       "recovered": 0, "retries": 0, "taken_over": 0, "failed": 0,
+                       "replies_sent": 0, "released": 0, "heartbeats": 0}
+
+    def _stat(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _ref(self, doc_id):
+        return self.db.collection(self.collection).document(doc_id)
+
+    def _lease_fields(self):
+        return {
+            "lease_owner": self.owner,
+            "lease_state": "active",
+            "lease_expires_at": _now() + timedelta(seconds=self.lease_sec),
+        }
+
+    def prefetch(self, msg_ids):
+        """Read all claim docs for msg_ids in chunked get_all() calls.
+
+        Returns the number of ids already claimed. On error the affected ids
+        are simply not marked known — claim() still guards with .create().
+        """
+        doc_ids = []
+        for msg_id in msg_ids:
+            if not msg_id:
+                continue
+            doc_id = claim_doc_id(msg_id)
+            if doc_id not in self._prefetched:
+                self._prefetched.add(doc_id)
+                doc_ids.append(doc_id)
+
+        known = 0
+        now = _now()
+        for i in range(0, len(doc_ids), _GET_ALL_CHUNK):
+            chunk = doc_ids[i:i + _GET_ALL_CHUNK]
+            try:
+                refs = [self._ref(d) for d in chunk]
+                for snap in self.db.get_all(refs):
+                    if not snap.exists:
+                        continue
+                    if _lease_expired(snap.to_dict(), now):
+                        self._expired[snap.id] = snap
+                    else:
+                        self._known.add(snap.id)
+                        known += 1
+            except Exception as e:
+                self._stat("prefetch_errors")
+                print(f"  ⚠️ rcb_processed get_all error (falling back to create): {e}")
+
+        self._stat("prefetched", len(doc_ids))
+        self._stat("known", known)
+        return known
+
+    def recover_expired(self, limit=RECOVER_LIMIT):
+        """Msg ids of claims whose lease expired (their run died) — to retry this run."""
+        msg_ids = []
+        now = _now()
+        try:
+            docs = (self.db.collection(self.collection)
+                    .where("lease_expires_at", "<", now)
+                    .limit(limit)
+                    .stream())
+            for snap in docs:
+                data = snap.to_dict() or {}
+                if _lease_expired(data, now) and data.get("msg_id"):
+                    self._expired[snap.id] = snap
+                    self._known.discard(snap.id)
+                    msg_ids.append(data["msg_id"])
+        except Exception as e:
+            print(f"  ⚠️ rcb_processed lease recovery error: {e}")
+        self._stat("recovered", len(msg_ids))
+        return msg_ids
+
+    def take_retries(self, limit=RECOVER_LIMIT):
+        """Msg ids queued by queue_retry() — to process this run.
+
+        The queue docs stay until claim() or ack_retry() handles the id, so a
+        message whose re-fetch fails is picked up again by the next run.
+        """
+        msg_ids = []
+        queue = self.db.collection(RETRY_QUEUE_COLLECTION)
+        try:
+            for snap in queue.limit(limit).stream():
+                data = snap.to_dict() or {}
+                msg_id = data.get("msg_id")
+                with self._lock:
+                    if snap.id in self._queued:
+                        continue
+                takes = int(data.get("takes") or 0)
+                if not msg_id or takes >= self.max_attempts:
+                    print(f"  RC-001: dropping retry {snap.id} after {takes} unclaimed takes")
+                    queue.document(snap.id).delete()
+                    continue
+                queue.document(snap.id).update({"takes": takes + 1})
+                with self._lock:
+                    self._queued.add(snap.id)
+                msg_ids.append(msg_id)
+        except Exception as e:
+            print(f"  ⚠️ rcb_retry_queue read error: {e}")
+        self._stat("retries", len(msg_ids))
+        return msg_ids
+
+    def ack_retry(self, msg_id):
+        """Drop msg_id's rcb_retry_queue doc once this run has handled it. No-op if not queued."""
+        if not msg_id:
+            return
+        doc_id = claim_doc_id(msg_id)
+        with self._lock:
+            if doc_id not in self._queued:
+                return
+            self._queued.discard(doc_id)
+        try:
+            self.db.collection(RETRY_QUEUE_COLLECTION).document(doc_id).delete()
+        except Exception as e:
+            print(f"  ⚠️ rcb_retry_queue ack error for {doc_id}: {e}")
+
+    def is_claimed(self, msg_id):
+        """True if the message was already claimed at prefetch time or by this run."""
+        return claim_doc_id(msg_id) in self._known
+
+    def claim(self, msg_id, claim_type):
+        """Atomically claim (or take over) msg_id. Returns the doc id, or None if taken.
+
+        Either way the id is settled, so a queued retry for it is acked.
+        """
+        doc_id = self._claim(msg_id, claim_type)
+        self.ack_retry(msg_id)
+        return doc_id
+
+    def _claim(self, msg_id, claim_type):
+        doc_id = claim_doc_id(msg_id)
+        if doc_id in self._expired:
+            return self._take_over(doc_id, claim_type)
+        if doc_id in self._known:
+            self._stat("skipped")
+            return None
+        try:
+            self._ref(doc_id).create({
+                "processed_at": SERVER_TIMESTAMP or _now(),
+                "locked_by": self.locked_by,
+                "type": claim_type,
+                "msg_id": msg_id,
+                "attempts": 1,
+                **self._lease_fields(),
+            })
+        except AlreadyExists:
+            self._known.add(doc_id)
+            self._stat("contended")
+            return None
+        self._known.add(doc_id)
+        with self._lock:
+            self._active.add(doc_id)
+        self._stat("claimed")
+        return doc_id
+
+    def _take_over(self, doc_id, claim_type):
+        """Re-lease an expired claim, conditional on nobody touching it since we read it."""
+        snap = self._expired.pop(doc_id)
+        self._known.add(doc_id)
+        attempts = int((snap.to_dict() or {}).get("attempts") or 1)
+        ref = self._ref(doc_id)
+        if attempts >= self.max_attempts:
+            try:
+                ref.update({"lease_state": "failed", "lease_expires_at": None},
+                           option=self.db.write_option(last_update_time=snap.update_time))
+                print(f"  RC-001: {doc_id} failed {attempts} times, giving up")
+                self._stat("failed")
+            except Exception:
+                self._stat("contended")
+            return None
+        try:
+            ref.update({"type": claim_type, "attempts": attempts + 1, **self._lease_fields()},
+                       option=self.db.write_option(last_update_time=snap.update_time))
+        except Exception:
+            self._stat("contended")
+            return None
+        with self._lock:
+            self._active.add(doc_id)
+            if (snap.to_dict() or {}).get("reply_sent_at"):
+                self._replied.add(doc_id)
+        self._stat("taken_over")
+        print(f"  RC-001: {doc_id} lease expired — taking over (attempt {attempts + 1})")
+        return doc_id
+
+    def mark_reply_sent(self, doc_id):
+        """Checkpoint: the reply for this message went out — a takeover must not resend it."""
+        try:
+            self._ref(doc_id).update({"reply_sent_at": _now()})
+            self._stat("replies_sent")
+        except Exception as e:
+            print(f"  ⚠️ rcb_processed reply checkpoint error for {doc_id}: {e}")
+
+    def reply_sent(self, doc_id):
+        """True if this run took over doc_id after its reply had already been sent."""
+        with self._lock:
+            return doc_id in self._replied
+
+    def release(self, doc_id):
+        """Mark a leased message done so it is never taken over."""
+        with self._lock:
+            if doc_id not in self._active:
+                return
+            self._active.discard(doc_id)
+        try:
+            self._ref(doc_id).update({"lease_state": "done", "lease_expires_at": None})
+            self._stat("released")
+        except Exception as e:
+            print(f"  ⚠️ rcb_processed release error for {doc_id}: {e}")
+
+    def renew(self):
+        """Extend the leases of all in-flight messages (one heartbeat)."""
+        with self._lock:
+            active = list(self._active)
+        if not active:
+            return 0
+        expires = _now() + timedelta(seconds=self.lease_sec)
+        for doc_id in active:
+            try:
+                self._ref(doc_id).update({"lease_expires_at": expires})
+            except Exception as e:
+                print(f"  ⚠️ rcb_processed heartbeat error for {doc_id}: {e}")
+        self._stat("heartbeats")
+        return len(active)
+
+    def start_heartbeat(self, interval=HEARTBEAT_SEC):
+        """Renew active leases every `interval` seconds on a daemon thread."""
+        if self._heartbeat_thread is not None:
+            return
+        stop = threading.Event()
+
+        def _beat():
+            while not stop.wait(interval):
+                self.renew()
+
+        self._heartbeat_stop = stop
+        self._heartbeat_thread = threading.Thread(target=_beat, name="rcb-claims-heartbeat", daemon=True)
+        self._heartbeat_thread.start()
+
+    def stop_heartbeat(self):
+        if self._heartbeat_thread is None:
+            return
+        self._heartbeat_stop.set()
+        self._heartbeat_thread.join(timeout=5)
+        self._heartbeat_thread = None
+        self._heartbeat_stop = None
+
+    def stats(self):
+        """Counters for logging: claimed / skipped / contended / lease activity."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = len(self._active)
+        return stats
@@ -1,13 +1,44 @@
 """RCB Helper functions - Graph API, PDF extraction, Hebrew names
 UPDATED Session 17 Phase 0: Improved document extraction
 """
-import requests
 import base64
+import contextvars
+import csv
 import io
+import itertools
 import re
 import hashlib
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta, timezone
 
+try:
+    from lib.graph_client import graph_request, get_graph_token
+    from lib.graph_batch import ATTACHMENT_META_SELECT, active_graph_batch
+except ImportError:
+    from graph_client import graph_request, get_graph_token
+    from graph_batch import ATTACHMENT_META_SELECT, active_graph_batch
+
+try:
+    from lib.extraction_cache import get_cached_extraction, put_cached_extraction
+    from lib.extraction_engine import backends_for, detect_doc_class, extract_document
+    from lib.text_postprocess import (
+        cleanup_hebrew_text as _cleanup_hebrew_text,
+        extract_urls_from_text as _extract_urls_from_text,
+    )
+except ImportError:
+    from extraction_cache import get_cached_extraction, put_cached_extraction
+    from extraction_engine import backends_for, detect_doc_class, extract_document
+    from text_postprocess import (
+        cleanup_hebrew_text as _cleanup_hebrew_text,
+        extract_urls_from_text as _extract_urls_from_text,
+    )
+
+# Bump when extract_text_from_attachments output changes (invalidates extraction_cache)
+_ATTACHMENT_EXTRACTOR_VERSION = 1
+_NO_TEXT_PLACEHOLDER = "[No text could be extracted]"
+
 # ============================================================
 # PDF TEXT EXTRACTION (with OCR fallback)
 # Phase 0: Improved extraction quality, table handling, OCR
@@ -43,81 +74,26 @@ def _assess_extraction_quality(text):
     return True, "ok"
 
 
-def _cleanup_hebrew_text(text):
-    """Fix common Hebrew/RTL extraction issues"""
-    if not text:
-        return text
-
-    # Normalize whitespace
-    text = re.sub(r' {3,}', '  ', text)  # Multiple spaces to double
-    text = re.sub(r'\n{4,}', '\n\n\n', text)  # Multiple newlines to max 3
-
-    # Fix common OCR mistakes in Hebrew customs context
-    replacements = {
-        'חשבוו': 'חשבון',
-        'מע"ט': 'מע"מ',
-        'עמיל מכם': 'עמיל מכס',
-        'מתווך מכס': 'עמיל מכס',
-        'מתווכי מכס': 'עמילי מכס',
-    }
-    for wrong, right in replacements.items():
-        text = text.replace(wrong, right)
-
-    return text
-
-
-def _tag_document_structure(text):
-    """Tag document sections to help AI classification agent"""
-    tags = []
-
-    # Detect invoice number
-    inv_match = re.search(r'(?:invoice|inv|חשבונית|חשבון)[\s#:]*(\S+)', text, re.IGNORECASE)
-    if inv_match:
-        tags.append(f"[INVOICE_NUMBER: {inv_match.group(1)}]")
-
-    # Detect dates
-    dates = re.findall(r'\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}', text)
-    if dates:
-        tags.append(f"[DATES_FOUND: {', '.join(dates[:5])}]")
-
-    # Detect currency and amounts
-    amounts = re.findall(r'(?:USD|EUR|ILS|NIS|\$|€|₪)\s*[\d,.]+', text, re.IGNORECASE)
-    if not amounts:
-        amounts = re.findall(r'[\d,.]+\s*(?:USD|EUR|ILS|NIS|\$|€|₪)', text, re.IGNORECASE)
-    if amounts:
-        tags.append(f"[AMOUNTS: {', '.join(amounts[:10])}]")
+def _assess_page_quality(text, doc_ok):
+    """Per-page check for extract_pdf_pages.
 
-    # Detect HS code patterns (XX.XX or XXXX.XX.XXXX)
-    hs_codes = re.findall(r'\b\d{4}[.\s]\d{2}(?:[.\s]\d{2,6})?\b', text)
-    if hs_codes:
-        tags.append(f"[HS_CODE_CANDIDATES: {', '.join(set(hs_codes[:10]))}]")
-
-    # Detect BL/AWB numbers
-    bl_match = re.search(r'(?:B/?L|bill\s*of\s*lading|שטר\s*מטען)[\s#:]*(\S+)', text, re.IGNORECASE)
-    if bl_match:
-        tags.append(f"[BL_NUMBER: {bl_match.group(1)}]")
-
-    awb_match = re.search(r'(?:AWB|air\s*waybill)[\s#:]*(\S+)', text, re.IGNORECASE)
-    if awb_match:
-        tags.append(f"[AWB_NUMBER: {awb_match.group(1)}]")
-
-    # Detect country names
-    countries = re.findall(r'(?:China|India|Turkey|Germany|USA|Italy|Japan|Korea|Vietnam|Thailand|'
-                           r'סין|הודו|טורקיה|גרמניה|ארה"ב|איטליה|יפן|קוריאה|וייטנאם|תאילנד)',
-                           text, re.IGNORECASE)
-    if countries:
-        tags.append(f"[COUNTRIES: {', '.join(set(countries[:5]))}]")
-
-    # Detect shipping terms
-    incoterms = re.findall(r'\b(?:FOB|CIF|CFR|EXW|DDP|DAP|FCA|CPT|CIP|DAT)\b', text, re.IGNORECASE)
-    if incoterms:
-        tags.append(f"[INCOTERMS: {', '.join(set(incoterms))}]")
-
-    if tags:
-        header = "\n".join(tags)
-        return f"[DOCUMENT_ANALYSIS]\n{header}\n[/DOCUMENT_ANALYSIS]\n\n{text}"
-
-    return text
+    A readable document has short pages (cover, signature, terms) that would
+    fail _assess_extraction_quality's length rule on their own; those pass when
+    the document as a whole does. Pages with no text layer, garbage text, or
+    short text in a document that fails as a whole still fall back.
+    """
+    stripped = (text or "").strip()
+    if not stripped:
+        return False, "no_text_layer"
+    is_good, reason = _assess_extraction_quality(stripped)
+    if reason != "too_short":
+        return is_good, reason
+    if not doc_ok:
+        return False, reason
+    meaningful = sum(1 for c in stripped if c.isalnum())
+    if meaningful / len(stripped) < 0.3:
+        return False, "garbage_chars"
+    return True, "short"
 
 
 def _preprocess_image_for_ocr(img_bytes):
@@ -147,181 +123,304 @@ def _preprocess_image_for_ocr(img_bytes):
         return img_bytes  # Return original if preprocessing fails
 
 
-def extract_text_from_pdf_bytes(pdf_bytes):
-    """Extract text from PDF bytes - tries multiple methods
-    Phase 0: Improved quality assessment, combined extraction, better OCR"""
-
-    # Method 1: pdfplumber (fast, for text-based PDFs)
-    text = _extract_with_pdfplumber(pdf_bytes)
-    is_good, reason = _assess_extraction_quality(text)
-    if is_good:
-        print(f"    ✅ pdfplumber extracted {len(text)} chars (quality: {reason})")
-        return text
-    elif text:
-        print(f"    ⚠️ pdfplumber: {len(text)} chars but quality: {reason}")
-
-    # Method 2: pypdf (sometimes works better)
-    text = _extract_with_pypdf(pdf_bytes)
-    is_good, reason = _assess_extraction_quality(text)
-    if is_good:
-        print(f"    ✅ pypdf extracted {len(text)} chars (quality: {reason})")
-        return text
-
-    # Method 3: COMBINED - try pdfplumber + pypdf merged
-    combined = _extract_with_pdfplumber(pdf_bytes) + "\n" + _extract_with_pypdf(pdf_bytes)
-    is_good, reason = _assess_extraction_quality(combined)
-    if is_good:
-        print(f"    ✅ Combined extraction: {len(combined)} chars")
-        return combined
-
-    # Method 4: Vision OCR (preprocessed, 300 DPI)
-    print(f"    🔍 All text methods failed, trying OCR...")
-    text = _extract_with_vision_ocr(pdf_bytes)
+_OCR_MAX_PAGES = 10  # Max pages rendered for OCR per PDF
+_OCR_WORKERS = 4  # Concurrent Vision OCR calls per PDF
+_OCR_MAX_IN_FLIGHT = 4  # Max rendered 300 DPI pages held in memory at once
+
+
+def extract_text_from_pdf_bytes(pdf_bytes, details=None):
+    """Extract text from PDF bytes - per-page, multiple methods
+    Phase 0: Improved quality assessment, combined extraction, better OCR
+
+    details: optional dict, updated with extract_pdf_pages' pages/degraded info."""
+    result = extract_pdf_pages(pdf_bytes)
+    if details is not None:
+        details.update(pages=result["pages"], degraded=result["degraded"])
+    return result["text"]
+
+
+def extract_pdf_pages(pdf_bytes):
+    """Per-page PDF extraction: each backend opens the PDF at most once.
+
+    1. pdfplumber for every page (text + tables)
+    2. pypdf only if some page failed _assess_page_quality
+       (page passes on pypdf text, or pdfplumber + pypdf combined)
+    3. Vision OCR only for the pages that still fail
+
+    Returns {"text", "pages": [{page, method, quality, chars}], "timings_ms",
+    "degraded"}; degraded is True when a page kept its low-quality fallback
+    text because OCR errored or was unavailable for it (not when OCR ran and
+    found nothing, e.g. a blank page).
+    """
+    timings = {}
+
+    t0 = time.time()
+    plumber = _pdfplumber_pages(pdf_bytes)
+    timings["pdfplumber"] = int((time.time() - t0) * 1000)
+
+    pages = {}      # page index -> (text, method, quality)
+    failed = []
+    doc_ok = _assess_extraction_quality("\n".join(plumber or []))[0]
+    for i, page_text in enumerate(plumber or []):
+        is_good, reason = _assess_page_quality(page_text, doc_ok)
+        if is_good:
+            pages[i] = (page_text, "pdfplumber", reason)
+        else:
+            failed.append(i)
+
+    pypdf = None
+    if failed or plumber is None:
+        t0 = time.time()
+        pypdf = _pypdf_pages(pdf_bytes)
+        timings["pypdf"] = int((time.time() - t0) * 1000)
+        if plumber is None:
+            failed = list(range(len(pypdf or [])))
+        for i in range(len(plumber or []), len(pypdf or [])):
+            if i not in failed:
+                failed.append(i)
+        doc_ok = doc_ok or _assess_extraction_quality("\n".join(pypdf or []))[0]
+
+    still_failed = []
+    for i in failed:
+        p_text = plumber[i] if plumber and i < len(plumber) else ""
+        y_text = pypdf[i] if pypdf and i < len(pypdf) else ""
+        is_good, reason = _assess_page_quality(y_text, doc_ok)
+        if is_good:
+            pages[i] = (y_text, "pypdf", reason)
+            continue
+        combined = (p_text + "\n" + y_text).strip()
+        is_good, reason = _assess_page_quality(combined, doc_ok)
+        if is_good:
+            pages[i] = (combined, "combined", reason)
+            continue
+        # Keep the best text we have in case OCR yields nothing
+        pages[i] = (max(p_text, y_text, key=len), "text", reason)
+        still_failed.append(i)
+
+    # No page structure from either backend — let OCR decide the page count
+    ocr_targets = still_failed if (plumber is not None or pypdf is not None) else None
+    if ocr_targets is None or ocr_targets:
+        print(f"    🔍 {len(ocr_targets) if ocr_targets is not None else 'all'} page(s) failed text extraction, trying OCR...")
+        t0 = time.time()
+        ocr = _vision_ocr_pages(pdf_bytes, ocr_targets)
+        timings["ocr"] = int((time.time() - t0) * 1000)
+        for i, ocr_text in ocr.items():
+            if ocr_text and ocr_text.strip():
+                pages[i] = (f"--- Page {i+1} ---\n{ocr_text}", "ocr", "ocr")
+        degraded = (not ocr) if ocr_targets is None else any(i not in ocr for i in ocr_targets)
+    else:
+        degraded = False
+
+    page_info = []
+    parts = []
+    for i in sorted(pages):
+        text, method, quality = pages[i]
+        page_info.append({"page": i + 1, "method": method, "quality": quality, "chars": len(text)})
+        if text:
+            parts.append(text)
+    text = _cleanup_hebrew_text("\n".join(parts))
+
+    methods = {}
+    for info in page_info:
+        methods[info["method"]] = methods.get(info["method"], 0) + 1
     if text:
-        print(f"    ✅ OCR extracted {len(text)} chars")
+        print(f"    ✅ PDF extracted {len(text)} chars from {len(page_info)} page(s) "
+              f"{methods} | {timings} ms")
     else:
         print(f"    ⚠️ All extraction methods failed")
-    return text or ""
+    return {"text": text or "", "pages": page_info, "timings_ms": timings, "degraded": degraded}
+
+
+def _pdfplumber_page_text(page, page_num):
+    """Text of one pdfplumber page with improved table handling"""
+    text_parts = []
+    # Extract regular text
+    page_text = page.extract_text()
+    if page_text:
+        text_parts.append(page_text)
+
+    # Extract tables with better settings
+    tables = page.extract_tables({
+        "vertical_strategy": "lines",
+        "horizontal_strategy": "lines",
+        "snap_tolerance": 5,
+        "join_tolerance": 5,
+        "edge_min_length": 10,
+        "min_words_vertical": 1,
+        "min_words_horizontal": 1,
+    })
+
+    for table_idx, table in enumerate(tables):
+        if not table:
+            continue
+
+        # Format table with structure preserved
+        table_text = f"\n[TABLE {table_idx + 1} on page {page_num + 1}]\n"
+        for row in table:
+            if row:
+                cells = [str(cell).strip() if cell else "" for cell in row]
+                # Skip completely empty rows
+                if any(cells):
+                    table_text += " | ".join(cells) + "\n"
+        table_text += f"[/TABLE]\n"
+        text_parts.append(table_text)
 
+    return _cleanup_hebrew_text("\n".join(text_parts))
 
-def _extract_with_pdfplumber(pdf_bytes):
-    """Extract text using pdfplumber with improved table handling"""
+
+def _pdfplumber_pages(pdf_bytes):
+    """Per-page text using pdfplumber (one open). None if the PDF can't be parsed."""
     try:
         import pdfplumber
-        text_parts = []
-
         with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                # Extract regular text
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
-
-                # Extract tables with better settings
-                tables = page.extract_tables({
-                    "vertical_strategy": "lines",
-                    "horizontal_strategy": "lines",
-                    "snap_tolerance": 5,
-                    "join_tolerance": 5,
-                    "edge_min_length": 10,
-                    "min_words_vertical": 1,
-                    "min_words_horizontal": 1,
-                })
-
-                for table_idx, table in enumerate(tables):
-                    if not table:
-                        continue
-
-                    # Format table with structure preserved
-                    table_text = f"\n[TABLE {table_idx + 1} on page {page_num + 1}]\n"
-                    for row in table:
-                        if row:
-                            cells = [str(cell).strip() if cell else "" for cell in row]
-                            # Skip completely empty rows
-                            if any(cells):
-                                table_text += " | ".join(cells) + "\n"
-                    table_text += f"[/TABLE]\n"
-                    text_parts.append(table_text)
-
-        return _cleanup_hebrew_text("\n".join(text_parts))
+            return [_pdfplumber_page_text(page, page_num) for page_num, page in enumerate(pdf.pages)]
     except Exception as e:
         print(f"    pdfplumber error: {e}")
-        return ""
+        return None
 
 
-def _extract_with_pypdf(pdf_bytes):
-    """Extract text using pypdf"""
+def _pypdf_pages(pdf_bytes):
+    """Per-page text using pypdf (one open). None if the PDF can't be parsed."""
     try:
         from pypdf import PdfReader
         reader = PdfReader(io.BytesIO(pdf_bytes))
-        text_parts = []
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-        return _cleanup_hebrew_text("\n".join(text_parts))
+        return [_cleanup_hebrew_text(page.extract_text() or "") for page in reader.pages]
     except Exception as e:
         print(f"    pypdf error: {e}")
-        return ""
+        return None
 
 
-def _extract_with_vision_ocr(pdf_bytes):
-    """Extract text using Google Cloud Vision OCR
-    Phase 0: Added image preprocessing before OCR"""
-    try:
-        from google.cloud import vision
+def _vision_ocr_fn():
+    """OCR callable (png bytes -> text) backed by one shared Cloud Vision client."""
+    from google.cloud import vision
+    client = vision.ImageAnnotatorClient()
 
-        # Convert PDF pages to images first
-        images = _pdf_to_images(pdf_bytes)
-        if not images:
-            print(f"    ⚠️ Could not convert PDF to images")
-            return ""
+    def _ocr(img_bytes):
+        response = client.text_detection(image=vision.Image(content=img_bytes))
+        if response.error.message:
+            raise RuntimeError(f"Vision API error: {response.error.message}")
+        if response.text_annotations:
+            return response.text_annotations[0].description
+        return ""
+    return _ocr
 
-        client = vision.ImageAnnotatorClient()
-        all_text = []
 
-        for i, img_bytes in enumerate(images):
-            # Phase 0: Preprocess image before OCR
-            img_bytes = _preprocess_image_for_ocr(img_bytes)
-            image = vision.Image(content=img_bytes)
-            response = client.text_detection(image=image)
+def _ocr_page_stream(page_images, ocr_fn, workers=_OCR_WORKERS, max_in_flight=_OCR_MAX_IN_FLIGHT):
+    """Preprocess + OCR pages from a render generator on a bounded pool.
 
-            if response.text_annotations:
-                page_text = response.text_annotations[0].description
-                all_text.append(f"--- Page {i+1} ---\n{page_text}")
-                print(f"    📄 Page {i+1}: {len(page_text)} chars")
+    page_images yields (page index, png bytes). The next page is only
+    rendered once fewer than max_in_flight pages are being OCR'd, so at most
+    max_in_flight rendered pages are held in memory at once.
+    Returns {page index: text} for every page OCR completed ("" when it found
+    no text); pages whose OCR call raised are left out.
+    """
+    def _one(i, img_bytes):
+        return i, ocr_fn(_preprocess_image_for_ocr(img_bytes))
+
+    result = {}
 
-            if response.error.message:
-                print(f"    Vision API error: {response.error.message}")
+    def _collect(done):
+        for fut in done:
+            try:
+                i, page_text = fut.result()
+            except Exception as e:
+                print(f"    Vision OCR page error: {e}")
+                continue
+            result[i] = _cleanup_hebrew_text(page_text or "")
+            if page_text:
+                print(f"    📄 Page {i+1}: {len(page_text)} chars")
 
-        return _cleanup_hebrew_text("\n\n".join(all_text))
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="rcb-ocr")
+    in_flight = set()
+    try:
+        for i, img_bytes in page_images:
+            in_flight.add(pool.submit(_one, i, img_bytes))
+            del img_bytes
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                _collect(done)
+        done, _ = wait(in_flight)
+        _collect(done)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return result
+
+
+def _vision_ocr_pages(pdf_bytes, page_indexes=None, ocr_fn=None):
+    """OCR selected pages (0-based; None = first pages) with Google Cloud Vision.
+    Phase 0: Added image preprocessing before OCR
+    Pages stream render -> preprocess -> OCR (see _ocr_page_stream).
+    ocr_fn (png bytes -> text) replaces Cloud Vision, e.g. a local OCR offline.
+    Returns {page index: text} for the pages OCR completed; {} when OCR is
+    unavailable."""
+    try:
+        if ocr_fn is None:
+            ocr_fn = _vision_ocr_fn()
+        result = _ocr_page_stream(_iter_pdf_page_images(pdf_bytes, page_indexes), ocr_fn)
+        if not any(result.values()):
+            print(f"    ⚠️ OCR produced no text")
+        return result
     except ImportError:
         print(f"    ⚠️ google-cloud-vision not installed")
-        return ""
+        return {}
     except Exception as e:
         print(f"    Vision OCR error: {e}")
-        return ""
+        return {}
+
 
+def _pdf_to_images(pdf_bytes, page_indexes=None):
+    """Convert PDF pages to images for OCR -> [(page index, png bytes)]
+    Holds every page in memory; OCR uses _iter_pdf_page_images instead."""
+    return list(_iter_pdf_page_images(pdf_bytes, page_indexes))
 
-def _pdf_to_images(pdf_bytes):
-    """Convert PDF pages to images for OCR
+
+def _iter_pdf_page_images(pdf_bytes, page_indexes=None):
+    """Render PDF pages one at a time -> yields (page index, png bytes)
     Phase 0: Raised DPI from 150 to 300"""
     try:
         import fitz  # PyMuPDF
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-        images = []
-
-        for page_num in range(min(len(doc), 10)):  # Max 10 pages
-            page = doc[page_num]
-            # Phase 0: Render at 300 DPI (was 150) for better OCR accuracy
-            pix = page.get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
-            img_bytes = pix.tobytes("png")
-            images.append(img_bytes)
-
-        doc.close()
-        return images
     except ImportError:
         print(f"    ⚠️ PyMuPDF not installed, trying pdf2image...")
-        return _pdf_to_images_fallback(pdf_bytes)
+        yield from _iter_pdf_page_images_fallback(pdf_bytes, page_indexes)
+        return
+    try:
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
     except Exception as e:
         print(f"    PDF to image error: {e}")
-        return []
+        return
+    try:
+        if page_indexes is None:
+            page_indexes = range(len(doc))
+        for page_num in [p for p in page_indexes if p < len(doc)][:_OCR_MAX_PAGES]:
+            try:
+                # Phase 0: Render at 300 DPI (was 150) for better OCR accuracy
+                pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(300/72, 300/72))
+                img_bytes = pix.tobytes("png")
+                del pix
+            except Exception as e:
+                print(f"    PDF to image error on page {page_num + 1}: {e}")
+                continue
+            yield page_num, img_bytes
+    finally:
+        doc.close()
 
 
-def _pdf_to_images_fallback(pdf_bytes):
-    """Fallback: Convert PDF to images using pdf2image"""
+def _iter_pdf_page_images_fallback(pdf_bytes, page_indexes=None):
+    """Fallback: render PDF pages one at a time using pdf2image"""
     try:
         from pdf2image import convert_from_bytes
-        images = convert_from_bytes(pdf_bytes, dpi=300, first_page=1, last_page=10)
-        result = []
-        for img in images:
+        if page_indexes is None:
+            page_indexes = range(_OCR_MAX_PAGES)
+        for p in list(page_indexes)[:_OCR_MAX_PAGES]:
+            images = convert_from_bytes(pdf_bytes, dpi=300, first_page=p + 1, last_page=p + 1)
+            if not images:
+                break  # past the last page
             buf = io.BytesIO()
-            img.save(buf, format='PNG')
-            result.append(buf.getvalue())
-        return result
+            images[0].save(buf, format='PNG')
+            del images
+            yield p, buf.getvalue()
     except Exception as e:
         print(f"    pdf2image error: {e}")
-        return []
 
 
 def _try_decode(raw_bytes):
@@ -453,21 +552,82 @@ def _extract_from_msg(file_bytes):
         return ""
 
 
-def _extract_urls_from_text(text):
-    """Detect URLs in text and append them as tagged section"""
-    if not text:
-        return text
-    urls = re.findall(r'https?://[^\s<>"\')\]]+', text)
-    if urls:
-        unique_urls = list(dict.fromkeys(urls))  # Preserve order, remove dupes
-        url_section = "\n[URLS_FOUND]\n" + "\n".join(unique_urls[:20]) + "\n[/URLS_FOUND]"
-        return text + url_section
-    return text
+def _extract_from_image(file_bytes):
+    """OCR a single image (.jpg, .png, .gif, .bmp)"""
+    return _ocr_image(_preprocess_image_for_ocr(file_bytes))
+
+
+def _extract_from_tiff(file_bytes):
+    """OCR a multi-page TIFF, one page at a time"""
+    try:
+        from PIL import Image
+        img = Image.open(io.BytesIO(file_bytes))
+        tiff_parts = []
+        page = 0
+        while True:
+            try:
+                img.seek(page)
+            except EOFError:
+                break
+            buf = io.BytesIO()
+            img.save(buf, format='PNG')
+            page_bytes = _preprocess_image_for_ocr(buf.getvalue())
+            page_text = _ocr_image(page_bytes)
+            if page_text:
+                tiff_parts.append(f"--- Page {page + 1} ---\n{page_text}")
+            page += 1
+        return "\n\n".join(tiff_parts)
+    except Exception as e:
+        print(f"    TIFF extraction error: {e}")
+        return ""
+
+
+def _extract_from_csv(file_bytes, sep=','):
+    """Render CSV / TSV rows as a [TABLE CSV] block"""
+    try:
+        text = _try_decode(file_bytes)
+        table_parts = [f"[TABLE CSV]"]
+        # csv.reader keeps quoted cells ("6,800") whole
+        for cells in itertools.islice(csv.reader(io.StringIO(text.strip()), delimiter=sep), 500):  # Cap at 500 rows
+            if any(c.strip() for c in cells):
+                table_parts.append(" | ".join(c.strip() for c in cells))
+        table_parts.append("[/TABLE]")
+        return "\n".join(table_parts)
+    except Exception as e:
+        print(f"    CSV extraction error: {e}")
+        return ""
+
+
+def _extract_from_html(file_bytes):
+    """Strip scripts, styles and tags from an HTML file"""
+    try:
+        text = _try_decode(file_bytes)
+        text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.DOTALL | re.IGNORECASE)
+        text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
+        text = re.sub(r'<[^>]+>', ' ', text)
+        return re.sub(r'\s+', ' ', text).strip()
+    except Exception as e:
+        print(f"    HTML extraction error: {e}")
+        return ""
+
+
+_EXTRACTION_LOG = {
+    "pdf": "📄 Extracting text from",
+    "excel": "📊 Extracting text from",
+    "docx": "📝 Extracting text from",
+    "eml": "📧 Extracting text from",
+    "msg": "📧 Extracting text from",
+    "image": "🖼️ OCR on image",
+    "tiff": "🖼️ OCR on TIFF",
+    "csv": "📊 Extracting text from",
+    "html": "🌐 Extracting text from",
+}
 
 
 def extract_text_from_attachments(attachments_data, email_body=None):
     """Extract text from all attachments (PDF, Excel, Word, images, emails)
-    Phase 0: Added Hebrew cleanup, structure tagging, multi-format support"""
+    Phase 0: Added Hebrew cleanup, structure tagging, multi-format support
+    Each attachment goes through extraction_engine (backends per document class)"""
     all_text = []
 
     # Extract URLs from email body if provided
@@ -477,138 +637,38 @@ def extract_text_from_attachments(attachments_data, email_body=None):
 
     for att in attachments_data:
         name = att.get('name', 'file')
-        content_bytes = att.get('contentBytes', '')
 
-        if not content_bytes:
-            continue
-
-        # Decode base64
+        # Inline base64 contentBytes, or a streamed "content" file (helper_graph_fetch_attachments)
         try:
-            file_bytes = base64.b64decode(content_bytes)
+            file_bytes = attachment_bytes(att)
         except Exception:
             continue
+        if not file_bytes:
+            continue
 
-        name_lower = name.lower()
-
-        # PDF
-        if name_lower.endswith('.pdf'):
-            print(f"    📄 Extracting text from: {name}")
-            text = extract_text_from_pdf_bytes(file_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _tag_document_structure(text)
-                all_text.append(f"=== {name} ===\n{text}")
-            else:
-                all_text.append(f"=== {name} ===\n[No text could be extracted]")
-
-        # Excel
-        elif name_lower.endswith(('.xlsx', '.xls')):
-            print(f"    📊 Extracting text from: {name}")
-            text = _extract_from_excel(file_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _tag_document_structure(text)
-                all_text.append(f"=== {name} ===\n{text}")
-
-        # Word
-        elif name_lower.endswith('.docx'):
-            print(f"    📝 Extracting text from: {name}")
-            text = _extract_from_docx(file_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _tag_document_structure(text)
-                all_text.append(f"=== {name} ===\n{text}")
-
-        # Email files — .eml
-        elif name_lower.endswith('.eml'):
-            print(f"    📧 Extracting text from: {name}")
-            text = _extract_from_eml(file_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _extract_urls_from_text(text)
-                all_text.append(f"=== {name} ===\n{text}")
-
-        # Email files — Outlook .msg
-        elif name_lower.endswith('.msg'):
-            print(f"    📧 Extracting text from: {name}")
-            text = _extract_from_msg(file_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _extract_urls_from_text(text)
-                all_text.append(f"=== {name} ===\n{text}")
-
-        # Images — OCR
-        elif name_lower.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-            print(f"    🖼️ OCR on image: {name}")
-            img_bytes = _preprocess_image_for_ocr(file_bytes)
-            text = _ocr_image(img_bytes)
-            if text:
-                text = _cleanup_hebrew_text(text)
-                text = _tag_document_structure(text)
-                all_text.append(f"=== {name} ===\n{text}")
-
-        # TIFF — multi-page image, convert each page then OCR
-        elif name_lower.endswith(('.tiff', '.tif')):
-            print(f"    🖼️ OCR on TIFF: {name}")
-            try:
-                from PIL import Image
-                img = Image.open(io.BytesIO(file_bytes))
-                tiff_parts = []
-                page = 0
-                while True:
-                    try:
-                        img.seek(page)
-                    except EOFError:
-                        break
-                    buf = io.BytesIO()
-                    img.save(buf, format='PNG')
-                    page_bytes = _preprocess_image_for_ocr(buf.getvalue())
-                    page_text = _ocr_image(page_bytes)
-                    if page_text:
-                        tiff_parts.append(f"--- Page {page + 1} ---\n{page_text}")
-                    page += 1
-                if tiff_parts:
-                    text = _cleanup_hebrew_text("\n\n".join(tiff_parts))
-                    text = _tag_document_structure(text)
-                    all_text.append(f"=== {name} ===\n{text}")
-            except Exception as e:
-                print(f"    TIFF extraction error: {e}")
+        content_type = att.get('contentType') or ""
+        doc_class = detect_doc_class(name, content_type)
+        backends = backends_for(doc_class) if doc_class else []
+        if not backends:
+            continue
 
-        # CSV / TSV
-        elif name_lower.endswith(('.csv', '.tsv')):
-            print(f"    📊 Extracting text from: {name}")
-            try:
-                text = _try_decode(file_bytes)
-                sep = '\t' if name_lower.endswith('.tsv') else ','
-                lines = text.strip().split('\n')
-                table_parts = [f"[TABLE CSV]"]
-                for line in lines[:500]:  # Cap at 500 rows
-                    cells = line.strip().split(sep)
-                    if any(c.strip() for c in cells):
-                        table_parts.append(" | ".join(c.strip() for c in cells))
-                table_parts.append("[/TABLE]")
-                result_text = "\n".join(table_parts)
-                result_text = _cleanup_hebrew_text(result_text)
-                result_text = _tag_document_structure(result_text)
-                all_text.append(f"=== {name} ===\n{result_text}")
-            except Exception as e:
-                print(f"    CSV extraction error: {e}")
+        # Same bytes already extracted (reply-all thread, reprocess run)
+        route = f"rcb_helpers_{doc_class}_{'+'.join(backends)}"
+        cached = get_cached_extraction(file_bytes, route, _ATTACHMENT_EXTRACTOR_VERSION)
+        if cached is not None:
+            print(f"    ♻️ Cached extraction for: {name}")
+            all_text.append(f"=== {name} ===\n{cached['text']}")
+            continue
 
-        # HTML
-        elif name_lower.endswith(('.html', '.htm')):
-            print(f"    🌐 Extracting text from: {name}")
-            try:
-                text = _try_decode(file_bytes)
-                text = re.sub(r'<script[^>]*>.*?</script>', '', text, flags=re.DOTALL | re.IGNORECASE)
-                text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
-                text = re.sub(r'<[^>]+>', ' ', text)
-                text = re.sub(r'\s+', ' ', text).strip()
-                if text:
-                    text = _cleanup_hebrew_text(text)
-                    text = _tag_document_structure(text)
-                    all_text.append(f"=== {name} ===\n{text}")
-            except Exception as e:
-                print(f"    HTML extraction error: {e}")
+        print(f"    {_EXTRACTION_LOG.get(doc_class, '📄 Extracting text from')}: {name}")
+        extracted = extract_document(file_bytes, name, content_type, backends=backends)
+        text = extracted["text"]
+        if text:
+            all_text.append(f"=== {name} ===\n{text}")
+            put_cached_extraction(file_bytes, route, _ATTACHMENT_EXTRACTOR_VERSION,
+                                  {"text": text, "degraded": extracted["degraded"]}, filename=name)
+        elif doc_class == "pdf":
+            all_text.append(f"=== {name} ===\n{_NO_TEXT_PLACEHOLDER}")
 
     # Fix 6: Extraction summary logging
     print(f"  📊 Extraction summary: {len(all_text)} files, {sum(len(t) for t in all_text)} total chars")
@@ -657,18 +717,11 @@ def get_rcb_secrets_internal(get_secret_func):
         return None
 
 def helper_get_graph_token(secrets):
-    """Get Microsoft Graph API access token"""
+    """Get Microsoft Graph API access token (cached until shortly before expiry)"""
     try:
-        response = requests.post(
-            f"https://login.microsoftonline.com/{secrets.get('RCB_GRAPH_TENANT_ID')}/oauth2/v2.0/token",
-            data={
-                'client_id': secrets.get('RCB_GRAPH_CLIENT_ID'),
-                'client_secret': secrets.get('RCB_GRAPH_CLIENT_SECRET'),
-                'scope': 'https://graph.microsoft.com/.default',
-                'grant_type': 'client_credentials'
-            }
-        )
-        return response.json().get('access_token') if response.status_code == 200 else None
+        return get_graph_token(secrets.get('RCB_GRAPH_TENANT_ID'),
+                               secrets.get('RCB_GRAPH_CLIENT_ID'),
+                               secrets.get('RCB_GRAPH_CLIENT_SECRET'))
     except Exception as e:
         print(f"Token error: {e}")
         return None
@@ -680,30 +733,319 @@ def helper_graph_messages(access_token, user_email, unread_only=True, max_result
         params = {'$top': max_results, '$orderby': 'receivedDateTime desc'}
         if unread_only:
             params['$filter'] = 'isRead eq false'
-        response = requests.get(url, headers={'Authorization': f'Bearer {access_token}'}, params=params)
+        response = graph_request('GET', url, access_token, params=params)
         return response.json().get('value', []) if response.status_code == 200 else []
     except Exception as e:
         print(f"Graph messages error: {e}")
         return []
 
 def helper_graph_attachments(access_token, user_email, message_id):
-    """Get message attachments"""
+    """Get message attachments with inline contentBytes (one call per message).
+
+    The active Graph $batch session only carries metadata lists; a message
+    whose batched list is empty needs no download at all.
+    """
+    batch = active_graph_batch(access_token, user_email)
+    if batch is not None and batch.attachments(message_id) == []:
+        return []
     try:
         url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}/attachments"
-        response = requests.get(url, headers={'Authorization': f'Bearer {access_token}'})
+        response = graph_request('GET', url, access_token)
         return response.json().get('value', []) if response.status_code == 200 else []
     except Exception as e:
         print(f"Graph attachments error: {e}")
         return []
 
+# ── Lazy attachments: list metadata first, download only what gets extracted ──
+# helper_graph_attachments returns every attachment inline as base64
+# contentBytes; this path lists metadata, filters by type and size, and
+# streams only the chosen bodies via /$value (large ones spill to a temp file).
+# "Type" is the extraction engine's doc class (extension, else contentType),
+# so only attachments extract_text_from_attachments would extract are fetched.
+
+_ATTACHMENT_MAX_BYTES = 25 * 1024 * 1024    # skip larger attachments entirely
+_INLINE_IMAGE_MIN_BYTES = 20 * 1024         # smaller inline images are signature logos
+_ATTACHMENT_SPOOL_BYTES = 2 * 1024 * 1024   # downloads above this go to a temp file
+_DOWNLOAD_CHUNK = 64 * 1024
+
+
+def helper_graph_attachment_list(access_token, user_email, message_id):
+    """Attachment metadata only (id, name, contentType, size, isInline) — no contentBytes"""
+    batch = active_graph_batch(access_token, user_email)
+    if batch is not None:
+        batched = batch.attachments(message_id)
+        if batched is not None:
+            return batched
+    try:
+        url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}/attachments"
+        response = graph_request('GET', url, access_token, params={'$select': ATTACHMENT_META_SELECT})
+        return response.json().get('value', []) if response.status_code == 200 else []
+    except Exception as e:
+        print(f"Graph attachment list error: {e}")
+        return []
+
+
+def select_extractable_attachments(attachments, max_bytes=_ATTACHMENT_MAX_BYTES):
+    """File attachments worth downloading for text extraction -> (chosen, skipped)"""
+    chosen, skipped = [], []
+    for att in attachments:
+        size = att.get('size') or 0
+        doc_class = detect_doc_class(att.get('name') or '', att.get('contentType') or '')
+        if att.get('@odata.type', '#microsoft.graph.fileAttachment') != '#microsoft.graph.fileAttachment':
+            skipped.append(att)   # item / reference attachments have no $value
+        elif not doc_class or not backends_for(doc_class) or size > max_bytes:
+            skipped.append(att)
+        elif att.get('isInline') and doc_class in ('image', 'tiff') and size < _INLINE_IMAGE_MIN_BYTES:
+            skipped.append(att)
+        else:
+            chosen.append(att)
+    return chosen, skipped
+
+
+def helper_graph_attachment_content(access_token, user_email, message_id, attachment_id,
+                                    spool_bytes=None):
+    """Stream one attachment body via /$value into a file-like object (None on error).
+    Kept in memory up to spool_bytes (default _ATTACHMENT_SPOOL_BYTES), then spilled to a temp file."""
+    if spool_bytes is None:
+        spool_bytes = _ATTACHMENT_SPOOL_BYTES
+    try:
+        url = (f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}"
+               f"/attachments/{attachment_id}/$value")
+        response = graph_request('GET', url, access_token, stream=True)
+        try:
+            if response.status_code != 200:
+                print(f"Graph attachment download error: HTTP {response.status_code}")
+                return None
+            buf = tempfile.SpooledTemporaryFile(max_size=spool_bytes)
+            for chunk in response.iter_content(chunk_size=_DOWNLOAD_CHUNK):
+                if chunk:
+                    buf.write(chunk)
+            buf.seek(0)
+            return buf
+        finally:
+            response.close()
+    except Exception as e:
+        print(f"Graph attachment download error: {e}")
+        return None
+
+
+def helper_graph_fetch_attachments(access_token, user_email, message_id, max_bytes=_ATTACHMENT_MAX_BYTES):
+    """List attachment metadata, then download only the extractable ones.
+
+    Returns (all metadata, chosen) where each chosen dict carries a "content"
+    file object — pass it to extract_text_from_attachments, then call
+    close_attachments(chosen).
+    """
+    meta = helper_graph_attachment_list(access_token, user_email, message_id)
+    chosen, skipped = select_extractable_attachments(meta, max_bytes)
+    if skipped:
+        print(f"    📎 Skipping {len(skipped)} attachment(s) (type/size/inline): "
+              f"{[a.get('name', '') for a in skipped][:5]}")
+    downloaded = []
+    for att in chosen:
+        content = helper_graph_attachment_content(access_token, user_email, message_id, att.get('id'))
+        if content is not None:
+            downloaded.append({**att, 'content': content})
+    return meta, downloaded
+
+
+def attachment_bytes(att):
+    """Raw bytes of an attachment dict: "content" (bytes / file object) or base64 "contentBytes"."""
+    content = att.get('content')
+    if content is not None:
+        if isinstance(content, (bytes, bytearray)):
+            return bytes(content)
+        content.seek(0)
+        return content.read()
+    content_bytes = att.get('contentBytes')
+    return base64.b64decode(content_bytes) if content_bytes else b''
+
+
+def close_attachments(attachments):
+    """Release temp files of attachments returned by helper_graph_fetch_attachments."""
+    for att in attachments or []:
+        content = att.get('content')
+        if hasattr(content, 'close'):
+            try:
+                content.close()
+            except Exception:
+                pass
+
+
+def helper_graph_get_message(access_token, user_email, message_id):
+    """Get a single message by id (None if it no longer exists)"""
+    try:
+        url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}"
+        response = graph_request('GET', url, access_token)
+        return response.json() if response.status_code == 200 else None
+    except Exception as e:
+        print(f"Graph message error: {e}")
+        return None
+
 def helper_graph_mark_read(access_token, user_email, message_id):
-    """Mark message as read"""
+    """Mark message as read (queued for a $batch flush while a batch session is active)"""
+    batch = active_graph_batch(access_token, user_email)
+    if batch is not None and batch.queue_mark_read(message_id):
+        return
     try:
         url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}"
-        requests.patch(url, headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}, json={'isRead': True})
+        graph_request('PATCH', url, access_token, json={'isRead': True})
     except Exception as e:
         print(f"Graph mark-read error: {e}")
 
+# ── Inbox sync: Graph delta query with time-window fallback ──
+# The delta link for the inbox is kept in system_state/<doc> so each
+# rcb_check_email tick only pulls messages added/changed since the last tick.
+
+INBOX_DELTA_STATE_DOC = "rcb_inbox_delta"
+_INBOX_PAGE_SIZE = 50
+_INBOX_MAX_PAGES = 20
+_DELTA_EXPIRED_CODES = frozenset({
+    "syncstatenotfound", "syncstateinvalid", "resyncrequired", "invaliddeltatoken",
+})
+
+
+def _graph_get_pages(access_token, url, params=None, max_pages=_INBOX_MAX_PAGES,
+                     page_size=_INBOX_PAGE_SIZE):
+    """Follow @odata.nextLink pages.
+
+    Returns (messages, last_page, status_code). last_page is the final JSON body
+    (holding @odata.deltaLink or a pending @odata.nextLink), or the error body.
+    """
+    headers = {'Prefer': f'odata.maxpagesize={page_size}'}
+    messages = []
+    page = {}
+    for _ in range(max_pages):
+        response = graph_request('GET', url, access_token, params=params, headers=headers)
+        try:
+            page = response.json()
+        except ValueError:
+            page = {}
+        if response.status_code != 200:
+            return messages, page, response.status_code
+        messages.extend(page.get('value', []))
+        url = page.get('@odata.nextLink')
+        params = None  # nextLink already carries the query
+        if not url:
+            break
+    return messages, page, 200
+
+
+def _delta_expired(status_code, body):
+    if status_code == 410:
+        return True
+    code = ((body or {}).get('error') or {}).get('code', '')
+    return status_code == 400 and code.lower() in _DELTA_EXPIRED_CODES
+
+
+def helper_graph_inbox_delta(access_token, user_email, delta_link=None, since_iso=None,
+                             max_pages=_INBOX_MAX_PAGES):
+    """Fetch inbox messages via a Graph delta query.
+
+    With delta_link: only messages added/changed since that link was issued.
+    Without: initial sync of messages received since since_iso.
+
+    Returns (messages, next_link, status) where status is "ok", "expired"
+    (link no longer valid — caller should resync) or "error". next_link is
+    the new @odata.deltaLink, or the pending @odata.nextLink when max_pages
+    was hit, so the next call resumes where this one stopped.
+    """
+    try:
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            url = f"https://graph.microsoft.com/v1.0/users/{user_email}/mailFolders/inbox/messages/delta"
+            params = {'$filter': f"receivedDateTime ge {since_iso}"} if since_iso else None
+        messages, last_page, status_code = _graph_get_pages(access_token, url, params, max_pages)
+        if status_code != 200:
+            if _delta_expired(status_code, last_page):
+                return [], None, "expired"
+            print(f"Graph delta error: HTTP {status_code}")
+            return [], None, "error"
+        next_link = last_page.get('@odata.deltaLink') or last_page.get('@odata.nextLink')
+        # Deleted/moved-out messages come back as {"id": ..., "@removed": {...}}
+        messages = [m for m in messages if '@removed' not in m]
+        return messages, next_link, "ok"
+    except Exception as e:
+        print(f"Graph delta error: {e}")
+        return [], None, "error"
+
+
+def helper_graph_recent_messages(access_token, user_email, since_iso, max_pages=_INBOX_MAX_PAGES):
+    """All inbox messages received since since_iso, newest first (paged)."""
+    try:
+        url = f"https://graph.microsoft.com/v1.0/users/{user_email}/mailFolders/inbox/messages"
+        params = {
+            '$top': _INBOX_PAGE_SIZE,
+            '$orderby': 'receivedDateTime desc',
+            '$filter': f"receivedDateTime ge {since_iso}",
+        }
+        messages, _, _ = _graph_get_pages(access_token, url, params, max_pages)
+        return messages
+    except Exception as e:
+        print(f"Graph messages error: {e}")
+        return []
+
+
+def load_inbox_delta_link(db, user_email):
+    """Stored delta link for this mailbox, or None."""
+    try:
+        doc = db.collection("system_state").document(INBOX_DELTA_STATE_DOC).get()
+        if doc.exists:
+            data = doc.to_dict() or {}
+            if data.get("user_email", "").lower() == (user_email or "").lower():
+                return data.get("delta_link") or None
+    except Exception as e:
+        print(f"Inbox delta load error: {e}")
+    return None
+
+
+def save_inbox_delta_link(db, user_email, delta_link):
+    """Persist (or clear, with delta_link=None) the mailbox delta link."""
+    try:
+        db.collection("system_state").document(INBOX_DELTA_STATE_DOC).set({
+            "user_email": user_email,
+            "delta_link": delta_link,
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+    except Exception as e:
+        print(f"Inbox delta save error: {e}")
+
+
+def helper_graph_inbox_sync(access_token, user_email, db, since_iso):
+    """Messages to look at this tick: delta sync, falling back to a time-window scan.
+
+    1. stored delta link      -> only new/changed messages
+    2. missing/expired link   -> initial delta sync over the since_iso window
+    3. delta endpoint failing -> plain paged listing of the since_iso window
+
+    Messages received before since_iso are dropped in every mode (a changed
+    old message must not be reprocessed once its rcb_processed doc is gone).
+    Returns (messages newest first, next_link, mode). The caller saves
+    next_link with save_inbox_delta_link() once the messages are handled, so
+    a crashed run re-reads the same changes instead of losing them.
+    """
+    delta_link = load_inbox_delta_link(db, user_email)
+    mode = "delta"
+    messages, next_link, status = [], None, "expired"
+    if delta_link:
+        messages, next_link, status = helper_graph_inbox_delta(access_token, user_email, delta_link)
+        if status == "expired":
+            print("📨 Inbox delta link expired — resyncing")
+    if status == "expired":
+        mode = "delta_initial"
+        messages, next_link, status = helper_graph_inbox_delta(
+            access_token, user_email, since_iso=since_iso)
+    if status != "ok":
+        mode = "window"
+        messages, next_link = helper_graph_recent_messages(access_token, user_email, since_iso), None
+
+    if since_iso:
+        messages = [m for m in messages if (m.get('receivedDateTime') or since_iso) >= since_iso]
+    messages.sort(key=lambda m: m.get('receivedDateTime') or '', reverse=True)
+    return messages, next_link, mode
+
+
 _NO_REPLY_ADDRESSES = frozenset({
     "cc@rpa-port.co.il",       # Distribution group — all employees + RCB
     "frdsea@rpa-port.co.il",   # Forwarding group — never reply to it
@@ -720,6 +1062,32 @@ def _is_internal_recipient(email: str) -> bool:
     return addr.endswith("@rpa-port.co.il")
 
 
+# ── Reply checkpoint: the lane handling a claimed message registers a callback
+# that runs after every successful send/reply, so a lease takeover can tell
+# that the reply already went out (rcb_claims.ClaimManager.mark_reply_sent).
+_reply_checkpoint = contextvars.ContextVar("rcb_reply_checkpoint", default=None)
+
+
+def set_reply_checkpoint(callback):
+    """Call callback() after each successful send in this context. Returns a reset token."""
+    return _reply_checkpoint.set(callback)
+
+
+def reset_reply_checkpoint(token):
+    _reply_checkpoint.reset(token)
+
+
+def _sent(ok):
+    """Run the active reply checkpoint for a successful send; returns ok."""
+    callback = _reply_checkpoint.get()
+    if ok and callback is not None:
+        try:
+            callback()
+        except Exception as e:
+            print(f"    ⚠️ Reply checkpoint error: {e}")
+    return ok
+
+
 def helper_graph_send(access_token, user_email, to_email, subject, body_html,
                       reply_to_id=None, attachments_data=None, internet_message_id=None,
                       deal_id=None, alert_type=None, db=None, conversation_id=None):
@@ -780,8 +1148,8 @@ def helper_graph_send(access_token, user_email, to_email, subject, body_html,
                     'contentBytes': a.get('contentBytes')
                 } for a in attachments_data if a.get('contentBytes')
             ]
-        response = requests.post(url, headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}, json={'message': message, 'saveToSentItems': True})
-        return response.status_code == 202
+        response = graph_request('POST', url, access_token, json={'message': message, 'saveToSentItems': True})
+        return _sent(response.status_code == 202)
     except Exception as e:
         print(f"Send error: {e}")
         return False
@@ -865,12 +1233,8 @@ def helper_graph_reply(access_token, user_email, message_id, body_html, to_email
                     'contentBytes': a.get('contentBytes')
                 } for a in attachments_data if a.get('contentBytes')
             ]
-        response = requests.post(
-            url,
-            headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'},
-            json=payload
-        )
-        return response.status_code == 202
+        response = graph_request('POST', url, access_token, json=payload)
+        return _sent(response.status_code == 202)
     except Exception as e:
         print(f"Reply error: {e}")
         return False
@@ -26,7 +26,11 @@ Callers:
 
 import re
 import json
+import math
+import threading
+import time
 import hashlib
+import weakref
 from datetime import datetime, timezone, timedelta
 
 # AI provider costs for budget tracking
@@ -39,6 +43,109 @@ AI_COSTS = {
 }
 
 
+# ════════════════════════════════════════════════════════════════════════════
+# MEMORY POSTINGS INDEX — token → doc-id, shared across engines on a warm instance
+# ════════════════════════════════════════════════════════════════════════════
+
+_FUZZY_MIN_OVERLAP = 0.6                # ≥60% keyword overlap (see check_classification_memory)
+_CORRECTIONS_INDEX_TTL_SEC = 600        # full reload of learned_corrections (≤500 docs)
+_CLASSIFICATIONS_INDEX_TTL_SEC = 6 * 3600
+_CLASSIFICATIONS_SYNC_SEC = 60          # incremental learned_at > last_seen pull
+_CLASSIFICATIONS_INDEX_MAX_DOCS = 20000
+
+# db client → {"corrections": _TokenPostings, "classifications": _TokenPostings}
+_MEMORY_INDEXES = weakref.WeakKeyDictionary()
+
+
+class _TokenPostings:
+    """Incrementally maintained token → doc-id postings for keyword-overlap lookups.
+
+    Shared by every engine on a warm instance, and the rcb_check_email lanes
+    classify concurrently — all reads and writes go through _lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.postings = {}      # token -> set(doc_id)
+        self.keywords = {}      # doc_id -> frozenset(keywords)
+        self.payload = {}       # doc_id -> small dict (e.g. resolved hs_code)
+        self.loaded_at = 0.0
+        self.synced_at = 0.0
+        self.last_seen = None   # newest learned_at pulled so far
+
+    def add(self, doc_id, keywords, payload=None):
+        kws = frozenset(keywords or ())
+        with self._lock:
+            self._remove(doc_id)
+            if not kws:
+                return
+            self.keywords[doc_id] = kws
+            self.payload[doc_id] = payload or {}
+            for kw in kws:
+                self.postings.setdefault(kw, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def entry(self, doc_id):
+        """(keywords, payload) of an indexed doc, or None if it was removed meanwhile."""
+        with self._lock:
+            kws = self.keywords.get(doc_id)
+            return None if kws is None else (kws, self.payload.get(doc_id, {}))
+
+    def _remove(self, doc_id):
+        kws = self.keywords.pop(doc_id, None)
+        self.payload.pop(doc_id, None)
+        for kw in kws or ():
+            ids = self.postings.get(kw)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[kw]
+
+    def candidates(self, query_kws, min_overlap=_FUZZY_MIN_OVERLAP):
+        """Doc ids sharing at least ceil(min_overlap × |query|) keywords with the query.
+
+        Any doc passing an overlap test normalized by |query| (or by a larger
+        denominator) must share that many tokens, so only these need checking.
+        """
+        need = max(1, math.ceil(len(query_kws) * min_overlap - 1e-9))
+        counts = {}
+        with self._lock:
+            for kw in query_kws:
+                for doc_id in self.postings.get(kw, ()):
+                    counts[doc_id] = counts.get(doc_id, 0) + 1
+        return sorted(d for d, c in counts.items() if c >= need)
+
+    def __len__(self):
+        return len(self.keywords)
+
+
+def _memory_indexes(db):
+    try:
+        idx = _MEMORY_INDEXES.get(db)
+        if idx is None:
+            idx = {"corrections": None, "classifications": None}
+            _MEMORY_INDEXES[db] = idx
+        return idx
+    except TypeError:
+        # db not weak-referenceable — keep a private, non-shared index
+        return {"corrections": None, "classifications": None}
+
+
+def _correction_hs(data):
+    return (data.get("tiebreaker_hs")
+            or data.get("corrected_code")
+            or data.get("validated_hs"))
+
+
+def reset_memory_index():
+    """Drop all warm memory indexes. Useful for testing."""
+    _MEMORY_INDEXES.clear()
+
+
+
 class SelfLearningEngine:
     """Brain of the RCB system — 5-level memory with multi-AI active enrichment."""
 
@@ -362,31 +469,23 @@ class SelfLearningEngine:
                     break
 
             # Phase 2: Keyword overlap fallback (>= 60% bidirectional)
+            # Candidates come from the warm postings index, not a 500-doc stream.
             if not matched_data and len(keywords) >= 2:
                 query_kws = set(keywords)
-                all_corrections = list(
-                    self.db.collection("learned_corrections").limit(500).stream()
-                )
-                for doc in all_corrections:
-                    data = doc.to_dict()
-                    if not data or data.get("status") == "needs_review":
-                        continue
-                    stored_product = data.get("product", "")
-                    if not stored_product:
-                        continue
-                    stored_kws = set(self._extract_keywords(stored_product))
-                    if not stored_kws:
+                index = self._corrections_index()
+                best_ratio = 0.0
+                for doc_id in (index.candidates(query_kws) if index else ()):
+                    entry = index.entry(doc_id)
+                    if entry is None:
                         continue
+                    stored_kws, payload = entry
                     overlap = query_kws & stored_kws
                     ratio_q = len(overlap) / len(query_kws)
                     ratio_s = len(overlap) / len(stored_kws)
-                    if ratio_q >= 0.6 and ratio_s >= 0.6:
-                        hs_code = (data.get("tiebreaker_hs")
-                                   or data.get("corrected_code")
-                                   or data.get("validated_hs"))
-                        if hs_code:
-                            matched_data = (hs_code, "fuzzy")
-                            break
+                    if ratio_q >= _FUZZY_MIN_OVERLAP and ratio_s >= _FUZZY_MIN_OVERLAP:
+                        if min(ratio_q, ratio_s) > best_ratio:
+                            best_ratio = min(ratio_q, ratio_s)
+                            matched_data = (payload["hs_code"], "fuzzy")
 
             if matched_data:
                 hs_code, match_type = matched_data
@@ -419,8 +518,19 @@ class SelfLearningEngine:
         # Level 0.5: Normalized keyword-overlap match in learned_classifications
         # Handles cases where same product is described with extra/missing/reordered words
         if len(keywords) >= 2:
+            index = self._classifications_index()
+            if index is not None:
+                try:
+                    match = self._match_classification_index(index, keywords)
+                    if match:
+                        data, overlap = match
+                        print(f"    🧠 SelfLearning: classification NORMALIZED for "
+                              f"'{product_description[:40]}' (overlap={overlap:.0%}, indexed)")
+                        return data, "exact"
+                except Exception as e:
+                    print(f"    🧠 SelfLearning: classification normalized (indexed) error: {e}")
             best_kw = max(keywords, key=len)
-            if len(best_kw) >= 3:
+            if index is None and len(best_kw) >= 3:
                 try:
                     kw_docs = (self.db.collection("learned_classifications")
                                .where("keywords", "array_contains", best_kw)
@@ -492,6 +602,100 @@ class SelfLearningEngine:
 
         return None, "none"
 
+    def _corrections_index(self):
+        """Warm postings index over resolved learned_corrections (None if unavailable)."""
+        indexes = _memory_indexes(self.db)
+        index = indexes["corrections"]
+        now = time.time()
+        if index is not None and now - index.loaded_at < _CORRECTIONS_INDEX_TTL_SEC:
+            return index
+        try:
+            fresh = _TokenPostings()
+            for doc in self.db.collection("learned_corrections").limit(500).stream():
+                data = doc.to_dict()
+                if not data or data.get("status") == "needs_review":
+                    continue
+                hs_code = _correction_hs(data)
+                stored_product = data.get("product", "")
+                if not hs_code or not stored_product:
+                    continue
+                kws = data.get("keywords") or self._extract_keywords(stored_product)
+                fresh.add(doc.id, kws, {"hs_code": hs_code})
+            fresh.loaded_at = now
+            indexes["corrections"] = fresh
+            return fresh
+        except Exception as e:
+            print(f"    🧠 SelfLearning: corrections index load error: {e}")
+            return index
+
+    def _classifications_index(self):
+        """Warm postings index over learned_classifications keywords (None if unavailable).
+
+        Built once per warm instance from the stored `keywords` field, then kept
+        current by learn_classification() and a periodic learned_at pull.
+        """
+        indexes = _memory_indexes(self.db)
+        index = indexes["classifications"]
+        now = time.time()
+        try:
+            if index is None or now - index.loaded_at >= _CLASSIFICATIONS_INDEX_TTL_SEC:
+                fresh = _TokenPostings()
+                docs = (self.db.collection("learned_classifications")
+                        .select(["keywords", "hs_code", "learned_at"])
+                        .limit(_CLASSIFICATIONS_INDEX_MAX_DOCS).stream())
+                for doc in docs:
+                    self._index_classification_doc(fresh, doc)
+                fresh.loaded_at = fresh.synced_at = now
+                indexes["classifications"] = fresh
+                print(f"    🧠 SelfLearning: classification index built ({len(fresh)} docs)")
+                return fresh
+            if now - index.synced_at >= _CLASSIFICATIONS_SYNC_SEC and index.last_seen:
+                index.synced_at = now
+                docs = (self.db.collection("learned_classifications")
+                        .where("learned_at", ">", index.last_seen)
+                        .select(["keywords", "hs_code", "learned_at"]).stream())
+                for doc in docs:
+                    self._index_classification_doc(index, doc)
+        except Exception as e:
+            print(f"    🧠 SelfLearning: classification index error: {e}")
+        return index
+
+    @staticmethod
+    def _index_classification_doc(index, doc):
+        data = doc.to_dict() or {}
+        if not data.get("hs_code"):
+            return
+        index.add(doc.id, data.get("keywords", []))
+        learned_at = data.get("learned_at")
+        try:
+            if learned_at is not None and (index.last_seen is None or learned_at > index.last_seen):
+                index.last_seen = learned_at
+        except TypeError:
+            pass
+
+    def _match_classification_index(self, index, keywords):
+        """Best ≥60% overlap among postings candidates → (full doc data, overlap) or None."""
+        query_kw = set(keywords)
+        best_id = None
+        best_overlap = 0.0
+        for doc_id in index.candidates(query_kw):
+            entry = index.entry(doc_id)
+            if entry is None:
+                continue
+            stored_kw = entry[0]
+            overlap = len(query_kw & stored_kw) / max(len(query_kw), len(stored_kw))
+            if overlap > best_overlap:
+                best_overlap = overlap
+                best_id = doc_id
+        if best_id is None or best_overlap < _FUZZY_MIN_OVERLAP:
+            return None
+        doc = self.db.collection("learned_classifications").document(best_id).get()
+        data = doc.to_dict() if doc.exists else None
+        if not data or not data.get("hs_code"):
+            index.remove(best_id)
+            return None
+        return data, best_overlap
+
     def learn_classification(self, product_description, hs_code, method,
                              source, confidence):
         """Save a classification result for future use.
@@ -557,6 +761,9 @@ class SelfLearningEngine:
                 "learned_at": now,
                 "times_used": 0,
             }, merge=True)
+            index = _memory_indexes(self.db)["classifications"]
+            if index is not None:
+                index.add(doc_id, keywords[:50])
             print(f"    🧠 SelfLearning: saved classification '{product_description[:30]}' → {hs_code}")
         except Exception as e:
             print(f"    🧠 SelfLearning: learn classification error: {e}")
@@ -904,6 +1111,7 @@ class SelfLearningEngine:
                         corr_id = self._make_id(f"corr_{product}_{original_hs}")
                         self.db.collection("learned_corrections").document(corr_id).set({
                             "product": product,
+                            "keywords": self._extract_keywords(product)[:50],
                             "original_hs": original_hs,
                             "original_source": original_source,
                             "validated_hs": validated_hs,
@@ -1415,6 +1623,11 @@ class SelfLearningEngine:
                                 "resolved_at": datetime.now(timezone.utc),
                             })
                             result["corrections"] += 1
+                            index = _memory_indexes(self.db)["corrections"]
+                            if index is not None:
+                                index.add(doc.id, data.get("keywords")
+                                          or self._extract_keywords(product),
+                                          {"hs_code": resolved_hs})
 
                             # Update the original classification
                             self.learn_classification(
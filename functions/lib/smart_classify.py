@@ -19,6 +19,11 @@ from dataclasses import dataclass, field
 from typing import List, Tuple, Optional, Dict, Set
 from enum import Enum
 
+try:
+    from lib.lexicon import tokenize, strip_prefixes
+except ImportError:
+    from lexicon import tokenize, strip_prefixes
+
 
 # ---------------------------------------------------------------------------
 #  Confidence levels
@@ -80,8 +85,6 @@ class ClassificationResult:
 #  Hebrew text processing
 # ---------------------------------------------------------------------------
 
-_HE_PREFIXES = ("של", "וה", "מה", "לה", "בה", "כש", "מ", "ב", "ל", "ה", "ו", "כ", "ש")
-_WORD_SPLIT_RE = re.compile(r'[^\w\u0590-\u05FF]+')
 _STOP_WORDS = frozenset({
     "את", "של", "על", "עם", "או", "גם", "כי", "אם", "לא", "יש", "זה",
     "אל", "הם", "הוא", "היא", "בין", "כל", "מן", "אשר", "עד", "רק",
@@ -92,99 +95,74 @@ _STOP_WORDS = frozenset({
 
 def _tokenize(text: str) -> List[str]:
     """Split text into words, lowercase, filter stop words."""
-    if not text:
-        return []
-    words = _WORD_SPLIT_RE.split(text.lower())
-    return [w for w in words if len(w) >= 2 and w not in _STOP_WORDS]
+    return tokenize(text, _STOP_WORDS)
 
 
 def _strip_prefixes(word: str) -> List[str]:
     """Return word + prefix-stripped variants."""
-    variants = [word]
-    if len(word) > 3:
-        for pfx in _HE_PREFIXES:
-            if word.startswith(pfx) and len(word) - len(pfx) >= 2:
-                stripped = word[len(pfx):]
-                if stripped not in variants:
-                    variants.append(stripped)
-    return variants
+    return strip_prefixes(word)
 
 
 # ---------------------------------------------------------------------------
 #  Step 1: Build vocabulary from tariff tree
 # ---------------------------------------------------------------------------
 
-_HE_VOCAB: Optional[Dict[str, List[str]]] = None
-_EN_VOCAB: Optional[Dict[str, List[str]]] = None
-_VOCAB_BUILT = False
+# The vocabulary is the tariff_tree description lexicon, shared with
+# tariff_tree.search_tree rather than rebuilt here.
+_VOCAB = None           # lexicon.Lexicon, or False if the tree is unavailable
+_FIELD_HE = 1
+_FIELD_EN = 2
 
 
 def _build_vocab_from_tree():
-    """Parse the full tariff tree and extract every unique word → HS node mapping."""
-    global _HE_VOCAB, _EN_VOCAB, _VOCAB_BUILT
-
-    if _VOCAB_BUILT:
-        return
-
-    _HE_VOCAB = {}
-    _EN_VOCAB = {}
+    """Attach to the shared tariff tree lexicon (word → HS nodes, he/en flags)."""
+    global _VOCAB, _FIELD_HE, _FIELD_EN
 
     try:
-        from lib.tariff_tree import load_tariff_tree
+        from lib.tariff_tree import tree_lexicon, FIELD_HE, FIELD_EN
     except ImportError:
         try:
-            from tariff_tree import load_tariff_tree
+            from tariff_tree import tree_lexicon, FIELD_HE, FIELD_EN
         except ImportError:
             print("[smart_classify] WARNING: tariff_tree not available")
-            _VOCAB_BUILT = True
+            _VOCAB = False
             return
 
     try:
-        nodes, fc_index, root_ids = load_tariff_tree()
+        lex = tree_lexicon()
     except Exception as e:
         print(f"[smart_classify] WARNING: Could not load tariff tree: {e}")
-        _VOCAB_BUILT = True
+        _VOCAB = False
         return
 
-    if not nodes:
+    if not len(lex):
         print("[smart_classify] WARNING: Tariff tree is empty")
-        _VOCAB_BUILT = True
-        return
+    _VOCAB = lex
+    _FIELD_HE, _FIELD_EN = FIELD_HE, FIELD_EN
 
-    for nid, node in nodes.items():
-        node_key = node.fc or str(nid)
 
-        # Hebrew description words
-        if node.desc_he:
-            for w in _tokenize(node.desc_he):
-                for variant in _strip_prefixes(w):
-                    if variant not in _HE_VOCAB:
-                        _HE_VOCAB[variant] = []
-                    _HE_VOCAB[variant].append(node_key)
+def _ensure_vocab():
+    """Lazy-load the vocabulary."""
+    if _VOCAB is None:
+        _build_vocab_from_tree()
 
-        # English description words
-        if node.desc_en:
-            for w in _tokenize(node.desc_en):
-                if w not in _EN_VOCAB:
-                    _EN_VOCAB[w] = []
-                _EN_VOCAB[w].append(node_key)
 
-    _VOCAB_BUILT = True
-    print(f"[smart_classify] Vocab built: {len(_HE_VOCAB)} Hebrew words, {len(_EN_VOCAB)} English words")
+def _in_he_vocab(word: str) -> bool:
+    return bool(_VOCAB) and _VOCAB.has(word, _FIELD_HE)
 
 
-def _ensure_vocab():
-    """Lazy-load the vocabulary."""
-    if not _VOCAB_BUILT:
-        _build_vocab_from_tree()
+def _in_en_vocab(word: str) -> bool:
+    return bool(_VOCAB) and _VOCAB.has(word, _FIELD_EN)
 
 
 def get_vocab_stats() -> dict:
     """Return vocabulary statistics (for testing/debugging)."""
     _ensure_vocab()
+    if not _VOCAB:
+        return {"he_words": 0, "en_words": 0}
     return {
-        "he_words": len(_HE_VOCAB) if _HE_VOCAB else 0,
-        "en_words": len(_EN_VOCAB) if _EN_VOCAB else 0,
+        "he_words": sum(1 for t in _VOCAB.vocab if _VOCAB.has(t, _FIELD_HE)),
+        "en_words": sum(1 for t in _VOCAB.vocab if _VOCAB.has(t, _FIELD_EN)),
     }
 
 
@@ -401,13 +379,13 @@ def expand_query(query_text: str) -> List[Tuple[str, str, str]]:
 
         # Check each variant against vocabulary
         for variant in variants:
-            if _HE_VOCAB and variant in _HE_VOCAB:
+            if _in_he_vocab(variant):
                 if variant not in seen_terms:
                     results.append((variant, "tariff_tree_he", Confidence.HIGH.value))
                     seen_terms.add(variant)
                 found_in_vocab = True
                 break
-            if _EN_VOCAB and variant in _EN_VOCAB:
+            if _in_en_vocab(variant):
                 if variant not in seen_terms:
                     results.append((variant, "tariff_tree_en", Confidence.HIGH.value))
                     seen_terms.add(variant)
@@ -431,12 +409,12 @@ def expand_query(query_text: str) -> List[Tuple[str, str, str]]:
             if variant in synonyms:
                 for syn in synonyms[variant]:
                     syn_lower = syn.lower()
-                    if _HE_VOCAB and syn_lower in _HE_VOCAB:
+                    if _in_he_vocab(syn_lower):
                         if syn_lower not in seen_terms:
                             results.append((syn_lower, "synonym_he", Confidence.HIGH.value))
                             seen_terms.add(syn_lower)
                         synonym_found = True
-                    elif _EN_VOCAB and syn_lower in _EN_VOCAB:
+                    elif _in_en_vocab(syn_lower):
                         if syn_lower not in seen_terms:
                             results.append((syn_lower, "synonym_en", Confidence.HIGH.value))
                             seen_terms.add(syn_lower)
@@ -681,10 +659,10 @@ def classify_product(query: str, db=None) -> ClassificationResult:
     vocab_chapters = set()  # chapters hinted by vocabulary matches
     vocab_official = []     # official terms found
     try:
-        from lib._customs_vocabulary import CUSTOMS_VOCABULARY
+        from lib._data_snapshot import CUSTOMS_VOCABULARY
     except ImportError:
         try:
-            from _customs_vocabulary import CUSTOMS_VOCABULARY
+            from _data_snapshot import CUSTOMS_VOCABULARY
         except ImportError:
             CUSTOMS_VOCABULARY = {}
 
@@ -1019,9 +997,7 @@ def classify_product(query: str, db=None) -> ClassificationResult:
 
 def reset_caches():
     """Reset all module-level caches. For testing only."""
-    global _HE_VOCAB, _EN_VOCAB, _VOCAB_BUILT, _SHAAROLAMI_CACHE, _BUILDER_SYNONYMS
-    _HE_VOCAB = None
-    _EN_VOCAB = None
-    _VOCAB_BUILT = False
+    global _VOCAB, _SHAAROLAMI_CACHE, _BUILDER_SYNONYMS
+    _VOCAB = None
     _SHAAROLAMI_CACHE = {}
     _BUILDER_SYNONYMS = None
@@ -16,6 +16,7 @@ import re
 import csv
 import logging
 from .extraction_result import ExtractionResult
+from .text_postprocess import cleanup_hebrew_text
 
 logger = logging.getLogger("rcb.smart_extractor")
 
@@ -618,20 +619,7 @@ class SmartExtractor:
 
     def _cleanup_hebrew(self, text):
         """Fix common Hebrew/RTL extraction issues."""
-        if not text:
-            return text
-        text = re.sub(r" {3,}", "  ", text)
-        text = re.sub(r"\n{4,}", "\n\n\n", text)
-        replacements = {
-            "חשבוו": "חשבון",
-            'מע"ט': 'מע"מ',
-            "עמיל מכם": "עמיל מכס",
-            "מתווך מכס": "עמיל מכס",
-            "מתווכי מכס": "עמילי מכס",
-        }
-        for wrong, right in replacements.items():
-            text = text.replace(wrong, right)
-        return text
+        return cleanup_hebrew_text(text)
 
     def _table_to_dicts(self, table_rows):
         """Convert raw table rows to list of dicts using first row as headers."""
@@ -0,0 +1,375 @@
+"""
+Process-wide tariff reference cache
+===================================
+elimination_engine reads the same reference data for every item it
+classifies: chapter_notes/chapter_XX, tariff_structure/section_* and
+tariff_structure/chapter_*, plus up to 10 `tariff` docs per heading. That
+data is rewritten maybe monthly (parse_chapter_notes*.py,
+seed_tariff_structure.py), so it is cached for the life of the process
+instead of per eliminate() call:
+
+- preload: all chapter notes (chapter_01..98) and all tariff_structure
+  section / chapter docs in ONE get_all — or, when available, from the
+  GCS snapshot written by publish_tariff_cache() (which also carries the
+  per-heading tariff docs). Happens on first use; warm instances then serve
+  elimination without Firestore reads.
+- versioning: system_state/tariff_cache holds a version number that the
+  writer scripts bump via publish_tariff_cache(). Instances re-read that
+  one doc at most every RCB_TARIFF_CACHE_CHECK_SEC seconds (default 300)
+  and drop everything when it moved. MAX_AGE_SEC is a safety-net reload.
+- invalidate_tariff_cache() drops this process's copy.
+
+Usage:
+    notes = get_chapter_notes_doc(db, "84")          # raw doc dict or None
+    section = get_tariff_structure_doc(db, "section_XVI")
+    rows = get_heading_tariff_docs(db, "8471")
+    # after rewriting chapter_notes / tariff_structure (offline scripts):
+    publish_tariff_cache(db)
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    from lib.storage_manager import BUCKET_NAME, BUCKET_PREFIX, download_from_gcs, upload_to_gcs
+except ImportError:
+    from storage_manager import BUCKET_NAME, BUCKET_PREFIX, download_from_gcs, upload_to_gcs
+
+VERSION_COLLECTION = "system_state"
+VERSION_DOC = "tariff_cache"
+SNAPSHOT_PREFIX = f"{BUCKET_PREFIX}/exports/tariff_cache"
+MAX_AGE_SEC = 24 * 3600            # full reload even without a version bump
+HEADING_LIMIT = 10                 # tariff docs kept per heading (matches the old query)
+_HEADINGS_MAX = 4000               # LRU bound for lazily fetched headings
+_GET_ALL_CHUNK = 300
+_HEADING_FIELDS = ("hs_code", "description_he", "description_en", "duty_rate")
+
+ROMAN_SECTIONS = ("I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI",
+                  "XII", "XIII", "XIV", "XV", "XVI", "XVII", "XVIII", "XIX", "XX", "XXI", "XXII")
+CHAPTERS = tuple(f"{n:02d}" for n in range(1, 99))
+
+_LOCK = threading.Lock()
+_LOAD_LOCK = threading.Lock()     # one preload / version check at a time
+_STATE = {
+    "loaded": False,        # bulk preload done (missing docs are then authoritative)
+    "source": None,         # "gcs" / "firestore"
+    "version": None,
+    "loaded_at": 0.0,
+    "checked_at": 0.0,
+}
+_CHAPTER_NOTES = {}         # "84" -> doc dict or None
+_STRUCTURE = {}             # "section_XVI" / "chapter_84" -> doc dict or None
+_HEADINGS = OrderedDict()   # "8471" -> [tariff doc dicts]
+_STATS = {"hits": 0, "reads": 0, "preloads": 0, "snapshot_loads": 0,
+          "version_checks": 0, "invalidations": 0, "errors": 0}
+
+
+def _check_interval():
+    try:
+        return float(os.environ.get("RCB_TARIFF_CACHE_CHECK_SEC", "300"))
+    except ValueError:
+        return 300.0
+
+
+def _stat(name, n=1):
+    with _LOCK:
+        _STATS[name] += n
+
+
+def _as_version(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def _read_version(db):
+    """Current published version (0 if never published or unreadable)."""
+    _stat("version_checks")
+    _stat("reads")
+    try:
+        doc = db.collection(VERSION_COLLECTION).document(VERSION_DOC).get()
+        if doc.exists:
+            return _as_version((doc.to_dict() or {}).get("version"))
+    except Exception as e:
+        _stat("errors")
+        print(f"  ⚠️ Tariff cache version check failed: {e}")
+    return 0
+
+
+def _clear_locked():
+    _CHAPTER_NOTES.clear()
+    _STRUCTURE.clear()
+    _HEADINGS.clear()
+    _STATE.update(loaded=False, source=None, version=None, loaded_at=0.0, checked_at=0.0)
+
+
+def _snapshot_path(version):
+    return f"{SNAPSHOT_PREFIX}/v{version}.json.gz"
+
+
+def _structure_ids():
+    return [f"section_{s}" for s in ROMAN_SECTIONS] + [f"chapter_{c}" for c in CHAPTERS]
+
+
+def _load_snapshot(version):
+    """(notes, structure, headings) from the GCS snapshot of `version`, or None."""
+    if not version:
+        return None
+    try:
+        payload = json.loads(gzip.decompress(download_from_gcs(BUCKET_NAME, _snapshot_path(version))))
+    except Exception as e:
+        print(f"  Tariff cache: no snapshot v{version} in GCS ({e.__class__.__name__}), using Firestore")
+        return None
+    if payload.get("version") != version or not payload.get("chapter_notes"):
+        return None
+    notes = {ch: payload["chapter_notes"].get(ch) for ch in CHAPTERS}
+    structure = {doc_id: payload["tariff_structure"].get(doc_id) for doc_id in _structure_ids()}
+    _stat("snapshot_loads")
+    return notes, structure, payload.get("headings") or {}
+
+
+def _load_firestore(db):
+    """(notes, structure, {}) from ONE get_all over chapter notes + tariff_structure, or None."""
+    refs = [db.collection("chapter_notes").document(f"chapter_{c}") for c in CHAPTERS]
+    refs += [db.collection("tariff_structure").document(d) for d in _structure_ids()]
+    notes = {ch: None for ch in CHAPTERS}
+    structure = {doc_id: None for doc_id in _structure_ids()}
+    found = 0
+    try:
+        for start in range(0, len(refs), _GET_ALL_CHUNK):
+            for snap in db.get_all(refs[start:start + _GET_ALL_CHUNK]):
+                if not snap.exists:
+                    continue
+                # chapter_notes/chapter_84 and tariff_structure/chapter_84 share ids
+                collection, doc_id = snap.reference.path.split("/")[-2:]
+                if collection == "chapter_notes":
+                    notes[doc_id[len("chapter_"):]] = snap.to_dict()
+                else:
+                    structure[doc_id] = snap.to_dict()
+                found += 1
+    except Exception as e:
+        _stat("errors")
+        print(f"  ⚠️ Tariff cache preload failed: {e}")
+        return None
+    _stat("reads", len(refs))
+    if not found:
+        # Nothing seeded (or a stand-in db): stay in per-doc mode rather than cache "not found"
+        return None
+    return notes, structure, {}
+
+
+def preload_tariff_cache(db, source="auto"):
+    """Bulk-load chapter notes + tariff structure. source: "auto" | "gcs" | "firestore".
+
+    "auto" tries the GCS snapshot of the published version first. Returns
+    get_tariff_cache_stats(); if nothing could be loaded the cache falls
+    back to per-doc reads (each doc still cached for the process).
+    """
+    version = _read_version(db)
+    loaded, origin = None, None
+    if source in ("auto", "gcs"):
+        loaded, origin = _load_snapshot(version), "gcs"
+    if loaded is None and source in ("auto", "firestore"):
+        loaded, origin = _load_firestore(db), "firestore"
+    now = time.time()
+    with _LOCK:
+        _clear_locked()
+        if loaded is not None:
+            notes, structure, headings = loaded
+            _CHAPTER_NOTES.update(notes)
+            _STRUCTURE.update(structure)
+            _HEADINGS.update(headings)
+        _STATE.update(loaded=loaded is not None, source=origin if loaded is not None else None,
+                      version=version, loaded_at=now, checked_at=now)
+    _stat("preloads")
+    return get_tariff_cache_stats()
+
+
+def _needs_check(now):
+    return (_STATE["version"] is None
+            or now - _STATE["loaded_at"] >= MAX_AGE_SEC
+            or now - _STATE["checked_at"] >= _check_interval())
+
+
+def _ensure_fresh(db):
+    """Preload on first use; drop and reload when the published version moved."""
+    if not _needs_check(time.time()):
+        return
+    with _LOAD_LOCK:
+        now = time.time()
+        if not _needs_check(now):
+            return      # another thread just (re)loaded
+        if _STATE["version"] is not None and now - _STATE["loaded_at"] < MAX_AGE_SEC:
+            if _read_version(db) == _STATE["version"]:
+                with _LOCK:
+                    _STATE["checked_at"] = now
+                return
+            _stat("invalidations")
+        preload_tariff_cache(db)
+
+
+def _fetch_doc(db, collection, doc_id):
+    _stat("reads")
+    try:
+        doc = db.collection(collection).document(doc_id).get()
+        return doc.to_dict() if doc.exists else None
+    except Exception:
+        _stat("errors")
+        raise
+
+
+def get_chapter_notes_doc(db, chapter):
+    """chapter_notes/chapter_XX as a dict, or None if it does not exist. May raise on read errors."""
+    chapter = str(chapter).zfill(2)
+    _ensure_fresh(db)
+    with _LOCK:
+        if chapter in _CHAPTER_NOTES:
+            _STATS["hits"] += 1
+            return _CHAPTER_NOTES[chapter]
+    data = _fetch_doc(db, "chapter_notes", f"chapter_{chapter}")
+    with _LOCK:
+        _CHAPTER_NOTES[chapter] = data
+    return data
+
+
+def get_tariff_structure_doc(db, doc_id):
+    """tariff_structure/<doc_id> (section_XVI, chapter_84) as a dict, or None. May raise."""
+    _ensure_fresh(db)
+    with _LOCK:
+        if doc_id in _STRUCTURE:
+            _STATS["hits"] += 1
+            return _STRUCTURE[doc_id]
+    data = _fetch_doc(db, "tariff_structure", doc_id)
+    with _LOCK:
+        _STRUCTURE[doc_id] = data
+    return data
+
+
+def _heading_row(data):
+    return {f: data.get(f, "") for f in _HEADING_FIELDS}
+
+
+def get_heading_tariff_docs(db, heading):
+    """Up to HEADING_LIMIT tariff docs (hs_code, descriptions, duty_rate) for a 4-digit heading."""
+    heading = str(heading)
+    _ensure_fresh(db)
+    with _LOCK:
+        rows = _HEADINGS.get(heading)
+        if rows is not None:
+            _HEADINGS.move_to_end(heading)
+            _STATS["hits"] += 1
+            return rows
+    _stat("reads")
+    try:
+        docs = db.collection("tariff").where("heading", "==", heading).limit(HEADING_LIMIT).stream()
+        rows = [_heading_row(doc.to_dict()) for doc in docs]
+    except Exception:
+        _stat("errors")
+        raise
+    with _LOCK:
+        _HEADINGS[heading] = rows
+        while len(_HEADINGS) > _HEADINGS_MAX:
+            _HEADINGS.popitem(last=False)
+    return rows
+
+
+# ═══════════════════════════════════════════
+#  WRITERS — offline scripts that rewrite the reference data
+# ═══════════════════════════════════════════
+
+def _published_version(db):
+    doc = db.collection(VERSION_COLLECTION).document(VERSION_DOC).get()
+    return _as_version((doc.to_dict() or {}).get("version")) if doc.exists else 0
+
+
+def bump_tariff_cache_version(db, reason="", version=None):
+    """Publish a new version so every instance drops its copy on its next check."""
+    version = version or _published_version(db) + 1
+    db.collection(VERSION_COLLECTION).document(VERSION_DOC).set({
+        "version": version,
+        "reason": reason,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+    })
+    invalidate_tariff_cache()
+    return version
+
+
+def export_tariff_snapshot(db, version):
+    """Write chapter notes, tariff_structure and per-heading tariff docs to GCS. Returns the gs:// path."""
+    notes, structure = {}, {}
+    for doc in db.collection("chapter_notes").stream():
+        if doc.id.startswith("chapter_"):
+            notes[doc.id[len("chapter_"):]] = doc.to_dict()
+    wanted = set(_structure_ids())
+    for doc in db.collection("tariff_structure").stream():
+        if doc.id in wanted:
+            structure[doc.id] = doc.to_dict()
+    headings = {}
+    for doc in db.collection("tariff").stream():
+        data = doc.to_dict() or {}
+        heading = str(data.get("heading") or "")
+        if heading and len(headings.setdefault(heading, [])) < HEADING_LIMIT:
+            headings[heading].append(_heading_row(data))
+    payload = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "chapter_notes": notes,
+        "tariff_structure": structure,
+        "headings": headings,
+    }
+    body = gzip.compress(json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+    path = _snapshot_path(version)
+    upload_to_gcs(BUCKET_NAME, path, body)
+    return f"gs://{BUCKET_NAME}/{path}"
+
+
+def publish_tariff_cache(db, reason="", snapshot=True):
+    """Call after rewriting chapter_notes / tariff_structure / tariff.
+
+    Writes the GCS snapshot for the next version first (so instances that
+    see the new version can load it), then bumps the version doc.
+    Returns {"version", "snapshot"} (snapshot None if not written).
+    """
+    version = _published_version(db) + 1
+    path = None
+    if snapshot:
+        try:
+            path = export_tariff_snapshot(db, version)
+        except Exception as e:
+            print(f"  WARNING: tariff cache snapshot not written ({e}); instances will preload from Firestore")
+    bump_tariff_cache_version(db, reason, version)
+    return {"version": version, "snapshot": path}
+
+
+# ═══════════════════════════════════════════
+#  IN-PROCESS CONTROL
+# ═══════════════════════════════════════════
+
+def invalidate_tariff_cache():
+    """Drop this process's copy; the next lookup preloads again."""
+    with _LOCK:
+        _clear_locked()
+        _STATS["invalidations"] += 1
+
+
+def get_tariff_cache_stats():
+    with _LOCK:
+        stats = dict(_STATS)
+        stats.update(
+            loaded=_STATE["loaded"], source=_STATE["source"], version=_STATE["version"],
+            chapter_notes=sum(1 for v in _CHAPTER_NOTES.values() if v is not None),
+            structure_docs=sum(1 for v in _STRUCTURE.values() if v is not None),
+            headings=len(_HEADINGS),
+        )
+    return stats
+
+
+def reset_tariff_cache():
+    """Drop the cache and zero the stats. Useful for testing."""
+    with _LOCK:
+        _clear_locked()
+        for k in _STATS:
+            _STATS[k] = 0
@@ -0,0 +1,348 @@
+"""
+Tariff Index — process-wide inverted index over tariff descriptions.
+=====================================================================
+Replaces the full `tariff` / `tariff_chapters` stream that
+intelligence._search_tariff used to run for EVERY item. The collections are
+read once per warm instance (or loaded from a prebuilt snapshot), tokenized
+with the shared lexicon rules (lexicon.py), and scored in memory with BM25.
+
+Public API:
+    get_tariff_index(db)              -> TariffIndex (built lazily, cached)
+    search_tariff_index(db, keywords) -> list of results (intelligence shape)
+    save_snapshot(index, path)        -> write a prebuilt snapshot (json.gz)
+    load_snapshot(path)               -> TariffIndex or None
+    reset_index()                     -> drop the cached index (tests)
+"""
+
+import bisect
+import gzip
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    from lib.lexicon import strip_prefixes, tokenize
+except ImportError:
+    from lexicon import strip_prefixes, tokenize
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+
+_INDEX_TTL_SEC = 6 * 3600          # rebuild at most every 6h on a warm instance
+_BUILD_RETRY_SEC = 60              # retry an empty/failed build soon, not after the full TTL
+_SNAPSHOT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'tariff_index.json.gz')
+_SNAPSHOT_VERSION = 2
+
+# Tariff text is indexed with every word (no stop list) and every prefix
+# variant whose stem keeps 2+ chars
+_NO_STOP = frozenset()
+_STRIP_MIN_LEN = 0
+
+# BM25 parameters
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+# Max vocabulary expansions per query term (prefix match: "shirt" -> "shirts")
+_MAX_EXPANSIONS = 40
+
+# Fields that make up the searchable text, per collection
+_CHAPTER_FIELDS = ('description_he', 'description_en', 'title', 'title_he', 'title_en')
+_TARIFF_FIELDS = ('description_he', 'description_en', 'hs_code')
+
+# Module-level cached index
+_INDEX = None
+_INDEX_EXPIRES = 0.0
+_INDEX_LOCK = threading.Lock()   # one build even when items are pre-classified concurrently;
+                                 # held by the builder only — others serve the stale _INDEX
+
+
+# ---------------------------------------------------------------------------
+# Tokenization
+# ---------------------------------------------------------------------------
+
+def _strip_he_prefixes(word):
+    """Return the word plus variants with Hebrew prefixes stripped (lexicon rule)."""
+    return strip_prefixes(word, _STRIP_MIN_LEN)
+
+
+def _tokenize(text):
+    """Lowercase, split on non-word chars, keep tokens of 2+ chars."""
+    return tokenize(text, _NO_STOP)
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+class TariffIndex:
+    """Inverted index: token -> [(doc_idx, term_freq)], plus per-doc metadata."""
+
+    def __init__(self):
+        self.docs = []          # [{hs_code, description_he, description_en, duty_rate, source}]
+        self.doc_lens = []      # token count per doc
+        self.postings = {}      # token -> list of (doc_idx, tf)
+        self.vocab = []         # sorted tokens, for prefix expansion
+        self.avg_len = 0.0
+        self.built_at = 0.0
+        self.complete = True    # False if a collection failed to stream
+
+    # ── construction ──
+
+    def add_document(self, meta, text):
+        """Add one document. Each token is indexed with its prefix-stripped variants."""
+        idx = len(self.docs)
+        self.docs.append(meta)
+        tokens = _tokenize(text)
+        self.doc_lens.append(len(tokens))
+        tf = {}
+        for tok in tokens:
+            for variant in _strip_he_prefixes(tok):
+                tf[variant] = tf.get(variant, 0) + 1
+        for tok, count in tf.items():
+            self.postings.setdefault(tok, []).append((idx, count))
+
+    def finalize(self):
+        """Compute corpus stats and the sorted vocabulary. Call after the last add."""
+        self.vocab = sorted(self.postings)
+        self.avg_len = (sum(self.doc_lens) / len(self.doc_lens)) if self.doc_lens else 0.0
+        self.built_at = time.time()
+
+    def __len__(self):
+        return len(self.docs)
+
+    # ── query ──
+
+    def _expand(self, term):
+        """Vocabulary tokens matching a query term: exact, prefix-stripped, and prefix-extended."""
+        matches = set()
+        for variant in _strip_he_prefixes(term):
+            if variant in self.postings:
+                matches.add(variant)
+            if len(variant) < 3:
+                continue
+            pos = bisect.bisect_left(self.vocab, variant)
+            added = 0
+            while pos < len(self.vocab) and added < _MAX_EXPANSIONS:
+                tok = self.vocab[pos]
+                if not tok.startswith(variant):
+                    break
+                matches.add(tok)
+                pos += 1
+                added += 1
+        return matches
+
+    def search(self, keywords, min_matched=2, limit=10):
+        """
+        Score documents against keywords with BM25.
+
+        Returns list of (doc_idx, matched_terms, bm25) sorted by
+        (matched_terms, bm25) descending. A doc must match at least
+        `min_matched` distinct query keywords (same gate as the old scan).
+        """
+        n_docs = len(self.docs)
+        if not n_docs:
+            return []
+
+        matched = {}   # doc_idx -> set(query term idx)
+        scores = {}    # doc_idx -> bm25
+        terms = []
+        for kw in keywords:
+            kw = (kw or '').lower().strip()
+            if kw and kw not in terms:
+                terms.append(kw)
+
+        for t_idx, term in enumerate(terms):
+            best_per_doc = {}
+            for tok in self._expand(term):
+                plist = self.postings.get(tok, ())
+                if not plist:
+                    continue
+                idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+                for doc_idx, tf in plist:
+                    dl = self.doc_lens[doc_idx] or 1
+                    norm = tf * (_BM25_K1 + 1) / (
+                        tf + _BM25_K1 * (1 - _BM25_B + _BM25_B * dl / (self.avg_len or 1)))
+                    s = idf * norm
+                    # One query term contributes its best-matching expansion only
+                    if s > best_per_doc.get(doc_idx, 0):
+                        best_per_doc[doc_idx] = s
+            for doc_idx, s in best_per_doc.items():
+                matched.setdefault(doc_idx, set()).add(t_idx)
+                scores[doc_idx] = scores.get(doc_idx, 0.0) + s
+
+        hits = [(d, len(m), scores[d]) for d, m in matched.items() if len(m) >= min_matched]
+        hits.sort(key=lambda h: (h[1], h[2]), reverse=True)
+        return hits[:limit]
+
+
+# ---------------------------------------------------------------------------
+# Build from Firestore
+# ---------------------------------------------------------------------------
+
+def _text_from(data, fields):
+    parts = []
+    for f in fields:
+        val = data.get(f, '')
+        if isinstance(val, str) and val:
+            parts.append(val)
+    return ' '.join(parts)
+
+
+def build_tariff_index(db):
+    """Stream tariff_chapters + tariff ONCE and build a TariffIndex."""
+    index = TariffIndex()
+    seen = set()
+
+    try:
+        for doc in db.collection('tariff_chapters').limit(1000).stream():
+            data = doc.to_dict() or {}
+            hs = data.get('code', data.get('hs_code', ''))
+            if not hs:
+                continue
+            seen.add(hs)
+            index.add_document({
+                'hs_code': hs,
+                'description_he': data.get('description_he', data.get('title_he', '')),
+                'description_en': data.get('description_en', data.get('title_en', '')),
+                'duty_rate': data.get('duty_rate', ''),
+                'source': 'tariff_chapters',
+            }, _text_from(data, _CHAPTER_FIELDS))
+    except Exception as e:
+        index.complete = False
+        print(f'[tariff_index] tariff_chapters load error: {e}')
+
+    try:
+        for doc in db.collection('tariff').stream():
+            data = doc.to_dict() or {}
+            hs = data.get('hs_code', '')
+            if not hs or data.get('corrupt_code') or hs in seen:
+                continue
+            seen.add(hs)
+            index.add_document({
+                'hs_code': hs,
+                'description_he': data.get('description_he', ''),
+                'duty_rate': data.get('duty_rate', ''),
+                'source': 'tariff',
+            }, _text_from(data, _TARIFF_FIELDS))
+    except Exception as e:
+        index.complete = False
+        print(f'[tariff_index] tariff load error: {e}')
+
+    index.finalize()
+    print(f'[tariff_index] Built index: {len(index)} docs, {len(index.vocab)} tokens')
+    return index
+
+
+# ---------------------------------------------------------------------------
+# Snapshot (prebuilt index shipped with the function or written by a job)
+# ---------------------------------------------------------------------------
+
+def save_snapshot(index, path=_SNAPSHOT_PATH):
+    """Write docs, doc lengths and postings to a gzip JSON snapshot."""
+    payload = {
+        'version': _SNAPSHOT_VERSION,
+        'docs': index.docs,
+        'doc_lens': index.doc_lens,
+        'postings': {tok: [list(p) for p in plist] for tok, plist in index.postings.items()},
+    }
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, separators=(',', ':'))
+
+
+def load_snapshot(path=_SNAPSHOT_PATH):
+    """Load a snapshot written by save_snapshot(). Returns None if absent/invalid."""
+    if not os.path.isfile(path):
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            payload = json.load(f)
+        if payload.get('version') != _SNAPSHOT_VERSION:
+            return None
+        index = TariffIndex()
+        index.docs = payload['docs']
+        index.doc_lens = payload['doc_lens']
+        index.postings = {tok: [tuple(p) for p in plist]
+                          for tok, plist in payload['postings'].items()}
+        index.finalize()
+        print(f'[tariff_index] Loaded snapshot: {len(index)} docs')
+        return index
+    except Exception as e:
+        print(f'[tariff_index] snapshot load error: {e}')
+        return None
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+def get_tariff_index(db, snapshot_path=_SNAPSHOT_PATH):
+    """Return the process-wide index, building it on first use or after TTL.
+
+    An empty or partial build (transient Firestore error) is never pinned for
+    the full TTL: the last good index keeps serving, and the build is retried
+    after _BUILD_RETRY_SEC.
+
+    Once an index exists, an expired one is rebuilt by a single caller while
+    concurrent callers keep getting the stale index; the new index is swapped
+    in when the build finishes. Only the first build makes callers wait.
+    """
+    global _INDEX, _INDEX_EXPIRES
+    current = _INDEX
+    if current is not None and time.time() < _INDEX_EXPIRES:
+        return current
+    if not _INDEX_LOCK.acquire(blocking=current is None):
+        return current
+    try:
+        if _INDEX is not None and time.time() < _INDEX_EXPIRES:
+            return _INDEX
+        index = load_snapshot(snapshot_path) if _INDEX is None else None
+        if index is None:
+            index = build_tariff_index(db)
+        if index.complete and len(index):
+            _INDEX = index
+            _INDEX_EXPIRES = time.time() + _INDEX_TTL_SEC
+        else:
+            if _INDEX is None or not len(_INDEX):
+                _INDEX = index
+            _INDEX_EXPIRES = time.time() + _BUILD_RETRY_SEC
+        return _INDEX
+    finally:
+        _INDEX_LOCK.release()
+
+
+def search_tariff_index(db, keywords, limit=10):
+    """
+    Search tariff descriptions. Same result shape as the old streaming scan:
+    [{hs_code, score, description_he, description_en?, duty_rate, source}]
+    """
+    keywords = [k for k in (keywords or []) if k]
+    if not keywords:
+        return []
+    index = get_tariff_index(db)
+    results = []
+    for doc_idx, n_matched, bm25 in index.search(keywords, limit=limit):
+        meta = index.docs[doc_idx]
+        r = dict(meta)
+        if meta['source'] == 'tariff_chapters':
+            score = min(85, n_matched * 15)
+        else:
+            score = min(80, n_matched * 15)
+            desc_he = meta.get('description_he', '')
+            # Penalize entries with empty/short descriptions (low quality)
+            if not desc_he or len(desc_he.strip()) < 5:
+                score = max(10, score - 15)
+        r['score'] = score
+        r['bm25'] = round(bm25, 3)
+        results.append(r)
+    results.sort(key=lambda r: (r['score'], r['bm25']), reverse=True)
+    return results
+
+
+def reset_index():
+    """Drop the cached index. Useful for testing."""
+    global _INDEX, _INDEX_EXPIRES
+    _INDEX = None
+    _INDEX_EXPIRES = 0.0
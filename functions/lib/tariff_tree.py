@@ -8,7 +8,10 @@ with 18,032 import nodes across 9 levels.
 
 Public API:
     get_subtree(code_or_id, db=None)  -> dict or None
-    search_tree(query, db=None)       -> list of matches
+    search_tree(query, db=None)       -> list of ranked matches (first page)
+    search_tree_page(query, offset=0, limit=50, db=None)
+                                      -> {results, total, offset, limit}
+    tree_lexicon(db=None)             -> shared description lexicon (lexicon.py)
 """
 
 import os
@@ -17,6 +20,11 @@ import xml.etree.ElementTree as ET
 from dataclasses import dataclass, field
 from typing import Optional
 
+try:
+    from lib.lexicon import Lexicon, get_lexicon, reset_lexicons, strip_prefixes, tokenize
+except ImportError:
+    from lexicon import Lexicon, get_lexicon, reset_lexicons, strip_prefixes, tokenize
+
 # ---------------------------------------------------------------------------
 # Constants
 # ---------------------------------------------------------------------------
@@ -26,14 +34,26 @@ _CUSTOMS_ITEM_FILE = 'CustomsItem.xml'
 _DESCRIPTIONS_FILE = 'CustomsItemDetailsHistory.xml'
 _NS = 'http://malam.com/customs/CustomsBook/CBC_NG_8362_MSG01_CustomsBookOut'
 
-# Hebrew prefixes to strip when searching
-_HE_PREFIXES = ('של', 'וה', 'מ', 'ב', 'ל', 'ה', 'ו', 'כ', 'ש')
-
 # Module-level cached tree
 _TREE = None           # dict: {node_id: TariffNode}
 _FC_INDEX = None       # dict: {fc_string: node_id}
 _ROOT_IDS = None       # list of root node IDs (sections)
 
+# Token index over descriptions lives in the shared lexicon under this name;
+# postings are (node_id, field_bits, 0)
+LEXICON_NAME = 'tariff_tree'
+FIELD_HE = 1
+FIELD_EN = 2
+
+# Descriptions are indexed without a stop list so search_tree can find any word
+_NO_STOP = frozenset()
+# Strip prefixes from any word whose stem keeps 2+ chars ("מעץ" -> "עץ")
+_STRIP_MIN_LEN = 0
+
+# Prefix expansion: query "crane" also hits "cranes"; capped per variant
+_MIN_EXPAND_LEN = 3
+_MAX_EXPANSIONS = 60
+
 # Characters that can appear in XML and break parsing
 _INVALID_XML_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
 
@@ -287,6 +307,26 @@ def _build_fc_index(nodes: dict) -> dict:
     return idx
 
 
+# ---------------------------------------------------------------------------
+# Token index builder (for search_tree)
+# ---------------------------------------------------------------------------
+
+def _build_token_index(nodes: dict) -> Lexicon:
+    """
+    Build the description lexicon: every desc_he/desc_en token, together with
+    its Hebrew prefix-stripped variants, maps to (node_id, field_bits).
+    """
+    postings = {}
+    for nid, node in nodes.items():
+        for text, bit in ((node.desc_he, FIELD_HE), (node.desc_en, FIELD_EN)):
+            for tok in tokenize(text, _NO_STOP):
+                for variant in strip_prefixes(tok, _STRIP_MIN_LEN):
+                    entry = postings.setdefault(variant, {})
+                    entry[nid] = entry.get(nid, 0) | bit
+    return Lexicon.build({tok: [(nid, bits, 0) for nid, bits in entry.items()]
+                          for tok, entry in postings.items()})
+
+
 # ---------------------------------------------------------------------------
 # Main loader
 # ---------------------------------------------------------------------------
@@ -333,6 +373,7 @@ def load_tariff_tree(db=None) -> tuple:
     _TREE = nodes
     _FC_INDEX = fc_index
     _ROOT_IDS = root_ids
+    reset_lexicons(LEXICON_NAME)
 
     return _TREE, _FC_INDEX, _ROOT_IDS
 
@@ -439,13 +480,7 @@ def _build_path(node: TariffNode, nodes: dict) -> list:
 
 def _strip_he_prefixes(word: str) -> list:
     """Return the word plus variants with Hebrew prefixes stripped."""
-    variants = [word]
-    for prefix in _HE_PREFIXES:
-        if word.startswith(prefix) and len(word) > len(prefix):
-            stripped = word[len(prefix):]
-            if stripped not in variants:
-                variants.append(stripped)
-    return variants
+    return strip_prefixes(word, _STRIP_MIN_LEN)
 
 
 # ---------------------------------------------------------------------------
@@ -489,59 +524,82 @@ def get_subtree(code_or_id, db=None) -> Optional[dict]:
     return None
 
 
-def search_tree(query: str, db=None) -> list:
+def tree_lexicon(db=None) -> Lexicon:
+    """Shared description lexicon for the loaded tree (built once, on first use)."""
+    load_tariff_tree(db)
+    return get_lexicon(LEXICON_NAME, lambda: _build_token_index(_TREE or {}))
+
+
+def search_tree_page(query: str, offset: int = 0, limit: int = 50, db=None) -> dict:
     """
-    Search Hebrew or English descriptions in the tree.
+    Ranked, paginated search over Hebrew and English descriptions.
+
+    A node matches if it contains any query word (with Hebrew prefix
+    stripping and prefix extension, e.g. "crane" -> "cranes"). Ranking:
+    number of distinct query words matched, then depth (level), then leaf
+    nodes before inner nodes, then FC order.
 
-    Returns list of matches, each with full path from Section down to the match.
-    Supports Hebrew prefix stripping (מ,ב,ל,ה,ו,כ,ש).
-    Returns up to 50 results.
+    Returns {'results': [...], 'total': int, 'offset': int, 'limit': int};
+    each result carries the full path from Section down to the match.
     """
+    page = {'results': [], 'total': 0, 'offset': offset, 'limit': limit}
     nodes, fc_index, root_ids = load_tariff_tree(db)
     if not nodes:
-        return []
-
-    query = (query or '').strip()
-    if not query:
-        return []
-
-    query_lower = query.lower()
-
-    # Build search terms with Hebrew prefix variants
-    words = query_lower.split()
-    search_variants = []
-    for w in words:
-        search_variants.extend(_strip_he_prefixes(w))
+        return page
+
+    # Same tokenizer as the index, so "t-shirt" looks up "shirt" as descriptions do
+    words = []
+    for w in tokenize(query, _NO_STOP):
+        if w not in words:
+            words.append(w)
+    if not words:
+        return page
+
+    lex = tree_lexicon(db)
+
+    overlap = {}   # node_id -> count of query words matched
+    fields = {}    # node_id -> OR of field bits over all matched tokens
+    for word in words:
+        hit_bits = {}
+        for variant in strip_prefixes(word, _STRIP_MIN_LEN):
+            for tok in lex.expand(variant, _MIN_EXPAND_LEN, _MAX_EXPANSIONS):
+                for nid, bits, _ in lex.postings(tok):
+                    hit_bits[nid] = hit_bits.get(nid, 0) | bits
+        for nid, bits in hit_bits.items():
+            overlap[nid] = overlap.get(nid, 0) + 1
+            fields[nid] = fields.get(nid, 0) | bits
+
+    ranked = sorted(
+        overlap,
+        key=lambda nid: (-overlap[nid], -nodes[nid].level,
+                         1 if nodes[nid].children else 0, nodes[nid].fc),
+    )
+    page['total'] = len(ranked)
+
+    for nid in ranked[offset:offset + limit]:
+        node = nodes[nid]
+        page['results'].append({
+            'fc': node.fc,
+            'hs': node.hs_formatted,
+            'level': node.level,
+            'desc_he': node.desc_he,
+            'desc_en': node.desc_en,
+            'path': _build_path(node, nodes),
+            'match_field': 'desc_he' if fields[nid] & FIELD_HE else 'desc_en',
+            'matched_terms': overlap[nid],
+        })
+    return page
+
+
+def search_tree(query: str, db=None, offset: int = 0, limit: int = 50) -> list:
+    """
+    Search Hebrew or English descriptions in the tree.
 
-    results = []
-    for nid, node in nodes.items():
-        he = (node.desc_he or '').lower()
-        en = (node.desc_en or '').lower()
-        match_field = None
-
-        # Check if any variant matches
-        for variant in search_variants:
-            if variant in he:
-                match_field = 'desc_he'
-                break
-            if variant in en:
-                match_field = 'desc_en'
-                break
-
-        if match_field:
-            results.append({
-                'fc': node.fc,
-                'hs': node.hs_formatted,
-                'level': node.level,
-                'desc_he': node.desc_he,
-                'desc_en': node.desc_en,
-                'path': _build_path(node, nodes),
-                'match_field': match_field,
-            })
-            if len(results) >= 50:
-                break
-
-    return results
+    Returns list of matches, best first, each with full path from Section
+    down to the match. Supports Hebrew prefix stripping (מ,ב,ל,ה,ו,כ,ש).
+    Returns up to `limit` results (default 50) starting at `offset`.
+    """
+    return search_tree_page(query, offset=offset, limit=limit, db=db)['results']
 
 
 def reset_cache():
@@ -550,3 +608,4 @@ def reset_cache():
     _TREE = None
     _FC_INDEX = None
     _ROOT_IDS = None
+    reset_lexicons(LEXICON_NAME)
@@ -0,0 +1,119 @@
+"""
+Post-processing shared by every extraction path.
+
+rcb_helpers, extraction_adapter, smart_extractor and the extraction engine
+used to carry their own copies of these helpers (and the copies had
+drifted: the adapter's tagger dropped countries / incoterms and the
+[DOCUMENT_ANALYSIS] wrapper). They all import from here now, so the AI
+agents see the same tags whichever backend extracted the document.
+
+    cleanup_hebrew_text(text)      -> whitespace + common Hebrew OCR fixes
+    tag_document_structure(text)   -> [DOCUMENT_ANALYSIS] header for the classifier
+    extract_urls_from_text(text)   -> appends a [URLS_FOUND] section
+"""
+
+import re
+
+_HEBREW_OCR_FIXES = {
+    'חשבוו': 'חשבון',
+    'מע"ט': 'מע"מ',
+    'עמיל מכם': 'עמיל מכס',
+    'מתווך מכס': 'עמיל מכס',
+    'מתווכי מכס': 'עמילי מכס',
+}
+
+_INVOICE_RE = re.compile(r'(?:invoice|inv|חשבונית|חשבון)[\s#:]*(\S+)', re.IGNORECASE)
+_DATE_RE = re.compile(r'\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}')
+_AMOUNT_PREFIX_RE = re.compile(r'(?:USD|EUR|ILS|NIS|\$|€|₪)\s*[\d,.]+', re.IGNORECASE)
+_AMOUNT_SUFFIX_RE = re.compile(r'[\d,.]+\s*(?:USD|EUR|ILS|NIS|\$|€|₪)', re.IGNORECASE)
+_HS_CODE_RE = re.compile(r'\b\d{4}[.\s]\d{2}(?:[.\s]\d{2,6})?\b')
+_BL_RE = re.compile(r'(?:B/?L|bill\s*of\s*lading|שטר\s*מטען)[\s#:]*(\S+)', re.IGNORECASE)
+_AWB_RE = re.compile(r'(?:AWB|air\s*waybill)[\s#:]*(\S+)', re.IGNORECASE)
+_COUNTRY_RE = re.compile(r'(?:China|India|Turkey|Germany|USA|Italy|Japan|Korea|Vietnam|Thailand|'
+                         r'סין|הודו|טורקיה|גרמניה|ארה"ב|איטליה|יפן|קוריאה|וייטנאם|תאילנד)',
+                         re.IGNORECASE)
+_INCOTERM_RE = re.compile(r'\b(?:FOB|CIF|CFR|EXW|DDP|DAP|FCA|CPT|CIP|DAT)\b', re.IGNORECASE)
+_URL_RE = re.compile(r'https?://[^\s<>"\')\]]+')
+
+
+def cleanup_hebrew_text(text):
+    """Fix common Hebrew/RTL extraction issues"""
+    if not text:
+        return text
+
+    # Normalize whitespace
+    text = re.sub(r' {3,}', '  ', text)  # Multiple spaces to double
+    text = re.sub(r'\n{4,}', '\n\n\n', text)  # Multiple newlines to max 3
+
+    # Fix common OCR mistakes in Hebrew customs context
+    for wrong, right in _HEBREW_OCR_FIXES.items():
+        text = text.replace(wrong, right)
+
+    return text
+
+
+def tag_document_structure(text):
+    """Tag document sections to help AI classification agent"""
+    if not text:
+        return text
+
+    tags = []
+
+    # Detect invoice number
+    inv_match = _INVOICE_RE.search(text)
+    if inv_match:
+        tags.append(f"[INVOICE_NUMBER: {inv_match.group(1)}]")
+
+    # Detect dates
+    dates = _DATE_RE.findall(text)
+    if dates:
+        tags.append(f"[DATES_FOUND: {', '.join(dates[:5])}]")
+
+    # Detect currency and amounts
+    amounts = _AMOUNT_PREFIX_RE.findall(text)
+    if not amounts:
+        amounts = _AMOUNT_SUFFIX_RE.findall(text)
+    if amounts:
+        tags.append(f"[AMOUNTS: {', '.join(amounts[:10])}]")
+
+    # Detect HS code patterns (XX.XX or XXXX.XX.XXXX)
+    hs_codes = _HS_CODE_RE.findall(text)
+    if hs_codes:
+        tags.append(f"[HS_CODE_CANDIDATES: {', '.join(set(hs_codes[:10]))}]")
+
+    # Detect BL/AWB numbers
+    bl_match = _BL_RE.search(text)
+    if bl_match:
+        tags.append(f"[BL_NUMBER: {bl_match.group(1)}]")
+
+    awb_match = _AWB_RE.search(text)
+    if awb_match:
+        tags.append(f"[AWB_NUMBER: {awb_match.group(1)}]")
+
+    # Detect country names
+    countries = _COUNTRY_RE.findall(text)
+    if countries:
+        tags.append(f"[COUNTRIES: {', '.join(set(countries[:5]))}]")
+
+    # Detect shipping terms
+    incoterms = _INCOTERM_RE.findall(text)
+    if incoterms:
+        tags.append(f"[INCOTERMS: {', '.join(set(incoterms))}]")
+
+    if tags:
+        header = "\n".join(tags)
+        return f"[DOCUMENT_ANALYSIS]\n{header}\n[/DOCUMENT_ANALYSIS]\n\n{text}"
+
+    return text
+
+
+def extract_urls_from_text(text):
+    """Detect URLs in text and append them as tagged section"""
+    if not text:
+        return text
+    urls = _URL_RE.findall(text)
+    if urls:
+        unique_urls = list(dict.fromkeys(urls))  # Preserve order, remove dupes
+        url_section = "\n[URLS_FOUND]\n" + "\n".join(unique_urls[:20]) + "\n[/URLS_FOUND]"
+        return text + url_section
+    return text
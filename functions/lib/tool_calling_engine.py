@@ -213,6 +213,16 @@ def tool_calling_classify(api_key, doc_text, db, gemini_key=None):
     # Session 54: Enforce call order — search_tariff runs BEFORE AI loop
     tariff_hits = {}     # High-confidence results that can replace AI
     tariff_context = {}  # All candidate lists as context hints for AI
+    try:
+        # One batched get_all for the index docs every search_tariff call below needs
+        from lib.intelligence import prefetch_index_docs
+        prefetch_index_docs(db, [
+            i.get("description", "") for i in items[:5]
+            if isinstance(i, dict) and i.get("description")
+            and i["description"][:50] not in memory_hits
+        ], seller_name=(invoice.get("seller") or ""))
+    except Exception as e:
+        print(f"  [TOOL ENGINE] Index prefetch error: {e}")
     for item in items[:5]:
         if not isinstance(item, dict):
             continue
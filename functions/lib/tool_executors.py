@@ -10,8 +10,11 @@ No new logic — just routing + caching + error handling.
 import hashlib
 import json
 import re
+import threading
 import time
 import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
 
 import requests
 
@@ -150,6 +153,118 @@ def _safe_get(url, params=None, headers=None, timeout=10):
         return None
 
 
+# ---------------------------------------------------------------------------
+# Process-level cache for _cached_external_lookup (shared by all ToolExecutors)
+#   tier 1: per-request dict (ToolExecutor._ext_cache)
+#   tier 2: this in-memory LRU — survives across requests on a warm instance
+#   tier 3: Firestore <collection>/<md5(key)> — survives cold starts
+# ---------------------------------------------------------------------------
+
+_EXT_MEM_MAX_ENTRIES = 2000
+_EXT_NEGATIVE_TTL_SEC = 600          # not-found / error results: retry after 10 min
+_EXT_STALE_FACTOR = 1.0              # serve expired entries for up to ttl * factor more
+_EXT_REFRESH_WORKERS = 2
+
+_EXT_MEM_CACHE = OrderedDict()       # ext_key -> (result, fresh_until, stale_until)
+_EXT_LOCK = threading.Lock()
+_EXT_REFRESHING = {}                 # ext_key -> Future of a background refresh
+_EXT_REFRESH_POOL = None
+_EXT_STATS = {"memory_hits": 0, "negative_hits": 0, "firestore_hits": 0, "stale_served": 0,
+              "misses": 0, "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+
+
+def _ext_now():
+    return time.time()
+
+
+def _ext_stat(name):
+    with _EXT_LOCK:
+        _EXT_STATS[name] += 1
+
+
+def _ext_mem_get(ext_key):
+    """Return (result, fresh_until, stale_until) or None. Moves the key to MRU."""
+    with _EXT_LOCK:
+        entry = _EXT_MEM_CACHE.get(ext_key)
+        if entry is not None:
+            _EXT_MEM_CACHE.move_to_end(ext_key)
+        return entry
+
+
+def _ext_mem_put(ext_key, result, fresh_until, stale_until):
+    with _EXT_LOCK:
+        _EXT_MEM_CACHE[ext_key] = (result, fresh_until, stale_until)
+        _EXT_MEM_CACHE.move_to_end(ext_key)
+        while len(_EXT_MEM_CACHE) > _EXT_MEM_MAX_ENTRIES:
+            _EXT_MEM_CACHE.popitem(last=False)
+            _EXT_STATS["evictions"] += 1
+
+
+def _is_positive(result):
+    return isinstance(result, dict) and bool(result.get("found"))
+
+
+def _clean_external_result(result, allowed_keys):
+    """Filter to allowed keys and sanitize free-text fields."""
+    if allowed_keys and isinstance(result, dict):
+        result = {k: v for k, v in result.items()
+                  if k in allowed_keys or k in ("found", "error", "source", "query", "message")}
+
+    if isinstance(result, dict):
+        for k, v in list(result.items()):
+            if isinstance(v, str) and k not in ("source", "query", "error", "message"):
+                result[k] = sanitize_external_text(
+                    v, max_length=1000 if k in ("extract", "indications_and_usage") else 500
+                )
+    return result
+
+
+def _schedule_ext_refresh(ext_key, refresh_fn):
+    """Run refresh_fn in the background unless a refresh for this key is in flight."""
+    global _EXT_REFRESH_POOL
+    with _EXT_LOCK:
+        if ext_key in _EXT_REFRESHING:
+            return _EXT_REFRESHING[ext_key]
+        if _EXT_REFRESH_POOL is None:
+            _EXT_REFRESH_POOL = ThreadPoolExecutor(max_workers=_EXT_REFRESH_WORKERS)
+        _EXT_STATS["refreshes"] += 1
+
+        def _run():
+            try:
+                refresh_fn()
+            except Exception as e:
+                _ext_stat("refresh_errors")
+                print(f"  [EXT_CACHE] refresh {ext_key[:60]} failed: {e}")
+            finally:
+                with _EXT_LOCK:
+                    _EXT_REFRESHING.pop(ext_key, None)
+
+        future = _EXT_REFRESH_POOL.submit(_run)
+        _EXT_REFRESHING[ext_key] = future
+        return future
+
+
+def get_external_cache_stats():
+    """Hit/miss counters and size of the process-level external lookup cache."""
+    with _EXT_LOCK:
+        stats = dict(_EXT_STATS)
+        stats["entries"] = len(_EXT_MEM_CACHE)
+        stats["refreshing"] = len(_EXT_REFRESHING)
+    return stats
+
+
+def clear_external_cache(wait_refreshes=True):
+    """Drop the process-level cache and reset stats. Useful for testing."""
+    if wait_refreshes:
+        with _EXT_LOCK:
+            futures = list(_EXT_REFRESHING.values())
+        wait(futures, timeout=5)
+    with _EXT_LOCK:
+        _EXT_MEM_CACHE.clear()
+        for k in _EXT_STATS:
+            _EXT_STATS[k] = 0
+
+
 class ToolExecutor:
     """Routes tool calls to existing module functions."""
 
@@ -267,8 +382,10 @@ class ToolExecutor:
             return {"error": str(e), "tool": tool_name}
 
     def get_stats(self):
-        """Return tool call counts for logging."""
-        return dict(self._stats)
+        """Return tool call counts for logging, plus external cache counters."""
+        stats = dict(self._stats)
+        stats["external_cache"] = get_external_cache_stats()
+        return stats
 
     # ------------------------------------------------------------------
     # Tool implementations
@@ -2049,12 +2166,34 @@ class ToolExecutor:
     # ------------------------------------------------------------------
 
     def _cached_external_lookup(self, cache_key, collection_name, ttl_days, fetcher_fn, allowed_keys=None):
-        """Shared external API lookup with per-request + Firestore caching.
-        fetcher_fn() should return a dict (the raw result)."""
+        """Shared external API lookup: per-request -> process LRU -> Firestore -> live.
+
+        fetcher_fn() should return a dict (the raw result). Found results are
+        kept for ttl_days; not-found/error results for _EXT_NEGATIVE_TTL_SEC
+        (memory only). Expired found results are served stale for up to
+        another ttl * _EXT_STALE_FACTOR while a background refresh runs.
+        """
         ext_key = f"{collection_name}:{cache_key}"
         if ext_key in self._ext_cache:
             return self._ext_cache[ext_key]
 
+        ttl_sec = ttl_days * 86400
+        now = _ext_now()
+
+        # Tier 2: process memory
+        entry = _ext_mem_get(ext_key)
+        if entry is not None:
+            result, fresh_until, stale_until = entry
+            if now < fresh_until:
+                _ext_stat("memory_hits" if _is_positive(result) else "negative_hits")
+                return self._remember_ext(ext_key, result)
+            if now < stale_until and _is_positive(result):
+                _ext_stat("stale_served")
+                self._refresh_external(ext_key, cache_key, collection_name, ttl_sec,
+                                       fetcher_fn, allowed_keys)
+                return self._remember_ext(ext_key, result)
+
+        # Tier 3: Firestore
         doc_id = hashlib.md5(cache_key.encode()).hexdigest()
         try:
             cached_doc = self.db.collection(collection_name).document(doc_id).get()
@@ -2062,36 +2201,52 @@ class ToolExecutor:
                 data = cached_doc.to_dict()
                 cached_at = data.get("cached_at", "")
                 if cached_at:
-                    from datetime import datetime, timezone, timedelta
+                    from datetime import datetime
                     try:
-                        cached_dt = datetime.fromisoformat(cached_at.replace("Z", "+00:00"))
-                        if datetime.now(timezone.utc) - cached_dt < timedelta(days=ttl_days):
+                        cached_ts = datetime.fromisoformat(cached_at.replace("Z", "+00:00")).timestamp()
+                        fresh_until = cached_ts + ttl_sec
+                        stale_until = fresh_until + ttl_sec * _EXT_STALE_FACTOR
+                        if now < stale_until:
                             result = data.get("result", {})
                             result["source"] = f"{collection_name}"
-                            self._ext_cache[ext_key] = result
-                            return result
+                            _ext_mem_put(ext_key, result, fresh_until, stale_until)
+                            if now < fresh_until:
+                                _ext_stat("firestore_hits")
+                            else:
+                                _ext_stat("stale_served")
+                                self._refresh_external(ext_key, cache_key, collection_name,
+                                                       ttl_sec, fetcher_fn, allowed_keys)
+                            return self._remember_ext(ext_key, result)
                     except (ValueError, TypeError):
                         pass
         except Exception:
             pass
 
-        result = fetcher_fn()
-
-        if allowed_keys and isinstance(result, dict):
-            result = {k: v for k, v in result.items()
-                      if k in allowed_keys or k in ("found", "error", "source", "query", "message")}
+        # Live fetch
+        _ext_stat("misses")
+        result = self._fetch_external(ext_key, cache_key, collection_name, ttl_sec,
+                                      fetcher_fn, allowed_keys)
+        return self._remember_ext(ext_key, result)
 
+    def _remember_ext(self, ext_key, result):
+        """Store in the per-request tier. Dicts are copied so callers can't mutate shared entries."""
         if isinstance(result, dict):
-            for k, v in list(result.items()):
-                if isinstance(v, str) and k not in ("source", "query", "error", "message"):
-                    result[k] = sanitize_external_text(
-                        v, max_length=1000 if k in ("extract", "indications_and_usage") else 500
-                    )
-
+            result = dict(result)
         self._ext_cache[ext_key] = result
-        if isinstance(result, dict) and result.get("found"):
+        return result
+
+    def _fetch_external(self, ext_key, cache_key, collection_name, ttl_sec, fetcher_fn,
+                        allowed_keys, keep_stale=False):
+        """Call fetcher_fn, clean the result and write it to memory (+ Firestore if found)."""
+        result = _clean_external_result(fetcher_fn(), allowed_keys)
+        now = _ext_now()
+
+        if _is_positive(result):
+            fresh_until = now + ttl_sec
+            _ext_mem_put(ext_key, result, fresh_until, fresh_until + ttl_sec * _EXT_STALE_FACTOR)
             try:
                 from datetime import datetime, timezone
+                doc_id = hashlib.md5(cache_key.encode()).hexdigest()
                 self.db.collection(collection_name).document(doc_id).set({
                     "cache_key": cache_key,
                     "result": result,
@@ -2099,9 +2254,20 @@ class ToolExecutor:
                 })
             except Exception:
                 pass
-
+        elif keep_stale and (entry := _ext_mem_get(ext_key)) is not None:
+            # Refresh came back empty — keep serving the stale hit, retry later
+            _ext_mem_put(ext_key, entry[0], now + _EXT_NEGATIVE_TTL_SEC, entry[2])
+        else:
+            negative_until = now + min(_EXT_NEGATIVE_TTL_SEC, ttl_sec)
+            _ext_mem_put(ext_key, result, negative_until, negative_until)
         return result
 
+    def _refresh_external(self, ext_key, cache_key, collection_name, ttl_sec, fetcher_fn, allowed_keys):
+        """Refresh an expired entry in the background (stale-while-revalidate)."""
+        return _schedule_ext_refresh(ext_key, lambda: self._fetch_external(
+            ext_key, cache_key, collection_name, ttl_sec, fetcher_fn, allowed_keys,
+            keep_stale=True))
+
     # ------------------------------------------------------------------
     # Tool #15: search_wikidata
     # ------------------------------------------------------------------
@@ -360,14 +360,16 @@ def tracker_process_email(msg, db, firestore_module, access_token, rcb_email, ge
         full_text = f"{subject}\n{clean_body}"
 
         # ── STEP 2: Extract text from attachments (PDFs, images) ──
+        # Metadata first; only extractable attachments are downloaded (streamed via $value)
         attachment_text = ""
         attachment_names = []
+        raw_atts = []
         if has_attachments and access_token:
             try:
-                from lib.rcb_helpers import helper_graph_attachments, extract_text_from_attachments
-                raw_atts = helper_graph_attachments(access_token, rcb_email, msg_id)
+                from lib.rcb_helpers import helper_graph_fetch_attachments, extract_text_from_attachments
+                att_meta, raw_atts = helper_graph_fetch_attachments(access_token, rcb_email, msg_id)
+                attachment_names = [a.get('name', '') for a in att_meta if a.get('name')]
                 if raw_atts:
-                    attachment_names = [a.get('name', '') for a in raw_atts if a.get('name')]
                     attachment_text = extract_text_from_attachments(raw_atts)
                     if attachment_text:
                         full_text = f"{full_text}\n{attachment_text}"
@@ -379,14 +381,14 @@ def tracker_process_email(msg, db, firestore_module, access_token, rcb_email, ge
         attachment_tables = []
         if has_attachments and access_token and attachment_names:
             try:
-                import base64
+                from lib.rcb_helpers import attachment_bytes
                 from lib.table_extractor import TableExtractor
                 _tbl_extractor = TableExtractor()
                 for att in raw_atts:
                     att_name = att.get('name', '')
-                    if att_name.lower().endswith('.pdf') and att.get('contentBytes'):
+                    if att_name.lower().endswith('.pdf'):
                         try:
-                            pdf_bytes = base64.b64decode(att['contentBytes'])
+                            pdf_bytes = attachment_bytes(att)
                             tbl_result = _tbl_extractor.extract_tables(pdf_bytes, "application/pdf")
                             if tbl_result.get('tables'):
                                 attachment_tables.extend(tbl_result['tables'])
@@ -395,6 +397,9 @@ def tracker_process_email(msg, db, firestore_module, access_token, rcb_email, ge
                             pass
             except (ImportError, NameError):
                 pass
+        if raw_atts:
+            from lib.rcb_helpers import close_attachments
+            close_attachments(raw_atts)
 
         # ── STEP 3: Check for follow/stop commands ──
         command = _detect_command(subject, clean_body)
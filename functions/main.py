@@ -14,15 +14,16 @@ Functions:
 import firebase_admin
 from firebase_admin import credentials, firestore, storage
 from firebase_functions import scheduler_fn, firestore_fn, https_fn, options
-from google.api_core.exceptions import AlreadyExists
 import json
 import os
 import re
 from lib.classification_agents import run_full_classification, build_classification_email, process_and_send_report
 from lib.knowledge_query import detect_knowledge_query, handle_knowledge_query
 from lib.rcb_id import generate_rcb_id, RCBType
+from lib.rcb_claims import ClaimManager, claim_doc_id, queue_retry
+from lib.graph_batch import GraphBatchSession, activate_graph_batch, deactivate_graph_batch
 from lib.extraction_adapter import extract_text_from_attachments
-from lib.rcb_helpers import helper_get_graph_token, helper_graph_messages, helper_graph_attachments, helper_graph_mark_read, helper_graph_send, to_hebrew_name, build_rcb_reply, get_rcb_secrets_internal, is_direct_recipient
+from lib.rcb_helpers import helper_get_graph_token, helper_graph_messages, helper_graph_attachments, helper_graph_attachment_list, helper_graph_mark_read, helper_graph_send, to_hebrew_name, build_rcb_reply, get_rcb_secrets_internal, is_direct_recipient, helper_graph_inbox_sync, save_inbox_delta_link, helper_graph_get_message, set_reply_checkpoint, reset_reply_checkpoint
 
 # ── Optional agent imports (fail gracefully if modules have issues) ──
 try:
@@ -490,11 +491,11 @@ def api(req: https_fn.Request) -> https_fn.Response:
 
 def graph_forward_email(access_token, user_email, message_id, to_email, comment):
     """Forward email"""
-    import requests
+    from lib.graph_client import graph_request
     try:
         url = f"https://graph.microsoft.com/v1.0/users/{user_email}/messages/{message_id}/forward"
-        requests.post(url, headers={'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'},
-                     json={'comment': comment, 'toRecipients': [{'emailAddress': {'address': to_email}}]})
+        graph_request('POST', url, access_token,
+                      json={'comment': comment, 'toRecipients': [{'emailAddress': {'address': to_email}}]})
         return True
     except Exception as e:
         print(f"Graph forward error: {e}")
@@ -978,663 +979,793 @@ def _rcb_check_email_inner(event) -> None:
     from datetime import datetime, timedelta, timezone
     # Session 47: Restored 2-day lookback (was temporarily 2h after hash fix)
     two_days_ago = (datetime.utcnow() - timedelta(days=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
-    
-    url = f"https://graph.microsoft.com/v1.0/users/{rcb_email}/mailFolders/inbox/messages"
-    params = {
-        '$top': 50,
-        '$orderby': 'receivedDateTime desc',
-        '$filter': f"receivedDateTime ge {two_days_ago}"
-    }
-    
-    import requests
-    response = requests.get(url, headers={'Authorization': f'Bearer {access_token}'}, params=params)
-    messages = response.json().get('value', []) if response.status_code == 200 else []
-    
+
+    # Delta sync: only new/changed messages since the last tick (stored delta link),
+    # falling back to the paged 2-day window scan when the link is missing/expired
+    messages, inbox_next_link, sync_mode = helper_graph_inbox_sync(
+        access_token, rcb_email, get_db(), two_days_ago)
+
+    # Messages whose claim lease expired (run crashed / timed out) or that rcb_retry_failed
+    # queued — delta won't return them again, so re-fetch them by id
+    claims = ClaimManager(get_db())
+    _seen_ids = {m.get('id') for m in messages}
+    for _rid in claims.recover_expired() + claims.take_retries():
+        if _rid not in _seen_ids:
+            _rmsg = helper_graph_get_message(access_token, rcb_email, _rid)
+            if _rmsg:
+                messages.append(_rmsg)
+                _seen_ids.add(_rid)
+
     if not messages:
-        print("📭 No messages in last 2 days")
+        print(f"📭 No new messages ({sync_mode})")
+        if inbox_next_link:
+            save_inbox_delta_link(get_db(), rcb_email, inbox_next_link)
         return
-    
-    print(f"📬 Found {len(messages)} messages in last 2 days")
-    
+
+    print(f"📬 Found {len(messages)} messages ({sync_mode})")
+
+    # One get_all for every rcb_processed claim doc — known ids are skipped in memory
+    already = claims.prefetch([m.get('id') for m in messages])
+    if already:
+        print(f"  RC-001: {already}/{len(messages)} messages already claimed")
+
+    ctx = {"access_token": access_token, "rcb_email": rcb_email, "claims": claims}
+    # Mark-read and attachment calls of this run are coalesced into Graph $batch requests
+    graph_batch = GraphBatchSession(access_token, rcb_email)
+    activate_graph_batch(graph_batch)
+    try:
+        jobs = _rcb_claim_jobs(messages, claims, rcb_email, access_token)
+        with_attachments = [(lane, msg.get('id')) for lane, msg, _ in jobs if msg.get('hasAttachments')]
+        # Metadata lists only; bodies are downloaded per message by the lane that needs them
+        graph_batch.plan_attachments([m for _, m in with_attachments])
+        _rcb_run_jobs(jobs, ctx)
+    finally:
+        deactivate_graph_batch()
+        graph_batch.flush_mark_read()
+
+    # Advance the delta link only after every message was looked at
+    save_inbox_delta_link(get_db(), rcb_email, inbox_next_link)
+    from lib.graph_client import get_graph_stats
+    print(f"✅ RCB check complete | claims: {claims.stats()} | graph: {get_graph_stats()} "
+          f"| batch: {graph_batch.stats()}")
+
+
+def _rcb_claim_jobs(messages, claims, rcb_email, access_token):
+    """Apply the skip rules and claim each message. Returns [(lane, msg, safe_id)]."""
+    jobs = []
     for msg in messages:
+        lane = _rcb_message_lane(msg, rcb_email, access_token)
         msg_id = msg.get('id')
-        internet_msg_id = msg.get('internetMessageId', '')  # RFC 2822 Message-ID for threading
-        subject = msg.get('subject', 'No Subject')
-        from_data = msg.get('from', {}).get('emailAddress', {})
-        from_email = from_data.get('address', '')
-        from_name = from_data.get('name', '')
-        to_recipients = msg.get('toRecipients', [])
-        
-        # Check if sent TO rcb@ (not CC)
-        is_direct = any(rcb_email.lower() in r.get('emailAddress', {}).get('address', '').lower() 
-                       for r in to_recipients)
-        
-        print(f"    DEBUG: {subject[:30]} from={from_email} is_direct={is_direct}")
-
-        # Skip system emails for all paths
-        if from_email.lower() == rcb_email.lower():
-            continue  # Never process our own outgoing emails (prevents feedback loop)
-        if from_email.lower() == 'cc@rpa-port.co.il':
-            continue  # Session 47: Digest group — read only, never process as sender
-        if 'undeliverable' in subject.lower() or 'backup' in subject.lower():
+        if not lane:
+            claims.ack_retry(msg_id)
             continue
-        if '[RCB-SELFTEST]' in subject:
+        safe_id = claims.claim(msg_id, _RCB_CLAIM_TYPES[lane])
+        if not safe_id:
+            print(f"  RC-001: {claim_doc_id(msg_id)} already claimed ({lane}), skipping")
             continue
+        jobs.append((lane, msg, safe_id))
+    return jobs
 
-        # Session 73: Skip auto-replies / out-of-office (prevents reply loops)
-        _subj_lower = subject.lower()
-        if any(s in _subj_lower for s in ('אני לא נמצא', 'automatic reply', 'out of office', 'שליחה אוטומטית')):
-            helper_graph_mark_read(access_token, rcb_email, msg_id)
-            continue
-        # Check X-Auto-Response-Suppress header (Graph exposes as internetMessageHeaders)
-        _msg_headers = msg.get('internetMessageHeaders') or []
-        if any(h.get('name', '').lower() == 'x-auto-response-suppress' for h in _msg_headers):
-            helper_graph_mark_read(access_token, rcb_email, msg_id)
-            continue
-        # OOO from doron@ with "אשוב" in body
-        if from_email.lower() == 'doron@rpa-port.co.il':
-            _body_preview = (msg.get('bodyPreview') or msg.get('body', {}).get('content', '') or '')[:500]
-            if 'אשוב' in _body_preview:
-                helper_graph_mark_read(access_token, rcb_email, msg_id)
-                continue
 
-        # ── Block A2: Customs declarations forwarded from airpaport@gmail ──
-        if '[DECL]' in subject.upper():
-            import hashlib as _hl_decl
-            safe_id_decl = _hl_decl.md5(msg_id.encode()).hexdigest()
-            try:
-                get_db().collection("rcb_processed").document(safe_id_decl).create({
-                    "processed_at": firestore.SERVER_TIMESTAMP,
-                    "locked_by": "rcb_check_email",
-                    "type": "declaration_pending",
-                })
-            except AlreadyExists:
-                print(f"  RC-001: {safe_id_decl} already claimed (decl), skipping")
-                continue
-            print(f"  📜 Declaration received: {subject[:50]} from {from_email}")
-            try:
-                decl_attachments = helper_graph_attachments(access_token, rcb_email, msg_id)
-                decl_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
-                decl_doc = {
-                    "received_at": firestore.SERVER_TIMESTAMP,
-                    "subject": subject,
-                    "from": from_email,
-                    "from_name": from_name,
-                    "msg_id": msg_id,
-                    "internet_message_id": internet_msg_id,
-                    "body": decl_body[:50000],  # Cap at 50k chars
-                    "attachment_count": len(decl_attachments),
-                    "attachments": [
-                        {"name": a.get("name", ""), "size": a.get("size", 0),
-                         "contentType": a.get("contentType", "")}
-                        for a in decl_attachments
-                        if a.get("@odata.type") == "#microsoft.graph.fileAttachment"
-                    ],
-                    "status": "pending_parse",  # Block G will process
-                }
-                get_db().collection("declarations_raw").add(decl_doc)
-                print(f"  ✅ Declaration saved ({len(decl_attachments)} attachments)")
-            except Exception as decl_err:
-                print(f"  ⚠️ Declaration save error (non-fatal): {decl_err}")
-            helper_graph_mark_read(access_token, rcb_email, msg_id)
-            get_db().collection("rcb_processed").document(safe_id_decl).set({
-                "processed_at": firestore.SERVER_TIMESTAMP,
-                "subject": subject,
-                "from": from_email,
-                "type": "declaration_received",
-            })
-            continue
+# ── rcb_check_email message pipeline ──
+# Each inbox message is claimed (leased) in the main thread, then handled on a
+# lane pool: "cc" for cheap silent observation and declarations, "direct" for
+# the expensive classification/reply pipeline. RCB_PIPELINE_MODE=serial runs
+# the claimed messages one at a time, as before.
 
-        # ── CC emails: silent learning from ALL senders, no reply ──
-        if not is_direct:
-            import hashlib as _hl
-            safe_id_cc = _hl.md5(msg_id.encode()).hexdigest()
-            try:
-                get_db().collection("rcb_processed").document(safe_id_cc).create({
-                    "processed_at": firestore.SERVER_TIMESTAMP,
-                    "locked_by": "rcb_check_email",
-                    "type": "cc_pending",
-                })
-            except AlreadyExists:
-                print(f"  RC-001: {safe_id_cc} already claimed (cc), skipping")
-                continue
+RCB_PIPELINE_MODE = os.environ.get("RCB_PIPELINE_MODE", "concurrent")
+RCB_LANE_WORKERS = {"cc": 4, "direct": 2}
+RCB_RUN_BUDGET_SEC = 420     # stop starting new messages; function timeout is 540s
+RCB_RUN_GRACE_SEC = 90       # then wait this long for in-flight messages
 
-            print(f"  👁️ CC observation: {subject[:50]} from {from_email}")
+_RCB_CLAIM_TYPES = {"decl": "declaration_pending", "cc": "cc_pending", "direct": "direct_pending"}
+_RCB_JOB_LANES = {"decl": "cc", "cc": "cc", "direct": "direct"}
 
-            # Pupil: silent observation (FREE — Firestore only, no replies)
-            if PUPIL_AVAILABLE:
-                try:
-                    pupil_process_email(
-                        msg, get_db(), firestore, access_token, rcb_email, get_secret
-                    )
-                except Exception as pe:
-                    print(f"    ⚠️ Pupil CC error (non-fatal): {pe}")
-
-            # Tracker: observe shipping updates (FREE — no notifications when is_direct=False)
-            tracker_result = None
-            if TRACKER_AVAILABLE:
-                try:
-                    tracker_result = tracker_process_email(
-                        msg, get_db(), firestore, access_token, rcb_email, get_secret,
-                        is_direct=False
-                    )
-                except Exception as te:
-                    print(f"    ⚠️ Tracker CC error (non-fatal): {te}")
-
-            # Sanctions screening: check shipper/consignee from tracker deal
-            if tracker_result and tracker_result.get("deal_id"):
-                try:
-                    _screen_deal_parties(get_db(), tracker_result["deal_id"],
-                                         get_secret, access_token, rcb_email)
-                except Exception as san_err:
-                    print(f"    ⚠️ Sanctions screening error (non-fatal): {san_err}")
 
-            # Schedule: detect vessel schedule emails (FREE — Firestore only)
-            if SCHEDULE_AVAILABLE:
-                try:
-                    _sched_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
-                    if is_schedule_email(subject, _sched_body, from_email):
-                        print(f"  🚢 Schedule email detected: {subject[:50]}")
-                        process_schedule_email(
-                            get_db(), subject, _sched_body, from_email, msg_id
-                        )
-                except Exception as se:
-                    print(f"    ⚠️ Schedule CC error (non-fatal): {se}")
-
-            # Session 79: CC path = process/learn/prepare silently, NEVER send.
-            # Gap 2: When deal accumulates invoice + shipping doc → classify silently,
-            # store result on deal. Email send happens in tracker poll.
-            if (tracker_result and tracker_result.get("classification_ready")
-                    and tracker_result.get("deal_id")):
-                try:
-                    _gap2_deal_id = tracker_result["deal_id"]
-                    print(f"  📋 Gap 2: Deal {_gap2_deal_id} ready for classification")
-                    _gap2_text = _aggregate_deal_text(get_db(), _gap2_deal_id)
-                    if _gap2_text and len(_gap2_text) > 50:
-                        _run_gap2_silent_classification(
-                            get_db(), firestore, _gap2_deal_id, _gap2_text, get_secret)
-                    else:
-                        print(f"    Gap 2: text too short ({len(_gap2_text or '')} chars)")
-                except Exception as gap2_err:
-                    print(f"    ⚠️ Gap 2 auto-trigger error (non-fatal): {gap2_err}")
-
-            get_db().collection("rcb_processed").document(safe_id_cc).set({
-                "processed_at": firestore.SERVER_TIMESTAMP,
-                "subject": subject,
-                "from": from_email,
-                "type": "cc_observation",
-            })
-            continue
+def _rcb_message_lane(msg, rcb_email, access_token):
+    """Skip rules for every inbox message. Returns "decl", "cc", "direct", or None to skip."""
+    msg_id = msg.get('id')
+    subject = msg.get('subject', 'No Subject')
+    from_email = msg.get('from', {}).get('emailAddress', {}).get('address', '')
+    to_recipients = msg.get('toRecipients', [])
 
-        # ── Direct TO emails: full pipeline from ANY sender ──
-        # Session 79: RCB replies ONLY when rcb@ is SOLE TO recipient.
-        # Reply goes to sender if @rpa-port.co.il, or to team member in CC chain.
-        _reply_to = None
-        _is_sole_to = is_direct_recipient(msg, rcb_email, sole=True)
-        if _is_sole_to:
-            _sender_lower = from_email.lower()
-            if (_sender_lower.endswith('@rpa-port.co.il')
-                    and _sender_lower != 'cc@rpa-port.co.il'
-                    and _sender_lower != rcb_email.lower()):
-                _reply_to = from_email  # Team sender — reply directly
-                print(f"    📬 Sole-TO from {from_email} → will reply")
-            else:
-                # External sender or system address — find team member in CC chain
-                for _r in msg.get('ccRecipients', []):
-                    _addr = (_r.get('emailAddress', {}).get('address', '') or '').lower()
-                    if (_addr.endswith('@rpa-port.co.il')
-                            and _addr != rcb_email.lower()
-                            and _addr != 'cc@rpa-port.co.il'):
-                        _reply_to = _r.get('emailAddress', {}).get('address', '')
-                        break
-                if _reply_to:
-                    print(f"    📬 External sender {from_email} → reply to CC team member {_reply_to}")
-                else:
-                    print(f"    📬 External sender {from_email} → no team in chain, classify only")
-        else:
-            print(f"    📬 rcb@ not sole TO recipient — classify only, no reply")
+    # Check if sent TO rcb@ (not CC)
+    is_direct = any(rcb_email.lower() in r.get('emailAddress', {}).get('address', '').lower() 
+                   for r in to_recipients)
 
-        # Check if already processed — atomic claim via .create()
-        import hashlib; safe_id = hashlib.md5(msg_id.encode()).hexdigest()
+    print(f"    DEBUG: {subject[:30]} from={from_email} is_direct={is_direct}")
+
+    # Skip system emails for all paths
+    if from_email.lower() == rcb_email.lower():
+        return None  # Never process our own outgoing emails (prevents feedback loop)
+    if from_email.lower() == 'cc@rpa-port.co.il':
+        return None  # Session 47: Digest group — read only, never process as sender
+    if 'undeliverable' in subject.lower() or 'backup' in subject.lower():
+        return None
+    if '[RCB-SELFTEST]' in subject:
+        return None
+
+    # Session 73: Skip auto-replies / out-of-office (prevents reply loops)
+    _subj_lower = subject.lower()
+    if any(s in _subj_lower for s in ('אני לא נמצא', 'automatic reply', 'out of office', 'שליחה אוטומטית')):
+        helper_graph_mark_read(access_token, rcb_email, msg_id)
+        return None
+    # Check X-Auto-Response-Suppress header (Graph exposes as internetMessageHeaders)
+    _msg_headers = msg.get('internetMessageHeaders') or []
+    if any(h.get('name', '').lower() == 'x-auto-response-suppress' for h in _msg_headers):
+        helper_graph_mark_read(access_token, rcb_email, msg_id)
+        return None
+    # OOO from doron@ with "אשוב" in body
+    if from_email.lower() == 'doron@rpa-port.co.il':
+        _body_preview = (msg.get('bodyPreview') or msg.get('body', {}).get('content', '') or '')[:500]
+        if 'אשוב' in _body_preview:
+            helper_graph_mark_read(access_token, rcb_email, msg_id)
+            return None
+
+    # ── Block A2: Customs declarations forwarded from airpaport@gmail ──
+    if '[DECL]' in subject.upper():
+        return "decl"
+    # ── CC emails: silent learning from ALL senders, no reply ──
+    if not is_direct:
+        return "cc"
+    # ── Direct TO emails: full pipeline from ANY sender ──
+    return "direct"
+
+
+def _rcb_process_declaration(msg, safe_id_decl, ctx):
+    """Block A2: store a forwarded customs declaration for Block G to parse."""
+    access_token, rcb_email = ctx["access_token"], ctx["rcb_email"]
+    msg_id = msg.get('id')
+    internet_msg_id = msg.get('internetMessageId', '')
+    subject = msg.get('subject', 'No Subject')
+    from_data = msg.get('from', {}).get('emailAddress', {})
+    from_email = from_data.get('address', '')
+    from_name = from_data.get('name', '')
+
+    print(f"  📜 Declaration received: {subject[:50]} from {from_email}")
+    try:
+        decl_attachments = helper_graph_attachment_list(access_token, rcb_email, msg_id)
+        decl_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
+        decl_doc = {
+            "received_at": firestore.SERVER_TIMESTAMP,
+            "subject": subject,
+            "from": from_email,
+            "from_name": from_name,
+            "msg_id": msg_id,
+            "internet_message_id": internet_msg_id,
+            "body": decl_body[:50000],  # Cap at 50k chars
+            "attachment_count": len(decl_attachments),
+            "attachments": [
+                {"name": a.get("name", ""), "size": a.get("size", 0),
+                 "contentType": a.get("contentType", "")}
+                for a in decl_attachments
+                if a.get("@odata.type") == "#microsoft.graph.fileAttachment"
+            ],
+            "status": "pending_parse",  # Block G will process
+        }
+        get_db().collection("declarations_raw").add(decl_doc)
+        print(f"  ✅ Declaration saved ({len(decl_attachments)} attachments)")
+    except Exception as decl_err:
+        print(f"  ⚠️ Declaration save error (non-fatal): {decl_err}")
+    helper_graph_mark_read(access_token, rcb_email, msg_id)
+    get_db().collection("rcb_processed").document(safe_id_decl).set({
+        "processed_at": firestore.SERVER_TIMESTAMP,
+        "subject": subject,
+        "from": from_email,
+        "type": "declaration_received",
+    })
+
+
+def _rcb_process_cc(msg, safe_id_cc, ctx):
+    """CC lane: silent learning from ALL senders (Pupil, tracker, sanctions, schedule, Gap 2), no reply."""
+    access_token, rcb_email = ctx["access_token"], ctx["rcb_email"]
+    msg_id = msg.get('id')
+    subject = msg.get('subject', 'No Subject')
+    from_email = msg.get('from', {}).get('emailAddress', {}).get('address', '')
+
+    print(f"  👁️ CC observation: {subject[:50]} from {from_email}")
+
+    # Pupil: silent observation (FREE — Firestore only, no replies)
+    if PUPIL_AVAILABLE:
         try:
-            get_db().collection("rcb_processed").document(safe_id).create({
-                "processed_at": firestore.SERVER_TIMESTAMP,
-                "locked_by": "rcb_check_email",
-                "type": "direct_pending",
-            })
-        except AlreadyExists:
-            print(f"  RC-001: {safe_id} already claimed (direct), skipping")
-            continue
+            pupil_process_email(
+                msg, get_db(), firestore, access_token, rcb_email, get_secret
+            )
+        except Exception as pe:
+            print(f"    ⚠️ Pupil CC error (non-fatal): {pe}")
 
-        print(f"  📧 Processing: {subject[:50]} from {from_email}")
-        
-        # Get attachments
-        raw_attachments = helper_graph_attachments(access_token, rcb_email, msg_id)
-        attachments = []
-        for att in raw_attachments:
-            if att.get('@odata.type') == '#microsoft.graph.fileAttachment':
-                name = att.get('name', 'file')
-                ext = os.path.splitext(name)[1].lower()
-                attachments.append({'filename': name, 'type': ext})
-        
-        print(f"    📎 {len(attachments)} attachments")
+    # Tracker: observe shipping updates (FREE — no notifications when is_direct=False)
+    tracker_result = None
+    if TRACKER_AVAILABLE:
+        try:
+            tracker_result = tracker_process_email(
+                msg, get_db(), firestore, access_token, rcb_email, get_secret,
+                is_direct=False
+            )
+        except Exception as te:
+            print(f"    ⚠️ Tracker CC error (non-fatal): {te}")
 
-        # ── Brain Commander: Father channel check ──
-        # If doron@ sends a brain command, handle it and skip classification
-        if BRAIN_COMMANDER_AVAILABLE:
-            try:
-                brain_result = brain_commander_check(msg, get_db(), access_token, rcb_email, get_secret)
-                if brain_result and brain_result.get('handled'):
-                    print(f"    🧠 Brain Commander handled: {brain_result.get('command', {}).get('type', 'unknown')}")
-                    helper_graph_mark_read(access_token, rcb_email, msg_id)
-                    get_db().collection("rcb_processed").document(safe_id).set({
-                        "processed_at": firestore.SERVER_TIMESTAMP,
-                        "subject": subject,
-                        "from": from_email,
-                        "type": "brain_command",
-                    })
-                    continue
-            except Exception as bc_err:
-                print(f"    ⚠️ Brain Commander error (continuing normally): {bc_err}")
+    # Sanctions screening: check shipper/consignee from tracker deal
+    if tracker_result and tracker_result.get("deal_id"):
+        try:
+            _screen_deal_parties(get_db(), tracker_result["deal_id"],
+                                 get_secret, access_token, rcb_email)
+        except Exception as san_err:
+            print(f"    ⚠️ Sanctions screening error (non-fatal): {san_err}")
 
-        # ── FIX 6: Email conversation threading ──
-        # If subject contains an RCB tracking code, load original case context
-        _thread_context = None
+    # Schedule: detect vessel schedule emails (FREE — Firestore only)
+    if SCHEDULE_AVAILABLE:
         try:
-            _rcb_track_match = re.search(r'RCB[-|][QT]-\d{8}-\w{5}', subject)
-            if _rcb_track_match:
-                _track_code = _rcb_track_match.group(0)
-                # Look up original case in questions_log
-                _q_docs = get_db().collection("questions_log").where(
-                    "tracking_code", "==", _track_code
-                ).limit(1).stream()
-                for _qd in _q_docs:
-                    _qdata = _qd.to_dict()
-                    _thread_context = {
-                        "tracking_code": _track_code,
-                        "original_question": _qdata.get("question_text", _qdata.get("question", "")),
-                        "original_answer": _qdata.get("answer_text", _qdata.get("answer", "")),
-                        "original_intent": _qdata.get("intent", ""),
-                        "original_from": _qdata.get("from_email", ""),
-                    }
-                    print(f"    🧵 Thread match: {_track_code} — continuing conversation")
+            _sched_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
+            if is_schedule_email(subject, _sched_body, from_email):
+                print(f"  🚢 Schedule email detected: {subject[:50]}")
+                process_schedule_email(
+                    get_db(), subject, _sched_body, from_email, msg_id
+                )
+        except Exception as se:
+            print(f"    ⚠️ Schedule CC error (non-fatal): {se}")
+
+    # Session 79: CC path = process/learn/prepare silently, NEVER send.
+    # Gap 2: When deal accumulates invoice + shipping doc → classify silently,
+    # store result on deal. Email send happens in tracker poll.
+    if (tracker_result and tracker_result.get("classification_ready")
+            and tracker_result.get("deal_id")):
+        try:
+            _gap2_deal_id = tracker_result["deal_id"]
+            print(f"  📋 Gap 2: Deal {_gap2_deal_id} ready for classification")
+            _gap2_text = _aggregate_deal_text(get_db(), _gap2_deal_id)
+            if _gap2_text and len(_gap2_text) > 50:
+                _run_gap2_silent_classification(
+                    get_db(), firestore, _gap2_deal_id, _gap2_text, get_secret)
+            else:
+                print(f"    Gap 2: text too short ({len(_gap2_text or '')} chars)")
+        except Exception as gap2_err:
+            print(f"    ⚠️ Gap 2 auto-trigger error (non-fatal): {gap2_err}")
+
+    get_db().collection("rcb_processed").document(safe_id_cc).set({
+        "processed_at": firestore.SERVER_TIMESTAMP,
+        "subject": subject,
+        "from": from_email,
+        "type": "cc_observation",
+    })
+
+
+def _rcb_process_direct(msg, safe_id, ctx):
+    """Direct TO emails: full pipeline from ANY sender."""
+    from datetime import datetime, timedelta, timezone
+    access_token, rcb_email = ctx["access_token"], ctx["rcb_email"]
+    msg_id = msg.get('id')
+    internet_msg_id = msg.get('internetMessageId', '')  # RFC 2822 Message-ID for threading
+    subject = msg.get('subject', 'No Subject')
+    from_data = msg.get('from', {}).get('emailAddress', {})
+    from_email = from_data.get('address', '')
+    from_name = from_data.get('name', '')
+    is_direct = True
+
+    # Session 79: RCB replies ONLY when rcb@ is SOLE TO recipient.
+    # Reply goes to sender if @rpa-port.co.il, or to team member in CC chain.
+    _reply_to = None
+    _is_sole_to = is_direct_recipient(msg, rcb_email, sole=True)
+    if _is_sole_to:
+        _sender_lower = from_email.lower()
+        if (_sender_lower.endswith('@rpa-port.co.il')
+                and _sender_lower != 'cc@rpa-port.co.il'
+                and _sender_lower != rcb_email.lower()):
+            _reply_to = from_email  # Team sender — reply directly
+            print(f"    📬 Sole-TO from {from_email} → will reply")
+        else:
+            # External sender or system address — find team member in CC chain
+            for _r in msg.get('ccRecipients', []):
+                _addr = (_r.get('emailAddress', {}).get('address', '') or '').lower()
+                if (_addr.endswith('@rpa-port.co.il')
+                        and _addr != rcb_email.lower()
+                        and _addr != 'cc@rpa-port.co.il'):
+                    _reply_to = _r.get('emailAddress', {}).get('address', '')
                     break
-        except Exception:
-            pass  # Threading is nice-to-have, never block
+            if _reply_to:
+                print(f"    📬 External sender {from_email} → reply to CC team member {_reply_to}")
+            else:
+                print(f"    📬 External sender {from_email} → no team in chain, classify only")
+    else:
+        print(f"    📬 rcb@ not sole TO recipient — classify only, no reply")
 
-        # ── Three-Layer Email Triage (Session 74) ──
-        # Sits ON TOP of legacy flow. If triage handles it → continue.
-        # If not → legacy flow runs exactly as before.
-        _triage_handled = False
-        if EMAIL_TRIAGE_AVAILABLE:
+    print(f"  📧 Processing: {subject[:50]} from {from_email}")
+
+    # Get attachments
+    raw_attachments = helper_graph_attachments(access_token, rcb_email, msg_id)
+    attachments = []
+    for att in raw_attachments:
+        if att.get('@odata.type') == '#microsoft.graph.fileAttachment':
+            name = att.get('name', 'file')
+            ext = os.path.splitext(name)[1].lower()
+            attachments.append({'filename': name, 'type': ext})
+
+    print(f"    📎 {len(attachments)} attachments")
+
+    # ── Brain Commander: Father channel check ──
+    # If doron@ sends a brain command, handle it and skip classification
+    if BRAIN_COMMANDER_AVAILABLE:
+        try:
+            brain_result = brain_commander_check(msg, get_db(), access_token, rcb_email, get_secret)
+            if brain_result and brain_result.get('handled'):
+                print(f"    🧠 Brain Commander handled: {brain_result.get('command', {}).get('type', 'unknown')}")
+                helper_graph_mark_read(access_token, rcb_email, msg_id)
+                get_db().collection("rcb_processed").document(safe_id).set({
+                    "processed_at": firestore.SERVER_TIMESTAMP,
+                    "subject": subject,
+                    "from": from_email,
+                    "type": "brain_command",
+                })
+                return
+        except Exception as bc_err:
+            print(f"    ⚠️ Brain Commander error (continuing normally): {bc_err}")
+
+    # ── FIX 6: Email conversation threading ──
+    # If subject contains an RCB tracking code, load original case context
+    _thread_context = None
+    try:
+        _rcb_track_match = re.search(r'RCB[-|][QT]-\d{8}-\w{5}', subject)
+        if _rcb_track_match:
+            _track_code = _rcb_track_match.group(0)
+            # Look up original case in questions_log
+            _q_docs = get_db().collection("questions_log").where(
+                "tracking_code", "==", _track_code
+            ).limit(1).stream()
+            for _qd in _q_docs:
+                _qdata = _qd.to_dict()
+                _thread_context = {
+                    "tracking_code": _track_code,
+                    "original_question": _qdata.get("question_text", _qdata.get("question", "")),
+                    "original_answer": _qdata.get("answer_text", _qdata.get("answer", "")),
+                    "original_intent": _qdata.get("intent", ""),
+                    "original_from": _qdata.get("from_email", ""),
+                }
+                print(f"    🧵 Thread match: {_track_code} — continuing conversation")
+                break
+    except Exception:
+        pass  # Threading is nice-to-have, never block
+
+    # ── Three-Layer Email Triage (Session 74) ──
+    # Sits ON TOP of legacy flow. If triage handles it → continue.
+    # If not → legacy flow runs exactly as before.
+    _triage_handled = False
+    if EMAIL_TRIAGE_AVAILABLE:
+        try:
+            triage_result = triage_email(msg, rcb_email, db=get_db(), get_secret_func=get_secret)
+
+            # Log triage decision to rcb_debug
             try:
-                triage_result = triage_email(msg, rcb_email, db=get_db(), get_secret_func=get_secret)
+                get_db().collection("rcb_debug").add({
+                    "type": "triage",
+                    "category": triage_result.category,
+                    "confidence": triage_result.confidence,
+                    "source": triage_result.source,
+                    "skip_reason": triage_result.skip_reason,
+                    "subject": subject,
+                    "sender": from_email,
+                    "timestamp": firestore.SERVER_TIMESTAMP,
+                })
+            except Exception:
+                pass  # debug logging should never break flow
 
-                # Log triage decision to rcb_debug
-                try:
-                    get_db().collection("rcb_debug").add({
-                        "type": "triage",
-                        "category": triage_result.category,
-                        "confidence": triage_result.confidence,
-                        "source": triage_result.source,
-                        "skip_reason": triage_result.skip_reason,
-                        "subject": subject,
-                        "sender": from_email,
-                        "timestamp": firestore.SERVER_TIMESTAMP,
-                    })
-                except Exception:
-                    pass  # debug logging should never break flow
+            if triage_result.category == "SKIP":
+                print(f"    ⏭️ Triage SKIP: {triage_result.skip_reason} | {subject[:40]}")
+                helper_graph_mark_read(access_token, rcb_email, msg_id)
+                get_db().collection("rcb_processed").document(safe_id).set({
+                    "processed_at": firestore.SERVER_TIMESTAMP,
+                    "subject": subject,
+                    "from": from_email,
+                    "type": f"triage_skip_{triage_result.skip_reason or 'generic'}",
+                })
+                _triage_handled = True
 
-                if triage_result.category == "SKIP":
-                    print(f"    ⏭️ Triage SKIP: {triage_result.skip_reason} | {subject[:40]}")
+            elif triage_result.category == "CASUAL":
+                print(f"    💬 Triage CASUAL ({triage_result.confidence:.2f} via {triage_result.source})")
+                casual_result = handle_casual(msg, access_token, rcb_email, get_secret, db=get_db())
+                if casual_result.get("status", "").startswith("replied"):
                     helper_graph_mark_read(access_token, rcb_email, msg_id)
                     get_db().collection("rcb_processed").document(safe_id).set({
                         "processed_at": firestore.SERVER_TIMESTAMP,
                         "subject": subject,
                         "from": from_email,
-                        "type": f"triage_skip_{triage_result.skip_reason or 'generic'}",
+                        "type": "triage_casual",
+                        "tracking_code": casual_result.get("tracking_code", ""),
                     })
                     _triage_handled = True
 
-                elif triage_result.category == "CASUAL":
-                    print(f"    💬 Triage CASUAL ({triage_result.confidence:.2f} via {triage_result.source})")
-                    casual_result = handle_casual(msg, access_token, rcb_email, get_secret, db=get_db())
-                    if casual_result.get("status", "").startswith("replied"):
-                        helper_graph_mark_read(access_token, rcb_email, msg_id)
-                        get_db().collection("rcb_processed").document(safe_id).set({
-                            "processed_at": firestore.SERVER_TIMESTAMP,
-                            "subject": subject,
-                            "from": from_email,
-                            "type": "triage_casual",
-                            "tracking_code": casual_result.get("tracking_code", ""),
-                        })
-                        _triage_handled = True
-
-                elif triage_result.category == "REPLY_THREAD":
-                    pass  # Session 75: thread_manager will handle this — falls through to legacy
-
-                elif triage_result.category == "LIVE_SHIPMENT":
-                    if CONSULTATION_HANDLER_AVAILABLE:
-                        try:
-                            ship_result = handle_consultation(
-                                msg, get_db(), firestore, access_token, rcb_email,
-                                get_secret, triage_result=triage_result,
-                                template_type="live_shipment",
-                                thread_context=_thread_context)
-                            if ship_result.get("status") in ("replied", "delegated"):
-                                helper_graph_mark_read(access_token, rcb_email, msg_id)
-                                get_db().collection("rcb_processed").document(safe_id).set({
-                                    "processed_at": firestore.SERVER_TIMESTAMP,
-                                    "subject": subject,
-                                    "from": from_email,
-                                    "type": "triage_live_shipment",
-                                    "level": ship_result.get("level", 0),
-                                    "model": ship_result.get("model", ""),
-                                })
-                                _triage_handled = True
-                        except Exception as ship_err:
-                            print(f"    ⚠️ Live shipment handler error (falling through): {ship_err}")
-
-                elif triage_result.category == "CONSULTATION":
-                    # ── Tariff subtree intercept — before consultation handler ──
-                    if _TARIFF_SUBTREE_AVAILABLE:
-                        try:
-                            _body_raw = _ei_get_body_text(msg)
-                            _subj_raw = msg.get('subject', '') or ''
-                            _combined = f"{_subj_raw} {_body_raw}"
-                            _st_match = _TARIFF_SUBTREE_RE.search(_combined)
-                            print(f"    SUBTREE_CHECK: pattern_match={bool(_st_match)}, text='{_combined[:80]}'")
-                            if _st_match:
-                                _mc = _st_match.group(1).replace(' ', '')
-                                _dg = _mc.replace('.', '')
-                                _hs = f"{_dg[:2]}.{_dg[2:4]}" if len(_dg) >= 4 else _mc
-                                if len(_dg) > 4:
-                                    _hs = f"{_dg[:2]}.{_dg[2:4]}.{_dg[4:]}"
-                                print(f"    🌳 Tariff subtree request: {_hs}")
-                                _st_res = _handle_tariff_subtree(get_db(), _hs, msg, access_token, rcb_email)
-                                if _st_res:
-                                    helper_graph_mark_read(access_token, rcb_email, msg_id)
-                                    get_db().collection("rcb_processed").document(safe_id).set({
-                                        "processed_at": firestore.SERVER_TIMESTAMP,
-                                        "subject": subject, "from": from_email,
-                                        "type": "tariff_subtree",
-                                    })
-                                    _triage_handled = True
-                        except Exception as st_err:
-                            print(f"    ⚠️ Subtree intercept error: {st_err}")
-
-                    if CONSULTATION_HANDLER_AVAILABLE and not _triage_handled:
-                        try:
-                            cons_result = handle_consultation(
-                                msg, get_db(), firestore, access_token, rcb_email,
-                                get_secret, triage_result=triage_result,
-                                thread_context=_thread_context)
-                            if cons_result.get("status") in ("replied", "delegated"):
+            elif triage_result.category == "REPLY_THREAD":
+                pass  # Session 75: thread_manager will handle this — falls through to legacy
+
+            elif triage_result.category == "LIVE_SHIPMENT":
+                if CONSULTATION_HANDLER_AVAILABLE:
+                    try:
+                        ship_result = handle_consultation(
+                            msg, get_db(), firestore, access_token, rcb_email,
+                            get_secret, triage_result=triage_result,
+                            template_type="live_shipment",
+                            thread_context=_thread_context)
+                        if ship_result.get("status") in ("replied", "delegated"):
+                            helper_graph_mark_read(access_token, rcb_email, msg_id)
+                            get_db().collection("rcb_processed").document(safe_id).set({
+                                "processed_at": firestore.SERVER_TIMESTAMP,
+                                "subject": subject,
+                                "from": from_email,
+                                "type": "triage_live_shipment",
+                                "level": ship_result.get("level", 0),
+                                "model": ship_result.get("model", ""),
+                            })
+                            _triage_handled = True
+                    except Exception as ship_err:
+                        print(f"    ⚠️ Live shipment handler error (falling through): {ship_err}")
+
+            elif triage_result.category == "CONSULTATION":
+                # ── Tariff subtree intercept — before consultation handler ──
+                if _TARIFF_SUBTREE_AVAILABLE:
+                    try:
+                        _body_raw = _ei_get_body_text(msg)
+                        _subj_raw = msg.get('subject', '') or ''
+                        _combined = f"{_subj_raw} {_body_raw}"
+                        _st_match = _TARIFF_SUBTREE_RE.search(_combined)
+                        print(f"    SUBTREE_CHECK: pattern_match={bool(_st_match)}, text='{_combined[:80]}'")
+                        if _st_match:
+                            _mc = _st_match.group(1).replace(' ', '')
+                            _dg = _mc.replace('.', '')
+                            _hs = f"{_dg[:2]}.{_dg[2:4]}" if len(_dg) >= 4 else _mc
+                            if len(_dg) > 4:
+                                _hs = f"{_dg[:2]}.{_dg[2:4]}.{_dg[4:]}"
+                            print(f"    🌳 Tariff subtree request: {_hs}")
+                            _st_res = _handle_tariff_subtree(get_db(), _hs, msg, access_token, rcb_email)
+                            if _st_res:
                                 helper_graph_mark_read(access_token, rcb_email, msg_id)
                                 get_db().collection("rcb_processed").document(safe_id).set({
                                     "processed_at": firestore.SERVER_TIMESTAMP,
-                                    "subject": subject,
-                                    "from": from_email,
-                                    "type": "triage_consultation",
-                                    "level": cons_result.get("level", 0),
-                                    "model": cons_result.get("model", ""),
+                                    "subject": subject, "from": from_email,
+                                    "type": "tariff_subtree",
                                 })
                                 _triage_handled = True
-                        except Exception as cons_err:
-                            print(f"    ⚠️ Consultation handler error (falling through): {cons_err}")
-                            try:
-                                get_db().collection("rcb_debug").add({
-                                    "type": "consultation_error",
-                                    "error": str(cons_err),
-                                    "subject": subject,
-                                    "timestamp": firestore.SERVER_TIMESTAMP,
-                                })
-                            except Exception:
-                                pass
-                    # If not available or failed, falls through to legacy flow
-
-            except Exception as triage_err:
-                # Log error but NEVER break email processing
-                print(f"    ⚠️ Triage error (non-fatal): {triage_err}")
-                try:
-                    get_db().collection("rcb_debug").add({
-                        "type": "triage_error",
-                        "error": str(triage_err),
-                        "subject": subject,
-                        "sender": from_email,
-                        "timestamp": firestore.SERVER_TIMESTAMP,
-                    })
-                except Exception:
-                    pass
-
-        if _triage_handled:
-            continue
-
-        # ── Email Intent: smart routing for direct emails ──
-        if EMAIL_INTENT_AVAILABLE:
-            try:
-                intent_result = process_email_intent(
-                    msg, get_db(), firestore, access_token, rcb_email, get_secret
-                )
-                _intent_name = intent_result.get('intent', 'NONE')
-                _intent_status = intent_result.get('status', '')
-                # If a real intent was detected AND it's not a classify instruction
-                if _intent_name not in ('NONE', '') and not (
-                    _intent_name == 'INSTRUCTION' and intent_result.get('action') == 'classify'
-                ):
-                    # BUG #2 FIX: Only consume email if send actually succeeded.
-                    # If send_failed → do NOT mark as read, do NOT continue.
-                    # Let email fall through to knowledge_query / classification.
-                    if _intent_status in ('replied', 'cache_hit', 'clarification_sent'):
-                        print(f"  🧠 Email intent handled: {_intent_name} (status={_intent_status})")
-                        helper_graph_mark_read(access_token, rcb_email, msg_id)
-                        get_db().collection("rcb_processed").document(safe_id).set({
-                            "processed_at": firestore.SERVER_TIMESTAMP,
-                            "subject": subject,
-                            "from": from_email,
-                            "type": f"intent_{_intent_name}",
-                        })
-                        # Debug logging for every processed intent
-                        try:
-                            get_db().collection("rcb_debug").add({
-                                "timestamp": firestore.SERVER_TIMESTAMP,
-                                "event": "email_processed",
-                                "intent": _intent_name,
-                                "status": _intent_status,
+                    except Exception as st_err:
+                        print(f"    ⚠️ Subtree intercept error: {st_err}")
+
+                if CONSULTATION_HANDLER_AVAILABLE and not _triage_handled:
+                    try:
+                        cons_result = handle_consultation(
+                            msg, get_db(), firestore, access_token, rcb_email,
+                            get_secret, triage_result=triage_result,
+                            thread_context=_thread_context)
+                        if cons_result.get("status") in ("replied", "delegated"):
+                            helper_graph_mark_read(access_token, rcb_email, msg_id)
+                            get_db().collection("rcb_processed").document(safe_id).set({
+                                "processed_at": firestore.SERVER_TIMESTAMP,
                                 "subject": subject,
                                 "from": from_email,
-                                "msg_id": msg_id,
-                                "product_description": intent_result.get("entities", {}).get("product_description", "") if isinstance(intent_result.get("entities"), dict) else "",
-                                "tariff_results": str(intent_result.get("answer_sources", []))[:500],
-                                "html_composed": bool(intent_result.get("answer_html")),
-                                "send_status": _intent_status,
-                                "failure_reason": None,
+                                "type": "triage_consultation",
+                                "level": cons_result.get("level", 0),
+                                "model": cons_result.get("model", ""),
                             })
-                        except Exception:
-                            pass
-                        continue
-                    else:
-                        # send_failed or other non-success status — log to debug, fall through
-                        print(f"  ⚠️ Email intent detected: {_intent_name} but status={_intent_status} — NOT consuming email, falling through")
+                            _triage_handled = True
+                    except Exception as cons_err:
+                        print(f"    ⚠️ Consultation handler error (falling through): {cons_err}")
                         try:
                             get_db().collection("rcb_debug").add({
-                                "timestamp": firestore.SERVER_TIMESTAMP,
-                                "event": "intent_send_failed",
-                                "intent": _intent_name,
-                                "status": _intent_status,
+                                "type": "consultation_error",
+                                "error": str(cons_err),
                                 "subject": subject,
-                                "from": from_email,
-                                "msg_id": msg_id,
-                                "product_description": intent_result.get("entities", {}).get("product_description", "") if isinstance(intent_result.get("entities"), dict) else "",
-                                "tariff_results": str(intent_result.get("answer_sources", []))[:500],
-                                "html_composed": bool(intent_result.get("answer_html")),
-                                "send_status": _intent_status,
-                                "failure_reason": intent_result.get('failure_reason', _intent_status),
+                                "timestamp": firestore.SERVER_TIMESTAMP,
                             })
                         except Exception:
                             pass
-                # INSTRUCTION intent with action='classify' → fall through to classification
-            except Exception as ei_err:
-                print(f"  ⚠️ Email intent error (non-fatal): {ei_err}")
+                # If not available or failed, falls through to legacy flow
 
-        # ── Session 13 v4.1.0: Knowledge Query Detection ──
-        # If team member asks a question (no commercial docs), answer it
-        # and skip the classification pipeline entirely.
-        try:
-            msg["attachments"] = raw_attachments
-            if detect_knowledge_query(msg):
-                try:
-                    rcb_id = generate_rcb_id(get_db(), firestore, RCBType.KNOWLEDGE_QUERY)
-                except Exception:
-                    rcb_id = "RCB-UNKNOWN-KQ"
-                print(f"  📚 [{rcb_id}] Knowledge query detected from {from_email}")
-                kq_result = handle_knowledge_query(
-                    msg=msg,
-                    db=get_db(),
-                    firestore_module=firestore,
-                    access_token=access_token,
-                    rcb_email=rcb_email,
-                    get_secret_func=get_secret,
-                )
-                print(f"  📚 [{rcb_id}] Knowledge query result: {kq_result.get('status')}")
-                helper_graph_mark_read(access_token, rcb_email, msg_id)
-                get_db().collection("rcb_processed").document(safe_id).set({
-                    "processed_at": firestore.SERVER_TIMESTAMP,
+        except Exception as triage_err:
+            # Log error but NEVER break email processing
+            print(f"    ⚠️ Triage error (non-fatal): {triage_err}")
+            try:
+                get_db().collection("rcb_debug").add({
+                    "type": "triage_error",
+                    "error": str(triage_err),
                     "subject": subject,
-                    "from": from_email,
-                    "type": "knowledge_query",
-                    "rcb_id": rcb_id,
+                    "sender": from_email,
+                    "timestamp": firestore.SERVER_TIMESTAMP,
                 })
-                continue
-        except Exception as kq_err:
-            print(f"  ⚠️ Knowledge query detection error: {kq_err}")
-
-        # ── Shipping-only routing: BL/AWB/booking without invoice → tracker ──
-        if attachments:
-            _invoice_kw = ['invoice', 'חשבונית', 'proforma', 'ci_']
-            _shipping_kw = [
-                'bill of lading', 'bl_', 'bol_', 'bol ', 'b_l', 'b/l',
-                'שטר מטען', 'שטר',
-                'awb', 'air waybill', 'airwaybill',
-                'booking', 'הזמנה',
-                'delivery order', 'פקודת מסירה', 'do_',
-                'air delivery order', 'ado_', 'cargo release', 'שחרור מטען אווירי',
-                'packing', 'רשימת אריזה', 'pl_',
-            ]
-            _cls_intent = ['סיווג', 'classify', 'classification', 'קוד מכס', 'hs code', 'לסווג']
-
-            _has_inv = False
-            _has_ship = False
-            for att in attachments:
-                fn = att.get('filename', '').lower()
-                if any(kw in fn for kw in _invoice_kw):
-                    _has_inv = True
-                if any(kw in fn for kw in _shipping_kw):
-                    _has_ship = True
-
-            if _has_ship and not _has_inv:
-                # Check body for classification intent — "please classify" overrides
-                _body_text = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
-                _combined = f"{subject} {_body_text}".lower()
-                if not any(kw in _combined for kw in _cls_intent):
-                    print(f"  📦 Shipping docs only (no invoice) — routing to tracker, skipping classification")
-                    if TRACKER_AVAILABLE:
-                        try:
-                            tracker_process_email(msg, get_db(), firestore, access_token, rcb_email, get_secret, is_direct=is_direct)
-                        except Exception as te:
-                            print(f"    ⚠️ Tracker error: {te}")
-                    if PUPIL_AVAILABLE:
-                        try:
-                            pupil_process_email(msg, get_db(), firestore, access_token, rcb_email, get_secret)
-                        except Exception as pe:
-                            print(f"    ⚠️ Pupil error: {pe}")
+            except Exception:
+                pass
+
+    if _triage_handled:
+        return
+
+    # ── Email Intent: smart routing for direct emails ──
+    if EMAIL_INTENT_AVAILABLE:
+        try:
+            intent_result = process_email_intent(
+                msg, get_db(), firestore, access_token, rcb_email, get_secret
+            )
+            _intent_name = intent_result.get('intent', 'NONE')
+            _intent_status = intent_result.get('status', '')
+            # If a real intent was detected AND it's not a classify instruction
+            if _intent_name not in ('NONE', '') and not (
+                _intent_name == 'INSTRUCTION' and intent_result.get('action') == 'classify'
+            ):
+                # BUG #2 FIX: Only consume email if send actually succeeded.
+                # If send_failed → do NOT mark as read, do NOT continue.
+                # Let email fall through to knowledge_query / classification.
+                if _intent_status in ('replied', 'cache_hit', 'clarification_sent'):
+                    print(f"  🧠 Email intent handled: {_intent_name} (status={_intent_status})")
                     helper_graph_mark_read(access_token, rcb_email, msg_id)
                     get_db().collection("rcb_processed").document(safe_id).set({
                         "processed_at": firestore.SERVER_TIMESTAMP,
                         "subject": subject,
                         "from": from_email,
-                        "type": "shipping_tracker",
+                        "type": f"intent_{_intent_name}",
                     })
-                    continue
-
-        # ── External sender rate limiting (before expensive classification) ──
-        if not from_email.lower().endswith('@rpa-port.co.il'):
+                    # Debug logging for every processed intent
+                    try:
+                        get_db().collection("rcb_debug").add({
+                            "timestamp": firestore.SERVER_TIMESTAMP,
+                            "event": "email_processed",
+                            "intent": _intent_name,
+                            "status": _intent_status,
+                            "subject": subject,
+                            "from": from_email,
+                            "msg_id": msg_id,
+                            "product_description": intent_result.get("entities", {}).get("product_description", "") if isinstance(intent_result.get("entities"), dict) else "",
+                            "tariff_results": str(intent_result.get("answer_sources", []))[:500],
+                            "html_composed": bool(intent_result.get("answer_html")),
+                            "send_status": _intent_status,
+                            "failure_reason": None,
+                        })
+                    except Exception:
+                        pass
+                    return
+                else:
+                    # send_failed or other non-success status — log to debug, fall through
+                    print(f"  ⚠️ Email intent detected: {_intent_name} but status={_intent_status} — NOT consuming email, falling through")
+                    try:
+                        get_db().collection("rcb_debug").add({
+                            "timestamp": firestore.SERVER_TIMESTAMP,
+                            "event": "intent_send_failed",
+                            "intent": _intent_name,
+                            "status": _intent_status,
+                            "subject": subject,
+                            "from": from_email,
+                            "msg_id": msg_id,
+                            "product_description": intent_result.get("entities", {}).get("product_description", "") if isinstance(intent_result.get("entities"), dict) else "",
+                            "tariff_results": str(intent_result.get("answer_sources", []))[:500],
+                            "html_composed": bool(intent_result.get("answer_html")),
+                            "send_status": _intent_status,
+                            "failure_reason": intent_result.get('failure_reason', _intent_status),
+                        })
+                    except Exception:
+                        pass
+            # INSTRUCTION intent with action='classify' → fall through to classification
+        except Exception as ei_err:
+            print(f"  ⚠️ Email intent error (non-fatal): {ei_err}")
+
+    # ── Session 13 v4.1.0: Knowledge Query Detection ──
+    # If team member asks a question (no commercial docs), answer it
+    # and skip the classification pipeline entirely.
+    try:
+        msg["attachments"] = raw_attachments
+        if detect_knowledge_query(msg):
             try:
-                _cutoff = datetime.now(timezone.utc) - timedelta(hours=1)
-                _recent = list(
-                    get_db().collection("rcb_processed")
-                    .where("from", "==", from_email.lower())
-                    .where("processed_at", ">=", _cutoff)
-                    .limit(5)
-                    .stream()
-                )
-                if len(_recent) >= 5:
-                    print(f"  🚫 Rate limited external sender {from_email}: {len(_recent)} classifications in last hour")
-                    get_db().collection("security_log").add({
-                        "type": "EXTERNAL_RATE_LIMITED",
-                        "from_email": from_email,
-                        "count": len(_recent),
-                        "timestamp": datetime.now(timezone.utc).isoformat(),
-                    })
-                    helper_graph_mark_read(access_token, rcb_email, msg_id)
-                    continue
-            except Exception as rl_err:
-                print(f"    ⚠️ Rate limit check error (proceeding): {rl_err}")
+                rcb_id = generate_rcb_id(get_db(), firestore, RCBType.KNOWLEDGE_QUERY)
+            except Exception:
+                rcb_id = "RCB-UNKNOWN-KQ"
+            print(f"  📚 [{rcb_id}] Knowledge query detected from {from_email}")
+            kq_result = handle_knowledge_query(
+                msg=msg,
+                db=get_db(),
+                firestore_module=firestore,
+                access_token=access_token,
+                rcb_email=rcb_email,
+                get_secret_func=get_secret,
+            )
+            print(f"  📚 [{rcb_id}] Knowledge query result: {kq_result.get('status')}")
+            helper_graph_mark_read(access_token, rcb_email, msg_id)
+            get_db().collection("rcb_processed").document(safe_id).set({
+                "processed_at": firestore.SERVER_TIMESTAMP,
+                "subject": subject,
+                "from": from_email,
+                "type": "knowledge_query",
+                "rcb_id": rcb_id,
+            })
+            return
+    except Exception as kq_err:
+        print(f"  ⚠️ Knowledge query detection error: {kq_err}")
+
+    # ── Shipping-only routing: BL/AWB/booking without invoice → tracker ──
+    if attachments:
+        _invoice_kw = ['invoice', 'חשבונית', 'proforma', 'ci_']
+        _shipping_kw = [
+            'bill of lading', 'bl_', 'bol_', 'bol ', 'b_l', 'b/l',
+            'שטר מטען', 'שטר',
+            'awb', 'air waybill', 'airwaybill',
+            'booking', 'הזמנה',
+            'delivery order', 'פקודת מסירה', 'do_',
+            'air delivery order', 'ado_', 'cargo release', 'שחרור מטען אווירי',
+            'packing', 'רשימת אריזה', 'pl_',
+        ]
+        _cls_intent = ['סיווג', 'classify', 'classification', 'קוד מכס', 'hs code', 'לסווג']
+
+        _has_inv = False
+        _has_ship = False
+        for att in attachments:
+            fn = att.get('filename', '').lower()
+            if any(kw in fn for kw in _invoice_kw):
+                _has_inv = True
+            if any(kw in fn for kw in _shipping_kw):
+                _has_ship = True
+
+        if _has_ship and not _has_inv:
+            # Check body for classification intent — "please classify" overrides
+            _body_text = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
+            _combined = f"{subject} {_body_text}".lower()
+            if not any(kw in _combined for kw in _cls_intent):
+                print(f"  📦 Shipping docs only (no invoice) — routing to tracker, skipping classification")
+                if TRACKER_AVAILABLE:
+                    try:
+                        tracker_process_email(msg, get_db(), firestore, access_token, rcb_email, get_secret, is_direct=is_direct)
+                    except Exception as te:
+                        print(f"    ⚠️ Tracker error: {te}")
+                if PUPIL_AVAILABLE:
+                    try:
+                        pupil_process_email(msg, get_db(), firestore, access_token, rcb_email, get_secret)
+                    except Exception as pe:
+                        print(f"    ⚠️ Pupil error: {pe}")
+                helper_graph_mark_read(access_token, rcb_email, msg_id)
+                get_db().collection("rcb_processed").document(safe_id).set({
+                    "processed_at": firestore.SERVER_TIMESTAMP,
+                    "subject": subject,
+                    "from": from_email,
+                    "type": "shipping_tracker",
+                })
+                return
 
-        # Consolidated: ONE email with ack + classification + clarification
+    # ── External sender rate limiting (before expensive classification) ──
+    if not from_email.lower().endswith('@rpa-port.co.il'):
         try:
-            rcb_id = generate_rcb_id(get_db(), firestore, RCBType.CLASSIFICATION)
-        except Exception:
-            rcb_id = "RCB-UNKNOWN-CLS"
-        print(f"  🏷️ [{rcb_id}] Processing classification")
+            _cutoff = datetime.now(timezone.utc) - timedelta(hours=1)
+            _recent = list(
+                get_db().collection("rcb_processed")
+                .where("from", "==", from_email.lower())
+                .where("processed_at", ">=", _cutoff)
+                .limit(5)
+                .stream()
+            )
+            if len(_recent) >= 5:
+                print(f"  🚫 Rate limited external sender {from_email}: {len(_recent)} classifications in last hour")
+                get_db().collection("security_log").add({
+                    "type": "EXTERNAL_RATE_LIMITED",
+                    "from_email": from_email,
+                    "count": len(_recent),
+                    "timestamp": datetime.now(timezone.utc).isoformat(),
+                })
+                helper_graph_mark_read(access_token, rcb_email, msg_id)
+                return
+        except Exception as rl_err:
+            print(f"    ⚠️ Rate limit check error (proceeding): {rl_err}")
 
-        # Update claim doc with classification metadata (doc already created by atomic .create() above)
-        get_db().collection("rcb_processed").document(safe_id).update({
-            "subject": subject,
-            "from": from_email,
-            "rcb_id": rcb_id,
-            "type": "classification",
-        })
+    # Consolidated: ONE email with ack + classification + clarification
+    try:
+        rcb_id = generate_rcb_id(get_db(), firestore, RCBType.CLASSIFICATION)
+    except Exception:
+        rcb_id = "RCB-UNKNOWN-CLS"
+    print(f"  🏷️ [{rcb_id}] Processing classification")
+
+    # Update claim doc with classification metadata (doc already created by atomic .create() above)
+    get_db().collection("rcb_processed").document(safe_id).update({
+        "subject": subject,
+        "from": from_email,
+        "rcb_id": rcb_id,
+        "type": "classification",
+    })
 
+    try:
+        # Extract email body for URL detection and context
+        email_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
+        if msg.get('body', {}).get('contentType', '') == 'html' and email_body:
+            import re as _re
+            email_body = _re.sub(r'<[^>]+>', ' ', email_body)
+            email_body = _re.sub(r'\s+', ' ', email_body).strip()
+
+        # Session 47: Reply routing — reply_to is @rpa-port.co.il or None
+        process_and_send_report(
+            access_token, rcb_email, _reply_to, subject,
+            from_name, raw_attachments, msg_id, get_secret,
+            get_db(), firestore, helper_graph_send, extract_text_from_attachments,
+            email_body=email_body,
+            internet_message_id=internet_msg_id,
+        )
+    except Exception as ce:
+        print(f"    ⚠️ Classification error: {ce}")
+
+    # ── Tracker: Feed email as observation for deal tracking ──
+    if TRACKER_AVAILABLE:
         try:
-            # Extract email body for URL detection and context
-            email_body = msg.get('body', {}).get('content', '') or msg.get('bodyPreview', '')
-            if msg.get('body', {}).get('contentType', '') == 'html' and email_body:
-                import re as _re
-                email_body = _re.sub(r'<[^>]+>', ' ', email_body)
-                email_body = _re.sub(r'\s+', ' ', email_body).strip()
-
-            # Session 47: Reply routing — reply_to is @rpa-port.co.il or None
-            process_and_send_report(
-                access_token, rcb_email, _reply_to, subject,
-                from_name, raw_attachments, msg_id, get_secret,
-                get_db(), firestore, helper_graph_send, extract_text_from_attachments,
-                email_body=email_body,
-                internet_message_id=internet_msg_id,
+            tracker_process_email(
+                msg, get_db(), firestore, access_token, rcb_email, get_secret,
+                is_direct=is_direct
             )
-        except Exception as ce:
-            print(f"    ⚠️ Classification error: {ce}")
+        except Exception as te:
+            print(f"    ⚠️ Tracker error (non-fatal): {te}")
 
-        # ── Tracker: Feed email as observation for deal tracking ──
-        if TRACKER_AVAILABLE:
-            try:
-                tracker_process_email(
-                    msg, get_db(), firestore, access_token, rcb_email, get_secret,
-                    is_direct=is_direct
-                )
-            except Exception as te:
-                print(f"    ⚠️ Tracker error (non-fatal): {te}")
+    # ── Pupil: Passive learning from every email ──
+    if PUPIL_AVAILABLE:
+        try:
+            pupil_process_email(
+                msg, get_db(), firestore, access_token, rcb_email, get_secret
+            )
+        except Exception as pe:
+            print(f"    ⚠️ Pupil error (non-fatal): {pe}")
 
-        # ── Pupil: Passive learning from every email ──
-        if PUPIL_AVAILABLE:
-            try:
-                pupil_process_email(
-                    msg, get_db(), firestore, access_token, rcb_email, get_secret
-                )
-            except Exception as pe:
-                print(f"    ⚠️ Pupil error (non-fatal): {pe}")
 
-    print("✅ RCB check complete")
+_RCB_HANDLERS = {"decl": _rcb_process_declaration, "cc": _rcb_process_cc, "direct": _rcb_process_direct}
+
+
+def _rcb_run_job(lane, msg, safe_id, ctx):
+    """Handle one claimed message. The lease is released only if the handler finished;
+    after a crash it expires and a later run takes the message over.
+
+    Direct-lane sends checkpoint the claim doc; a takeover of a message whose
+    reply already went out is closed without running the handler again."""
+    claims = ctx["claims"]
+    if lane == "direct" and claims.reply_sent(safe_id):
+        print(f"  RC-001: {safe_id} reply already sent before takeover — not resending")
+        helper_graph_mark_read(ctx["access_token"], ctx["rcb_email"], msg.get('id'))
+        claims.release(safe_id)
+        return True
+    token = set_reply_checkpoint(lambda: claims.mark_reply_sent(safe_id)) if lane == "direct" else None
+    try:
+        _RCB_HANDLERS[lane](msg, safe_id, ctx)
+    except Exception as e:
+        import traceback
+        print(f"  ❌ {lane} message {safe_id} failed: {e} — lease left to expire for retry")
+        traceback.print_exc()
+        return False
+    finally:
+        if token is not None:
+            reset_reply_checkpoint(token)
+    claims.release(safe_id)
+    return True
+
+
+def _rcb_run_jobs(jobs, ctx):
+    """Run claimed messages on the per-lane worker pools (inline in serial mode).
+
+    Returns {"done": n, "failed": n, "unfinished": n}. Messages not finished
+    within the budget keep their lease; once it expires they are retried.
+    """
+    claims = ctx["claims"]
+    counts = {"done": 0, "failed": 0, "unfinished": 0}
+    if not jobs:
+        return counts
+    claims.start_heartbeat()
+    try:
+        if RCB_PIPELINE_MODE == "serial" or len(jobs) == 1:
+            for lane, msg, safe_id in jobs:
+                counts["done" if _rcb_run_job(lane, msg, safe_id, ctx) else "failed"] += 1
+            return counts
+
+        from concurrent.futures import ThreadPoolExecutor, wait
+        pools = {name: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"rcb-{name}")
+                 for name, n in RCB_LANE_WORKERS.items()}
+        futures = [pools[_RCB_JOB_LANES[lane]].submit(_rcb_run_job, lane, msg, safe_id, ctx)
+                   for lane, msg, safe_id in jobs]
+        _, pending = wait(futures, timeout=RCB_RUN_BUDGET_SEC)
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if pending:
+            print(f"  ⏱️ {len(pending)} messages unfinished after {RCB_RUN_BUDGET_SEC}s — "
+                  f"waiting {RCB_RUN_GRACE_SEC}s for in-flight ones, the rest retry via lease expiry")
+            wait(pending, timeout=RCB_RUN_GRACE_SEC)
+        for f in futures:
+            if f.done() and not f.cancelled():
+                counts["done" if f.result() else "failed"] += 1
+            else:
+                counts["unfinished"] += 1
+        return counts
+    finally:
+        claims.stop_heartbeat()
+        print(f"  📊 Pipeline ({RCB_PIPELINE_MODE}): {counts}")
 
 
 
@@ -1818,7 +1949,12 @@ def rcb_ttl_cleanup(event: scheduler_fn.ScheduledEvent) -> None:
 # ============================================================
 @scheduler_fn.on_schedule(schedule="every 6 hours")
 def rcb_retry_failed(event: scheduler_fn.ScheduledEvent) -> None:
-    """Retry failed classifications from last 24 hours"""
+    """Retry failed classifications from last 24 hours.
+
+    Deleting the claim doc alone no longer retries anything — the inbox delta
+    sync never returns an unchanged message — so the msg id is queued and the
+    next rcb_check_email run re-fetches it (rcb_claims.queue_retry).
+    """
     print("🔄 Checking for failed classifications to retry...")
     
     from datetime import datetime, timedelta, timezone
@@ -1847,7 +1983,7 @@ def rcb_retry_failed(event: scheduler_fn.ScheduledEvent) -> None:
                 continue
             data = doc.to_dict()
             if data.get("processed_at") and data.get("processed_at") > cutoff:
-                processed_subjects[data.get("subject", "")] = doc.id
+                processed_subjects[data.get("subject", "")] = data.get("msg_id")
 
         # Find classifications
         classified_subjects = set()
@@ -1862,7 +1998,12 @@ def rcb_retry_failed(event: scheduler_fn.ScheduledEvent) -> None:
         updates = {}
 
         for subject in failed:
-            doc_id = processed_subjects[subject]
+            msg_id = processed_subjects[subject]
+            if not msg_id:
+                # Older claim docs, and docs rewritten by .set() in the non-classification lanes,
+                # carry no msg id — nothing to re-fetch
+                print(f"  ⏭️ No msg id to retry: {subject[:40]}")
+                continue
             subj_hash = _hl.md5(subject.encode("utf-8", errors="replace")).hexdigest()[:12]
             count = retry_counts.get(subj_hash, 0)
             if count >= _MAX_RETRIES:
@@ -1870,7 +2011,7 @@ def rcb_retry_failed(event: scheduler_fn.ScheduledEvent) -> None:
                 print(f"  ⏭️ Max retries ({_MAX_RETRIES}) reached: {subject[:40]}")
                 continue
             updates[subj_hash] = count + 1
-            get_db().collection("rcb_processed").document(doc_id).delete()
+            queue_retry(get_db(), msg_id)
             retried += 1
             print(f"  🔄 Retry {count + 1}/{_MAX_RETRIES}: {subject[:40]}")
 
@@ -230,5 +230,13 @@ if WRITE_MODE:
     for _ in db.collection('chapter_notes').stream():
         count += 1
     print(f'Final chapter_notes count: {count}')
+
+    # Tell running instances their cached chapter notes are stale
+    try:
+        from lib.tariff_cache import publish_tariff_cache
+        published = publish_tariff_cache(db, reason='parse_chapter_notes')
+        print(f"tariff_cache: published v{published['version']} (snapshot: {published['snapshot']})")
+    except Exception as e:
+        print(f'  WARNING: Could not publish tariff_cache version: {e}')
 else:
     print('\n*** DRY RUN — no writes performed ***')
@@ -478,6 +478,14 @@ def write_to_firestore(chapter_data, section_data):
     print(f"\n[Firestore] Written {written} chapter_notes updates")
     print(f"[Firestore] Written {len(section_data)} section_notes documents")
 
+    # Tell running instances their cached chapter notes are stale
+    try:
+        from lib.tariff_cache import publish_tariff_cache
+        published = publish_tariff_cache(db, reason="parse_chapter_notes_c2")
+        print(f"[Firestore] tariff_cache published v{published['version']} (snapshot: {published['snapshot']})")
+    except Exception as e:
+        print(f"  WARNING: Could not publish tariff_cache version: {e}")
+
     firebase_admin.delete_app(app)
 
 
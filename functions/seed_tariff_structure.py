@@ -10,6 +10,7 @@ Safety:
   - Tags everything with source: "israeli_customs_tariff_structure.xml"
   - Never overwrites existing keyword_index entries from B2 seeding
   - Re-indexes tariff_structure in librarian_index after seeding
+  - Publishes a new tariff_cache version so warm instances reload
 
 Run: python -X utf8 seed_tariff_structure.py [--test] [--skip-keywords]
 """
@@ -404,6 +405,19 @@ def reindex_tariff_structure():
         return 0
 
 
+def publish_tariff_cache_version():
+    """Bump the tariff_cache version so warm instances reload tariff_structure."""
+    try:
+        from lib.tariff_cache import publish_tariff_cache
+        published = publish_tariff_cache(db, reason="seed_tariff_structure")
+        print(f"  tariff_cache: published v{published['version']} (snapshot: {published['snapshot']})")
+        return published["version"]
+    except Exception as e:
+        print(f"  WARNING: Could not publish tariff_cache version: {e}")
+        print("  (Warm instances pick up the new data within 24h)")
+        return 0
+
+
 if __name__ == "__main__":
     test_mode = "--test" in sys.argv
     skip_keywords = "--skip-keywords" in sys.argv
@@ -439,10 +453,14 @@ if __name__ == "__main__":
     print("\n4. Re-indexing tariff_structure in librarian_index...")
     reindex_count = reindex_tariff_structure()
 
+    print("\n5. Publishing tariff_cache version...")
+    cache_version = publish_tariff_cache_version()
+
     # Summary
     print("\n" + "=" * 60)
     print("  DONE")
     print(f"  tariff_structure docs: {struct_count}")
     print(f"  keyword_index added: {kw_added}, skipped: {kw_skipped}")
     print(f"  librarian_index re-indexed: {reindex_count}")
+    print(f"  tariff_cache version: {cache_version}")
     print("=" * 60)
@@ -10,6 +10,27 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+@pytest.fixture(autouse=True)
+def _fresh_process_caches():
+    """Extractors, Graph, Firestore and the LLM APIs are mocked per test — never serve a result cached by another test."""
+    from lib.extraction_cache import clear_extraction_cache
+    from lib.extraction_engine import reset_extraction_engine
+    from lib.graph_client import reset_graph_client
+    from lib.llm_cache import clear_llm_cache
+    from lib.tariff_cache import reset_tariff_cache
+    clear_extraction_cache()
+    reset_extraction_engine()
+    reset_graph_client()
+    reset_tariff_cache()
+    clear_llm_cache()
+    yield
+    clear_extraction_cache()
+    reset_extraction_engine()
+    reset_graph_client()
+    reset_tariff_cache()
+    clear_llm_cache()
+
+
 # ============================================================
 # MOCK FIRESTORE
 # ============================================================
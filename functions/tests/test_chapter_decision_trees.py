@@ -14,6 +14,7 @@ import unittest
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 
+from lib import _chapter_decision_trees
 from lib._chapter_decision_trees import (
     decide_chapter,
     _decide_chapter_01,
@@ -4828,5 +4829,58 @@ class TestDecisionTreeHsFormat(unittest.TestCase):
                 )
 
 
+# ============================================================================
+# Single-pass chapter detection (Aho-Corasick prefilter)
+# ============================================================================
+
+class TestSinglePassDetection(unittest.TestCase):
+    """_detect_chapter must pick exactly what the linear walk picked."""
+
+    @staticmethod
+    def _linear(text):
+        for ch_num, detect_fn, _tree_fn in _chapter_decision_trees._CHAPTER_DETECT_ORDER:
+            if detect_fn(text):
+                return ch_num
+        return None
+
+    def _assert_same(self, text):
+        detected = _chapter_decision_trees._detect_chapter(text)
+        self.assertEqual(detected[0] if detected else None, self._linear(text), text)
+
+    def test_matches_linear_walk_on_all_fixtures(self):
+        from benchmarks.chapter_detect_bench import load_fixture_texts
+        texts = load_fixture_texts()
+        self.assertGreater(len(texts), 500)
+        for text in texts:
+            self._assert_same(text)
+
+    def test_case_and_script_variants(self):
+        for text in ("FROZEN SALMON FILLET", "Frozen Salmon", "סלמון קפוא", "ſalmon",
+                     "\u212anife steel", "electric motor 5kw", "plastic toy car",
+                     "", "xyz unknown widget", "returning resident furniture תושב חוזר"):
+            self._assert_same(text)
+
+    def test_candidate_set_is_small(self):
+        candidates = _chapter_decision_trees._candidate_chapters("frozen salmon fillet")
+        self.assertIn(3, candidates)
+        self.assertLess(len(candidates), 20)
+        self.assertEqual(_chapter_decision_trees._candidate_chapters("qqqq"), set())
+
+    def test_every_detector_is_prefiltered(self):
+        matcher = _chapter_decision_trees._get_detect_matcher()
+        self.assertEqual(matcher["always"], frozenset())
+
+    def test_required_literals(self):
+        from re import _parser as sre_parse
+        req = _chapter_decision_trees._required_literals
+        self.assertEqual(req(sre_parse.parse(r"(?:fish|shrimp)\s*meal", re.I)), {"meal"})
+        self.assertEqual(req(sre_parse.parse(r"(?:קמח|fish\s*flour)", re.I)), {"קמח", "flour"})
+        self.assertEqual(req(sre_parse.parse(r"\bcarp\b", re.I)), {"carp"})
+        self.assertIsNone(req(sre_parse.parse(r"(?:fish)?\d+", re.I)))
+
+    def test_unanalyzable_detector_always_runs(self):
+        self.assertIsNone(_chapter_decision_trees._detector_literals(lambda text: len(text) > 3))
+
+
 if __name__ == "__main__":
     unittest.main()
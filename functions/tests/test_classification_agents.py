@@ -19,6 +19,8 @@ from lib.classification_agents import (
     _enrich_results_for_email,
     build_classification_email,
     build_excel_report,
+    _pre_classify_items,
+    _run_agent_graph,
 )
 
 
@@ -451,6 +453,157 @@ class TestBuildExcelEnriched:
             assert excel is None
 
 
+# ============================================================
+# CONCURRENT PRE-CLASSIFY TESTS
+# ============================================================
+
+class TestPreClassifyItems:
+    """Tests for the bounded per-item pre_classify pool"""
+
+    def _fake(self, delays=None, fail=()):
+        import time as _time
+        delays = delays or {}
+
+        def _pc(db, desc, origin, seller_name=""):
+            _time.sleep(delays.get(desc, 0))
+            if desc in fail:
+                raise RuntimeError("boom")
+            return {"desc": desc, "origin": origin, "seller": seller_name}
+        return _pc
+
+    def test_results_in_input_order(self):
+        """Slow early items must not reorder results"""
+        work = [("a", "CN"), ("b", "DE"), ("c", "US")]
+        with patch("lib.classification_agents.pre_classify",
+                   self._fake(delays={"a": 0.2}), create=True):
+            results = _pre_classify_items(Mock(), work, seller_name="S", max_workers=3)
+        assert [r["desc"] for r in results] == ["a", "b", "c"]
+        assert results[1]["origin"] == "DE"
+        assert results[2]["seller"] == "S"
+
+    def test_error_isolated(self):
+        """One failing item yields None, others still return"""
+        work = [("a", ""), ("bad", ""), ("c", "")]
+        with patch("lib.classification_agents.pre_classify",
+                   self._fake(fail={"bad"}), create=True):
+            results = _pre_classify_items(Mock(), work, max_workers=3)
+        assert results[1] is None
+        assert results[0]["desc"] == "a" and results[2]["desc"] == "c"
+
+    def test_item_timeout(self):
+        """An item past its deadline is dropped without blocking the batch"""
+        import time as _time
+        work = [("slow", ""), ("fast", "")]
+        start = _time.monotonic()
+        with patch("lib.classification_agents.pre_classify",
+                   self._fake(delays={"slow": 2.0}), create=True):
+            results = _pre_classify_items(Mock(), work, max_workers=2, item_timeout=0.3)
+        assert _time.monotonic() - start < 1.5
+        assert results[0] is None
+        assert results[1]["desc"] == "fast"
+
+    def test_serial_mode(self):
+        """max_workers=1 runs on the calling thread"""
+        import threading
+        seen = []
+
+        def _pc(db, desc, origin, seller_name=""):
+            seen.append(threading.current_thread())
+            return {"desc": desc}
+        with patch("lib.classification_agents.pre_classify", _pc, create=True):
+            results = _pre_classify_items(Mock(), [("a", ""), ("b", "")], max_workers=1)
+        assert [r["desc"] for r in results] == ["a", "b"]
+        assert all(t is threading.current_thread() for t in seen)
+
+    def test_empty_work(self):
+        """No items → empty result list"""
+        assert _pre_classify_items(Mock(), []) == []
+
+
+# ============================================================
+# AGENT GRAPH TESTS
+# ============================================================
+
+class TestRunAgentGraph:
+    """Tests for the DAG orchestrator behind Agents 3-6"""
+
+    def _sleepy(self, value, delay=0.0, fail=False):
+        import time as _time
+
+        def _fn(**deps):
+            _time.sleep(delay)
+            if fail:
+                raise RuntimeError("boom")
+            return value if not deps else {"value": value, "deps": deps}
+        return _fn
+
+    def test_independent_agents_overlap(self):
+        """Three 0.3s agents finish in about one agent's time"""
+        import time as _time
+        start = _time.monotonic()
+        results = _run_agent_graph({
+            name: {"fn": self._sleepy(name, 0.3), "default": None} for name in ("a", "b", "c")
+        }, max_workers=3)
+        assert _time.monotonic() - start < 0.8
+        assert results == {"a": "a", "b": "b", "c": "c"}
+
+    def test_dependent_gets_dep_results(self):
+        """A node runs after its deps and receives their results as kwargs"""
+        results = _run_agent_graph({
+            "reg": {"fn": self._sleepy({"regulatory": [1]}, 0.1), "default": {}},
+            "fta": {"fn": self._sleepy({"fta": [2]}), "default": {}},
+            "synthesis": {"fn": lambda reg, fta: f"{reg['regulatory']}+{fta['fta']}", "deps": ("reg", "fta")},
+        }, max_workers=3)
+        assert results["synthesis"] == "[1]+[2]"
+
+    def test_timeout_yields_default_and_dependents_run(self):
+        """A late agent is dropped; synthesis runs on partial inputs without waiting for it"""
+        import time as _time
+        start = _time.monotonic()
+        results = _run_agent_graph({
+            "slow": {"fn": self._sleepy("late", 2.0), "default": {"risk": {}}},
+            "fast": {"fn": self._sleepy("ok"), "default": None},
+            "synthesis": {"fn": lambda slow, fast: (slow, fast), "deps": ("slow", "fast"), "deadline": None},
+        }, max_workers=3, timeout=0.3)
+        assert _time.monotonic() - start < 1.5
+        assert results["synthesis"] == ({"risk": {}}, "ok")
+
+    def test_error_yields_default(self):
+        """An agent that raises contributes its default"""
+        results = _run_agent_graph({
+            "bad": {"fn": self._sleepy(None, fail=True), "default": {"fta": []}},
+            "good": {"fn": self._sleepy("ok"), "default": None},
+        }, max_workers=2)
+        assert results == {"bad": {"fta": []}, "good": "ok"}
+
+    def test_required_node_error_propagates(self):
+        """A node without a default is required"""
+        with pytest.raises(RuntimeError):
+            _run_agent_graph({"audit": {"fn": self._sleepy(None, fail=True)}}, max_workers=2)
+
+    def test_serial_mode(self):
+        """max_workers=1 runs in dependency order on the calling thread"""
+        import threading
+        seen = []
+
+        def _fn(name):
+            def _run(**deps):
+                seen.append((name, threading.current_thread()))
+                return name
+            return _run
+        results = _run_agent_graph({
+            "synthesis": {"fn": _fn("synthesis"), "deps": ("risk",)},
+            "risk": {"fn": _fn("risk")},
+        }, max_workers=1)
+        assert results == {"risk": "risk", "synthesis": "synthesis"}
+        assert [n for n, _ in seen] == ["risk", "synthesis"]
+        assert all(t is threading.current_thread() for _, t in seen)
+
+    def test_unknown_dep_rejected(self):
+        with pytest.raises(ValueError):
+            _run_agent_graph({"synthesis": {"fn": lambda risk: risk, "deps": ("risk",)}})
+
+
 # ============================================================
 # RUN TESTS
 # ============================================================
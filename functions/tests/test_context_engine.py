@@ -3,6 +3,7 @@ Tests for context_engine.py — System Intelligence First (SIF) layer.
 """
 import sys
 import os
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -21,6 +22,8 @@ from lib.context_engine import (
     _plan_tool_calls,
     _build_tool_params,
     _store_tool_result,
+    _execute_tool_plan,
+    _run_tools,
     TOOL_ROUTING_MAP,
 )
 
@@ -644,5 +647,88 @@ class TestPrepareContextPackage(unittest.TestCase):
         self.assertIn("logistics", pkg.all_domains)
 
 
+
+class TestExecuteToolPlan(unittest.TestCase):
+    """Concurrent plan execution: ordering, deadlines, dependencies."""
+
+    def setUp(self):
+        self.pkg = ContextPackage(original_subject="", original_body="", detected_language="he")
+        self.starts = {}
+        self.ends = {}
+        patches = [
+            patch("lib.context_engine._get_executor", return_value=MagicMock()),
+            patch("lib.context_engine._build_tool_params", return_value={"q": "x"}),
+            patch("lib.context_engine._run_tool", side_effect=self._fake_run),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+        self.delays = {}
+
+    def _fake_run(self, tool_name, params, executor, db, get_secret_func):
+        self.starts[tool_name] = time.monotonic()
+        time.sleep(self.delays.get(tool_name, 0))
+        self.ends[tool_name] = time.monotonic()
+        return {"value": tool_name}, [{"search": f"tool:{tool_name}", "status": "ok"}]
+
+    def _tools_in_results(self):
+        return [r["tool"] for r in self.pkg.other_tool_results]
+
+    def test_runs_concurrently_and_merges_in_plan_order(self):
+        plan = ["lookup_fta", "bank_of_israel_rates", "convert_currency"]
+        self.delays = {"lookup_fta": 0.3, "bank_of_israel_rates": 0.15}
+        t0 = time.monotonic()
+        _execute_tool_plan(plan, self.pkg, MagicMock(), None)
+        self.assertLess(time.monotonic() - t0, 0.55)
+        self.assertEqual(self._tools_in_results(), plan)
+        # Fallback search_wikipedia follows, since no customs data was found
+        logged = [e["search"] for e in self.pkg.search_log]
+        self.assertEqual(logged, [f"tool:{t}" for t in plan] + ["tool:search_wikipedia"])
+
+    def test_elapsed_ms_recorded(self):
+        self.delays = {"lookup_fta": 0.05}
+        _execute_tool_plan(["lookup_fta"], self.pkg, MagicMock(), None)
+        self.assertGreaterEqual(self.pkg.search_log[0]["elapsed_ms"], 40)
+
+    def test_tool_timeout(self):
+        self.delays = {"lookup_fta": 0.5}
+        _run_tools(["lookup_fta", "convert_currency"], self.pkg, MagicMock(), None, None,
+                   deadline=time.monotonic() + 5, default_timeout=0.1)
+        statuses = {e["search"]: e["status"] for e in self.pkg.search_log}
+        self.assertEqual(statuses["tool:lookup_fta"], "timeout")
+        self.assertEqual(self._tools_in_results(), ["convert_currency"])
+
+    def test_budget_exceeded(self):
+        self.delays = {"lookup_fta": 0.5}
+        t0 = time.monotonic()
+        _execute_tool_plan(["lookup_fta"], self.pkg, MagicMock(), None, budget_sec=0.1)
+        self.assertLess(time.monotonic() - t0, 0.4)
+        self.assertEqual(self.pkg.search_log[-1]["status"], "budget_exceeded")
+        self.assertEqual(self.pkg.other_tool_results, [])
+
+    def test_dependency_waits_for_merge(self):
+        self.delays = {"bank_of_israel_rates": 0.1}
+        dependent = dict(TOOL_ROUTING_MAP["convert_currency"], depends_on=["bank_of_israel_rates"])
+        with patch.dict(TOOL_ROUTING_MAP, {"convert_currency": dependent}):
+            _execute_tool_plan(["convert_currency", "bank_of_israel_rates"],
+                               self.pkg, MagicMock(), None)
+        self.assertGreaterEqual(self.starts["convert_currency"], self.ends["bank_of_israel_rates"])
+        self.assertEqual(self._tools_in_results(), ["bank_of_israel_rates", "convert_currency"])
+
+    def test_dependency_cycle_reported(self):
+        a = dict(TOOL_ROUTING_MAP["lookup_fta"], depends_on=["convert_currency"])
+        b = dict(TOOL_ROUTING_MAP["convert_currency"], depends_on=["lookup_fta"])
+        with patch.dict(TOOL_ROUTING_MAP, {"lookup_fta": a, "convert_currency": b}):
+            _execute_tool_plan(["lookup_fta", "convert_currency"], self.pkg, MagicMock(), None)
+        statuses = {e["search"]: e["status"] for e in self.pkg.search_log}
+        self.assertEqual(statuses["tool:lookup_fta"], "dependency_cycle")
+        self.assertEqual(statuses["tool:convert_currency"], "dependency_cycle")
+
+    def test_crash_is_logged(self):
+        with patch("lib.context_engine._run_tool", side_effect=RuntimeError("boom")):
+            _execute_tool_plan(["lookup_fta"], self.pkg, MagicMock(), None)
+        self.assertEqual(self.pkg.search_log[0]["status"], "crash:boom")
+
+
 if __name__ == '__main__':
     unittest.main()
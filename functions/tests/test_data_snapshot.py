@@ -0,0 +1,118 @@
+"""
+Tests for _data_snapshot.py — marshalled snapshots of the generated data modules.
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import _data_snapshot as ds
+from lib._data_snapshot import (
+    LazyTable, build_snapshots, load_table, reset_tables,
+    get_supplement_rate, get_unit_for_hs, get_statistical_unit,
+)
+from lib import _tariff_supplements as ts
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    reset_tables()
+    yield
+    reset_tables()
+
+
+@pytest.fixture
+def snap_dir(tmp_path, monkeypatch):
+    out = str(tmp_path / "snap")
+    build_snapshots(out)
+    monkeypatch.setattr(ds, "_SNAPSHOT_DIR", out)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Build + load
+# ---------------------------------------------------------------------------
+
+class TestSnapshots:
+
+    def test_build_writes_manifest(self, snap_dir):
+        with open(os.path.join(snap_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+        assert manifest["python"] == list(sys.version_info[:2])
+        assert "_tariff_supplements.SUPPLEMENT_RATES" in manifest["tables"]
+
+    def test_snapshot_matches_module(self, snap_dir):
+        assert load_table("_tariff_supplements", "SUPPLEMENT_RATES") == ts.SUPPLEMENT_RATES
+
+    def test_snapshot_read_without_import(self, snap_dir, monkeypatch):
+        monkeypatch.setattr(ds, "_import_table", lambda m, t: pytest.fail("imported module"))
+        assert load_table("_tariff_supplements", "GENERAL_CUSTOMS")
+
+    def test_stale_snapshot_falls_back_to_import(self, snap_dir, monkeypatch):
+        path = os.path.join(snap_dir, "manifest.json")
+        with open(path) as f:
+            manifest = json.load(f)
+        manifest["tables"]["_tariff_supplements.PURCHASE_TAX"]["source_size"] = 1
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+        imported = []
+        real = ds._import_table
+        monkeypatch.setattr(ds, "_import_table", lambda m, t: imported.append(t) or real(m, t))
+        assert load_table("_tariff_supplements", "PURCHASE_TAX") == ts.PURCHASE_TAX
+        assert imported == ["PURCHASE_TAX"]
+
+    def test_same_size_edit_falls_back_to_import(self, snap_dir, monkeypatch):
+        path = os.path.join(snap_dir, "manifest.json")
+        with open(path) as f:
+            manifest = json.load(f)
+        manifest["tables"]["_tariff_supplements.PURCHASE_TAX"]["source_sha256"] = "0" * 64
+        with open(path, "w") as f:
+            json.dump(manifest, f)
+        monkeypatch.setattr(ds, "_import_table", lambda m, t: {"fallback": True})
+        assert load_table("_tariff_supplements", "PURCHASE_TAX") == {"fallback": True}
+
+    def test_other_python_version_ignored(self, snap_dir, monkeypatch):
+        monkeypatch.setattr(ds, "_import_table", lambda m, t: {"fallback": True})
+        manifest = {"format": ds._FORMAT_VERSION, "python": [2, 7], "tables": {}}
+        assert not ds._snapshot_valid(manifest, "_tariff_supplements", "x.y")
+        assert load_table("_nope", "T", snapshot_dir=snap_dir) == {"fallback": True}
+
+    def test_no_snapshot_dir_imports(self, tmp_path):
+        data = load_table("_tariff_supplements", "STATISTICAL_UNITS",
+                          snapshot_dir=str(tmp_path / "missing"))
+        assert data == ts.STATISTICAL_UNITS
+
+    def test_missing_module_raises(self, tmp_path):
+        with pytest.raises(ImportError):
+            load_table("_no_such_module", "X", snapshot_dir=str(tmp_path))
+
+
+# ---------------------------------------------------------------------------
+# Lazy API
+# ---------------------------------------------------------------------------
+
+class TestLazyApi:
+
+    def test_supplement_helpers_match_module(self, snap_dir):
+        for code in list(ts.SUPPLEMENT_RATES)[:50] + ["8516310000", "85.16.31", "", "9999"]:
+            assert get_supplement_rate(code) == ts.get_supplement_rate(code)
+            assert get_unit_for_hs(code) == ts.get_unit_for_hs(code)
+
+    def test_statistical_unit(self, snap_dir):
+        mu_id = next(iter(ts.STATISTICAL_UNITS))
+        assert get_statistical_unit(mu_id) == ts.get_statistical_unit(mu_id)
+
+    def test_lazy_table_loads_on_access(self, snap_dir):
+        table = LazyTable("_tariff_supplements", "STATISTICAL_UNITS")
+        assert "_tariff_supplements.STATISTICAL_UNITS" not in ds._TABLES
+        assert len(table) == len(ts.STATISTICAL_UNITS)
+        assert "_tariff_supplements.STATISTICAL_UNITS" in ds._TABLES
+
+    def test_lazy_table_missing_module_is_empty(self, tmp_path):
+        table = LazyTable("_no_such_module", "X")
+        assert not table
+        assert table.get("a") is None
@@ -0,0 +1,160 @@
+"""
+Tests for elimination_engine.py — batch elimination (eliminate_batch).
+"""
+
+import copy
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import elimination_engine
+from lib.elimination_engine import TariffCache, eliminate, eliminate_batch, make_product_info
+
+
+def _firestore(collections):
+    """Dict-backed db: collection().document().get(), get_all, where().limit().stream()."""
+    db = MagicMock()
+
+    def snap(collection, doc_id):
+        data = collections.get(collection, {}).get(doc_id)
+        s = MagicMock(exists=data is not None, id=doc_id)
+        s.to_dict.return_value = data
+        s.reference.path = f"{collection}/{doc_id}"
+        return s
+
+    def collection(name):
+        col = MagicMock()
+
+        def document(doc_id):
+            ref = MagicMock(path=f"{name}/{doc_id}")
+            ref.get.side_effect = lambda: snap(name, doc_id)
+            return ref
+
+        def where(field, op, value):
+            rows = [d for d in collections.get(name, {}).values() if d.get(field) == value]
+            query = MagicMock()
+            query.limit.side_effect = lambda n: MagicMock(stream=lambda: iter(
+                [MagicMock(to_dict=MagicMock(return_value=d)) for d in rows[:n]]))
+            return query
+        col.document.side_effect = document
+        col.where.side_effect = where
+        return col
+
+    db.collection.side_effect = collection
+    db.get_all.side_effect = lambda refs: iter([snap(*ref.path.split("/")) for ref in refs])
+    return db
+
+
+def _db():
+    return _firestore({
+        "chapter_notes": {
+            "chapter_73": {
+                "chapter_title_he": "פלדה", "preamble": "Articles of iron or steel, tubes, containers and fasteners",
+                "notes": ['In this chapter, "steel containers" means tanks and boxes of steel'],
+                "exclusions": ["plastic toys and plastic dolls (chapter 95)",
+                               "steel screws and bolts except for steel pipe fittings"],
+                "inclusions": ["steel tanks and steel containers"],
+            },
+            "chapter_39": {
+                "chapter_title_he": "פלסטיק", "preamble": "Plastics and articles thereof including containers",
+                "exclusions": ["steel tanks and steel containers (chapter 73)"],
+                "inclusions": ["plastic boxes and plastic containers"],
+            },
+            "chapter_95": {"chapter_title_he": "צעצועים", "preamble": "Toys, games and sports requisites of any material"},
+        },
+        "tariff_structure": {
+            "chapter_73": {"section": "XV"}, "chapter_39": {"section": "VII"}, "chapter_95": {"section": "XX"},
+            "section_XV": {"name_en": "Base metals and articles of base metal", "chapters": ["73"]},
+            "section_VII": {"name_en": "Plastics and articles thereof; rubber", "chapters": ["39"]},
+            "section_XX": {"name_en": "Miscellaneous manufactured articles", "chapters": ["95"]},
+        },
+        "tariff": {
+            "a": {"heading": "7309", "hs_code": "7309.00", "description_en": "Tanks and containers of steel"},
+            "b": {"heading": "7326", "hs_code": "7326.90", "description_en": "Other articles of iron or steel"},
+            "c": {"heading": "3923", "hs_code": "3923.10", "description_en": "Boxes and containers of plastics"},
+            "d": {"heading": "9503", "hs_code": "9503.00", "description_en": "Toys and dolls"},
+        },
+    })
+
+
+def _items():
+    def cands(*codes):
+        return [{"hs_code": code, "confidence": 50, "description": "", "description_en": ""} for code in codes]
+    return [
+        (make_product_info({"description": "steel storage tank container", "material": "steel"}),
+         cands("7309000000", "7326900000", "3923100000")),
+        (make_product_info({"description": "plastic toy doll", "material": "plastic 90%"}),
+         cands("9503000000", "3923100000", "7326900000")),
+        (make_product_info({"description": "plastic storage box container", "material": "plastic"}),
+         cands("3923100000", "7309000000")),
+        (make_product_info({"description": "single candidate"}), cands("7326900000")),
+        (make_product_info({"description": "nothing to eliminate"}), []),
+    ]
+
+
+def _comparable(result):
+    return {k: v for k, v in result.items() if k != "timestamp"}
+
+
+@pytest.fixture(autouse=True)
+def _no_elimination_log():
+    with patch.object(elimination_engine, "_log_elimination_run"):
+        yield
+
+
+class TestEliminateBatch:
+
+    def test_batch_matches_item_by_item(self):
+        db = _db()
+        sequential = [eliminate(db, copy.deepcopy(p), copy.deepcopy(c)) for p, c in _items()]
+        batch = eliminate_batch(db, [(copy.deepcopy(p), copy.deepcopy(c)) for p, c in _items()])
+        assert [_comparable(r) for r in batch] == [_comparable(r) for r in sequential]
+        assert any(r["eliminated"] for r in batch)
+        assert batch[-1]["input_count"] == 0 and batch[-1]["challenges"] == []
+
+    def test_chapter_rules_parsed_once_per_batch(self):
+        parsed = []
+        original = elimination_engine._extract_definitions
+
+        def counting(notes_text):
+            parsed.append(notes_text)
+            return original(notes_text)
+        with patch.object(elimination_engine, "_extract_definitions", side_effect=counting):
+            eliminate_batch(_db(), _items())
+        # notes + preamble for the chapters that have them, not per item / per level
+        assert len(parsed) <= 2 * 3
+
+    def test_shared_candidate_dicts_rejected(self):
+        shared = {"hs_code": "7309000000"}
+        product = make_product_info({"description": "tank"})
+        with pytest.raises(ValueError):
+            eliminate_batch(_db(), [(product, [shared]), (product, [shared])])
+
+    def test_empty_batch(self):
+        assert eliminate_batch(_db(), []) == []
+
+
+class TestChapterRules:
+
+    def test_rules_parsed_from_notes(self):
+        rules = TariffCache(_db()).get_chapter_rules(73)
+        assert rules["found"]
+        assert rules["exclusions"][0]["other_chapters"] == ["95"]
+        conditional = rules["exclusions"][1]
+        assert conditional["conditional"] and conditional["exception"].startswith("except")
+        assert rules["inclusions"] == ["steel tanks and steel containers"]
+        assert len(rules["definitions"]) == 1
+
+    def test_missing_chapter(self):
+        rules = TariffCache(_db()).get_chapter_rules("01")
+        assert rules["found"] is False and rules["exclusions"] == []
+
+    def test_keyword_set_memoized(self):
+        cache = TariffCache(_db())
+        first = cache.keyword_set("Tanks and containers of steel")
+        assert cache.keyword_set("Tanks and containers of steel") is first
+        assert first == {"tanks", "containers", "steel"}
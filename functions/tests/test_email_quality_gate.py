@@ -457,7 +457,7 @@ class TestLogging:
 # ============================================================
 
 class TestGraphSendIntegration:
-    @patch('lib.rcb_helpers.requests')
+    @patch('lib.rcb_helpers.graph_request')
     def test_send_blocked_by_gate(self, mock_requests):
         """helper_graph_send returns False when gate rejects."""
         from lib.rcb_helpers import helper_graph_send
@@ -466,23 +466,23 @@ class TestGraphSendIntegration:
             "RCB | Deal", _good_body())
         assert result is False
         # Graph API should NOT be called
-        mock_requests.post.assert_not_called()
+        mock_requests.assert_not_called()
 
-    @patch('lib.rcb_helpers.requests')
+    @patch('lib.rcb_helpers.graph_request')
     def test_send_allowed_by_gate(self, mock_requests):
         """helper_graph_send proceeds when gate approves."""
-        mock_requests.post.return_value.status_code = 202
+        mock_requests.return_value.status_code = 202
         from lib.rcb_helpers import helper_graph_send
         result = helper_graph_send(
             "token", "rcb@rpa-port.co.il", "doron@rpa-port.co.il",
             "RCB | MEDURS12345 | Status", _good_body())
         assert result is True
-        mock_requests.post.assert_called_once()
+        mock_requests.assert_called_once()
 
-    @patch('lib.rcb_helpers.requests')
+    @patch('lib.rcb_helpers.graph_request')
     def test_send_gate_error_failopen(self, mock_requests):
         """If gate crashes, send still proceeds."""
-        mock_requests.post.return_value.status_code = 202
+        mock_requests.return_value.status_code = 202
         from lib.rcb_helpers import helper_graph_send
         with patch('lib.rcb_helpers.email_quality_gate', side_effect=Exception("boom")):
             result = helper_graph_send(
@@ -0,0 +1,178 @@
+"""
+Tests for extraction_cache.py — content-addressed reuse of attachment extractions.
+"""
+
+import base64
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import extraction_cache
+from lib.extraction_cache import (
+    cache_key, cached_extraction, get_cached_extraction, put_cached_extraction,
+    get_extraction_cache_stats, set_extraction_cache_db,
+)
+
+
+def _firestore():
+    """Mock db backed by a dict: collection/document/get/set."""
+    docs = {}
+    db = MagicMock()
+
+    def document(doc_id):
+        ref = MagicMock()
+
+        def get():
+            snap = MagicMock()
+            snap.exists = doc_id in docs
+            snap.to_dict.return_value = docs.get(doc_id)
+            return snap
+        ref.get.side_effect = get
+        ref.set.side_effect = lambda data: docs.__setitem__(doc_id, data)
+        return ref
+    db.collection.return_value.document.side_effect = document
+    return db, docs
+
+
+class TestExtractionCache:
+
+    def test_key_depends_on_bytes_extractor_and_version(self):
+        k = cache_key(b"abc", "pipeline_pdf", 1)
+        assert k.startswith("pipeline_pdf-v1-") and len(k.rsplit("-", 1)[-1]) == 64
+        assert k != cache_key(b"abd", "pipeline_pdf", 1)
+        assert k != cache_key(b"abc", "pipeline_pdf", 2)
+        assert k != cache_key(b"abc", "smart_application/pdf", 1)
+        assert "/" not in cache_key(b"abc", "smart_application/pdf", 1)
+
+    def test_second_call_skips_extractor(self):
+        fn = MagicMock(return_value={"text": "Invoice 12345"})
+        assert cached_extraction(b"pdf", "x", 1, fn)["text"] == "Invoice 12345"
+        assert cached_extraction(b"pdf", "x", 1, fn)["text"] == "Invoice 12345"
+        assert fn.call_count == 1
+        assert get_extraction_cache_stats()["memory_hits"] == 1
+
+    def test_empty_result_not_cached(self):
+        fn = MagicMock(return_value={"text": "  ", "tables": []})
+        cached_extraction(b"scan", "x", 1, fn)
+        cached_extraction(b"scan", "x", 1, fn)
+        assert fn.call_count == 2
+
+    def test_invalid_or_degraded_results_not_cached(self):
+        for result in ({"text": "abc", "valid": False}, {"text": "abc", "needs_review": True},
+                       {"text": "abc", "degraded": True}):
+            assert not put_cached_extraction(b"r", "x", 1, result)
+        assert get_cached_extraction(b"r", "x", 1) is None
+        assert get_extraction_cache_stats()["skipped"] == 3
+
+    def test_entries_expire(self, monkeypatch):
+        db, docs = _firestore()
+        set_extraction_cache_db(db)
+        put_cached_extraction(b"pdf", "x", 1, {"text": "abc"})
+        assert docs[cache_key(b"pdf", "x", 1)]["expires_at"] > 0
+        monkeypatch.setattr(extraction_cache.time, "time", lambda: 4e9)
+        assert get_cached_extraction(b"pdf", "x", 1) is None
+        assert get_extraction_cache_stats()["expired"] == 1
+
+    def test_full_text_results_accepted(self):
+        assert put_cached_extraction(b"b", "pipeline_pdf", 1, {"full_text": "abc", "tables": [[{"a": 1}]]})
+        assert get_cached_extraction(b"b", "pipeline_pdf", 1)["tables"] == [[{"a": 1}]]
+
+    def test_firestore_tier_survives_process_restart(self):
+        db, docs = _firestore()
+        set_extraction_cache_db(db)
+        put_cached_extraction(b"pdf", "x", 1, {"text": "שלום", "tables": []}, filename="inv.pdf")
+        doc = docs[cache_key(b"pdf", "x", 1)]
+        assert doc["extractor"] == "x" and doc["filename"] == "inv.pdf" and doc["char_count"] == 4
+        assert json.loads(doc["full_text"])["text"] == "שלום"
+
+        extraction_cache._MEMORY.clear()   # cold instance
+        assert get_cached_extraction(b"pdf", "x", 1)["text"] == "שלום"
+        assert get_extraction_cache_stats()["firestore_hits"] == 1
+
+    def test_large_result_goes_to_gcs(self):
+        db, docs = _firestore()
+        set_extraction_cache_db(db)
+        big = {"text": "x" * 20000}
+        with patch("lib.storage_manager.upload_to_gcs", return_value="gs://b/p") as upload:
+            assert put_cached_extraction(b"big", "x", 1, big)
+        doc = docs[cache_key(b"big", "x", 1)]
+        assert doc["full_text_storage"] == "cloud_storage" and "full_text" not in doc
+        assert upload.call_args[0][1].startswith("rcb-docs/texts/extraction_cache/")
+
+    def test_firestore_errors_fall_back_to_extractor(self):
+        db = MagicMock()
+        db.collection.side_effect = RuntimeError("unavailable")
+        set_extraction_cache_db(db)
+        fn = MagicMock(return_value={"text": "ok"})
+        assert cached_extraction(b"pdf", "x", 1, fn)["text"] == "ok"
+        assert get_extraction_cache_stats()["errors"] == 2
+
+    def test_disabled_by_env(self, monkeypatch):
+        monkeypatch.setenv("RCB_EXTRACTION_CACHE", "0")
+        fn = MagicMock(return_value={"text": "ok"})
+        cached_extraction(b"pdf", "x", 1, fn)
+        cached_extraction(b"pdf", "x", 1, fn)
+        assert fn.call_count == 2
+
+    def test_memory_lru_bounded(self, monkeypatch):
+        monkeypatch.setattr(extraction_cache, "_MEMORY_MAX_ENTRIES", 2)
+        for i in range(3):
+            put_cached_extraction(bytes([i]), "x", 1, {"text": "t"})
+        assert get_extraction_cache_stats()["memory_entries"] == 2
+        assert get_cached_extraction(bytes([0]), "x", 1) is None
+
+
+class TestCallers:
+
+    def test_attachments_reextracted_once(self):
+        from lib import rcb_helpers
+        att = [{"name": "invoice.pdf", "contentBytes": base64.b64encode(b"%PDF-1").decode()}]
+        with patch.object(rcb_helpers, "extract_text_from_pdf_bytes",
+                          return_value="Commercial invoice total USD 1500") as pdf:
+            first = rcb_helpers.extract_text_from_attachments(att)
+            second = rcb_helpers.extract_text_from_attachments(att)
+        assert pdf.call_count == 1
+        assert first == second and "=== invoice.pdf ===" in second
+
+    def test_attachment_without_text_retried(self):
+        from lib import rcb_helpers
+        att = [{"name": "scan.pdf", "contentBytes": base64.b64encode(b"%PDF-2").decode()}]
+        with patch.object(rcb_helpers, "extract_text_from_pdf_bytes", return_value="") as pdf:
+            rcb_helpers.extract_text_from_attachments(att)
+            out = rcb_helpers.extract_text_from_attachments(att)
+        assert pdf.call_count == 2 and "[No text could be extracted]" in out
+
+    def test_attachment_with_failed_ocr_retried(self):
+        from lib import rcb_helpers
+
+        def degraded(file_bytes, details=None):
+            if details is not None:
+                details["degraded"] = True
+            return "Signed: J. Doe"
+
+        att = [{"name": "scan.pdf", "contentBytes": base64.b64encode(b"%PDF-3").decode()}]
+        with patch.object(rcb_helpers, "extract_text_from_pdf_bytes", side_effect=degraded) as pdf:
+            rcb_helpers.extract_text_from_attachments(att)
+            rcb_helpers.extract_text_from_attachments(att)
+        assert pdf.call_count == 2
+
+    def test_pipeline_extract_text_cached(self):
+        from lib.data_pipeline import extractor
+        result = {"full_text": "directive text", "tables": [], "language": "en",
+                  "extraction_method": "plain_text", "char_count": 14}
+        with patch.object(extractor, "_extract_plain_text", return_value=result) as plain:
+            extractor.extract_text(b"directive text", "text/plain")
+            out = extractor.extract_text(b"directive text", "text/plain", "d.txt")
+        assert plain.call_count == 1 and out["full_text"] == "directive text"
+
+    def test_adapter_reuses_smart_extraction(self):
+        from lib import extraction_adapter
+        result = {"text": "Bill of lading MSCU1234567", "tables": [], "confidence": 0.9,
+                  "method_used": "pdfplumber", "valid": True, "warnings": []}
+        with patch("lib.read_document.read_document_reliable", return_value=result) as read:
+            a = extraction_adapter.extract_text(b"%PDF-3", "application/pdf", "bl.pdf")
+            b = extraction_adapter.extract_text(b"%PDF-3", "application/pdf", "copy.pdf")
+        assert read.call_count == 1 and a == b
@@ -0,0 +1,239 @@
+"""
+Tests for extraction_engine.py — backend registry, ordering and shared post-processing.
+"""
+
+import base64
+import os
+import sys
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import extraction_engine
+from lib.extraction_engine import (
+    backends_for, detect_doc_class, extract_document, get_extraction_engine_stats,
+    register_backend, run_backend, set_backend_order,
+)
+from lib.text_postprocess import tag_document_structure
+
+INVOICE = "Invoice No: INV-77 dated 14/03/2024, HS 8431.49, total USD 1,200.00 FOB Ningbo, China"
+
+
+def _backend(text, calls=None, error=None):
+    def fn(file_bytes, filename, content_type, doc_class):
+        if calls is not None:
+            calls.append((filename, doc_class))
+        if error:
+            raise error
+        return text, [{"row": 1}]
+    return fn
+
+
+class TestDetectDocClass:
+
+    def test_extension_wins(self):
+        assert detect_doc_class("Invoice.PDF") == "pdf"
+        assert detect_doc_class("list.tsv", "application/pdf") == "csv"
+        assert detect_doc_class("scan.tif") == "tiff"
+
+    def test_content_type_fallback(self):
+        assert detect_doc_class("attachment", "application/pdf") == "pdf"
+        assert detect_doc_class("noext", "image/jpeg") == "image"
+        assert detect_doc_class("noext", "message/rfc822") == "eml"
+
+    def test_unknown(self):
+        assert detect_doc_class("photos.zip") is None
+        assert detect_doc_class("") is None
+
+
+class TestExtractDocument:
+
+    def test_falls_through_errors_and_empty_results(self):
+        calls = []
+        register_backend("t_broken", ["pdf"], _backend("", calls, RuntimeError("boom")))
+        register_backend("t_empty", ["pdf"], _backend("   ", calls))
+        register_backend("t_good", ["pdf"], _backend(INVOICE, calls))
+        set_backend_order("pdf", ["t_broken", "t_empty", "t_good"])
+        result = extract_document(b"%PDF", "inv.pdf")
+        assert result["backend"] == "t_good"
+        assert result["tried"] == ["t_broken", "t_empty", "t_good"]
+        assert result["tables"] == [{"row": 1}]
+        stats = get_extraction_engine_stats()
+        assert stats["pdf/t_broken"]["errors"] == 1 and stats["pdf/t_good"]["hits"] == 1
+
+    def test_postprocess_tags_documents_and_urls_for_emails(self):
+        register_backend("t_good", ["pdf", "eml"], _backend(INVOICE + " see https://track.example/x1"))
+        pdf = extract_document(b"x", "inv.pdf", backends=["t_good"])["text"]
+        assert pdf.startswith("[DOCUMENT_ANALYSIS]") and "[INCOTERMS: FOB]" in pdf
+        eml = extract_document(b"x", "fwd.eml", backends=["t_good"])["text"]
+        assert "[URLS_FOUND]\nhttps://track.example/x1" in eml
+        assert "[DOCUMENT_ANALYSIS]" not in eml
+        raw = extract_document(b"x", "inv.pdf", backends=["t_good"], postprocess=False)["text"]
+        assert raw == INVOICE + " see https://track.example/x1"
+
+    def test_unknown_class_and_empty_bytes(self):
+        assert extract_document(b"zip", "a.zip")["backend"] is None
+        assert extract_document(b"", "a.pdf")["tried"] == []
+
+    def test_run_backend_unregistered_class(self):
+        import pytest
+        with pytest.raises(KeyError):
+            run_backend("rcb", b"x", "notes.txt")
+
+
+class TestBackendOrder:
+
+    def test_defaults_keep_rcb_chain(self):
+        assert backends_for("pdf") == ["rcb"]
+        assert backends_for("text") == []
+        assert set(extraction_engine.available_backends("pdf")) >= {"rcb", "smart", "reliable", "pipeline"}
+
+    def test_caller_defaults_and_overrides(self, monkeypatch):
+        assert backends_for("pdf", caller="adapter") == ["reliable"]
+        assert backends_for("eml", caller="pipeline") == []
+        assert backends_for("text", caller="pipeline") == ["pipeline"]
+        set_backend_order("pdf", ["rcb", "pipeline"], caller="pipeline")
+        assert backends_for("pdf", caller="pipeline") == ["rcb", "pipeline"]
+        assert backends_for("pdf") == ["rcb"]
+        monkeypatch.setenv("RCB_EXTRACTION_BACKENDS_ADAPTER", "pdf=smart")
+        assert backends_for("pdf", caller="adapter") == ["smart"]
+
+    def test_env_override(self, monkeypatch):
+        set_backend_order("pdf", ["smart"])
+        monkeypatch.setenv("RCB_EXTRACTION_BACKENDS", "pdf=pipeline, rcb; image=smart")
+        assert backends_for("pdf") == ["pipeline", "rcb"]
+        assert backends_for("image") == ["smart"]
+        assert backends_for("excel") == ["rcb"]
+
+    def test_set_and_restore(self):
+        set_backend_order("excel", ["smart", "rcb"])
+        assert backends_for("excel") == ["smart", "rcb"]
+        set_backend_order("excel", None)
+        assert backends_for("excel") == ["rcb"]
+
+
+class TestRcbHelpersThroughEngine:
+
+    def _att(self, name, data):
+        return {"name": name, "contentBytes": base64.b64encode(data).decode()}
+
+    def test_configured_backend_used(self):
+        from lib.rcb_helpers import extract_text_from_attachments
+        calls = []
+        register_backend("t_good", ["excel"], _backend(INVOICE, calls))
+        set_backend_order("excel", ["t_good"])
+        out = extract_text_from_attachments([self._att("list.xlsx", b"xlsx")])
+        assert calls == [("list.xlsx", "excel")]
+        assert "=== list.xlsx ===\n[DOCUMENT_ANALYSIS]" in out
+
+    def test_cache_keyed_by_backend_order(self):
+        from lib.rcb_helpers import extract_text_from_attachments
+        calls = []
+        register_backend("t_a", ["excel"], _backend("first", calls))
+        register_backend("t_b", ["excel"], _backend("second", calls))
+        att = [self._att("list.xlsx", b"same bytes")]
+        set_backend_order("excel", ["t_a"])
+        assert "first" in extract_text_from_attachments(att)
+        set_backend_order("excel", ["t_b"])
+        assert "second" in extract_text_from_attachments(att)
+        assert len(calls) == 2
+
+    def test_content_type_used_without_extension(self):
+        from lib.rcb_helpers import extract_text_from_attachments
+        with patch('lib.rcb_helpers.extract_text_from_pdf_bytes', return_value=INVOICE):
+            att = dict(self._att("scan", b"%PDF"), contentType="application/pdf")
+            out = extract_text_from_attachments([att])
+        assert "INV-77" in out
+
+    def test_csv_quoted_cells_kept_whole(self):
+        from lib.rcb_helpers import _extract_from_csv
+        text = _extract_from_csv(b'Item,Net KG\nBucket teeth,"10,560"\n')
+        assert "Bucket teeth | 10,560" in text
+
+
+class TestOtherCallersThroughEngine:
+
+    def test_adapter_uses_configured_backend(self):
+        from lib import extraction_adapter
+        calls = []
+        register_backend("t_good", ["pdf"], _backend(INVOICE, calls))
+        set_backend_order("pdf", ["t_good"], caller="adapter")
+        with patch("lib.read_document.read_document_reliable") as reliable:
+            out = extraction_adapter.extract_text(b"%PDF-adapter", "application/pdf", "inv.pdf")
+        reliable.assert_not_called()
+        assert calls == [("inv.pdf", "pdf")]
+        assert out["full_text"] == INVOICE and out["extraction_method"] == "t_good"
+
+    def test_adapter_default_is_read_document_reliable(self):
+        from lib import extraction_adapter
+        result = {"text": INVOICE, "tables": [], "confidence": 0.9, "method_used": "pdfplumber",
+                  "valid": True, "warnings": [], "needs_review": False}
+        with patch("lib.read_document.read_document_reliable", return_value=result) as reliable:
+            out = extraction_adapter.extract_text(b"%PDF-reliable", "application/pdf", "bl.pdf")
+        reliable.assert_called_once()
+        assert out["extraction_method"] == "pdfplumber" and out["confidence"] == 0.9
+
+    def test_pipeline_uses_configured_backend(self):
+        from lib.data_pipeline import extractor
+        calls = []
+        register_backend("t_good", ["pdf"], _backend(INVOICE, calls))
+        set_backend_order("pdf", ["t_good"], caller="pipeline")
+        out = extractor.extract_text(b"%PDF-pipeline", "application/pdf", "directive.pdf")
+        assert calls == [("directive.pdf", "pdf")]
+        assert out["full_text"] == INVOICE and out["extraction_method"] == "t_good"
+        assert out["language"] == "en" and out["char_count"] == len(INVOICE)
+
+    def test_pipeline_default_keeps_own_result(self):
+        from lib.data_pipeline import extractor
+        out = extractor.extract_text("שלום עולם, צו יבוא".encode("utf-8"), "text/plain", "notes.bin")
+        assert out["extraction_method"] == "plain_text" and out["language"] == "he"
+
+
+class TestSharedPostprocessor:
+
+    def test_adapter_uses_shared_tagger(self):
+        from lib import extraction_adapter
+        assert extraction_adapter._tag_document_structure is tag_document_structure
+        tagged = tag_document_structure(INVOICE)
+        assert "[COUNTRIES: China]" in tagged and "[INCOTERMS: FOB]" in tagged
+
+    def test_smart_extractor_uses_shared_cleanup(self):
+        from lib.smart_extractor import SmartExtractor
+        assert SmartExtractor()._cleanup_hebrew('מע"ט   חשבוו') == 'מע"מ  חשבון'
+
+
+class TestBenchmarkHarness:
+
+    def test_quality_score(self):
+        from benchmarks.extraction_bench import quality_score
+        assert quality_score("Total USD  12,440.00\nFOB", ["usd 12,440.00", "FOB", "CIF"]) == 2 / 3
+        assert quality_score("", []) == 1.0
+
+    def test_corpus_stdlib_backends_full_quality(self):
+        from benchmarks.extraction_bench import recommend_order, run_benchmark
+        rows, summary = run_benchmark(backends=["rcb"], classes={"csv", "html", "eml"})
+        assert {r["file"] for r in rows} >= {"packing_list_en.csv", "arrival_notice_he.html",
+                                             "arrival_notice_he.eml"}
+        assert all(s["quality"] == 1.0 and s["errors"] == 0 for s in summary)
+        assert recommend_order(summary)["csv"] == ["rcb"]
+
+    def test_hebrew_pdfs_embed_font_with_unicode_map(self):
+        from benchmarks.extraction_bench import CORPUS_DIR
+        from benchmarks.extraction_corpus import visual_order
+        with open(os.path.join(CORPUS_DIR, "invoice_he.pdf"), "rb") as f:
+            pdf = f.read()
+        assert b"/Subtype /Type3" in pdf and b"/ToUnicode 6 0 R" in pdf
+        assert b"<05D7>" in pdf and b"<05EA>" in pdf     # ח, ת
+        with open(os.path.join(CORPUS_DIR, "bl_scan_he.pdf"), "rb") as f:
+            scan = f.read()
+        assert b"/Subtype /Image" in scan and b"/Font" not in scan
+        line = "תאריך: 05/05/2024"
+        assert "".join(line[i] for i in visual_order(line)) == "05/05/2024 :ךיראת"
+
+    def test_corpus_is_reproducible(self, tmp_path):
+        from benchmarks.extraction_bench import CORPUS_DIR
+        from benchmarks.extraction_corpus import write_corpus
+        expected = write_corpus(str(tmp_path))
+        for filename in expected:
+            with open(os.path.join(CORPUS_DIR, filename), "rb") as checked_in:
+                assert (tmp_path / filename).read_bytes() == checked_in.read(), filename
@@ -0,0 +1,141 @@
+"""
+Tests for graph_batch.py — $batch chunking, demultiplexing and the per-run session.
+"""
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import graph_batch, graph_client
+from lib.graph_batch import (
+    GraphBatchSession, activate_graph_batch, deactivate_graph_batch, graph_batch as send_batch,
+)
+
+
+class _FakeGraph:
+    """Answers POST /$batch; `answer(sub)` returns (status, body) per sub-request."""
+
+    def __init__(self, answer=None):
+        self.batches = []
+        self.answer = answer or (lambda sub: (200, {}))
+
+    def __call__(self, method, url, access_token=None, json=None, **kwargs):
+        assert method == "POST" and url == "/$batch"
+        self.batches.append(json["requests"])
+        responses = []
+        for sub in reversed(json["requests"]):   # Graph may answer out of order
+            status, body = self.answer(sub)
+            responses.append({"id": sub["id"], "status": status, "body": body,
+                              "headers": {"Retry-After": "2"} if status == 429 else {}})
+        return Mock(status_code=200, json=lambda: {"responses": responses})
+
+
+@pytest.fixture
+def fake():
+    g = _FakeGraph()
+    with patch.object(graph_batch, "graph_request", side_effect=g), \
+            patch.object(graph_client, "_sleep") as sleep:
+        g.sleep = sleep
+        yield g
+    deactivate_graph_batch()
+
+
+class TestGraphBatch:
+
+    def test_chunks_of_twenty_and_aligned_results(self, fake):
+        fake.answer = lambda sub: (200, {"url": sub["url"]})
+        subs = [{"method": "get", "url": f"{graph_client.GRAPH_BASE}/users/u/messages/m{i}"}
+                for i in range(45)]
+        results = send_batch("tok", subs)
+        assert [len(b) for b in fake.batches] == [20, 20, 5]
+        assert fake.batches[0][0]["url"] == "/users/u/messages/m0"
+        assert [r["body"]["url"] for r in results] == [f"/users/u/messages/m{i}" for i in range(45)]
+
+    def test_throttled_subrequests_retried(self, fake):
+        calls = {}
+
+        def answer(sub):
+            calls[sub["id"]] = calls.get(sub["id"], 0) + 1
+            return (429, {}) if sub["id"] == "1" and calls["1"] == 1 else (200, {})
+        fake.answer = answer
+        results = send_batch("tok", [{"method": "GET", "url": "/a"}, {"method": "GET", "url": "/b"}])
+        assert [r["status"] for r in results] == [200, 200]
+        assert [len(b) for b in fake.batches] == [2, 1]
+        fake.sleep.assert_called_once_with(2.0)
+
+    def test_failed_batch_call_marks_subrequests(self):
+        with patch.object(graph_batch, "graph_request", return_value=Mock(status_code=400)):
+            results = send_batch("tok", [{"method": "GET", "url": "/a"}])
+        assert results[0]["status"] == 400
+
+
+class TestGraphBatchSession:
+
+    def test_mark_read_queued_and_flushed(self, fake):
+        from lib.rcb_helpers import helper_graph_mark_read
+        session = GraphBatchSession("tok", "rcb@x.com")
+        activate_graph_batch(session)
+        for i in range(25):
+            helper_graph_mark_read("tok", "RCB@x.com", f"m{i}")
+        assert fake.batches == []
+        deactivate_graph_batch()
+        assert session.flush_mark_read() == 25
+        assert [len(b) for b in fake.batches] == [20, 5]
+        assert fake.batches[0][0] == {"id": "0", "method": "PATCH", "url": "/users/rcb@x.com/messages/m0",
+                                      "body": {"isRead": True},
+                                      "headers": {"Content-Type": "application/json"}}
+        assert not session.queue_mark_read("late")
+
+    def test_other_token_not_batched(self, fake):
+        from lib import rcb_helpers
+        activate_graph_batch(GraphBatchSession("tok", "rcb@x.com"))
+        with patch.object(rcb_helpers, "graph_request") as direct:
+            rcb_helpers.helper_graph_mark_read("other", "rcb@x.com", "m1")
+        direct.assert_called_once()
+
+    def test_attachments_fetched_per_chunk_and_demultiplexed(self, fake):
+        from lib import rcb_helpers
+        fake.answer = lambda sub: (200, {"value": [{"name": sub["url"].split("/")[-2]}]})
+        session = GraphBatchSession("tok", "rcb@x.com")
+        session.plan_attachments([f"m{i}" for i in range(30)])
+        activate_graph_batch(session)
+        assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m3") == [{"name": "m3"}]
+        assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m7") == [{"name": "m7"}]
+        assert len(fake.batches) == 1 and len(fake.batches[0]) == 20
+        assert fake.batches[0][0]["url"].endswith("/attachments?$select=" + graph_batch.ATTACHMENT_META_SELECT)
+        assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m25") == [{"name": "m25"}]
+        assert len(fake.batches) == 2
+        # every lane of a message reads the same list
+        assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m3") == [{"name": "m3"}]
+        assert session.stats()["attachments_served"] == 4
+
+    def test_failed_subrequest_falls_back_to_single_call(self, fake):
+        from lib import rcb_helpers
+        fake.answer = lambda sub: (404, {}) if "m1" in sub["url"] else (200, {"value": []})
+        session = GraphBatchSession("tok", "rcb@x.com")
+        session.plan_attachments(["m0", "m1"])
+        activate_graph_batch(session)
+        single = Mock(status_code=200, json=lambda: {"value": [{"name": "a.pdf"}]})
+        with patch.object(rcb_helpers, "graph_request", return_value=single) as direct:
+            assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m1") == [{"name": "a.pdf"}]
+            assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m0") == []
+            assert rcb_helpers.helper_graph_attachment_list("tok", "rcb@x.com", "m9") == [{"name": "a.pdf"}]
+        assert direct.call_count == 2
+
+    def test_bodies_downloaded_per_message(self, fake):
+        from lib import rcb_helpers
+        fake.answer = lambda sub: (200, {"value": [{"id": "a1", "name": "inv.pdf"}] if "m1" in sub["url"] else []})
+        session = GraphBatchSession("tok", "rcb@x.com")
+        session.plan_attachments(["m0", "m1"])
+        activate_graph_batch(session)
+        full = Mock(status_code=200, json=lambda: {"value": [{"name": "inv.pdf", "contentBytes": "JVBERg=="}]})
+        with patch.object(rcb_helpers, "graph_request", return_value=full) as direct:
+            assert rcb_helpers.helper_graph_attachments("tok", "rcb@x.com", "m0") == []
+            assert rcb_helpers.helper_graph_attachments("tok", "rcb@x.com", "m1")[0]["contentBytes"] == "JVBERg=="
+        direct.assert_called_once()
+        assert direct.call_args[0][1].endswith("/messages/m1/attachments")
+        assert "contentBytes" not in str(fake.batches)
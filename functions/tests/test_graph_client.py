@@ -0,0 +1,151 @@
+"""
+Tests for graph_client.py — pooled session, retries, token cache and metrics.
+"""
+
+import os
+import sys
+from unittest.mock import Mock, patch
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import graph_client
+from lib.graph_client import (
+    GRAPH_BASE, get_graph_stats, get_graph_token, get_session, graph_request,
+)
+
+
+def _resp(status_code, body=None, headers=None):
+    return Mock(status_code=status_code, json=lambda: body or {}, headers=headers or {})
+
+
+@pytest.fixture
+def session():
+    """Mock pooled session + recorded sleeps (no real waiting)."""
+    sleeps = []
+    sess = Mock()
+    with patch.object(graph_client, "get_session", return_value=sess), \
+            patch.object(graph_client, "_sleep", side_effect=sleeps.append):
+        sess.sleeps = sleeps
+        yield sess
+
+
+class TestGraphRequest:
+
+    def test_session_is_shared(self):
+        assert get_session() is get_session()
+
+    def test_relative_url_auth_and_timeout(self, session):
+        session.request.return_value = _resp(200)
+        graph_request("get", "/users/x/messages", "tok", params={"$top": 5})
+        method, url = session.request.call_args[0]
+        kwargs = session.request.call_args[1]
+        assert method == "GET" and url == GRAPH_BASE + "/users/x/messages"
+        assert kwargs["headers"]["Authorization"] == "Bearer tok"
+        assert kwargs["timeout"] == graph_client.DEFAULT_TIMEOUT
+
+    def test_retry_after_honoured_on_429(self, session):
+        session.request.side_effect = [_resp(429, headers={"Retry-After": "7"}), _resp(200)]
+        assert graph_request("GET", "/me", "tok").status_code == 200
+        assert session.sleeps == [7.0]
+        stats = get_graph_stats()
+        assert stats["throttled"] == 1 and stats["retries"] == 1 and stats["requests"] == 2
+
+    def test_retry_after_capped(self, session):
+        session.request.side_effect = [_resp(503, headers={"Retry-After": "3600"}), _resp(202)]
+        graph_request("POST", "/sendMail", "tok", json={})
+        assert session.sleeps == [graph_client.MAX_RETRY_AFTER_SEC]
+
+    def test_gives_up_after_max_retries(self, session):
+        session.request.return_value = _resp(503)
+        assert graph_request("GET", "/me", "tok", max_retries=2).status_code == 503
+        assert session.request.call_count == 3
+        assert get_graph_stats()["errors"] == 1
+
+    def test_connection_error_retried_for_get_only(self, session):
+        session.request.side_effect = [requests.ConnectionError("reset"), _resp(200)]
+        assert graph_request("GET", "/me", "tok").status_code == 200
+
+        session.request.side_effect = [requests.ConnectionError("reset"), _resp(202)]
+        with pytest.raises(requests.ConnectionError):
+            graph_request("POST", "/sendMail", "tok", json={})
+
+    def test_post_not_retried_after_possible_acceptance(self, session):
+        session.request.side_effect = [_resp(504), _resp(202)]
+        assert graph_request("POST", "/sendMail", "tok", json={}).status_code == 504
+        session.request.side_effect = [_resp(503), _resp(202)]
+        assert graph_request("POST", "/sendMail", "tok", json={}).status_code == 503
+        assert session.request.call_count == 2 and session.sleeps == []
+
+    def test_post_retried_on_throttle(self, session):
+        session.request.side_effect = [_resp(429, headers={"Retry-After": "2"}), _resp(202)]
+        assert graph_request("POST", "/sendMail", "tok", json={}).status_code == 202
+        assert session.sleeps == [2.0]
+
+    def test_client_errors_not_retried(self, session):
+        session.request.return_value = _resp(404)
+        assert graph_request("GET", "/me", "tok").status_code == 404
+        assert session.request.call_count == 1
+
+
+class TestTokenCache:
+
+    def test_token_reused_until_expiry(self, session):
+        session.request.return_value = _resp(200, {"access_token": "t1", "expires_in": 3599})
+        assert get_graph_token("ten", "cid", "sec") == "t1"
+        assert get_graph_token("ten", "cid", "sec") == "t1"
+        assert session.request.call_count == 1
+        assert get_graph_stats()["token_cache_hits"] == 1
+
+    def test_short_lived_token_refetched(self, session):
+        session.request.side_effect = [
+            _resp(200, {"access_token": "t1", "expires_in": 60}),
+            _resp(200, {"access_token": "t2", "expires_in": 3599}),
+        ]
+        assert get_graph_token("ten", "cid", "sec") == "t1"
+        assert get_graph_token("ten", "cid", "sec") == "t2"
+
+    def test_rotated_secret_gets_new_token(self, session):
+        session.request.side_effect = [
+            _resp(200, {"access_token": "t1", "expires_in": 3599}),
+            _resp(200, {"access_token": "t2", "expires_in": 3599}),
+        ]
+        get_graph_token("ten", "cid", "old")
+        assert get_graph_token("ten", "cid", "new") == "t2"
+
+    def test_failed_login_not_cached(self, session):
+        session.request.side_effect = [_resp(401), _resp(200, {"access_token": "t1"})]
+        assert get_graph_token("ten", "cid", "sec") is None
+        assert get_graph_token("ten", "cid", "sec") == "t1"
+
+    def test_401_refetches_token_once(self, session):
+        session.request.side_effect = [
+            _resp(200, {"access_token": "t1", "expires_in": 3599}),
+            _resp(401),
+            _resp(200, {"access_token": "t2", "expires_in": 3599}),
+            _resp(200),
+        ]
+        token = get_graph_token("ten", "cid", "sec")
+        assert graph_request("GET", "/me", token).status_code == 200
+        assert session.request.call_args[1]["headers"]["Authorization"] == "Bearer t2"
+        assert get_graph_token("ten", "cid", "sec") == "t2"
+        assert get_graph_stats()["token_refreshes"] == 1
+
+    def test_401_with_stale_token_uses_already_refreshed_one(self, session):
+        session.request.side_effect = [
+            _resp(200, {"access_token": "t1", "expires_in": 3599}),
+            _resp(401), _resp(200, {"access_token": "t2", "expires_in": 3599}), _resp(200),
+            _resp(401), _resp(200),
+        ]
+        get_graph_token("ten", "cid", "sec")
+        graph_request("GET", "/me", "t1")
+        assert graph_request("GET", "/me", "t1").status_code == 200
+        assert session.request.call_count == 6
+        assert get_graph_stats()["token_fetches"] == 2
+
+    def test_401_not_retried_twice_or_for_unknown_tokens(self, session):
+        session.request.return_value = _resp(401)
+        assert graph_request("GET", "/me", "foreign").status_code == 401
+        assert session.request.call_count == 1
@@ -0,0 +1,199 @@
+"""
+Tests for intelligence.py — batched keyword/product/supplier index lookups.
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import intelligence
+from lib.intelligence import (
+    _fetch_index_docs, _keyword_doc_ids, _product_doc_ids, _supplier_doc_id,
+    _search_keyword_index, _search_product_index, _search_supplier_index,
+    prefetch_index_docs, clear_index_cache,
+)
+
+
+# ---------------------------------------------------------------------------
+# Fake Firestore with get_all
+# ---------------------------------------------------------------------------
+
+class _Snap:
+    def __init__(self, collection, doc_id, data):
+        self.id = doc_id
+        self.exists = data is not None
+        self._data = data
+        self.reference = MagicMock()
+        self.reference.parent.id = collection
+
+    def to_dict(self):
+        return self._data
+
+
+class _FakeDB:
+    """Minimal Firestore stand-in: collection().document().get() + get_all()."""
+
+    def __init__(self, docs):
+        self.docs = docs            # {(collection, id): data}
+        self.get_all_calls = 0
+        self.get_calls = 0
+
+    def collection(self, name):
+        db = self
+        coll = MagicMock()
+
+        def _document(doc_id):
+            ref = MagicMock()
+            ref._key = (name, doc_id)
+
+            def _get():
+                db.get_calls += 1
+                return _Snap(name, doc_id, db.docs.get((name, doc_id)))
+            ref.get.side_effect = _get
+            return ref
+        coll.document.side_effect = _document
+        return coll
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        for ref in refs:
+            yield _Snap(ref._key[0], ref._key[1], self.docs.get(ref._key))
+
+
+@pytest.fixture(autouse=True)
+def _reset_cache():
+    clear_index_cache()
+    yield
+    clear_index_cache()
+
+
+_DOCS = {
+    ("keyword_index", "cotton"): {"codes": [{"hs_code": "6109.10", "weight": 5}]},
+    ("keyword_index", "shirts"): {"codes": [{"hs_code": "6109.10", "weight": 3},
+                                            {"hs_code": "6205.20", "weight": 2}]},
+    ("product_index", "cotton_shirts"): {"hs_code": "6109.10", "confidence": 88},
+    ("supplier_index", "acme"): {"codes": [{"hs_code": "6109.10", "count": 4}]},
+}
+
+
+# ---------------------------------------------------------------------------
+# Doc-id helpers
+# ---------------------------------------------------------------------------
+
+class TestDocIds:
+
+    def test_keyword_ids_limited_to_12(self):
+        assert len(_keyword_doc_ids([f"kw{i}" for i in range(20)])) == 12
+
+    def test_product_ids_with_prefix(self):
+        ids = _product_doc_ids("a" * 30 + " " + "b" * 40)
+        assert len(ids) == 2
+
+    def test_product_ids_short_description(self):
+        assert _product_doc_ids("abc") == []
+
+    def test_supplier_suffix_stripped(self):
+        assert _supplier_doc_id("ACME Ltd.") == "acme"
+
+
+# ---------------------------------------------------------------------------
+# Batched fetch
+# ---------------------------------------------------------------------------
+
+class TestFetchIndexDocs:
+
+    def test_single_get_all_for_many_docs(self):
+        db = _FakeDB(_DOCS)
+        keys = [("keyword_index", "cotton"), ("keyword_index", "shirts"),
+                ("keyword_index", "missing"), ("product_index", "cotton_shirts")]
+        found = _fetch_index_docs(db, keys)
+        assert db.get_all_calls == 1
+        assert db.get_calls == 0
+        assert found[("keyword_index", "missing")] is None
+        assert found[("product_index", "cotton_shirts")]["confidence"] == 88
+
+    def test_cached_after_first_fetch(self):
+        db = _FakeDB(_DOCS)
+        _fetch_index_docs(db, [("keyword_index", "cotton")])
+        _fetch_index_docs(db, [("keyword_index", "cotton")])
+        assert db.get_all_calls == 1
+
+    def test_cached_entries_expire(self, monkeypatch):
+        from lib import intelligence
+        monkeypatch.setattr(intelligence, "_INDEX_DOC_TTL_SEC", -1)
+        db = _FakeDB(dict(_DOCS))
+        assert _fetch_index_docs(db, [("keyword_index", "new")])[("keyword_index", "new")] is None
+        db.docs[("keyword_index", "new")] = {"codes": []}
+        found = _fetch_index_docs(db, [("keyword_index", "new")])
+        assert db.get_all_calls == 2
+        assert found[("keyword_index", "new")] == {"codes": []}
+
+    def test_run_rereads_docs_cached_before_it_started(self):
+        import contextvars
+        from lib.intelligence import begin_index_cache_run
+        db = _FakeDB(dict(_DOCS))
+        _fetch_index_docs(db, [("keyword_index", "cotton")])
+
+        def run():
+            begin_index_cache_run()
+            _fetch_index_docs(db, [("keyword_index", "cotton")])
+            _fetch_index_docs(db, [("keyword_index", "cotton")])
+        contextvars.copy_context().run(run)
+        assert db.get_all_calls == 2
+        # a concurrent run (other context) still has its cached entry
+        _fetch_index_docs(db, [("keyword_index", "cotton")])
+        assert db.get_all_calls == 2
+
+    def test_fallback_to_get_without_get_all(self):
+        db = _FakeDB(_DOCS)
+        db.get_all = MagicMock(side_effect=AttributeError("no get_all"))
+        found = _fetch_index_docs(db, [("keyword_index", "cotton")])
+        assert db.get_calls == 1
+        assert found[("keyword_index", "cotton")] is not None
+
+    def test_cache_reset_for_new_db(self):
+        _fetch_index_docs(_FakeDB(_DOCS), [("keyword_index", "cotton")])
+        other = _FakeDB({})
+        found = _fetch_index_docs(other, [("keyword_index", "cotton")])
+        assert found[("keyword_index", "cotton")] is None
+
+
+# ---------------------------------------------------------------------------
+# Prefetch + search helpers
+# ---------------------------------------------------------------------------
+
+class TestPrefetch:
+
+    def test_prefetch_serves_all_item_lookups(self):
+        db = _FakeDB(_DOCS)
+        descs = ["cotton shirts", "cotton shirts blue", "wool sweater knitted"]
+        prefetch_index_docs(db, descs, seller_name="Acme Ltd")
+        assert db.get_all_calls == 1
+        for desc in descs:
+            _search_keyword_index(db, intelligence._extract_keywords(desc))
+            _search_product_index(db, desc.lower())
+        _search_supplier_index(db, "Acme Ltd")
+        assert db.get_all_calls == 1
+        assert db.get_calls == 0
+
+    def test_keyword_index_scoring_unchanged(self):
+        db = _FakeDB(_DOCS)
+        results = _search_keyword_index(db, ["cotton", "shirts"])
+        top = results[0]
+        assert top["hs_code"] == "6109.10"
+        assert top["matched_keywords"] == 2
+        assert top["weight"] == 8
+
+    def test_supplier_index_results(self):
+        db = _FakeDB(_DOCS)
+        results = _search_supplier_index(db, "ACME")
+        assert results[0]["confidence"] == 50
+
+    def test_prefetch_empty(self):
+        db = _FakeDB(_DOCS)
+        assert prefetch_index_docs(db, ["", None]) == 0
+        assert db.get_all_calls == 0
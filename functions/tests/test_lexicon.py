@@ -0,0 +1,115 @@
+"""
+Tests for lexicon.py — shared tokenizer and array-backed postings.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.lexicon import (
+    Lexicon, get_lexicon, reset_lexicons, strip_prefixes, tokenize, index_tokens,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    reset_lexicons()
+    yield
+    reset_lexicons()
+
+
+# ---------------------------------------------------------------------------
+# Tokenizer
+# ---------------------------------------------------------------------------
+
+class TestTokenizer:
+
+    def test_tokenize_drops_stop_words_and_short(self):
+        assert tokenize("The steel box of a crane x") == ["steel", "box", "crane"]
+
+    def test_tokenize_custom_stop(self):
+        assert tokenize("the box", stop=frozenset()) == ["the", "box"]
+
+    def test_compound_prefix_first(self):
+        variants = strip_prefixes("והמכולות")
+        assert variants[0] == "והמכולות"
+        assert variants[1] == "מכולות"
+        assert "המכולות" in variants
+
+    def test_short_words_not_stripped(self):
+        assert strip_prefixes("מים") == ["מים"]
+
+    def test_min_len_zero_keeps_two_letter_stem(self):
+        assert strip_prefixes("מבד", min_len=0) == ["מבד", "בד"]
+        assert strip_prefixes("בו", min_len=0) == ["בו"]
+
+    def test_index_tokens_add_first_variant_only(self):
+        assert index_tokens("והמכולות") == ["והמכולות", "מכולות"]
+
+    def test_empty(self):
+        assert tokenize(None) == []
+        assert index_tokens("") == []
+
+
+# ---------------------------------------------------------------------------
+# Lexicon
+# ---------------------------------------------------------------------------
+
+class TestLexicon:
+
+    def _word_index(self):
+        return {
+            "steel": [("7308000000", "tariff", 5), ("7326000000", "chapter", 3)],
+            "crane": [("8426000000", "tariff", 4)],
+            "cranes": [("8426110000", "tariff", 2)],
+        }
+
+    def test_postings_round_trip_with_labels(self):
+        wi = self._word_index()
+        lex = Lexicon.build(wi, labels=True)
+        for word, entries in wi.items():
+            assert lex.postings(word) == entries
+        assert lex.postings("missing") == []
+
+    def test_doc_keys_interned_once(self):
+        lex = Lexicon.build({"a1": [("X", 1, 0)], "b1": [("X", 2, 0)]})
+        assert lex.doc_keys == ["X"]
+
+    def test_has_tag_mask(self):
+        lex = Lexicon.build({"w": [(1, 1, 0), (2, 1, 0)], "e": [(1, 2, 0)]})
+        assert lex.has("w", 1) and not lex.has("w", 2)
+        assert lex.has("e", 2)
+        assert not lex.has("missing", 3)
+
+    def test_expand_prefix(self):
+        lex = Lexicon.build(self._word_index(), labels=True)
+        assert lex.expand("cran") == ["crane", "cranes"]
+        assert lex.expand("st", min_len=3) == []
+
+    def test_empty_lexicon(self):
+        lex = Lexicon()
+        assert len(lex) == 0
+        assert "x" not in lex
+        assert lex.docs("x") == []
+
+
+class TestRegistry:
+
+    def test_built_once(self):
+        calls = []
+
+        def builder():
+            calls.append(1)
+            return Lexicon.build({"a": [("d", 1, 0)]})
+        first = get_lexicon("t", builder)
+        assert get_lexicon("t", builder) is first
+        assert len(calls) == 1
+
+    def test_reset_one(self):
+        get_lexicon("a", Lexicon)
+        b = get_lexicon("b", Lexicon)
+        reset_lexicons("a")
+        assert get_lexicon("b", Lexicon) is b
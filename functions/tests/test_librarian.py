@@ -15,7 +15,9 @@ from lib.librarian import (
     search_collection_smart,
     search_tariff_codes,
     clear_search_cache,
+    get_collection_cache_stats,
 )
+from lib import librarian
 
 
 # ============================================================
@@ -173,6 +175,115 @@ class TestSearchCollectionSmart:
         assert results == []
 
 
+# ============================================================
+# COLLECTION SNAPSHOT CACHE TESTS
+# ============================================================
+
+def _mock_doc(doc_id, data):
+    doc = Mock()
+    doc.id = doc_id
+    doc.to_dict.return_value = data
+    return doc
+
+
+class TestCollectionSnapshotCache:
+    """Tests for the warm collection snapshot cache"""
+
+    def setup_method(self):
+        clear_search_cache()
+
+    def _db(self, docs):
+        mock_db = MagicMock()
+        mock_db.collection.return_value.limit.return_value.stream.return_value = docs
+        return mock_db
+
+    def test_collection_streamed_once_across_keyword_sets(self):
+        """Different keyword sets should reuse the same snapshot"""
+        mock_db = self._db([_mock_doc("d1", {"text": "electric hair dryer"})])
+        search_collection_smart(mock_db, "test", ["electric"], ["text"])
+        search_collection_smart(mock_db, "test", ["dryer"], ["text"])
+        search_collection_smart(mock_db, "test", ["hair"], ["text"])
+        assert mock_db.collection.return_value.limit.return_value.stream.call_count == 1
+
+    def test_hit_and_miss_counters(self):
+        """Stats should count one miss then hits"""
+        mock_db = self._db([_mock_doc("d1", {"text": "electric"})])
+        before = get_collection_cache_stats()
+        search_collection_smart(mock_db, "test", ["electric"], ["text"])
+        search_collection_smart(mock_db, "test", ["fan"], ["text"])
+        after = get_collection_cache_stats()
+        assert after["misses"] - before["misses"] == 1
+        assert after["hits"] - before["hits"] == 1
+        assert after["collections"] == 1
+
+    def test_word_boundary_preserved(self):
+        """Latin keywords must match whole words only"""
+        mock_db = self._db([_mock_doc("d1", {"text": "status report"})])
+        assert search_collection_smart(mock_db, "test", ["us"], ["text"]) == []
+
+    def test_hebrew_substring_match(self):
+        """Hebrew keywords still match as substrings"""
+        mock_db = self._db([_mock_doc("d1", {"text": "מייבשי שיער"})])
+        results = search_collection_smart(mock_db, "test", ["מייבש"], ["text"])
+        assert len(results) == 1
+
+    def test_only_requested_fields_scored(self):
+        """Text in fields outside text_fields must not score"""
+        mock_db = self._db([_mock_doc("d1", {"title": "dryer", "notes": "electric"})])
+        results = search_collection_smart(mock_db, "test", ["electric"], ["title"])
+        assert results == []
+
+    def test_ttl_expiry_reloads(self, monkeypatch):
+        """Snapshot older than TTL is reloaded"""
+        mock_db = self._db([_mock_doc("d1", {"text": "electric"})])
+        search_collection_smart(mock_db, "test", ["electric"], ["text"])
+        librarian._COLLECTION_CACHE["test"]["loaded_at"] -= librarian._COLLECTION_TTL_SEC + 1
+        search_collection_smart(mock_db, "test", ["fan"], ["text"])
+        assert mock_db.collection.return_value.limit.return_value.stream.call_count == 2
+
+    def test_updated_at_change_reloads(self):
+        """A newer updated_at in the probe triggers a reload"""
+        mock_db = self._db([_mock_doc("d1", {"text": "electric", "updated_at": 1})])
+        search_collection_smart(mock_db, "test", ["electric"], ["text"])
+        snap = librarian._COLLECTION_CACHE["test"]
+        snap["checked_at"] -= librarian._COLLECTION_CHECK_SEC + 1
+        probe = mock_db.collection.return_value.order_by.return_value.limit.return_value
+        probe.stream.return_value = [_mock_doc("d2", {"updated_at": 2})]
+        search_collection_smart(mock_db, "test", ["fan"], ["text"])
+        assert mock_db.collection.return_value.limit.return_value.stream.call_count == 2
+
+    def test_lru_eviction_under_memory_ceiling(self, monkeypatch):
+        """Least recently used collections are evicted first"""
+        monkeypatch.setattr(librarian, "_COLLECTION_CACHE_MAX_BYTES", 1)
+        mock_db = self._db([_mock_doc("d1", {"text": "electric"})])
+        search_collection_smart(mock_db, "a", ["electric"], ["text"])
+        search_collection_smart(mock_db, "b", ["electric"], ["text"])
+        assert list(librarian._COLLECTION_CACHE) == ["b"]
+
+    def test_concurrent_searches_share_cache(self, monkeypatch):
+        """Parallel searches across collections keep the LRU cache consistent"""
+        from concurrent.futures import ThreadPoolExecutor
+        monkeypatch.setattr(librarian, "_COLLECTION_CACHE_MAX_BYTES", 2000)
+        mock_db = self._db([_mock_doc("d1", {"text": "electric"})])
+        names = [f"c{i % 8}" for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(
+                lambda n: search_collection_smart(mock_db, n, [n, "electric"], ["text"]), names))
+        assert all(len(r) == 1 for r in results)
+        stats = get_collection_cache_stats()
+        assert stats["bytes"] <= 2000
+        assert stats["collections"] == len(librarian._COLLECTION_CACHE)
+
+    def test_clear_keeps_collections_when_asked(self):
+        """clear_search_cache(collections=False) keeps warm snapshots"""
+        mock_db = self._db([_mock_doc("d1", {"text": "electric"})])
+        search_collection_smart(mock_db, "test", ["electric"], ["text"])
+        clear_search_cache(collections=False)
+        assert "test" in librarian._COLLECTION_CACHE
+        clear_search_cache()
+        assert "test" not in librarian._COLLECTION_CACHE
+
+
 # ============================================================
 # TARIFF CODE SEARCH TESTS
 # ============================================================
@@ -0,0 +1,209 @@
+"""
+Tests for llm_cache.py — content-addressed reuse of LLM responses.
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock, Mock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import llm_cache
+from lib.llm_cache import (
+    llm_cache_key, cached_llm_call, get_cached_response, put_cached_response,
+    get_llm_cache_stats, set_llm_cache_db, IncompleteResponse, has_json_object,
+)
+from lib.classification_agents import call_claude, call_gemini, _cost_tracker
+from lib.cost_tracker import CostTracker, call_gemini_tracked
+
+
+def _firestore():
+    """Mock db backed by a dict: collection/document/get/set."""
+    docs = {}
+    db = MagicMock()
+
+    def document(doc_id):
+        ref = MagicMock()
+
+        def get():
+            snap = MagicMock()
+            snap.exists = doc_id in docs
+            snap.to_dict.return_value = docs.get(doc_id)
+            return snap
+        ref.get.side_effect = get
+        ref.set.side_effect = lambda data: docs.__setitem__(doc_id, data)
+        return ref
+    db.collection.return_value.document.side_effect = document
+    return db, docs
+
+
+def _claude_ok(text="HS 8516.31"):
+    return Mock(status_code=200, json=lambda: {"content": [{"text": text}], "usage": {}})
+
+
+class TestKey:
+
+    def test_every_field_changes_the_key(self):
+        base = ("gemini-2.5-flash", "system", "user", 2000, 0.3)
+        key = llm_cache_key(*base)
+        assert key == llm_cache_key(*base)
+        for i, other in enumerate(("gemini-2.5-pro", "system!", "user!", 1000, 0.0)):
+            changed = list(base)
+            changed[i] = other
+            assert llm_cache_key(*changed) != key
+
+
+class TestCachedCall:
+
+    def test_second_identical_call_is_served_from_memory(self):
+        call_fn = MagicMock(return_value="answer")
+        args = ("m", "sys", "user", 100, 0.3)
+        assert cached_llm_call(*args, call_fn) == "answer"
+        assert cached_llm_call(*args, call_fn) == "answer"
+        assert call_fn.call_count == 1
+        stats = get_llm_cache_stats()
+        assert stats["memory_hits"] == 1 and stats["misses"] == 1
+
+    def test_failed_and_empty_responses_not_cached(self):
+        call_fn = MagicMock(side_effect=[None, "", "ok"])
+        args = ("m", "sys", "user", 100, 0.3)
+        assert cached_llm_call(*args, call_fn) is None
+        assert cached_llm_call(*args, call_fn) == ""
+        assert cached_llm_call(*args, call_fn) == "ok"
+        assert call_fn.call_count == 3
+
+    def test_opt_out_per_call_and_by_env(self):
+        call_fn = MagicMock(return_value="fresh")
+        args = ("m", "sys", "user", 100, 0.3)
+        cached_llm_call(*args, call_fn)
+        cached_llm_call(*args, call_fn, cache=False)
+        with patch.dict(os.environ, {"RCB_LLM_CACHE": "0"}):
+            cached_llm_call(*args, call_fn)
+        assert call_fn.call_count == 3
+        assert get_llm_cache_stats()["bypassed"] == 2
+
+    def test_tracker_records_hits_and_misses(self):
+        tracker = CostTracker()
+        args = ("m", "sys", "user", 100, 0.3)
+        for _ in range(3):
+            cached_llm_call(*args, lambda: "x", tracker=tracker)
+        assert tracker.breakdown["llm_cache_hits"] == 2
+        assert tracker.breakdown["llm_cache_misses"] == 1
+
+
+class TestFirestoreTier:
+
+    def test_new_process_reads_persisted_response(self):
+        db, docs = _firestore()
+        set_llm_cache_db(db)
+        key = llm_cache_key("m", "sys", "user", 100, 0.3)
+        assert put_cached_response(key, "persisted", model="m")
+        assert docs[key]["model"] == "m" and docs[key]["full_text"] == "persisted"
+        llm_cache._MEMORY.clear()
+        assert get_cached_response(key) == "persisted"
+        assert get_llm_cache_stats()["firestore_hits"] == 1
+
+    def test_expired_entries_are_misses(self):
+        db, docs = _firestore()
+        set_llm_cache_db(db)
+        key = llm_cache_key("m", "sys", "user", 100, 0.3)
+        put_cached_response(key, "old")
+        docs[key]["expires_at"] = 0
+        llm_cache._MEMORY[key] = ("old", 0)
+        assert get_cached_response(key) is None
+        stats = get_llm_cache_stats()
+        assert stats["expired"] == 1 and stats["misses"] == 1
+
+    def test_incomplete_response_not_cached(self):
+        call_fn = MagicMock(return_value=IncompleteResponse('{"items": [{"desc'))
+        assert cached_llm_call("m", "sys", "user", 100, 0.3, call_fn) == '{"items": [{"desc'
+        cached_llm_call("m", "sys", "user", 100, 0.3, call_fn)
+        assert call_fn.call_count == 2
+        assert get_llm_cache_stats()["skipped"] == 2
+
+    def test_cache_if_rejects_unparseable_answers(self):
+        call_fn = MagicMock(side_effect=["Sorry, here is the JSON: {oops", 'ok {"a": 1}', "unused"])
+        args = ("m", "sys", "user", 100, 0.3)
+        assert cached_llm_call(*args, call_fn, cache_if=has_json_object) == "Sorry, here is the JSON: {oops"
+        assert cached_llm_call(*args, call_fn, cache_if=has_json_object) == 'ok {"a": 1}'
+        assert cached_llm_call(*args, call_fn, cache_if=has_json_object) == 'ok {"a": 1}'
+        assert call_fn.call_count == 2
+
+    def test_has_json_object(self):
+        assert has_json_object('```json\n{"a": [1]}\n```')
+        assert not has_json_object('{"a": [1')
+        assert not has_json_object("no json")
+        assert not has_json_object(None)
+
+    def test_read_errors_fall_through_to_the_api(self):
+        db = MagicMock()
+        db.collection.return_value.document.return_value.get.side_effect = RuntimeError("unavailable")
+        set_llm_cache_db(db)
+        assert cached_llm_call("m", "sys", "user", 100, 0.3, lambda: "live") == "live"
+        assert get_llm_cache_stats()["errors"] == 1
+
+
+class TestModelCalls:
+
+    @patch('requests.post')
+    def test_call_claude_reuses_identical_prompt(self, mock_post):
+        mock_post.return_value = _claude_ok()
+        _cost_tracker.reset()
+        assert call_claude("key", "system", "user") == "HS 8516.31"
+        assert call_claude("key", "system", "user") == "HS 8516.31"
+        assert mock_post.call_count == 1
+        call_claude("key", "system", "user", max_tokens=500)
+        call_claude("key", "system", "user", cache=False)
+        assert mock_post.call_count == 3
+        assert _cost_tracker.cache_counts() == (1, 2)
+        assert "LLM cache: 1 hits / 2 misses" in _cost_tracker.summary()
+
+    def test_cost_tracker_is_per_run_context(self):
+        import contextvars
+        from lib.classification_agents import _CostTracker, _run_cost_tracker
+        _cost_tracker.reset()
+        _cost_tracker.add("outer", 1.0)
+
+        def run(cost):
+            _run_cost_tracker.set(_CostTracker())
+            _cost_tracker.add("run", cost)
+            return _cost_tracker.total()
+        assert contextvars.copy_context().run(run, 0.25) == 0.25
+        assert contextvars.copy_context().run(run, 0.5) == 0.5
+        assert _cost_tracker.total() == 1.0
+
+    @patch('requests.post')
+    def test_truncated_answers_not_cached(self, mock_post):
+        mock_post.side_effect = [
+            Mock(status_code=200, json=lambda: {"content": [{"text": '{"classif'}],
+                                                "stop_reason": "max_tokens"}),
+            Mock(status_code=200, json=lambda: {"candidates": [{
+                "finishReason": "MAX_TOKENS", "content": {"parts": [{"text": '{"reg'}]}}]}),
+        ]
+        assert call_claude("key", "system", "user") == '{"classif'
+        assert call_gemini("key", "system", "user") == '{"reg'
+        assert get_llm_cache_stats()["stores"] == 0
+        assert get_cached_response(llm_cache_key(
+            "claude-sonnet-4-20250514", "system", "user", 2000, None)) is None
+
+    @patch('requests.post')
+    def test_call_gemini_hit_skips_quota_fast_fail(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=lambda: {
+            "candidates": [{"content": {"parts": [{"text": "```json\n{}\n```"}]}}]})
+        assert call_gemini("key", "system", "user") == "{}"
+        with patch("lib.classification_agents._gemini_quota_exhausted_at", 10 ** 12):
+            assert call_gemini("key", "system", "user") == "{}"
+            assert call_gemini("key", "system", "other") is None
+        assert mock_post.call_count == 1
+
+    @patch("lib.cost_tracker.requests.post")
+    def test_call_gemini_tracked_hit_is_free(self, mock_post):
+        mock_post.return_value = Mock(status_code=200, json=lambda: {
+            "usageMetadata": {"promptTokenCount": 100, "candidatesTokenCount": 50},
+            "candidates": [{"content": {"parts": [{"text": '{"a": 1}'}]}}]})
+        tracker = CostTracker()
+        assert call_gemini_tracked("key", "prompt", tracker) == {"a": 1}
+        spent = tracker.total_spent
+        assert call_gemini_tracked("key", "prompt", tracker) == {"a": 1}
+        assert tracker.total_spent == spent and tracker.breakdown["gemini_calls"] == 1
+        assert tracker.summary()["llm_cache_hits"] == 1
@@ -0,0 +1,369 @@
+"""
+Tests for rcb_claims.py — bulk pre-check, atomic claim and leases of rcb_processed docs.
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib.rcb_claims import (
+    RETRY_QUEUE_COLLECTION, AlreadyExists, ClaimManager, claim_doc_id, queue_retry,
+)
+
+
+class _Snap:
+    def __init__(self, doc_id, exists, data=None):
+        self.id = doc_id
+        self.exists = exists
+        self._data = data or {}
+        self.update_time = "t0"
+
+    def to_dict(self):
+        return self._data
+
+
+def _db(existing=(), get_all_error=None):
+    """Mock db: `existing` msg ids already have claim docs."""
+    existing_ids = {claim_doc_id(m) for m in existing}
+    created = []
+    db = MagicMock()
+
+    def document(doc_id):
+        ref = MagicMock()
+        ref.id = doc_id
+
+        def create(data):
+            if doc_id in existing_ids:
+                raise AlreadyExists("exists")
+            existing_ids.add(doc_id)
+            created.append((doc_id, data))
+        ref.create.side_effect = create
+        return ref
+    db.collection.return_value.document.side_effect = document
+
+    def get_all(refs):
+        if get_all_error:
+            raise get_all_error
+        return [_Snap(r.id, r.id in existing_ids) for r in refs]
+    db.get_all.side_effect = get_all
+    return db, created, existing_ids
+
+
+class TestClaimManager:
+
+    def test_prefetch_one_get_all(self):
+        db, _, _ = _db(existing=["m1", "m2"])
+        claims = ClaimManager(db)
+        assert claims.prefetch(["m1", "m2", "m3", None]) == 2
+        assert db.get_all.call_count == 1
+        assert claims.is_claimed("m1") and not claims.is_claimed("m3")
+
+    def test_known_ids_skipped_without_write(self):
+        db, created, _ = _db(existing=["m1"])
+        claims = ClaimManager(db)
+        claims.prefetch(["m1", "m2"])
+        assert claims.claim("m1", "direct_pending") is None
+        assert claims.claim("m2", "direct_pending") == claim_doc_id("m2")
+        assert [d for d, _ in created] == [claim_doc_id("m2")]
+        assert created[0][1]["type"] == "direct_pending"
+        assert created[0][1]["locked_by"] == "rcb_check_email"
+        stats = claims.stats()
+        assert stats["skipped"] == 1 and stats["claimed"] == 1 and stats["contended"] == 0
+
+    def test_concurrent_claim_counted_as_contended(self):
+        db, created, existing_ids = _db()
+        claims = ClaimManager(db)
+        claims.prefetch(["m1"])
+        existing_ids.add(claim_doc_id("m1"))   # another run claims it after prefetch
+        assert claims.claim("m1", "cc_pending") is None
+        assert claims.stats()["contended"] == 1
+        assert claims.claim("m1", "cc_pending") is None
+        assert claims.stats()["skipped"] == 1
+
+    def test_claim_once_per_run(self):
+        db, created, _ = _db()
+        claims = ClaimManager(db)
+        assert claims.claim("m1", "direct_pending")
+        assert claims.claim("m1", "direct_pending") is None
+        assert len(created) == 1
+
+    def test_prefetch_error_falls_back_to_create(self):
+        db, created, _ = _db(existing=["m1"], get_all_error=RuntimeError("down"))
+        claims = ClaimManager(db)
+        assert claims.prefetch(["m1", "m2"]) == 0
+        assert claims.claim("m1", "direct_pending") is None
+        assert claims.claim("m2", "direct_pending")
+        stats = claims.stats()
+        assert stats["prefetch_errors"] == 1 and stats["contended"] == 1
+
+    def test_prefetch_chunks_and_dedupes(self, monkeypatch):
+        from lib import rcb_claims
+        monkeypatch.setattr(rcb_claims, "_GET_ALL_CHUNK", 2)
+        db, _, _ = _db()
+        claims = ClaimManager(db)
+        claims.prefetch(["a", "b", "c", "a"])
+        claims.prefetch(["b"])
+        assert db.get_all.call_count == 2
+        assert claims.stats()["prefetched"] == 3
+
+
+class _LeaseDb:
+    """Minimal stateful stand-in for rcb_processed with update_time preconditions."""
+
+    def __init__(self):
+        self.docs = {}      # doc_id -> (data, update_time)
+        self.clock = 0
+
+    def _write(self, doc_id, data):
+        self.clock += 1
+        self.docs[doc_id] = (data, self.clock)
+
+    def collection(self, name):
+        return self
+
+    def document(self, doc_id):
+        db = self
+        ref = MagicMock()
+        ref.id = doc_id
+
+        def create(data):
+            if doc_id in db.docs:
+                raise AlreadyExists("exists")
+            db._write(doc_id, dict(data))
+
+        def update(data, option=None):
+            current, update_time = db.docs[doc_id]
+            if option is not None and option != update_time:
+                raise RuntimeError("FailedPrecondition")
+            db._write(doc_id, {**current, **data})
+        ref.create.side_effect = create
+        ref.update.side_effect = update
+        return ref
+
+    def write_option(self, last_update_time):
+        return last_update_time
+
+    def snap(self, doc_id):
+        data, update_time = self.docs.get(doc_id, (None, None))
+        s = _Snap(doc_id, data is not None, data)
+        s.update_time = update_time
+        return s
+
+    def get_all(self, refs):
+        return [self.snap(r.id) for r in refs]
+
+    def where(self, field, op, value):
+        self._where = (field, value)
+        return self
+
+    def limit(self, n):
+        return self
+
+    def stream(self):
+        field, value = self._where
+        return [self.snap(d) for d, (data, _) in self.docs.items()
+                if data.get(field) is not None and data[field] < value]
+
+
+class TestLeases:
+
+    def _expire(self, db, msg_id):
+        doc_id = claim_doc_id(msg_id)
+        data, _ = db.docs[doc_id]
+        db._write(doc_id, {**data, "lease_expires_at": data["lease_expires_at"] - timedelta(hours=1)})
+
+    def test_claim_sets_lease(self):
+        db = _LeaseDb()
+        claims = ClaimManager(db)
+        doc_id = claims.claim("m1", "direct_pending")
+        data = db.docs[doc_id][0]
+        assert data["lease_state"] == "active" and data["lease_owner"] == claims.owner
+        assert data["msg_id"] == "m1" and data["attempts"] == 1
+        assert claims.stats()["active"] == 1
+
+    def test_release_prevents_takeover(self):
+        db = _LeaseDb()
+        first = ClaimManager(db)
+        doc_id = first.claim("m1", "cc_pending")
+        first.release(doc_id)
+        assert db.docs[doc_id][0]["lease_state"] == "done"
+        second = ClaimManager(db)
+        assert second.recover_expired() == []
+        second.prefetch(["m1"])
+        assert second.claim("m1", "cc_pending") is None
+
+    def test_expired_lease_taken_over_via_prefetch(self):
+        db = _LeaseDb()
+        ClaimManager(db).claim("m1", "direct_pending")   # run dies without releasing
+        self._expire(db, "m1")
+        second = ClaimManager(db)
+        assert second.prefetch(["m1"]) == 0
+        doc_id = second.claim("m1", "direct_pending")
+        assert doc_id == claim_doc_id("m1")
+        data = db.docs[doc_id][0]
+        assert data["lease_owner"] == second.owner and data["attempts"] == 2
+        assert second.stats()["taken_over"] == 1
+
+    def test_recover_expired_returns_msg_ids(self):
+        db = _LeaseDb()
+        ClaimManager(db).claim("m1", "direct_pending")
+        ClaimManager(db).claim("m2", "direct_pending")
+        self._expire(db, "m1")
+        claims = ClaimManager(db)
+        assert claims.recover_expired() == ["m1"]
+        assert claims.claim("m1", "direct_pending")
+
+    def test_takeover_race_single_winner(self):
+        db = _LeaseDb()
+        ClaimManager(db).claim("m1", "direct_pending")
+        self._expire(db, "m1")
+        a, b = ClaimManager(db), ClaimManager(db)
+        a.prefetch(["m1"])
+        b.prefetch(["m1"])
+        assert a.claim("m1", "direct_pending")
+        assert b.claim("m1", "direct_pending") is None
+        assert b.stats()["contended"] == 1
+
+    def test_gives_up_after_max_attempts(self):
+        db = _LeaseDb()
+        ClaimManager(db, max_attempts=2).claim("m1", "direct_pending")
+        for expected in (claim_doc_id("m1"), None):
+            self._expire(db, "m1")
+            claims = ClaimManager(db, max_attempts=2)
+            claims.prefetch(["m1"])
+            assert claims.claim("m1", "direct_pending") == expected
+        assert db.docs[claim_doc_id("m1")][0]["lease_state"] == "failed"
+
+    def test_reply_checkpoint_survives_takeover(self):
+        db = _LeaseDb()
+        first = ClaimManager(db)
+        doc_id = first.claim("m1", "direct_pending")
+        first.mark_reply_sent(doc_id)            # reply went out, then the run died
+        ClaimManager(db).claim("m2", "direct_pending")
+        self._expire(db, "m1")
+        self._expire(db, "m2")
+        second = ClaimManager(db)
+        second.prefetch(["m1", "m2"])
+        assert second.claim("m1", "direct_pending") == doc_id
+        assert second.claim("m2", "direct_pending")
+        assert second.reply_sent(doc_id) and not second.reply_sent(claim_doc_id("m2"))
+        assert first.stats()["replies_sent"] == 1
+
+    def test_legacy_claim_without_lease_not_taken_over(self):
+        db = _LeaseDb()
+        db._write(claim_doc_id("m1"), {"type": "direct_pending"})
+        claims = ClaimManager(db)
+        claims.prefetch(["m1"])
+        assert claims.claim("m1", "direct_pending") is None
+
+    def test_renew_extends_active_leases(self):
+        db = _LeaseDb()
+        claims = ClaimManager(db)
+        doc_id = claims.claim("m1", "direct_pending")
+        self._expire(db, "m1")
+        assert claims.renew() == 1
+        assert db.docs[doc_id][0]["lease_expires_at"] > datetime.now(timezone.utc)
+        claims.release(doc_id)
+        assert claims.renew() == 0
+
+    def test_heartbeat_thread(self):
+        import time
+        db = _LeaseDb()
+        claims = ClaimManager(db)
+        claims.claim("m1", "direct_pending")
+        claims.start_heartbeat(interval=0.01)
+        time.sleep(0.1)
+        claims.stop_heartbeat()
+        assert claims.stats()["heartbeats"] >= 1
+
+
+class _CollectionsDb:
+    """Dict-per-collection stand-in: document().set/update/delete/create, collection.limit().stream()."""
+
+    def __init__(self):
+        self.data = {}      # collection -> doc_id -> data
+
+    def collection(self, name):
+        docs = self.data.setdefault(name, {})
+        coll = MagicMock()
+
+        def document(doc_id):
+            def create(data):
+                if doc_id in docs:
+                    raise AlreadyExists(doc_id)
+                docs[doc_id] = dict(data)
+
+            ref = MagicMock()
+            ref.id = doc_id
+            ref.set.side_effect = lambda data: docs.__setitem__(doc_id, dict(data))
+            ref.create.side_effect = create
+            ref.delete.side_effect = lambda: docs.pop(doc_id, None)
+            ref.update.side_effect = lambda data, **kw: docs[doc_id].update(data)
+            return ref
+        coll.document.side_effect = document
+        coll.limit.return_value.stream.side_effect = lambda: [
+            _Snap(d, True, data) for d, data in list(docs.items())]
+        return coll
+
+
+class TestRetryQueue:
+
+    def test_queued_msg_is_reclaimable_next_run(self):
+        db = _CollectionsDb()
+        doc_id = ClaimManager(db).claim("m1", "direct_pending")
+        assert doc_id in db.data["rcb_processed"]
+        assert queue_retry(db, "m1") == doc_id
+        assert doc_id not in db.data["rcb_processed"]
+        assert db.data[RETRY_QUEUE_COLLECTION][doc_id]["msg_id"] == "m1"
+        claims = ClaimManager(db)
+        assert claims.take_retries() == ["m1"]
+        assert claims.take_retries() == []
+        assert claims.stats()["retries"] == 1
+        assert doc_id in db.data[RETRY_QUEUE_COLLECTION]
+        claims.prefetch(["m1"])
+        assert claims.claim("m1", "direct_pending") == doc_id
+        assert db.data[RETRY_QUEUE_COLLECTION] == {}
+
+    def test_unclaimed_retry_survives_to_next_run(self):
+        """A failed re-fetch (no claim) leaves the id queued for the next run"""
+        db = _CollectionsDb()
+        queue_retry(db, "m1")
+        assert ClaimManager(db).take_retries() == ["m1"]
+        assert ClaimManager(db).take_retries() == ["m1"]
+
+    def test_retry_dropped_after_max_takes(self):
+        db = _CollectionsDb()
+        queue_retry(db, "m1")
+        for _ in range(2):
+            assert ClaimManager(db, max_attempts=2).take_retries() == ["m1"]
+        assert ClaimManager(db, max_attempts=2).take_retries() == []
+        assert db.data[RETRY_QUEUE_COLLECTION] == {}
+
+    def test_contended_claim_acks_retry(self):
+        """Another run owning the message settles the retry too"""
+        db = _CollectionsDb()
+        queue_retry(db, "m1")
+        ClaimManager(db).claim("m1", "direct_pending")
+        claims = ClaimManager(db)
+        claims.take_retries()
+        claims.prefetch(["m1"])
+        assert claims.claim("m1", "direct_pending") is None
+        assert db.data[RETRY_QUEUE_COLLECTION] == {}
+
+    def test_ack_retry_of_skipped_msg(self):
+        db = _CollectionsDb()
+        queue_retry(db, "m1")
+        claims = ClaimManager(db)
+        claims.take_retries()
+        claims.ack_retry("m2")
+        assert db.data[RETRY_QUEUE_COLLECTION] != {}
+        claims.ack_retry("m1")
+        assert db.data[RETRY_QUEUE_COLLECTION] == {}
+
+    def test_queue_read_error_returns_nothing(self):
+        db = MagicMock()
+        db.collection.return_value.limit.return_value.stream.side_effect = RuntimeError("unavailable")
+        assert ClaimManager(db).take_retries() == []
@@ -15,8 +15,13 @@ from lib.rcb_helpers import (
     to_hebrew_name,
     build_rcb_reply,
     extract_text_from_pdf_bytes,
+    extract_pdf_pages,
     extract_text_from_attachments,
     helper_get_graph_token,
+    helper_graph_inbox_delta,
+    helper_graph_inbox_sync,
+    load_inbox_delta_link,
+    save_inbox_delta_link,
     HEBREW_NAMES
 )
 
@@ -130,35 +135,208 @@ class TestPdfExtraction:
         result = extract_text_from_pdf_bytes(b"not a pdf")
         assert result == ""  # Should not crash
     
-    @patch('lib.rcb_helpers._extract_with_pdfplumber')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
     def test_pdfplumber_success(self, mock_pdfplumber):
         """Should return pdfplumber result if successful"""
-        mock_pdfplumber.return_value = "This is extracted text with more than 50 characters to pass the threshold check."
+        mock_pdfplumber.return_value = ["This is extracted text with more than 50 characters to pass the threshold check."]
         result = extract_text_from_pdf_bytes(b"fake pdf bytes")
         assert "extracted text" in result
         mock_pdfplumber.assert_called_once()
-    
-    @patch('lib.rcb_helpers._extract_with_pdfplumber')
-    @patch('lib.rcb_helpers._extract_with_pypdf')
+
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
     def test_pypdf_fallback(self, mock_pypdf, mock_pdfplumber):
         """Should fall back to pypdf if pdfplumber fails"""
-        mock_pdfplumber.return_value = ""  # pdfplumber fails
-        mock_pypdf.return_value = "pypdf extracted this text successfully with enough characters"
+        mock_pdfplumber.return_value = [""]  # pdfplumber fails
+        mock_pypdf.return_value = ["pypdf extracted this text successfully with enough characters"]
         result = extract_text_from_pdf_bytes(b"fake pdf")
         assert "pypdf extracted" in result
-    
-    @patch('lib.rcb_helpers._extract_with_pdfplumber')
-    @patch('lib.rcb_helpers._extract_with_pypdf')
-    @patch('lib.rcb_helpers._extract_with_vision_ocr')
+
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._vision_ocr_pages')
     def test_ocr_fallback(self, mock_ocr, mock_pypdf, mock_pdfplumber):
         """Should fall back to OCR if text extraction fails"""
-        mock_pdfplumber.return_value = ""
-        mock_pypdf.return_value = ""
-        mock_ocr.return_value = "OCR extracted this from scanned document with sufficient length"
+        mock_pdfplumber.return_value = [""]
+        mock_pypdf.return_value = [""]
+        mock_ocr.return_value = {0: "OCR extracted this from scanned document with sufficient length"}
         result = extract_text_from_pdf_bytes(b"fake scanned pdf")
         assert "OCR extracted" in result
 
 
+class TestPerPagePdfExtraction:
+    """Tests for the per-page extraction engine"""
+
+    GOOD = "Invoice 12345 dated 01/02/2024 total USD 1,500.00 for steel bolts page {}"
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_all_pages_good_single_parse(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should not touch pypdf or OCR when every pdfplumber page passes"""
+        mock_plumber.return_value = [self.GOOD.format(1), self.GOOD.format(2)]
+        result = extract_pdf_pages(b"pdf")
+        assert [p["method"] for p in result["pages"]] == ["pdfplumber", "pdfplumber"]
+        mock_pypdf.assert_not_called()
+        mock_ocr.assert_not_called()
+        assert "pdfplumber" in result["timings_ms"]
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_only_failed_pages_ocrd(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should OCR only the pages that fail both text backends, merged in order"""
+        mock_plumber.return_value = [self.GOOD.format(1), "", self.GOOD.format(3)]
+        mock_pypdf.return_value = ["", "", ""]
+        mock_ocr.return_value = {1: "scanned page two text with invoice 98765 and USD 42.00 amounts"}
+        result = extract_pdf_pages(b"pdf")
+        mock_ocr.assert_called_once_with(b"pdf", [1])
+        assert [p["method"] for p in result["pages"]] == ["pdfplumber", "ocr", "pdfplumber"]
+        text = result["text"]
+        assert text.index("page 1") < text.index("scanned page two") < text.index("page 3")
+        assert "--- Page 2 ---" in text
+        assert set(result["timings_ms"]) == {"pdfplumber", "pypdf", "ocr"}
+        assert result["degraded"] is False
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_short_page_of_readable_doc_accepted(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should keep a short signature/cover page when the document passes as a whole"""
+        mock_plumber.return_value = [self.GOOD.format(1), "Signed: J. Doe"]
+        result = extract_pdf_pages(b"pdf")
+        assert [p["quality"] for p in result["pages"]] == ["ok", "short"]
+        mock_pypdf.assert_not_called()
+        mock_ocr.assert_not_called()
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_garbage_page_of_readable_doc_ocrd(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should still OCR a garbage-text page inside a readable document"""
+        mock_plumber.return_value = [self.GOOD.format(1), "\u25a1\u25a1 \u25a1\u25a1\u25a1 ##"]
+        mock_pypdf.return_value = ["", ""]
+        mock_ocr.return_value = {1: "scanned page two text with invoice 98765 and USD 42.00 amounts"}
+        result = extract_pdf_pages(b"pdf")
+        mock_ocr.assert_called_once_with(b"pdf", [1])
+        assert result["pages"][1]["method"] == "ocr"
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_combined_page(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should accept a page when pdfplumber + pypdf together pass"""
+        mock_plumber.return_value = ["Commercial invoice 12345 for steel"]
+        mock_pypdf.return_value = ["hex bolts, total USD 1,500.00"]
+        result = extract_pdf_pages(b"pdf")
+        assert result["pages"][0]["method"] == "combined"
+        mock_ocr.assert_not_called()
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_unparseable_pdf_ocrs_all(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should let OCR handle all pages when neither backend can open the PDF"""
+        mock_plumber.return_value = None
+        mock_pypdf.return_value = None
+        mock_ocr.return_value = {}
+        assert extract_pdf_pages(b"pdf")["text"] == ""
+        mock_ocr.assert_called_once_with(b"pdf", None)
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_ocr_empty_keeps_text(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should keep the short text layer, flagged degraded, when OCR is unavailable"""
+        mock_plumber.return_value = ["Signed: J. Doe"]
+        mock_pypdf.return_value = [""]
+        mock_ocr.return_value = {}
+        result = extract_pdf_pages(b"pdf")
+        assert "Signed" in result["text"]
+        assert result["pages"][0]["method"] == "text"
+        assert result["degraded"] is True
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_blank_page_ocr_not_degraded(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should not flag degraded when OCR ran on a blank page and found nothing"""
+        mock_plumber.return_value = [self.GOOD.format(1), ""]
+        mock_pypdf.return_value = ["", ""]
+        mock_ocr.return_value = {1: ""}
+        result = extract_pdf_pages(b"pdf")
+        assert result["pages"][1]["method"] == "text"
+        assert result["degraded"] is False
+
+    @patch('lib.rcb_helpers._vision_ocr_pages')
+    @patch('lib.rcb_helpers._pypdf_pages')
+    @patch('lib.rcb_helpers._pdfplumber_pages')
+    def test_ocr_page_error_degraded(self, mock_plumber, mock_pypdf, mock_ocr):
+        """Should flag degraded when OCR failed for a page that kept its fallback"""
+        mock_plumber.return_value = ["", ""]
+        mock_pypdf.return_value = ["", ""]
+        mock_ocr.return_value = {0: "scanned page one text with invoice 98765 and USD 42.00 amounts"}
+        assert extract_pdf_pages(b"pdf")["degraded"] is True
+
+
+class TestParallelPageOcr:
+    """Tests for the streaming render -> preprocess -> OCR page pipeline"""
+
+    def _pages(self, n, rendered):
+        for i in range(n):
+            rendered.append(i)
+            yield i, f"png{i}".encode()
+
+    @patch('lib.rcb_helpers._preprocess_image_for_ocr', side_effect=lambda b: b)
+    def test_local_ocr_stand_in(self, _prep):
+        """Should OCR every streamed page with the injected OCR function"""
+        from lib import rcb_helpers
+        rendered = []
+        with patch.object(rcb_helpers, '_iter_pdf_page_images', return_value=self._pages(3, rendered)):
+            result = rcb_helpers._vision_ocr_pages(b"pdf", [0, 1, 2],
+                                                  ocr_fn=lambda b: b.decode().upper())
+        assert result == {0: "PNG0", 1: "PNG1", 2: "PNG2"}
+
+    @patch('lib.rcb_helpers._preprocess_image_for_ocr', side_effect=lambda b: b)
+    def test_bounded_pages_in_memory(self, _prep):
+        """Should never render more than max_in_flight pages ahead of OCR"""
+        import threading
+        import time
+        from lib.rcb_helpers import _ocr_page_stream
+        rendered, finished = [], []
+        lock = threading.Lock()
+        peak = [0]
+
+        def ocr(img_bytes):
+            time.sleep(0.01)
+            with lock:
+                finished.append(img_bytes)
+            return "text"
+
+        def pages():
+            for i, img in self._pages(10, rendered):
+                with lock:
+                    peak[0] = max(peak[0], len(rendered) - len(finished))
+                yield i, img
+
+        result = _ocr_page_stream(pages(), ocr, workers=2, max_in_flight=3)
+        assert len(result) == 10
+        assert peak[0] <= 3
+
+    @patch('lib.rcb_helpers._preprocess_image_for_ocr', side_effect=lambda b: b)
+    def test_page_errors_isolated(self, _prep):
+        """Should keep other pages when one OCR call fails; blank pages report """""
+        from lib.rcb_helpers import _ocr_page_stream
+
+        def ocr(img_bytes):
+            if img_bytes == b"png1":
+                raise RuntimeError("quota")
+            return "" if img_bytes == b"png2" else "ok"
+
+        result = _ocr_page_stream(self._pages(4, []), ocr, workers=3, max_in_flight=2)
+        assert result == {0: "ok", 2: "", 3: "ok"}
+
+
 class TestExtractFromAttachments:
     """Tests for attachment extraction"""
     
@@ -205,10 +383,81 @@ class TestExtractFromAttachments:
 # GRAPH API TESTS
 # ============================================================
 
+class TestLazyAttachments:
+    """Tests for metadata-first attachment fetch with streamed $value downloads"""
+
+    META = [
+        {"id": "a1", "name": "invoice.pdf", "size": 300_000, "isInline": False,
+         "@odata.type": "#microsoft.graph.fileAttachment"},
+        {"id": "a2", "name": "logo.png", "size": 4_000, "isInline": True,
+         "@odata.type": "#microsoft.graph.fileAttachment"},
+        {"id": "a3", "name": "photos.zip", "size": 9_000_000, "isInline": False,
+         "@odata.type": "#microsoft.graph.fileAttachment"},
+        {"id": "a4", "name": "scan.tif", "size": 40_000_000, "isInline": False,
+         "@odata.type": "#microsoft.graph.fileAttachment"},
+        {"id": "a5", "name": "Fwd: booking", "size": 50_000,
+         "@odata.type": "#microsoft.graph.itemAttachment"},
+        {"id": "a6", "name": "screenshot.png", "size": 200_000, "isInline": True,
+         "@odata.type": "#microsoft.graph.fileAttachment"},
+    ]
+
+    def test_select_by_type_size_and_inline(self):
+        """Should keep only extractable file attachments within the size cap"""
+        from lib.rcb_helpers import select_extractable_attachments
+        chosen, skipped = select_extractable_attachments(self.META)
+        assert [a["id"] for a in chosen] == ["a1", "a6"]
+        assert len(skipped) == 4
+
+    def test_select_by_content_type(self):
+        """Should route like extraction: contentType when the name has no known extension"""
+        from lib.rcb_helpers import select_extractable_attachments
+        meta = [
+            {"id": "b1", "name": "invoice", "contentType": "application/pdf", "size": 80_000},
+            {"id": "b2", "name": "notes.txt", "contentType": "text/plain", "size": 1_000},
+            {"id": "b3", "name": "image001", "contentType": "image/png", "size": 3_000,
+             "isInline": True},
+        ]
+        chosen, skipped = select_extractable_attachments(meta)
+        assert [a["id"] for a in chosen] == ["b1"]
+        assert [a["id"] for a in skipped] == ["b2", "b3"]
+
+    def test_only_chosen_downloaded_and_spooled(self):
+        """Should list metadata, then stream only chosen bodies via $value"""
+        from lib import rcb_helpers
+        calls = []
+
+        def graph(method, url, token, params=None, stream=False, **kw):
+            calls.append((url, params, stream))
+            if url.endswith("/attachments"):
+                return Mock(status_code=200, json=lambda: {"value": self.META})
+            body = url.split("/")[-2].encode() * 1000
+            return Mock(status_code=200, iter_content=lambda chunk_size: [body[:500], body[500:]])
+
+        with patch.object(rcb_helpers, "graph_request", side_effect=graph), \
+                patch.object(rcb_helpers, "_ATTACHMENT_SPOOL_BYTES", 1000):
+            meta, chosen = rcb_helpers.helper_graph_fetch_attachments("tok", "rcb@x.com", "m1")
+        assert len(meta) == 6
+        assert "contentBytes" not in calls[0][1]["$select"]
+        downloads = [c for c in calls if c[0].endswith("$value")]
+        assert [c[0].split("/")[-2] for c in downloads] == ["a1", "a6"]
+        assert all(c[2] for c in downloads)
+        assert rcb_helpers.attachment_bytes(chosen[0]) == b"a1" * 1000
+        assert chosen[0]["content"]._rolled   # larger than the spool limit -> temp file
+        rcb_helpers.close_attachments(chosen)
+        assert chosen[0]["content"].closed
+
+    def test_extract_accepts_file_objects(self):
+        """Should extract from streamed "content" entries like contentBytes ones"""
+        import io
+        with patch('lib.rcb_helpers._extract_from_excel', return_value="HS 8431.49 qty 12"):
+            out = extract_text_from_attachments([{"name": "list.xlsx", "content": io.BytesIO(b"xlsx")}])
+        assert "=== list.xlsx ===" in out and "8431.49" in out
+
+
 class TestGraphToken:
     """Tests for Microsoft Graph API token"""
     
-    @patch('requests.post')
+    @patch('lib.graph_client.graph_request')
     def test_successful_token(self, mock_post):
         """Should return token on success"""
         mock_post.return_value = Mock(
@@ -223,7 +472,7 @@ class TestGraphToken:
         token = helper_get_graph_token(secrets)
         assert token == "test_token_123"
     
-    @patch('requests.post')
+    @patch('lib.graph_client.graph_request')
     def test_failed_token(self, mock_post):
         """Should return None on failure"""
         mock_post.return_value = Mock(status_code=401)
@@ -235,7 +484,7 @@ class TestGraphToken:
         token = helper_get_graph_token(secrets)
         assert token is None
     
-    @patch('requests.post')
+    @patch('lib.graph_client.graph_request')
     def test_network_error(self, mock_post):
         """Should handle network errors"""
         mock_post.side_effect = Exception("Network error")
@@ -248,6 +497,136 @@ class TestGraphToken:
         assert token is None
 
 
+class TestReplyCheckpoint:
+    """Successful sends run the lane's reply checkpoint callback"""
+
+    @patch('lib.rcb_helpers.email_quality_gate', return_value=(True, ""))
+    @patch('lib.rcb_helpers.graph_request')
+    def test_callback_only_after_accepted_send(self, mock_request, _gate):
+        from lib.rcb_helpers import helper_graph_send, helper_graph_reply, set_reply_checkpoint, reset_reply_checkpoint
+        checkpoint = Mock()
+        token = set_reply_checkpoint(checkpoint)
+        try:
+            mock_request.return_value = Mock(status_code=500)
+            assert not helper_graph_send("tok", "rcb@rpa-port.co.il", "a@rpa-port.co.il", "s", "<p>x</p>")
+            assert not helper_graph_send("tok", "rcb@rpa-port.co.il", "ext@gmail.com", "s", "<p>x</p>")
+            checkpoint.assert_not_called()
+            mock_request.return_value = Mock(status_code=202)
+            assert helper_graph_send("tok", "rcb@rpa-port.co.il", "a@rpa-port.co.il", "s", "<p>x</p>")
+            assert helper_graph_reply("tok", "rcb@rpa-port.co.il", "m1", "<p>x</p>", to_email="a@rpa-port.co.il")
+            assert checkpoint.call_count == 2
+        finally:
+            reset_reply_checkpoint(token)
+        helper_graph_send("tok", "rcb@rpa-port.co.il", "a@rpa-port.co.il", "s", "<p>x</p>")
+        assert checkpoint.call_count == 2
+
+
+class TestInboxDeltaSync:
+    """Tests for delta-based inbox sync with time-window fallback"""
+
+    SINCE = "2026-01-01T00:00:00Z"
+
+    def _resp(self, status_code, body):
+        return Mock(status_code=status_code, json=lambda: body)
+
+    def _db(self, stored_link=None, user_email="rcb@x.com"):
+        db = MagicMock()
+        doc = db.collection.return_value.document.return_value.get.return_value
+        doc.exists = stored_link is not None
+        doc.to_dict.return_value = {"user_email": user_email, "delta_link": stored_link}
+        return db
+
+    def _msg(self, mid, received="2026-01-02T10:00:00Z"):
+        return {"id": mid, "receivedDateTime": received}
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_delta_pages_and_returns_delta_link(self, mock_get):
+        """Should follow nextLink pages and return the final deltaLink"""
+        mock_get.side_effect = [
+            self._resp(200, {"value": [self._msg("a")], "@odata.nextLink": "https://next"}),
+            self._resp(200, {"value": [self._msg("b"), {"id": "c", "@removed": {"reason": "deleted"}}],
+                             "@odata.deltaLink": "https://delta2"}),
+        ]
+        messages, link, status = helper_graph_inbox_delta("tok", "rcb@x.com", "https://delta1")
+        assert status == "ok"
+        assert [m["id"] for m in messages] == ["a", "b"]
+        assert link == "https://delta2"
+        assert mock_get.call_args_list[0][0][1] == "https://delta1"
+        assert mock_get.call_args_list[1][0][1] == "https://next"
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_delta_page_cap_returns_next_link(self, mock_get):
+        """Should resume from the pending nextLink when max_pages is hit"""
+        mock_get.return_value = self._resp(200, {"value": [self._msg("a")], "@odata.nextLink": "https://next"})
+        messages, link, status = helper_graph_inbox_delta("tok", "rcb@x.com", since_iso=self.SINCE, max_pages=2)
+        assert status == "ok" and len(messages) == 2
+        assert link == "https://next"
+        assert "receivedDateTime ge" in mock_get.call_args_list[0][1]["params"]["$filter"]
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_delta_expired(self, mock_get):
+        """Should report expired on 410 / SyncStateNotFound"""
+        mock_get.return_value = self._resp(410, {})
+        assert helper_graph_inbox_delta("tok", "rcb@x.com", "https://old")[2] == "expired"
+        mock_get.return_value = self._resp(400, {"error": {"code": "SyncStateNotFound"}})
+        assert helper_graph_inbox_delta("tok", "rcb@x.com", "https://old")[2] == "expired"
+        mock_get.return_value = self._resp(500, {})
+        assert helper_graph_inbox_delta("tok", "rcb@x.com", "https://old")[2] == "error"
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_sync_uses_stored_link(self, mock_get):
+        """Should only query the stored delta link when it is valid"""
+        mock_get.return_value = self._resp(200, {"value": [self._msg("a")], "@odata.deltaLink": "https://d2"})
+        messages, link, mode = helper_graph_inbox_sync("tok", "rcb@x.com", self._db("https://d1"), self.SINCE)
+        assert mode == "delta" and link == "https://d2"
+        assert mock_get.call_count == 1 and mock_get.call_args[0][1] == "https://d1"
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_sync_expired_link_resyncs_window(self, mock_get):
+        """Should start a fresh delta over the time window when the link expired"""
+        mock_get.side_effect = [
+            self._resp(410, {}),
+            self._resp(200, {"value": [self._msg("a")], "@odata.deltaLink": "https://fresh"}),
+        ]
+        messages, link, mode = helper_graph_inbox_sync("tok", "rcb@x.com", self._db("https://d1"), self.SINCE)
+        assert mode == "delta_initial" and link == "https://fresh"
+        assert mock_get.call_args_list[1][0][1].endswith("/mailFolders/inbox/messages/delta")
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_sync_falls_back_to_window_scan(self, mock_get):
+        """Should list the time window (paged) when the delta endpoint fails"""
+        mock_get.side_effect = [
+            self._resp(503, {}),
+            self._resp(200, {"value": [self._msg("a")], "@odata.nextLink": "https://p2"}),
+            self._resp(200, {"value": [self._msg("b", "2026-01-03T10:00:00Z")]}),
+        ]
+        messages, link, mode = helper_graph_inbox_sync("tok", "rcb@x.com", self._db(), self.SINCE)
+        assert mode == "window" and link is None
+        assert [m["id"] for m in messages] == ["b", "a"]
+
+    @patch('lib.rcb_helpers.graph_request')
+    def test_sync_drops_messages_before_window(self, mock_get):
+        """Changed old messages must not be reprocessed"""
+        mock_get.return_value = self._resp(200, {
+            "value": [self._msg("old", "2025-12-01T00:00:00Z"), self._msg("new")],
+            "@odata.deltaLink": "https://d2"})
+        messages, _, _ = helper_graph_inbox_sync("tok", "rcb@x.com", self._db("https://d1"), self.SINCE)
+        assert [m["id"] for m in messages] == ["new"]
+
+    def test_link_for_other_mailbox_ignored(self):
+        """Should not reuse a delta link stored for a different mailbox"""
+        assert load_inbox_delta_link(self._db("https://d1", "other@x.com"), "rcb@x.com") is None
+        assert load_inbox_delta_link(self._db("https://d1"), "RCB@x.com") == "https://d1"
+
+    def test_save_link(self):
+        """Should persist the link under system_state"""
+        db = self._db()
+        save_inbox_delta_link(db, "rcb@x.com", "https://d2")
+        db.collection.assert_called_with("system_state")
+        saved = db.collection.return_value.document.return_value.set.call_args[0][0]
+        assert saved["delta_link"] == "https://d2" and saved["user_email"] == "rcb@x.com"
+
+
 # ============================================================
 # RUN TESTS
 # ============================================================
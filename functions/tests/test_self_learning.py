@@ -14,7 +14,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "lib"))
 
-from lib.self_learning import SelfLearningEngine
+from lib.self_learning import SelfLearningEngine, _TokenPostings, reset_memory_index
 
 
 # ═══════════════════════════════════════════
@@ -759,3 +759,141 @@ class TestCorrectionRecall:
         assert result is not None
         assert result["hs_code"] == "4015.19"
         assert result["correction"] is True
+
+
+# ═══════════════════════════════════════════
+#  MEMORY POSTINGS INDEX — warm token → doc-id lookups
+# ═══════════════════════════════════════════
+
+class TestTokenPostings:
+
+    def test_candidates_require_min_shared(self):
+        idx = _TokenPostings()
+        idx.add("a", ["rubber", "gloves", "medical"])
+        idx.add("b", ["rubber", "boots"])
+        # 3 query keywords → need ceil(1.8) = 2 shared
+        assert idx.candidates({"rubber", "gloves", "medical"}) == ["a"]
+
+    def test_readd_replaces_postings(self):
+        idx = _TokenPostings()
+        idx.add("a", ["rubber", "gloves"])
+        idx.add("a", ["steel", "pipe"])
+        assert idx.candidates({"rubber", "gloves"}) == []
+        assert idx.candidates({"steel", "pipe"}) == ["a"]
+
+    def test_remove(self):
+        idx = _TokenPostings()
+        idx.add("a", ["rubber", "gloves"])
+        idx.remove("a")
+        assert len(idx) == 0
+        assert idx.postings == {}
+
+    def test_entry_of_removed_doc_is_none(self):
+        idx = _TokenPostings()
+        idx.add("a", ["rubber", "gloves"], {"hs_code": "4015.19"})
+        assert idx.entry("a") == (frozenset({"rubber", "gloves"}), {"hs_code": "4015.19"})
+        idx.remove("a")
+        assert idx.entry("a") is None
+
+
+class TestIndexedMemoryLookup:
+
+    def setup_method(self):
+        reset_memory_index()
+
+    def _db(self, corrections=(), classifications=(), full_docs=None):
+        db = MagicMock()
+        corr = MagicMock()
+        corr.where.return_value.limit.return_value.stream.side_effect = lambda: iter([])
+        corr.limit.return_value.stream.side_effect = lambda: iter(list(corrections))
+        cls = MagicMock()
+        cls.where.return_value.limit.return_value.stream.side_effect = lambda: iter([])
+        cls.select.return_value.limit.return_value.stream.side_effect = lambda: iter(list(classifications))
+        full_docs = full_docs or {}
+
+        def _document(doc_id):
+            ref = MagicMock()
+            data = full_docs.get(doc_id)
+            snap = MagicMock()
+            snap.exists = data is not None
+            snap.to_dict.return_value = data
+            ref.get.return_value = snap
+            return ref
+        cls.document.side_effect = _document
+        db.collection.side_effect = lambda name: {
+            "learned_corrections": corr,
+            "learned_classifications": cls,
+        }.get(name, MagicMock())
+        return db, corr, cls
+
+    def test_fuzzy_correction_from_index(self):
+        db, corr, _ = self._db(corrections=[
+            _make_doc({"product": "medical rubber gloves", "corrected_code": "4015.19"}, "c1"),
+            _make_doc({"product": "rubber boots", "corrected_code": "6401.10"}, "c2"),
+        ])
+        engine = SelfLearningEngine(db)
+        result, level = engine.check_classification_memory("Rubber Gloves Medical")
+        assert result["hs_code"] == "4015.19"
+        assert result["correction"] is True
+
+    def test_corrections_streamed_once(self):
+        db, corr, _ = self._db(corrections=[
+            _make_doc({"product": "medical rubber gloves", "corrected_code": "4015.19"}, "c1"),
+        ])
+        engine = SelfLearningEngine(db)
+        engine.check_classification_memory("Rubber Gloves Medical")
+        engine.check_classification_memory("medical gloves rubber")
+        SelfLearningEngine(db).check_classification_memory("gloves medical rubber")
+        assert corr.limit.return_value.stream.call_count == 1
+
+    def test_needs_review_not_indexed(self):
+        db, _, _ = self._db(corrections=[
+            _make_doc({"product": "medical rubber gloves", "validated_hs": "4015.19",
+                       "status": "needs_review"}, "c1"),
+        ])
+        result, level = SelfLearningEngine(db).check_classification_memory("Rubber Gloves Medical")
+        assert result is None
+
+    def test_classification_match_without_longest_keyword(self):
+        """Index finds matches the old array_contains(longest keyword) query missed."""
+        stored = {"product": "rubber gloves medical", "hs_code": "4015.19",
+                  "keywords": ["rubber", "gloves", "medical"]}
+        db, _, cls = self._db(
+            classifications=[_make_doc({"hs_code": "4015.19",
+                                        "keywords": stored["keywords"]}, "k1")],
+            full_docs={"k1": stored},
+        )
+        result, level = SelfLearningEngine(db).check_classification_memory(
+            "rubber gloves medical disposable")
+        assert level == "exact"
+        assert result["hs_code"] == "4015.19"
+        cls.document.assert_called_once_with("k1")
+
+    def test_learn_classification_updates_index(self):
+        db, _, cls = self._db()
+        engine = SelfLearningEngine(db)
+        engine.check_classification_memory("steel wire rope")  # builds empty index
+        existing = MagicMock()
+        existing.exists = False
+        cls.document.side_effect = None
+        cls.document.return_value.get.return_value = existing
+        engine.learn_classification("Steel wire rope", "7312.10", "ai", "gemini", 0.9)
+        stored = cls.document.return_value.set.call_args[0][0]
+        snap = MagicMock()
+        snap.exists = True
+        snap.to_dict.return_value = stored
+        cls.document.return_value.get.return_value = snap
+        result, level = engine.check_classification_memory("rope wire steel galvanized")
+        assert result["hs_code"] == stored["hs_code"]
+        assert cls.select.return_value.limit.return_value.stream.call_count == 1
+
+    def test_classification_index_error_falls_through(self):
+        db, _, cls = self._db(
+            classifications=[_make_doc({"hs_code": "4015.19",
+                                        "keywords": ["rubber", "gloves", "medical"]}, "k1")],
+        )
+        cls.document.side_effect = RuntimeError("firestore unavailable")
+        result, level = SelfLearningEngine(db).check_classification_memory(
+            "rubber gloves medical disposable")
+        assert result is None
+        assert level == "none"
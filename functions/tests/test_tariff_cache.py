@@ -0,0 +1,260 @@
+"""
+Tests for tariff_cache.py — process-wide, versioned tariff reference cache.
+"""
+
+import gzip
+import json
+import os
+import sys
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import tariff_cache
+from lib.tariff_cache import (
+    get_chapter_notes_doc, get_tariff_structure_doc, get_heading_tariff_docs,
+    preload_tariff_cache, publish_tariff_cache, invalidate_tariff_cache, get_tariff_cache_stats,
+)
+from lib.elimination_engine import TariffCache
+
+
+class _FakeFirestore:
+    """Dict-backed db: collection/document/get/set, get_all, where().limit().stream(), counts reads."""
+
+    def __init__(self, collections=None):
+        self.data = {name: dict(docs) for name, docs in (collections or {}).items()}
+        self.reads = 0
+        self.get_all_calls = 0
+        self.fail = False
+
+    def _snap(self, collection, doc_id):
+        snap = MagicMock()
+        data = self.data.get(collection, {}).get(doc_id)
+        snap.exists = data is not None
+        snap.id = doc_id
+        snap.to_dict.return_value = data
+        snap.reference.path = f"{collection}/{doc_id}"
+        return snap
+
+    def collection(self, name):
+        col = MagicMock()
+
+        def document(doc_id):
+            ref = MagicMock()
+            ref.path = f"{name}/{doc_id}"
+
+            def get():
+                if self.fail:
+                    raise RuntimeError("deadline exceeded")
+                self.reads += 1
+                return self._snap(name, doc_id)
+            ref.get.side_effect = get
+            ref.set.side_effect = lambda data: self.data.setdefault(name, {}).__setitem__(doc_id, data)
+            return ref
+
+        def where(field, op, value):
+            query = MagicMock()
+
+            def limit(n):
+                limited = MagicMock()
+
+                def stream():
+                    self.reads += 1
+                    rows = [d for d in self.data.get(name, {}).values() if d.get(field) == value]
+                    return iter([MagicMock(to_dict=MagicMock(return_value=d)) for d in rows[:n]])
+                limited.stream.side_effect = stream
+                return limited
+            query.limit.side_effect = limit
+            return query
+
+        col.document.side_effect = document
+        col.where.side_effect = where
+        col.stream.side_effect = lambda: iter([self._snap(name, i) for i in self.data.get(name, {})])
+        return col
+
+    def get_all(self, refs):
+        self.get_all_calls += 1
+        for ref in refs:
+            collection, doc_id = ref.path.split("/")
+            yield self._snap(collection, doc_id)
+
+
+def _seeded_db():
+    return _FakeFirestore({
+        "chapter_notes": {
+            "chapter_84": {"chapter_title_he": "מכונות", "notes": ["note 1"], "keywords": ["k"] * 80},
+            "chapter_85": {"chapter_title_he": "חשמל", "exclusions": ["8471"]},
+        },
+        "tariff_structure": {
+            "section_XVI": {"name_he": "מכונות", "name_en": "Machinery", "chapters": ["84", "85"]},
+            "chapter_84": {"section": "XVI"},
+            "chapter_85": {"section": "XVI"},
+        },
+        "tariff": {
+            "t1": {"heading": "8471", "hs_code": "8471.30", "description_en": "Laptops", "duty_rate": "0%"},
+            "t2": {"heading": "8516", "hs_code": "8516.31", "description_en": "Hair dryers"},
+        },
+    })
+
+
+class TestPreload:
+
+    def test_first_lookup_preloads_in_one_get_all(self):
+        db = _seeded_db()
+        assert get_chapter_notes_doc(db, 84)["chapter_title_he"] == "מכונות"
+        assert db.get_all_calls == 1
+        stats = get_tariff_cache_stats()
+        assert stats["loaded"] and stats["source"] == "firestore"
+        assert stats["chapter_notes"] == 2 and stats["structure_docs"] == 3
+
+    def test_warm_lookups_need_zero_reads(self):
+        db = _seeded_db()
+        preload_tariff_cache(db)
+        db.reads = 0
+        assert get_tariff_structure_doc(db, "section_XVI")["name_en"] == "Machinery"
+        assert get_tariff_structure_doc(db, "chapter_85")["section"] == "XVI"
+        assert get_chapter_notes_doc(db, "01") is None  # missing after a preload is authoritative
+        assert db.reads == 0
+
+    def test_shared_across_callers(self):
+        db = _seeded_db()
+        get_chapter_notes_doc(db, "84")
+        other = _FakeFirestore()  # a later request's client: nothing comes from it
+        assert get_chapter_notes_doc(other, "84")["chapter_title_he"] == "מכונות"
+        assert other.get_all_calls == 0
+
+    def test_unseeded_db_falls_back_to_per_doc_reads(self):
+        db = _FakeFirestore({"chapter_notes": {}})
+        preload_tariff_cache(db)
+        assert not get_tariff_cache_stats()["loaded"]
+        db.data["chapter_notes"]["chapter_84"] = {"chapter_title_he": "late"}
+        assert get_chapter_notes_doc(db, "84")["chapter_title_he"] == "late"
+        get_chapter_notes_doc(db, "84")
+        assert get_tariff_cache_stats()["hits"] == 1
+
+    def test_read_errors_raise_and_are_not_cached(self):
+        db = _FakeFirestore({"chapter_notes": {}})
+        preload_tariff_cache(db)
+        db.fail = True
+        try:
+            get_chapter_notes_doc(db, "84")
+            assert False, "expected the read error to propagate"
+        except RuntimeError:
+            pass
+        db.fail = False
+        db.data["chapter_notes"]["chapter_84"] = {"chapter_title_he": "ok"}
+        assert get_chapter_notes_doc(db, "84")["chapter_title_he"] == "ok"
+
+
+class TestHeadings:
+
+    def test_heading_rows_projected_and_cached(self):
+        db = _seeded_db()
+        rows = get_heading_tariff_docs(db, "8471")
+        assert rows == [{"hs_code": "8471.30", "description_he": "", "description_en": "Laptops",
+                         "duty_rate": "0%"}]
+        reads = db.reads
+        assert get_heading_tariff_docs(db, "8471") == rows
+        assert db.reads == reads
+
+
+class TestVersioning:
+
+    def test_version_bump_triggers_reload(self):
+        db = _seeded_db()
+        with patch.dict(os.environ, {"RCB_TARIFF_CACHE_CHECK_SEC": "0"}):
+            get_chapter_notes_doc(db, "84")
+            db.data["chapter_notes"]["chapter_84"] = {"chapter_title_he": "updated"}
+            assert get_chapter_notes_doc(db, "84")["chapter_title_he"] == "מכונות"
+            db.data.setdefault("system_state", {})["tariff_cache"] = {"version": 2}
+            assert get_chapter_notes_doc(db, "84")["chapter_title_he"] == "updated"
+        assert db.get_all_calls == 2
+        assert get_tariff_cache_stats()["version"] == 2
+
+    def test_version_not_rechecked_within_interval(self):
+        db = _seeded_db()
+        get_chapter_notes_doc(db, "84")
+        db.reads = 0
+        for _ in range(20):
+            get_chapter_notes_doc(db, "85")
+        assert db.reads == 0
+
+    def test_invalidate_forces_preload(self):
+        db = _seeded_db()
+        get_chapter_notes_doc(db, "84")
+        invalidate_tariff_cache()
+        get_chapter_notes_doc(db, "84")
+        assert db.get_all_calls == 2
+
+
+class TestSnapshot:
+
+    def test_publish_writes_snapshot_then_bumps(self):
+        db = _seeded_db()
+        uploads = {}
+        with patch.object(tariff_cache, "upload_to_gcs", side_effect=lambda b, p, c: uploads.__setitem__(p, c)):
+            result = publish_tariff_cache(db, reason="test")
+        assert result["version"] == 1
+        assert db.data["system_state"]["tariff_cache"]["version"] == 1
+        (path, body), = uploads.items()
+        assert path.endswith("/v1.json.gz") and result["snapshot"].endswith(path)
+        payload = json.loads(gzip.decompress(body))
+        assert payload["version"] == 1
+        assert set(payload["chapter_notes"]) == {"84", "85"}
+        assert payload["headings"]["8471"][0]["hs_code"] == "8471.30"
+
+    def test_preload_from_snapshot_skips_firestore(self):
+        db = _seeded_db()
+        uploads = {}
+        with patch.object(tariff_cache, "upload_to_gcs", side_effect=lambda b, p, c: uploads.__setitem__(p, c)):
+            publish_tariff_cache(db)
+        db.reads = 0
+        with patch.object(tariff_cache, "download_from_gcs", side_effect=lambda b, p: uploads[p]):
+            stats = preload_tariff_cache(db)
+        assert stats["source"] == "gcs" and stats["version"] == 1
+        assert db.get_all_calls == 0
+        assert get_heading_tariff_docs(db, "8516")[0]["description_en"] == "Hair dryers"
+        assert db.reads == 1  # the version doc only
+
+    def test_missing_snapshot_falls_back_to_firestore(self):
+        db = _seeded_db()
+        db.data["system_state"] = {"tariff_cache": {"version": 3}}
+        with patch.object(tariff_cache, "download_from_gcs", side_effect=RuntimeError("404")):
+            stats = preload_tariff_cache(db)
+        assert stats["source"] == "firestore" and stats["version"] == 3
+
+    def test_publish_bumps_even_if_snapshot_fails(self):
+        db = _seeded_db()
+        with patch.object(tariff_cache, "upload_to_gcs", side_effect=RuntimeError("no bucket")):
+            result = publish_tariff_cache(db)
+        assert result == {"version": 1, "snapshot": None}
+
+
+class TestEliminationTariffCache:
+
+    def test_projections_keep_their_shape(self):
+        cache = TariffCache(_seeded_db())
+        notes = cache.get_chapter_notes("84")
+        assert notes["found"] and notes["notes"] == ["note 1"] and len(notes["keywords"]) == 50
+        assert cache.get_chapter_notes("01") == {"found": False, "chapter": "01"}
+        section = cache.get_section_data("xvi")
+        assert section["found"] and section["chapters"] == ["84", "85"]
+        assert cache.get_chapter_section("85") == "XVI"
+        assert cache.get_heading_docs("8471")[0]["hs_code"] == "8471.30"
+
+    def test_new_run_on_warm_instance_reads_nothing(self):
+        db = _seeded_db()
+        TariffCache(db).get_chapter_notes("84")
+        db.reads = 0
+        cache = TariffCache(db)
+        cache.get_chapter_notes("85")
+        cache.get_section_data("XVI")
+        cache.get_chapter_section("84")
+        assert db.reads == 0
+
+    def test_read_error_reported_as_not_found(self):
+        db = _FakeFirestore({"chapter_notes": {}})
+        preload_tariff_cache(db)
+        db.fail = True
+        result = TariffCache(db).get_chapter_notes("84")
+        assert result["found"] is False and "deadline" in result["error"]
@@ -0,0 +1,228 @@
+"""
+Tests for tariff_index.py — in-memory inverted index over tariff descriptions.
+"""
+
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import tariff_index
+from lib.tariff_index import (
+    TariffIndex, _strip_he_prefixes, _tokenize, build_tariff_index,
+    get_tariff_index, search_tariff_index, save_snapshot, load_snapshot, reset_index,
+)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def _doc(data):
+    d = MagicMock()
+    d.to_dict.return_value = data
+    return d
+
+
+_CHAPTERS = [
+    {"code": "85.16", "description_en": "Electric hair dryers and hair curlers",
+     "description_he": "מייבשי שיער חשמליים", "duty_rate": "12%"},
+]
+_TARIFF = [
+    {"hs_code": "6109100000", "description_he": "חולצות טי מכותנה",
+     "description_en": "T-shirts of cotton, knitted", "duty_rate": "12%"},
+    {"hs_code": "6109900000", "description_he": "חולצות טי מחומרים אחרים",
+     "description_en": "T-shirts of other textile materials", "duty_rate": "12%"},
+    {"hs_code": "5201000000", "description_he": "כותנה לא מנופצת",
+     "description_en": "Cotton, not carded or combed", "duty_rate": ""},
+    {"hs_code": "9999999999", "description_en": "cotton shirts broken", "corrupt_code": True},
+    {"hs_code": "6205200000", "description_he": "",
+     "description_en": "Men's shirts of cotton", "duty_rate": ""},
+]
+
+
+def _make_db():
+    db = MagicMock()
+
+    def collection(name):
+        coll = MagicMock()
+        rows = _CHAPTERS if name == "tariff_chapters" else _TARIFF
+        coll.stream.return_value = [_doc(r) for r in rows]
+        coll.limit.return_value.stream.return_value = [_doc(r) for r in rows]
+        return coll
+
+    db.collection.side_effect = collection
+    return db
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    reset_index()
+    yield
+    reset_index()
+
+
+# ---------------------------------------------------------------------------
+# Tokenization
+# ---------------------------------------------------------------------------
+
+class TestTokenization:
+
+    def test_tokenize_lowercases_and_splits(self):
+        assert _tokenize("T-Shirts, of COTTON") == ["shirts", "of", "cotton"]
+
+    def test_tokenize_drops_single_chars(self):
+        assert _tokenize("a b cd") == ["cd"]
+
+    def test_strip_he_prefix(self):
+        assert "כותנה" in _strip_he_prefixes("מכותנה")
+
+    def test_strip_he_prefix_keeps_english(self):
+        assert _strip_he_prefixes("shirt") == ["shirt"]
+
+    def test_strip_he_prefix_min_length(self):
+        # Never strip down to a single letter
+        assert _strip_he_prefixes("בו") == ["בו"]
+
+
+# ---------------------------------------------------------------------------
+# Index + BM25
+# ---------------------------------------------------------------------------
+
+class TestTariffIndex:
+
+    def test_build_skips_corrupt_codes(self):
+        index = build_tariff_index(_make_db())
+        codes = [d["hs_code"] for d in index.docs]
+        assert "9999999999" not in codes
+        assert "85.16" in codes
+
+    def test_prefix_expansion_matches_plural(self):
+        index = build_tariff_index(_make_db())
+        hits = index.search(["shirt", "cotton"])
+        codes = [index.docs[h[0]]["hs_code"] for h in hits]
+        assert "6109100000" in codes
+
+    def test_min_matched_gate(self):
+        index = build_tariff_index(_make_db())
+        assert index.search(["cotton"]) == []
+        assert index.search(["cotton"], min_matched=1)
+
+    def test_hebrew_prefix_query(self):
+        index = build_tariff_index(_make_db())
+        hits = index.search(["חולצות", "בכותנה"])
+        assert index.docs[hits[0][0]]["hs_code"] == "6109100000"
+
+    def test_empty_index(self):
+        index = TariffIndex()
+        index.finalize()
+        assert index.search(["cotton", "shirt"]) == []
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+class TestSearchTariffIndex:
+
+    def test_result_shape(self, tmp_path):
+        db = _make_db()
+        get_tariff_index(db, snapshot_path=str(tmp_path / "none.json.gz"))
+        results = search_tariff_index(db, ["hair", "dryers"])
+        assert results
+        r = results[0]
+        assert r["hs_code"] == "85.16"
+        assert r["source"] == "tariff_chapters"
+        assert r["score"] == 30
+        for key in ("description_he", "description_en", "duty_rate"):
+            assert key in r
+
+    def test_short_description_penalized(self, tmp_path):
+        db = _make_db()
+        get_tariff_index(db, snapshot_path=str(tmp_path / "none.json.gz"))
+        results = search_tariff_index(db, ["men", "shirts", "cotton"])
+        men = [r for r in results if r["hs_code"] == "6205200000"][0]
+        assert men["score"] == 30  # 3 matches * 15 - 15 penalty
+
+    def test_built_once_per_instance(self, tmp_path):
+        db = _make_db()
+        path = str(tmp_path / "none.json.gz")
+        get_tariff_index(db, snapshot_path=path)
+        calls = db.collection.call_count
+        search_tariff_index(db, ["cotton", "shirts"])
+        search_tariff_index(db, ["hair", "dryers"])
+        assert db.collection.call_count == calls
+
+    def test_failed_build_not_cached(self, tmp_path, monkeypatch):
+        db = _make_db()
+        good = db.collection.side_effect
+        state = {"fail": True}
+
+        def collection(name):
+            if state["fail"] and name == "tariff":
+                coll = MagicMock()
+                coll.stream.side_effect = RuntimeError("deadline exceeded")
+                return coll
+            return good(name)
+
+        db.collection.side_effect = collection
+        path = str(tmp_path / "none.json.gz")
+        monkeypatch.setattr(tariff_index, "_BUILD_RETRY_SEC", 0)
+        assert not get_tariff_index(db, snapshot_path=path).complete
+        state["fail"] = False
+        index = get_tariff_index(db, snapshot_path=path)  # backoff elapsed -> rebuilt
+        assert index.complete and len(index) == 5
+
+    def test_failed_rebuild_keeps_last_good_index(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "none.json.gz")
+        good = get_tariff_index(_make_db(), snapshot_path=path)
+        monkeypatch.setattr(tariff_index, "_INDEX_EXPIRES", 0.0)
+        broken = MagicMock()
+        broken.collection.side_effect = RuntimeError("unavailable")
+        assert get_tariff_index(broken, snapshot_path=path) is good
+
+    def test_stale_index_served_during_rebuild(self, tmp_path, monkeypatch):
+        path = str(tmp_path / "none.json.gz")
+        good = get_tariff_index(_make_db(), snapshot_path=path)
+        monkeypatch.setattr(tariff_index, "_INDEX_EXPIRES", 0.0)
+        db = _make_db()
+        with tariff_index._INDEX_LOCK:  # another caller is rebuilding
+            assert get_tariff_index(db, snapshot_path=path) is good
+        db.collection.assert_not_called()
+        rebuilt = get_tariff_index(db, snapshot_path=path)
+        assert rebuilt is not good and rebuilt.complete
+
+    def test_empty_keywords(self):
+        db = _make_db()
+        assert search_tariff_index(db, []) == []
+        db.collection.assert_not_called()
+
+    def test_snapshot_round_trip(self, tmp_path):
+        path = str(tmp_path / "idx.json.gz")
+        index = build_tariff_index(_make_db())
+        save_snapshot(index, path)
+        loaded = load_snapshot(path)
+        assert loaded is not None
+        assert len(loaded) == len(index)
+        assert loaded.search(["shirt", "cotton"]) == index.search(["shirt", "cotton"])
+
+    def test_snapshot_used_instead_of_firestore(self, tmp_path):
+        path = str(tmp_path / "idx.json.gz")
+        save_snapshot(build_tariff_index(_make_db()), path)
+        db = MagicMock()
+        get_tariff_index(db, snapshot_path=path)
+        db.collection.assert_not_called()
+
+    def test_missing_snapshot_returns_none(self, tmp_path):
+        assert load_snapshot(str(tmp_path / "missing.json.gz")) is None
+
+    def test_intelligence_uses_index(self, tmp_path, monkeypatch):
+        from lib import intelligence
+        monkeypatch.setattr(tariff_index, "_SNAPSHOT_PATH", str(tmp_path / "none.json.gz"))
+        db = _make_db()
+        get_tariff_index(db, snapshot_path=str(tmp_path / "none.json.gz"))
+        results = intelligence._search_tariff(db, ["Cotton", "Shirts"])
+        assert any(r["hs_code"] == "6109100000" for r in results)
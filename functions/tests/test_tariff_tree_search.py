@@ -0,0 +1,156 @@
+"""
+Tests for tariff_tree.search_tree — token index, ranking and pagination.
+Uses a small synthetic tree, so it runs without the XML archive.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from lib import tariff_tree
+from lib.tariff_tree import (
+    TariffNode, _build_tree, _build_fc_index, _build_token_index,
+    search_tree, search_tree_page, reset_cache,
+)
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+def _make_nodes():
+    rows = [
+        (1, None, 'XVI', 1, 'מכונות ומכשירים', 'Machinery and mechanical appliances'),
+        (2, 1, '8400000000', 2, 'כורים גרעיניים, מכונות', 'Nuclear reactors, machinery'),
+        (3, 2, '8426000000', 3, 'עגורנים ומנופים', 'Cranes and derricks'),
+        (4, 3, '8426110000', 4, 'עגורני גשר על תמיכות קבועות', 'Overhead travelling cranes on fixed support'),
+        (5, 3, '8426200000', 4, 'עגורני מגדל', 'Tower cranes'),
+        (6, 2, '8431000000', 3, 'חלקים למכונות', 'Parts of machinery'),
+        (7, 6, '8431490000', 4, 'חלקים אחרים של עגורנים', 'Other parts of cranes'),
+        (8, 1, '7300000000', 2, 'מוצרים מפלדה', 'Articles of iron or steel'),
+        (9, 8, '7308000000', 3, 'מבנים מפלדה', 'Structures of iron or steel'),
+        (10, 1, '4400000000', 2, 'עץ ומוצרים מעץ', 'Wood and articles of wood'),
+        (11, 10, '4421000000', 3, 'מוצרים אחרים מעץ', 'Other articles of wood'),
+        (12, 1, '4202000000', 2, 'תיקים מבד', 'Bags of textile'),
+    ]
+    nodes = {r[0]: TariffNode(id=r[0], parent_id=r[1], fc=r[2], level=r[3],
+                              desc_he=r[4], desc_en=r[5]) for r in rows}
+    return nodes
+
+
+@pytest.fixture(autouse=True)
+def _synthetic_tree():
+    reset_cache()
+    nodes = _make_nodes()
+    tariff_tree._TREE = nodes
+    tariff_tree._ROOT_IDS = _build_tree(nodes)
+    tariff_tree._FC_INDEX = _build_fc_index(nodes)
+    yield
+    reset_cache()
+
+
+def _fcs(results):
+    return [r['fc'] for r in results]
+
+
+# ---------------------------------------------------------------------------
+# Token index
+# ---------------------------------------------------------------------------
+
+class TestTokenIndex:
+
+    def test_hebrew_prefix_variants_indexed(self):
+        lex = _build_token_index(_make_nodes())
+        # "מפלדה" is indexed under "פלדה" as well
+        assert set(lex.docs('פלדה')) == {8, 9}
+        assert lex.vocab == sorted(lex.vocab)
+
+    def test_three_letter_words_keep_two_letter_stem(self):
+        lex = _build_token_index(_make_nodes())
+        assert set(lex.docs('עץ')) == {10, 11}
+        assert set(lex.docs('בד')) == {12}
+
+    def test_field_bits(self):
+        lex = _build_token_index(_make_nodes())
+        assert lex.has('cranes', tariff_tree.FIELD_EN)
+        assert not lex.has('cranes', tariff_tree.FIELD_HE)
+        assert lex.has('עגורני', tariff_tree.FIELD_HE)
+
+    def test_lexicon_shared_and_reset_with_tree(self):
+        lex = tariff_tree.tree_lexicon()
+        assert tariff_tree.tree_lexicon() is lex
+        reset_cache()
+        tariff_tree._TREE = _make_nodes()
+        assert tariff_tree.tree_lexicon() is not lex
+
+
+# ---------------------------------------------------------------------------
+# Ranking
+# ---------------------------------------------------------------------------
+
+class TestSearchRanking:
+
+    def test_english_prefix_extension(self):
+        # "crane" reaches "cranes" via the sorted vocabulary
+        assert set(_fcs(search_tree('crane'))) == {
+            '8426000000', '8426110000', '8426200000', '8431490000'}
+
+    def test_overlap_ranks_first(self):
+        results = search_tree('tower cranes')
+        assert results[0]['fc'] == '8426200000'
+        assert results[0]['matched_terms'] == 2
+
+    def test_deeper_and_leaf_nodes_first(self):
+        results = search_tree('cranes')
+        assert results[-1]['fc'] == '8426000000'   # heading, not a leaf
+        assert all(r['level'] == 4 for r in results[:3])
+
+    def test_hebrew_query_prefix_stripped(self):
+        results = search_tree('ופלדה')
+        assert set(_fcs(results)) == {'7300000000', '7308000000'}
+        assert results[0]['match_field'] == 'desc_he'
+
+    def test_short_hebrew_stem_query(self):
+        assert set(_fcs(search_tree('עץ'))) == {'4400000000', '4421000000'}
+        assert _fcs(search_tree('בד')) == ['4202000000']
+
+    def test_query_split_like_index(self):
+        assert _fcs(search_tree('tower-cranes'))[0] == '8426200000'
+        assert set(_fcs(search_tree('iron/steel'))) == {'7300000000', '7308000000'}
+
+    def test_results_have_path(self):
+        results = search_tree('derricks')
+        assert results[0]['path'][0]['fc'] == 'XVI'
+        assert results[0]['path'][-1]['fc'] == '8426000000'
+
+    def test_empty_query(self):
+        assert search_tree('') == []
+        assert search_tree('   ') == []
+
+    def test_no_match(self):
+        assert search_tree('bicycle') == []
+
+
+# ---------------------------------------------------------------------------
+# Pagination
+# ---------------------------------------------------------------------------
+
+class TestPagination:
+
+    def test_pages_cover_all_results(self):
+        full = search_tree_page('steel cranes machinery')
+        first = search_tree_page('steel cranes machinery', offset=0, limit=3)
+        rest = search_tree_page('steel cranes machinery', offset=3, limit=50)
+        assert first['total'] == full['total'] == len(full['results'])
+        assert _fcs(first['results']) + _fcs(rest['results']) == _fcs(full['results'])
+
+    def test_limit_caps_results(self):
+        assert len(search_tree('cranes', limit=2)) == 2
+
+    def test_offset_past_end(self):
+        page = search_tree_page('cranes', offset=100)
+        assert page['results'] == []
+        assert page['total'] == 4
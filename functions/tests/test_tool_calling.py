@@ -563,3 +563,130 @@ class TestFTACountryMap:
         from lib.tool_executors import _FTA_COUNTRY_MAP
         for k, v in _FTA_COUNTRY_MAP.items():
             assert isinstance(v, str), f"FTA map key '{k}' has non-string value"
+
+
+# ---------------------------------------------------------------------------
+# Tests: Shared external lookup cache (memory -> Firestore, stale-while-revalidate)
+# ---------------------------------------------------------------------------
+
+class TestExternalLookupCache:
+
+    @pytest.fixture(autouse=True)
+    def _clock(self, monkeypatch):
+        from lib import tool_executors as te
+        te.clear_external_cache()
+        self.now = [1_000_000.0]
+        monkeypatch.setattr(te, "_ext_now", lambda: self.now[0])
+        yield
+        te.clear_external_cache()
+
+    def _executor(self, doc_exists=False, doc_data=None):
+        from unittest.mock import MagicMock
+        from lib.tool_executors import ToolExecutor
+        db = MagicMock()
+        doc = db.collection.return_value.document.return_value.get.return_value
+        doc.exists = doc_exists
+        doc.to_dict.return_value = doc_data or {}
+        return ToolExecutor(db, api_key=None), db
+
+    def _fetcher(self, result):
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            return dict(result)
+        return fetch, calls
+
+    def _drain(self):
+        from concurrent.futures import wait
+        from lib import tool_executors as te
+        wait(list(te._EXT_REFRESHING.values()), timeout=5)
+
+    def test_memory_tier_shared_across_executors(self):
+        from lib.tool_executors import get_external_cache_stats
+        fetch, calls = self._fetcher({"found": True, "extract": "steel"})
+        first, db = self._executor()
+        second, _ = self._executor()
+        assert first._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] == "steel"
+        assert second._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] == "steel"
+        assert len(calls) == 1
+        assert db.collection.return_value.document.return_value.set.called
+        stats = get_external_cache_stats()
+        assert stats["misses"] == 1 and stats["memory_hits"] == 1
+
+    def test_returned_dict_is_a_copy(self):
+        fetch, _ = self._fetcher({"found": True, "extract": "steel"})
+        executor, _ = self._executor()
+        executor._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] = "changed"
+        other, _ = self._executor()
+        assert other._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] == "steel"
+
+    def test_negative_result_short_ttl_not_persisted(self):
+        from lib.tool_executors import _EXT_NEGATIVE_TTL_SEC
+        fetch, calls = self._fetcher({"found": False})
+        executor, db = self._executor()
+        executor._cached_external_lookup("k", "wiki_cache", 7, fetch)
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 7, fetch)
+        assert len(calls) == 1
+        assert not db.collection.return_value.document.return_value.set.called
+        self.now[0] += _EXT_NEGATIVE_TTL_SEC + 1
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 7, fetch)
+        assert len(calls) == 2
+
+    def test_stale_entry_served_while_refreshing(self):
+        from lib.tool_executors import get_external_cache_stats
+        fetch, calls = self._fetcher({"found": True, "extract": "old"})
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fetch)
+        self.now[0] += 86400 + 60
+
+        fresh, fresh_calls = self._fetcher({"found": True, "extract": "new"})
+        result = self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fresh)
+        assert result["extract"] == "old"
+        self._drain()
+        assert len(fresh_calls) == 1
+        assert self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fresh)["extract"] == "new"
+        stats = get_external_cache_stats()
+        assert stats["stale_served"] == 1 and stats["refreshes"] == 1
+
+    def test_failed_refresh_keeps_stale_entry(self):
+        fetch, _ = self._fetcher({"found": True, "extract": "old"})
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fetch)
+        self.now[0] += 86400 + 60
+        empty, _ = self._fetcher({"found": False})
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, empty)
+        self._drain()
+        assert self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, empty)["extract"] == "old"
+
+    def test_expired_past_stale_window_fetches_inline(self):
+        fetch, calls = self._fetcher({"found": True, "extract": "x"})
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fetch)
+        self.now[0] += 3 * 86400
+        self._executor()[0]._cached_external_lookup("k", "wiki_cache", 1, fetch)
+        assert len(calls) == 2
+
+    def test_firestore_tier_populates_memory(self):
+        from datetime import datetime, timezone
+        from lib.tool_executors import get_external_cache_stats
+        cached_at = datetime.fromtimestamp(self.now[0] - 60, timezone.utc).isoformat()
+        executor, db = self._executor(doc_exists=True, doc_data={
+            "result": {"found": True, "extract": "from fs"}, "cached_at": cached_at})
+        fetch, calls = self._fetcher({"found": True, "extract": "live"})
+        assert executor._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] == "from fs"
+        assert self._executor()[0]._cached_external_lookup("k", "wiki_cache", 7, fetch)["extract"] == "from fs"
+        assert calls == []
+        stats = get_external_cache_stats()
+        assert stats["firestore_hits"] == 1 and stats["memory_hits"] == 1
+
+    def test_lru_eviction(self, monkeypatch):
+        from lib import tool_executors as te
+        monkeypatch.setattr(te, "_EXT_MEM_MAX_ENTRIES", 2)
+        executor, _ = self._executor()
+        for key in ("a", "b", "c"):
+            fetch, _ = self._fetcher({"found": True})
+            executor._cached_external_lookup(key, "wiki_cache", 7, fetch)
+        assert list(te._EXT_MEM_CACHE) == ["wiki_cache:b", "wiki_cache:c"]
+        assert te.get_external_cache_stats()["evictions"] == 1
+
+    def test_executor_stats_include_cache(self):
+        executor, _ = self._executor()
+        assert "external_cache" in executor.get_stats()
@@ -294,3 +294,34 @@ class TestBuilderTokenize:
             # Search deduplicates, builder doesn't always — compare as sets
             assert set(b_tokens) == set(s_tokens), \
                 f"Tokenizer mismatch for '{text}': builder={b_tokens}, search={s_tokens}"
+
+
+class TestSearchWordLexicon:
+    """search_word over the shared lexicon (no generated index needed)."""
+
+    @pytest.fixture(autouse=True)
+    def _fake_index(self, monkeypatch):
+        from lib import _unified_search
+        from lib.lexicon import Lexicon
+        words = Lexicon.build({
+            "פלדה": [("7308000000", "tariff", 5)],
+            "steel": [("7308000000", "tariff", 5), ("7326000000", "chapter", 2)],
+        }, labels=True)
+        monkeypatch.setattr(_unified_search, "_INDEX",
+                            {"words": words, "headings": {}, "meta": {}})
+
+    def test_exact_word(self):
+        from lib._unified_search import search_word
+        assert search_word("Steel") == [("7308000000", "tariff", 5),
+                                         ("7326000000", "chapter", 2)]
+
+    def test_prefix_strip_fallback(self):
+        from lib._unified_search import search_word
+        assert search_word("מפלדה") == [("7308000000", "tariff", 5)]
+
+    def test_phrase_aggregates(self):
+        from lib._unified_search import search_phrase
+        results = search_phrase("steel מפלדה", min_score=2)
+        assert results[0]["hs_code"] == "7308000000"
+        # "מפלדה" and its stripped token "פלדה" each count, as in the builder
+        assert results[0]["score"] == 3